@@ -39,3 +39,7 @@ SELECTED_TASK_CLASS = "selected_task_class"
 # The default number of days to plot for task instances, provided there
 # are tasks within this range.
 DEFAULT_DAYS_TO_PLOT = 7
+
+# The maximum number of rows to send for one page of a DataTables table
+# which is processed server-side
+DATATABLES_MAX_PAGE_LENGTH = 100
@@ -1,8 +1,22 @@
 """Contains tests for the front-end."""
 
+from datetime import date, datetime
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from frontend.views.utils_stats import (
+    get_job_state_data,
+    get_job_state_data_date_enumerated,
+)
+from tasksapi.constants import RUNNING, SUCCESSFUL
+from tasksapi.logs import LogsBucket
+from tasksapi.models import ExecutableTaskInstance
+from tasksapi.tests.requests_tests.utils import FakeS3Client
 
 ADMIN_USER_USERNAME = "adminuser"
 ADMIN_USER_PASSWORD = "qwertyuiop"
@@ -39,6 +53,7 @@ class FrontendRenderTests(TestCase):
             reverse("account-edit-profile"),
             reverse("account-change-password"),
             reverse("containertaskinstance-list"),
+            reverse("containertaskinstance-table-data"),
             reverse("containertaskinstance-create-menu"),
             reverse(
                 "containertaskinstance-detail",
@@ -83,6 +98,7 @@ class FrontendRenderTests(TestCase):
                 kwargs={"pk": CONTAINER_TASK_TYPE_PK},
             ),
             reverse("executabletaskinstance-list"),
+            reverse("executabletaskinstance-table-data"),
             reverse("executabletaskinstance-create-menu"),
             reverse(
                 "executabletaskinstance-detail",
@@ -142,3 +158,279 @@ class FrontendRenderTests(TestCase):
         for page in pages_to_get:
             get_response = self.client.get(page)
             self.assertEqual(get_response.status_code, status.HTTP_200_OK)
+
+    def test_task_type_resource_usage(self):
+        """Make sure task types show the resources their jobs used."""
+        url = reverse(
+            "executabletasktype-detail",
+            kwargs={"pk": EXECUTABLE_TASK_TYPE_PK},
+        )
+
+        self.assertNotContains(self.client.get(url), "Resource usage")
+
+        ExecutableTaskInstance.objects.filter(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        ).update(
+            wall_time_seconds=12.5,
+            cpu_user_seconds=3,
+            cpu_system_seconds=1,
+            peak_memory_megabytes=300,
+            bytes_read=2048,
+            bytes_written=0,
+        )
+
+        response = self.client.get(url)
+
+        self.assertContains(response, "Resource usage")
+        self.assertEqual(
+            response.context["resource_usage"]["avg_cpu_seconds"], 4
+        )
+        self.assertEqual(
+            response.context["resource_usage"]["max_peak_memory_megabytes"],
+            300,
+        )
+
+
+class FrontendStatsTests(TestCase):
+    """Make sure job state statistics are right and cheap to compute."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def get_successful_counts(self, time_zone):
+        """Get successful job counts from 2018-12-13 to 2018-12-15.
+
+        Args:
+            time_zone: A string containing the name of the time zone to
+                count with.
+
+        Returns:
+            A list of three integers, one for each date.
+        """
+        with timezone.override(time_zone), self.assertNumQueries(1):
+            chart_data = get_job_state_data_date_enumerated(
+                start_date=date(2018, 12, 13), end_date=date(2018, 12, 15)
+            )
+
+        self.assertEqual(
+            chart_data["labels"], ["2018-12-13", "2018-12-14", "2018-12-15"]
+        )
+
+        for dataset in chart_data["datasets"]:
+            if dataset["label"] != SUCCESSFUL:
+                self.assertEqual(dataset["data"], [0, 0, 0])
+
+        return next(
+            dataset["data"]
+            for dataset in chart_data["datasets"]
+            if dataset["label"] == SUCCESSFUL
+        )
+
+    def test_job_state_data_date_enumerated(self):
+        """Make sure states are counted on the right dates."""
+        # The fixture's instances were all created at around 05:00 UTC
+        # on 2018-12-14 and are all successful, which is the evening of
+        # 2018-12-13 in Vancouver
+        self.assertEqual(self.get_successful_counts("UTC"), [0, 3, 0])
+        self.assertEqual(
+            self.get_successful_counts("America/Vancouver"), [3, 0, 0]
+        )
+
+    def test_job_state_data_fractional_offsets(self):
+        """Make sure dates are right in zones with half hour offsets."""
+        # 18:40 UTC is 00:10 the next day in Kolkata (UTC+05:30)
+        ExecutableTaskInstance.objects.filter(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        ).update(
+            datetime_created=datetime(
+                2018, 12, 14, 18, 40, tzinfo=timezone.utc
+            )
+        )
+        call_command("rebuild_task_instance_state_counts", stdout=StringIO())
+
+        self.assertEqual(self.get_successful_counts("UTC"), [0, 3, 0])
+        self.assertEqual(self.get_successful_counts("Asia/Kolkata"), [0, 2, 1])
+
+    def test_job_state_data_query_count_is_constant(self):
+        """Make sure plotting more days doesn't cost more queries."""
+        with self.assertNumQueries(1):
+            chart_data = get_job_state_data(
+                start_date=date(2018, 1, 1), end_date=date(2018, 12, 31)
+            )
+
+        self.assertTrue(chart_data["has_data"])
+        self.assertEqual(sum(chart_data["datasets"][0]["data"]), 3)
+
+        with self.assertNumQueries(1):
+            get_job_state_data_date_enumerated(
+                start_date=date(2015, 1, 1), end_date=date(2018, 12, 31)
+            )
+
+
+class FrontendTableDataTests(TestCase):
+    """Make sure task instance tables are processed server-side."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Authenticate the client in."""
+        self.client.login(
+            username=ADMIN_USER_USERNAME, password=ADMIN_USER_PASSWORD
+        )
+
+    def get_table_data(self, urlname, **params):
+        """Get a page of task instance table data.
+
+        Args:
+            urlname: A string containing the URL name of the table data
+                view.
+            **params: DataTables and filter request parameters.
+
+        Returns:
+            A dictionary containing the table data.
+        """
+        response = self.client.get(
+            reverse(urlname),
+            {
+                "draw": 1,
+                "start": 0,
+                "length": 10,
+                "columns[0][data]": "uuid",
+                "columns[1][data]": "name",
+                "columns[5][data]": "datetime_created",
+                "order[0][column]": 5,
+                "order[0][dir]": "desc",
+                **params,
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.json()
+
+    def test_table_data(self):
+        """Make sure table data is paged, sorted, searched, and filtered."""
+        table_data = self.get_table_data("containertaskinstance-table-data")
+
+        self.assertEqual(table_data["draw"], 1)
+        self.assertEqual(table_data["recordsTotal"], 2)
+        self.assertEqual(table_data["recordsFiltered"], 2)
+
+        # Most recently created first
+        self.assertIn(
+            CONTAINER_TASK_INSTANCE_UUID, table_data["data"][1]["uuid"]
+        )
+
+        # Paging
+        table_data = self.get_table_data(
+            "containertaskinstance-table-data", start=1, length=1
+        )
+
+        self.assertEqual(len(table_data["data"]), 1)
+        self.assertIn(
+            CONTAINER_TASK_INSTANCE_UUID, table_data["data"][0]["uuid"]
+        )
+
+        # Searching
+        table_data = self.get_table_data(
+            "containertaskinstance-table-data",
+            **{"search[value]": "docker world"}
+        )
+
+        self.assertEqual(table_data["recordsTotal"], 2)
+        self.assertEqual(table_data["recordsFiltered"], 1)
+        self.assertIn(
+            CONTAINER_TASK_INSTANCE_UUID, table_data["data"][0]["uuid"]
+        )
+
+        # Filtering
+        table_data = self.get_table_data(
+            "executabletaskinstance-table-data",
+            task_type=EXECUTABLE_TASK_TYPE_PK,
+            task_queue=TASK_QUEUE_PK,
+            state=SUCCESSFUL,
+        )
+
+        self.assertEqual(table_data["recordsTotal"], 1)
+
+        table_data = self.get_table_data(
+            "executabletaskinstance-table-data", state=RUNNING
+        )
+
+        self.assertEqual(table_data["recordsTotal"], 0)
+        self.assertEqual(table_data["data"], [])
+
+    def test_table_data_query_count_is_constant(self):
+        """Make sure bigger pages don't cost more queries."""
+        instance = ExecutableTaskInstance.objects.get(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        )
+
+        for _ in range(5):
+            ExecutableTaskInstance.objects.create(
+                user=instance.user,
+                task_type=instance.task_type,
+                task_queue=instance.task_queue,
+            )
+
+        # A user lookup, then counting and fetching the instances (along
+        # with their task types and users)
+        with self.assertNumQueries(3):
+            table_data = self.get_table_data(
+                "executabletaskinstance-table-data"
+            )
+
+        self.assertEqual(len(table_data["data"]), 6)
+
+
+class FrontendLogDataTests(TestCase):
+    """Make sure task instance logs can be polled from detail pages."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Authenticate the client in and put a log in S3."""
+        self.client.login(
+            username=ADMIN_USER_USERNAME, password=ADMIN_USER_PASSWORD
+        )
+
+        # Don't use logs cached by other tests
+        cache.clear()
+
+        s3_client = FakeS3Client()
+        s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt", b"hello\n"
+        )
+
+        patcher = mock.patch(
+            "tasksapi.logs.get_logs_bucket",
+            return_value=LogsBucket(s3_client, "logs"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_log_data(self):
+        """Make sure logs are read from offsets."""
+        url = reverse(
+            "executabletaskinstance-log-data",
+            kwargs={"uuid": EXECUTABLE_TASK_INSTANCE_UUID},
+        )
+
+        response = self.client.get(url, {"file": "stdout.txt", "offset": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "text": "llo\n",
+                "offset": 2,
+                "next_offset": 6,
+                "size": 6,
+                "state": SUCCESSFUL,
+            },
+        )
+
+        response = self.client.get(url, {"file": "stderr.txt"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {"file": "stdout.txt", "tail": "a"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
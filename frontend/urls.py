@@ -27,6 +27,11 @@ urlpatterns = [
         views.ContainerTaskInstanceList.as_view(),
         name="containertaskinstance-list",
     ),
+    path(
+        r"containertaskinstances/table-data/",
+        views.ContainerTaskInstanceTableData.as_view(),
+        name="containertaskinstance-table-data",
+    ),
     path(
         r"containertaskinstances/create/",
         views.ContainerTaskInstanceCreateTaskTypeMenu.as_view(),
@@ -37,6 +42,11 @@ urlpatterns = [
         views.ContainerTaskInstanceDetail.as_view(),
         name="containertaskinstance-detail",
     ),
+    path(
+        r"containertaskinstances/<uuid:uuid>/logs/",
+        views.ContainerTaskInstanceLogData.as_view(),
+        name="containertaskinstance-log-data",
+    ),
     path(
         r"containertaskinstances/<uuid:uuid>/rename/",
         views.ContainerTaskInstanceRename.as_view(),
@@ -97,6 +107,11 @@ urlpatterns = [
         views.ExecutableTaskInstanceList.as_view(),
         name="executabletaskinstance-list",
     ),
+    path(
+        r"executabletaskinstances/table-data/",
+        views.ExecutableTaskInstanceTableData.as_view(),
+        name="executabletaskinstance-table-data",
+    ),
     path(
         r"executabletaskinstances/create/",
         views.ExecutableTaskInstanceCreateTaskTypeMenu.as_view(),
@@ -107,6 +122,11 @@ urlpatterns = [
         views.ExecutableTaskInstanceDetail.as_view(),
         name="executabletaskinstance-detail",
     ),
+    path(
+        r"executabletaskinstances/<uuid:uuid>/logs/",
+        views.ExecutableTaskInstanceLogData.as_view(),
+        name="executabletaskinstance-log-data",
+    ),
     path(
         r"executabletaskinstances/<uuid:uuid>/rename/",
         views.ExecutableTaskInstanceRename.as_view(),
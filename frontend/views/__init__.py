@@ -25,13 +25,17 @@ from .queues import (
 )
 from .taskinstances import (
     ContainerTaskInstanceList,
+    ContainerTaskInstanceTableData,
     ContainerTaskInstanceDetail,
+    ContainerTaskInstanceLogData,
     ContainerTaskInstanceRename,
     ContainerTaskInstanceStateUpdate,
     ContainerTaskInstanceTerminate,
     ContainerTaskInstanceDelete,
     ExecutableTaskInstanceList,
+    ExecutableTaskInstanceTableData,
     ExecutableTaskInstanceDetail,
+    ExecutableTaskInstanceLogData,
     ExecutableTaskInstanceRename,
     ExecutableTaskInstanceStateUpdate,
     ExecutableTaskInstanceTerminate,
@@ -5,11 +5,12 @@ don't, or do it indirectly. I guess "directly" isn't super well defined
 here, but whatever.
 """
 
-from datetime import date, timedelta
+from datetime import timedelta
 import json
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views.generic import FormView, TemplateView
 from frontend.forms import (
     ContainerTaskTypeSelectForm,
@@ -60,8 +61,8 @@ class Home(TemplateView):
         use_week_days = bool(days_to_plot <= 7)
 
         # Get data for Chart.js
-        today = date.today()
-        last_week_date = date.today() - timedelta(days=days_to_plot - 1)
+        today = timezone.localdate()
+        last_week_date = today - timedelta(days=days_to_plot - 1)
         chart_data = get_job_state_data_date_enumerated(
             start_date=last_week_date,
             end_date=today,
@@ -66,6 +66,11 @@ class TaskTypeFormViewMixin:
             "required_arguments",
             "required_arguments_default_values",
             "environment_variables",
+            "required_cpus",
+            "required_memory_megabytes",
+            "cpu_limit",
+            "memory_limit_megabytes",
+            "pids_limit",
         ]
         form.order_fields(form.field_order)
 
@@ -1,7 +1,8 @@
 """Views for queues."""
 
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -47,6 +48,24 @@ class QueueDetail(LoginRequiredMixin, DetailView):
     model = TaskQueue
     template_name = "frontend/queue_detail.html"
 
+    def get_context_data(self, **kwargs):
+        """Add in where to load related task instances from."""
+        context = super().get_context_data(**kwargs)
+
+        query_string = urlencode({"task_queue": self.object.pk})
+
+        for taskinstance_name, taskinstance_set in (
+            ("containertaskinstance", self.object.containertaskinstance_set),
+            ("executabletaskinstance", self.object.executabletaskinstance_set),
+        ):
+            context["has_%ss" % taskinstance_name] = taskinstance_set.exists()
+            context["%s_data_url" % taskinstance_name] = "%s?%s" % (
+                reverse("%s-table-data" % taskinstance_name),
+                query_string,
+            )
+
+        return context
+
 
 class QueueUpdate(
     LoginRequiredMixin,
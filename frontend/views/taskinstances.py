@@ -5,32 +5,76 @@ Views for creating and cloning are in a separate module.
 
 from celery.result import AsyncResult
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseRedirect
-from django.urls import reverse_lazy
-from django.views.generic import DeleteView, DetailView, ListView, UpdateView
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseNotFound,
+    HttpResponseRedirect,
+    JsonResponse,
+)
+from django.urls import reverse, reverse_lazy
+from django.utils import dateformat, timezone
+from django.utils.html import escape, format_html
+from django.views.generic import (
+    DeleteView,
+    DetailView,
+    TemplateView,
+    UpdateView,
+    View,
+)
+from django.views.generic.detail import SingleObjectMixin
+from frontend.templatetags.color_state import color_state
 from tasksapi.constants import CONTAINER_TASK, EXECUTABLE_TASK
+from tasksapi.logs import LOG_READ_MAX_BYTES, read_task_instance_log
 from tasksapi.models import ContainerTaskInstance, ExecutableTaskInstance
 from .mixins import (
     SetContainerTaskClassCookieMixin,
     SetExecutableTaskClassCookieMixin,
 )
 from .utils import get_context_data_for_chartjs
+from .utils_datatables import get_datatables_page
 from .utils_logs import (
     get_s3_logs_for_task_instance,
     get_s3_logs_for_executable_task_instance,
 )
 
 
-class BaseTaskInstanceList(LoginRequiredMixin, ListView):
-    """A base view for listing task instances."""
+# The fields to order task instance table columns by
+TASKINSTANCE_TABLE_ORDER_FIELDS = {
+    "uuid": "uuid",
+    "name": "name",
+    "task_type": "task_type__name",
+    "user": "user__username",
+    "state": "state",
+    "datetime_created": "datetime_created",
+}
+
+# The field lookups to search task instance tables with
+TASKINSTANCE_TABLE_SEARCH_FIELDS = (
+    "uuid__istartswith",
+    "name__icontains",
+    "task_type__name__icontains",
+    "user__username__icontains",
+    "state__istartswith",
+)
+
+
+class BaseTaskInstanceList(LoginRequiredMixin, TemplateView):
+    """A base view for listing task instances.
+
+    The task instances themselves are loaded from the corresponding
+    table data view.
+    """
 
-    context_object_name = "taskinstance_list"
     task_class = None
+    table_data_urlname = None
 
     def get_context_data(self, **kwargs):
-        """Get some stats for the task instances."""
+        """Get some stats and a table data URL for the task instances."""
         context = super().get_context_data(**kwargs)
 
+        # Add in where to load the task instances from
+        context["taskinstance_data_url"] = reverse(self.table_data_urlname)
+
         # Get data for Chart.js
         context = {
             **context,
@@ -40,6 +84,83 @@ class BaseTaskInstanceList(LoginRequiredMixin, ListView):
         return context
 
 
+class BaseTaskInstanceTableData(LoginRequiredMixin, View):
+    """A base view for the data of task instance tables.
+
+    This serves pages of task instances to DataTables tables processed
+    server-side. The task instances can be filtered with the task_queue,
+    task_type, and state request parameters.
+    """
+
+    model = None
+    taskinstance_urlname = None
+    tasktype_urlname = None
+
+    def get(self, request, *args, **kwargs):
+        """Get a page of task instances as JSON."""
+        params = request.GET
+        queryset = self.model.objects.select_related("task_type", "user")
+
+        # Filter the task instances
+        for param in ("task_queue", "task_type"):
+            if param in params:
+                try:
+                    pk = int(params[param])
+                except ValueError:
+                    return HttpResponseBadRequest(
+                        "%s must be an integer" % param
+                    )
+
+                queryset = queryset.filter(**{param + "_id": pk})
+
+        if "state" in params:
+            queryset = queryset.filter(state=params["state"])
+
+        # Get the page of task instances
+        page = get_datatables_page(
+            params,
+            queryset,
+            order_fields=TASKINSTANCE_TABLE_ORDER_FIELDS,
+            search_fields=TASKINSTANCE_TABLE_SEARCH_FIELDS,
+        )
+        page["data"] = [
+            self.get_row(taskinstance) for taskinstance in page["data"]
+        ]
+
+        return JsonResponse(page)
+
+    def get_row(self, taskinstance):
+        """Get the table cells (as HTML) for a task instance.
+
+        Args:
+            taskinstance: The task instance to get the cells for.
+
+        Returns:
+            A dictionary where keys are column names and values are
+            strings containing the HTML for those columns' cells.
+        """
+        return {
+            "uuid": format_html(
+                '<a href="{}">{}</a>',
+                reverse(self.taskinstance_urlname, args=[taskinstance.uuid]),
+                taskinstance.uuid,
+            ),
+            "name": escape(taskinstance.name),
+            "task_type": format_html(
+                '<a href="{}">{}</a>',
+                reverse(
+                    self.tasktype_urlname, args=[taskinstance.task_type.pk]
+                ),
+                taskinstance.task_type.name,
+            ),
+            "user": escape(taskinstance.user),
+            "state": color_state(taskinstance.state),
+            "datetime_created": dateformat.format(
+                timezone.localtime(taskinstance.datetime_created), "Y-m-d"
+            ),
+        }
+
+
 class BaseTaskInstanceDetail(LoginRequiredMixin, DetailView):
     """A base view for a specific task instance."""
 
@@ -59,7 +180,58 @@ class BaseTaskInstanceDetail(LoginRequiredMixin, DetailView):
 
     def get_logs(self):
         """Get the logs for the task instance."""
-        return get_s3_logs_for_task_instance(str(self.get_object().uuid))
+        return get_s3_logs_for_task_instance(self.object)
+
+
+class BaseTaskInstanceLogData(LoginRequiredMixin, SingleObjectMixin, View):
+    """A base view for reading part of a task instance's log file.
+
+    The file is given by the file request parameter. The bytes from the
+    offset request parameter are read if it's given; otherwise the last
+    tail bytes (the default amount if not given) are read. The detail
+    pages use this to poll for what running jobs have written.
+    """
+
+    model = None
+    pk_url_kwarg = "uuid"
+
+    def get(self, request, *args, **kwargs):
+        """Get part of a log file as JSON."""
+        taskinstance = self.get_object()
+        params = request.GET
+
+        if "file" not in params:
+            return HttpResponseBadRequest("file must be given")
+
+        read_kwargs = {}
+
+        for param, kwarg in (("offset", "offset"), ("tail", "tail_bytes")):
+            if param in params:
+                try:
+                    read_kwargs[kwarg] = int(params[param])
+                except ValueError:
+                    return HttpResponseBadRequest(
+                        "%s must be an integer" % param
+                    )
+
+                if read_kwargs[kwarg] < 0:
+                    return HttpResponseBadRequest(
+                        "%s must not be negative" % param
+                    )
+
+        log = read_task_instance_log(
+            taskinstance,
+            params["file"],
+            max_bytes=LOG_READ_MAX_BYTES,
+            **read_kwargs
+        )
+
+        if log is None:
+            return HttpResponseNotFound("No log file %s" % params["file"])
+
+        log["state"] = taskinstance.state
+
+        return JsonResponse(log)
 
 
 class BaseTaskInstanceRename(LoginRequiredMixin, UpdateView):
@@ -121,11 +293,19 @@ class ContainerTaskInstanceList(
 ):
     """A view for listing container task instances."""
 
-    model = ContainerTaskInstance
     task_class = CONTAINER_TASK
+    table_data_urlname = "containertaskinstance-table-data"
     template_name = "frontend/containertaskinstance_list.html"
 
 
+class ContainerTaskInstanceTableData(BaseTaskInstanceTableData):
+    """A view for the data of container task instance tables."""
+
+    model = ContainerTaskInstance
+    taskinstance_urlname = "containertaskinstance-detail"
+    tasktype_urlname = "containertasktype-detail"
+
+
 class ContainerTaskInstanceDetail(BaseTaskInstanceDetail):
     """A view for a specific container task instance."""
 
@@ -133,6 +313,12 @@ class ContainerTaskInstanceDetail(BaseTaskInstanceDetail):
     template_name = "frontend/containertaskinstance_detail.html"
 
 
+class ContainerTaskInstanceLogData(BaseTaskInstanceLogData):
+    """A view for reading part of a container task instance's log file."""
+
+    model = ContainerTaskInstance
+
+
 class ContainerTaskInstanceRename(BaseTaskInstanceRename):
     """A view for renaming a container task instance."""
 
@@ -185,11 +371,19 @@ class ExecutableTaskInstanceList(
 ):
     """A view for listing executable task instance."""
 
-    model = ExecutableTaskInstance
     task_class = EXECUTABLE_TASK
+    table_data_urlname = "executabletaskinstance-table-data"
     template_name = "frontend/executabletaskinstance_list.html"
 
 
+class ExecutableTaskInstanceTableData(BaseTaskInstanceTableData):
+    """A view for the data of executable task instance tables."""
+
+    model = ExecutableTaskInstance
+    taskinstance_urlname = "executabletaskinstance-detail"
+    tasktype_urlname = "executabletasktype-detail"
+
+
 class ExecutableTaskInstanceDetail(BaseTaskInstanceDetail):
     """A view for a specific executable task instance."""
 
@@ -198,9 +392,13 @@ class ExecutableTaskInstanceDetail(BaseTaskInstanceDetail):
 
     def get_logs(self):
         """Get the logs for the task instance."""
-        return get_s3_logs_for_executable_task_instance(
-            str(self.get_object().uuid)
-        )
+        return get_s3_logs_for_executable_task_instance(self.object)
+
+
+class ExecutableTaskInstanceLogData(BaseTaskInstanceLogData):
+    """A view for reading part of an executable task instance's log file."""
+
+    model = ExecutableTaskInstance
 
 
 class ExecutableTaskInstanceRename(BaseTaskInstanceRename):
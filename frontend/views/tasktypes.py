@@ -1,7 +1,8 @@
 """Views for task types."""
 
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -10,7 +11,11 @@ from django.views.generic import (
     UpdateView,
 )
 from tasksapi.constants import CONTAINER_TASK, EXECUTABLE_TASK
-from tasksapi.models import ContainerTaskType, ExecutableTaskType
+from tasksapi.models import (
+    ContainerTaskType,
+    ExecutableTaskType,
+    summarize_resource_usage,
+)
 from .mixins import (
     ContainerTaskTypeFormViewMixin,
     DisableUserSelectFormViewMixin,
@@ -54,9 +59,11 @@ class BaseTaskTypeDetail(LoginRequiredMixin, DetailView):
         """Pass along extra bits to the context."""
         context = super().get_context_data(**kwargs)
 
-        # Add in related task instances
-        context["taskinstances"] = self.get_taskinstances()
-        context["taskinstance_urlname"] = self.get_taskinstance_urlname()
+        # Add in where to load related task instances from
+        context["taskinstance_data_url"] = "%s?%s" % (
+            reverse(self.get_taskinstance_data_urlname()),
+            urlencode({"task_type": self.get_object().pk}),
+        )
         context[
             "taskinstance_create_urlname"
         ] = self.get_taskinstance_create_urlname()
@@ -66,6 +73,11 @@ class BaseTaskTypeDetail(LoginRequiredMixin, DetailView):
             "command_to_run_formatted"
         ] = self.get_formatted_command_to_run()
 
+        # Summarize the resources the task type's jobs have used
+        context["resource_usage"] = summarize_resource_usage(
+            self.get_taskinstance_queryset()
+        )
+
         # Get data for Chart.js
         context = {
             **context,
@@ -93,18 +105,18 @@ class BaseTaskTypeDetail(LoginRequiredMixin, DetailView):
 
         return command_to_run
 
-    def get_taskinstances(self):
-        """Get a queryset of the task type's instances."""
-        raise NotImplementedError
-
-    def get_taskinstance_urlname(self):
-        """Get the URL name for task instances."""
+    def get_taskinstance_data_urlname(self):
+        """Get the URL name for task instance table data."""
         raise NotImplementedError
 
     def get_taskinstance_create_urlname(self):
         """Get the URL name for creating task instances."""
         raise NotImplementedError
 
+    def get_taskinstance_queryset(self):
+        """Get the task type's task instances."""
+        raise NotImplementedError
+
 
 class BaseTaskTypeUpdate(
     LoginRequiredMixin,
@@ -166,18 +178,18 @@ class ContainerTaskTypeDetail(BaseTaskTypeDetail):
     task_class = CONTAINER_TASK
     template_name = "frontend/containertasktype_detail.html"
 
-    def get_taskinstances(self):
-        """Get a queryset of the task type's instances."""
-        return self.get_object().containertaskinstance_set.all()
-
-    def get_taskinstance_urlname(self):
-        """Get the URL name for task instances."""
-        return "containertaskinstance-detail"
+    def get_taskinstance_data_urlname(self):
+        """Get the URL name for task instance table data."""
+        return "containertaskinstance-table-data"
 
     def get_taskinstance_create_urlname(self):
         """Get the URL name for creating task instances."""
         return "containertaskinstance-create"
 
+    def get_taskinstance_queryset(self):
+        """Get the task type's task instances."""
+        return self.object.containertaskinstance_set.all()
+
 
 class ContainerTaskTypeUpdate(
     ContainerTaskTypeFormViewMixin, BaseTaskTypeUpdate
@@ -255,18 +267,18 @@ class ExecutableTaskTypeDetail(BaseTaskTypeDetail):
 
         return command_to_run
 
-    def get_taskinstances(self):
-        """Get a queryset of the task type's instances."""
-        return self.get_object().executabletaskinstance_set.all()
-
-    def get_taskinstance_urlname(self):
-        """Get the URL name for task instances."""
-        return "executabletaskinstance-detail"
+    def get_taskinstance_data_urlname(self):
+        """Get the URL name for task instance table data."""
+        return "executabletaskinstance-table-data"
 
     def get_taskinstance_create_urlname(self):
         """Get the URL name for creating task instances."""
         return "executabletaskinstance-create"
 
+    def get_taskinstance_queryset(self):
+        """Get the task type's task instances."""
+        return self.object.executabletaskinstance_set.all()
+
 
 class ExecutableTaskTypeUpdate(
     ExecutableTaskTypeFormViewMixin, BaseTaskTypeUpdate
@@ -1,7 +1,8 @@
 """Contains general helpers for frontend views."""
 
-from datetime import date, timedelta
+from datetime import timedelta
 import json
+from django.utils import timezone
 from .utils_stats import determine_days_to_plot, get_job_state_data
 
 
@@ -47,8 +48,8 @@ def get_context_data_for_chartjs(task_class="both", task_type_pk=None):
     days_to_plot = determine_days_to_plot(
         task_class=task_class, task_type_pk=task_type_pk
     )
-    today = date.today()
-    other_date = date.today() - timedelta(days=days_to_plot - 1)
+    today = timezone.localdate()
+    other_date = today - timedelta(days=days_to_plot - 1)
 
     chart_data = get_job_state_data(
         task_class=task_class,
@@ -0,0 +1,98 @@
+"""Contains helpers for tables which DataTables processes server-side.
+
+See https://datatables.net/manual/server-side for the request and
+response formats.
+"""
+
+from django.db.models import Q
+from frontend.constants import DATATABLES_MAX_PAGE_LENGTH
+
+
+def get_int_param(params, name, default=0):
+    """Get an integer from request parameters.
+
+    Args:
+        params: A QueryDict containing the request parameters.
+        name: A string containing the name of the parameter.
+        default: An optional integer to use if the parameter is missing
+            or malformed. Defaults to 0.
+
+    Returns:
+        An integer.
+    """
+    try:
+        return int(params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def get_datatables_page(params, queryset, order_fields, search_fields):
+    """Page, sort, and search a queryset for a DataTables request.
+
+    All of this is done by the database, so only the rows on the page
+    requested are ever loaded.
+
+    Args:
+        params: A QueryDict containing the DataTables request
+            parameters.
+        queryset: A queryset containing the (already filtered) objects
+            for the table.
+        order_fields: A dictionary whose keys are the names of the
+            table's orderable columns (as given by their data options)
+            and whose values are the fields to order those columns by.
+        search_fields: A sequence of strings containing the field
+            lookups to search with the table's search value.
+
+    Returns:
+        A dictionary containing the draw counter, the total number of
+        records, the number of records after searching, and a list of
+        the objects on the page requested, with keys as DataTables
+        expects them (where the objects are under the "data" key).
+    """
+    records_total = queryset.count()
+
+    # Search
+    search_value = params.get("search[value]", "").strip()
+
+    if search_value:
+        search_query = Q()
+
+        for search_field in search_fields:
+            search_query |= Q(**{search_field: search_value})
+
+        queryset = queryset.filter(search_query)
+        records_filtered = queryset.count()
+    else:
+        records_filtered = records_total
+
+    # Order. Break ties with the primary key so pages don't overlap.
+    ordering = []
+    idx = 0
+
+    while "order[%s][column]" % idx in params:
+        column_idx = get_int_param(params, "order[%s][column]" % idx)
+        column_name = params.get("columns[%s][data]" % column_idx)
+
+        if column_name in order_fields:
+            ordering.append(
+                ("-" if params.get("order[%s][dir]" % idx) == "desc" else "")
+                + order_fields[column_name]
+            )
+
+        idx += 1
+
+    queryset = queryset.order_by(*ordering, "pk")
+
+    # Page
+    start = max(get_int_param(params, "start"), 0)
+    length = get_int_param(params, "length", DATATABLES_MAX_PAGE_LENGTH)
+
+    if not 0 < length <= DATATABLES_MAX_PAGE_LENGTH:
+        length = DATATABLES_MAX_PAGE_LENGTH
+
+    return {
+        "draw": get_int_param(params, "draw"),
+        "recordsTotal": records_total,
+        "recordsFiltered": records_filtered,
+        "data": list(queryset[start : start + length]),
+    }
@@ -1,57 +1,54 @@
 """Contains helpers for getting task instance logs."""
 
-import os
-from django.conf import settings
-import boto3
+from tasksapi.logs import (
+    get_logs_bucket,
+    get_task_instance_log_files,
+    read_task_instance_log_files,
+)
 
 
-def get_s3_logs_for_task_instance(job_uuid):
+def get_s3_logs_for_task_instance(taskinstance):
     """Get logs for a task instance.
 
-    The text from the job logs will be one long text strings, so no
-    splitting at new lines here. If the project doesn't have AWS stuff
-    defined, then this just returns an empty dictionary.
+    Only the end of each log is read (see the tasksapi.logs module), so
+    this is cheap even for huge logs. The logs are read concurrently,
+    and finished task instances' logs are cached. The text from the job
+    logs will be one long text strings, so no splitting at new lines
+    here. If the project doesn't have AWS stuff defined, then this just
+    returns an empty dictionary.
 
     Args:
-        job_uuid: A string specifying the UUID of the task instance to
-            get logs for.
+        taskinstance: The task instance to get logs for.
 
     Returns:
         A dictionary where keys are file names and values are
-        dictionaries containing the date the logs were last modified and
-        the text they contain.
+        dictionaries containing the date the logs were last modified,
+        the text at the end of the logs, the byte offsets of the start
+        and end of the text, and the size of the logs in bytes.
     """
     # Get out if we don't have any AWS stuff defined for the project
-    if (
-        not os.environ["AWS_ACCESS_KEY_ID"]
-        or not os.environ["AWS_SECRET_ACCESS_KEY"]
-        or not settings.AWS_LOGS_BUCKET_NAME
-    ):
+    bucket = get_logs_bucket()
+
+    if bucket is None:
         return {}
 
-    # This'll grab its settings from the environment (ultimately coming
-    # from .env file)
-    s3 = boto3.resource("s3")
-    bucket = s3.Bucket(settings.AWS_LOGS_BUCKET_NAME)
+    # Read the end of each file
+    log_files = get_task_instance_log_files(bucket, taskinstance)
+    logs = read_task_instance_log_files(bucket, taskinstance, log_files)
 
-    # Get the files
     log_files_dict = {}
-    log_files = bucket.objects.filter(Prefix=job_uuid)
 
-    for log_file in log_files:
-        # Extract the file name and text
-        file_name = log_file.key[len(job_uuid) + 1 :]
-        file_last_modified = log_file.last_modified
-        file_text = log_file.get()["Body"].read().decode("utf-8")
+    for log_file, sub_dict in zip(log_files, logs):
+        sub_dict["name"] = log_file["name"]
+        sub_dict["last_modified"] = log_file["last_modified"]
 
         # Add in this log file to our output
-        sub_dict = {"last_modified": file_last_modified, "text": file_text}
-        log_files_dict[file_name] = sub_dict
+        log_files_dict[log_file["name"]] = sub_dict
 
     return log_files_dict
 
 
-def get_s3_logs_for_executable_task_instance(job_uuid):
+def get_s3_logs_for_executable_task_instance(taskinstance):
     """Get stdout and stderr logs for executable task instances.
 
     This is basically the same thing as get_s3_logs_for_task_instance
@@ -59,8 +56,7 @@ def get_s3_logs_for_executable_task_instance(job_uuid):
     are the only two types of logs an executable task type can have).
 
     Args:
-        job_uuid: A string specifying the UUID of the exedcutable task
-            instance to get logs for.
+        taskinstance: The executable task instance to get logs for.
 
     Returns:
         A dictionary with keys "stdout" and "stderr" where the values
@@ -69,13 +65,14 @@ def get_s3_logs_for_executable_task_instance(job_uuid):
         just return an empty dictionary.
     """
     # Call the base function
-    these_logs = get_s3_logs_for_task_instance(job_uuid)
+    these_logs = get_s3_logs_for_task_instance(taskinstance)
 
     # Get out if these logs don't exist
     if not these_logs:
         return these_logs
 
     # Update the key names
+    job_uuid = str(taskinstance.uuid)
     these_logs["stdout"] = these_logs.pop(job_uuid + "-" + "stdout.txt")
     these_logs["stderr"] = these_logs.pop(job_uuid + "-" + "stderr.txt")
 
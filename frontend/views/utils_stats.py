@@ -1,14 +1,27 @@
-"""Contains helpers for getting and packaging data statistics."""
-
-from datetime import date, timedelta
+"""Contains helpers for getting and packaging data statistics.
+
+The statistics here are computed from the task instance state counts
+(cf. from the task instances themselves), so they're cheap to compute
+no matter how many task instances there are. Each statistic is
+computed with a single query grouped by state and date created,
+regardless of how many days are being plotted. The dates used for
+grouping are those of the currently active time zone, which is the
+user's time zone for logged in users.
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from frontend.constants import (
     DATES_LIST,
     DEFAULT_DAYS_TO_PLOT,
     INTERESTING_STATES,
     STATE_COLOR_DICT,
 )
-from tasksapi.constants import CONTAINER_TASK, CREATED
-from tasksapi.models import ContainerTaskInstance, ExecutableTaskInstance
+from tasksapi.constants import CREATED
+from tasksapi.models import TaskInstanceStateCount
 
 
 def translate_date_to_string(
@@ -25,14 +38,14 @@ def translate_date_to_string(
             and previous date, respectively. Defaults to True.
         today: A datetime.date indicating the current date. If this is
             None and today_and_yesterday is True, then a
-            datetime.date.today call will be made per function call,
-            which might not be efficient. Defaults to None. Does nothing
-            if day_of_week is False.
+            django.utils.timezone.localdate call will be made per
+            function call, which might not be efficient. Defaults to
+            None. Does nothing if day_of_week is False.
     """
     if today_and_yesterday:
         # Load up today if necessary
         if today is None:
-            today = date.today()
+            today = timezone.localdate()
 
         # Translate
         if this_date == today:
@@ -47,6 +60,114 @@ def translate_date_to_string(
     return this_date.isoformat()
 
 
+def get_task_instance_state_counts(task_class="both", task_type_pk=None):
+    """Get the task instance state counts to compute statistics with.
+
+    Args:
+        task_class: An optional string indicating which task class to
+            use. Can be either "container", "executable", or "both". The
+            former two are defined as constants in tasksapi, which we'll
+            be using here. Defaults to "both".
+        task_type_pk: An optional integer indicating the primary key of
+            the task type to use. Defaults to None, which means,
+            consider all task types.
+
+    Returns:
+        A queryset of task instance state counts.
+    """
+    queryset = TaskInstanceStateCount.objects.filter(count__gt=0)
+
+    # Filter by task class, possibly
+    if task_class != "both":
+        queryset = queryset.filter(task_class=task_class)
+
+    # Now filter by task type, possibly
+    if task_type_pk is not None:
+        queryset = queryset.filter(task_type_pk=task_type_pk)
+
+    return queryset
+
+
+def get_datetime_range(start_date, end_date):
+    """Get the datetimes bounding a date range.
+
+    Filtering on these bounds (cf. filtering on the date of the
+    datetime created) lets the database use an index on the datetime
+    column.
+
+    Args:
+        start_date: A datetime.date indicating the start of the date
+            range (inclusive).
+        end_date: A datetime.date indicating the end of the date range
+            (inclusive).
+
+    Returns:
+        A tuple containing two aware datetimes in the current time zone:
+        the start of the start date (inclusive) and the start of the day
+        after the end date (exclusive).
+    """
+    start_datetime = timezone.make_aware(
+        datetime.combine(start_date, time.min), is_dst=False
+    )
+    end_datetime = timezone.make_aware(
+        datetime.combine(end_date + timedelta(days=1), time.min),
+        is_dst=False,
+    )
+
+    return (start_datetime, end_datetime)
+
+
+def count_job_states_by_date(
+    task_class="both", task_type_pk=None, start_date=None, end_date=None
+):
+    """Count jobs by state and date created.
+
+    This computes the whole state by date matrix in a single database
+    query, no matter how many dates are in the date range. Only states
+    we're interested in plotting are counted.
+
+    Args:
+        task_class: An optional string indicating which task class to
+            use. Can be either "container", "executable", or "both".
+            Defaults to "both".
+        task_type_pk: An optional integer indicating the primary key of
+            the task type to use. Defaults to None, which means,
+            consider all task types.
+        start_date: An optional datetime.date indicating the start of
+            the date range (inclusive). Defaults to today.
+        end_date: An optional datetime.date indicating the end of the
+            date range (inclusive). Defaults to today.
+
+    Returns:
+        A collections.Counter whose keys are (state, datetime.date)
+        tuples and whose values are the number of jobs with that state
+        created on that date. Missing keys count as zero.
+    """
+    # Use today for dates not provided
+    today = timezone.localdate()
+    start_date = start_date or today
+    end_date = end_date or today
+
+    datetime_range = get_datetime_range(start_date, end_date)
+
+    # Group the relevant counts by state and date
+    rows = (
+        get_task_instance_state_counts(task_class, task_type_pk)
+        .filter(
+            datetime_created_bucket__gte=datetime_range[0],
+            datetime_created_bucket__lt=datetime_range[1],
+            state__in=INTERESTING_STATES,
+        )
+        .annotate(date_created=TruncDate("datetime_created_bucket"))
+        .values("state", "date_created")
+        .annotate(total=Sum("count"))
+    )
+
+    return Counter(
+        {(row["state"], row["date_created"]): row["total"] for row in rows}
+    )
+
+
 def determine_days_to_plot(task_class="both", task_type_pk=None):
     """Determine how many days to plot using the "default behavior".
 
@@ -67,40 +188,25 @@ def determine_days_to_plot(task_class="both", task_type_pk=None):
     Returns:
         An integer specifying the number of days to plot.
     """
-    # First build a list of the task instance models to use
-    if task_class == "both":
-        instance_models = [ContainerTaskInstance, ExecutableTaskInstance]
-    elif task_class == CONTAINER_TASK:
-        instance_models = [ContainerTaskInstance]
-    else:
-        instance_models = [ExecutableTaskInstance]
-
-    # Now build the corresponding querysets
-    querysets = [x.objects.all() for x in instance_models]
-
-    # Now filter by task type, possibly
-    if task_type_pk is not None:
-        querysets = [x.filter(task_type__pk=task_type_pk) for x in querysets]
-
-    # Grab the latest dates of an instance for each queryset, making
-    # sure to not include jobs with "created" state (since these aren't
-    # shown in the plot).
-    latest_dates = [
-        i.datetime_created.date()
-        for i in [q.exclude(state=CREATED).first() for q in querysets]
-        if i is not None
-    ]
+    # Grab the latest datetime of an instance, making sure to not
+    # include jobs with "created" state (since these aren't shown in the
+    # plot).
+    latest_datetime = (
+        get_task_instance_state_counts(task_class, task_type_pk)
+        .exclude(state=CREATED)
+        .aggregate(latest=Max("datetime_created_bucket"))["latest"]
+    )
 
     # Make sure we have any instances at all, if not, just use default
     # value.
-    if not latest_dates:
+    if latest_datetime is None:
         return DEFAULT_DAYS_TO_PLOT
 
     # Now pick out the latest date
-    latest_date = max(latest_dates)
+    latest_date = timezone.localtime(latest_datetime).date()
 
     # Count how many days between today and that date
-    delta_days = (date.today() - latest_date).days
+    delta_days = (timezone.localdate() - latest_date).days
 
     # If the latest date is within the range of the default, just use
     # the default
@@ -113,10 +219,7 @@ def determine_days_to_plot(task_class="both", task_type_pk=None):
 
 
 def get_job_state_data(
-    task_class="both",
-    task_type_pk=None,
-    start_date=date.today(),
-    end_date=date.today(),
+    task_class="both", task_type_pk=None, start_date=None, end_date=None
 ):
     """Get data for job states.
 
@@ -144,41 +247,23 @@ def get_job_state_data(
         for Chart.js pie chargs. To use with Chart.js, make sure to
         encode the dictionaries to JSON strings first.
     """
-    # First build a list of the task instance models to use
-    if task_class == "both":
-        instance_models = [ContainerTaskInstance, ExecutableTaskInstance]
-    elif task_class == CONTAINER_TASK:
-        instance_models = [ContainerTaskInstance]
-    else:
-        instance_models = [ExecutableTaskInstance]
+    # Get the state counts for each date, and collapse the dates
+    counts = count_job_states_by_date(
+        task_class=task_class,
+        task_type_pk=task_type_pk,
+        start_date=start_date,
+        end_date=end_date,
+    )
 
-    # Now build the corresponding querysets
-    querysets = [x.objects.all() for x in instance_models]
+    state_counts = Counter()
 
-    # Now filter by task type, possibly
-    if task_type_pk is not None:
-        querysets = [x.filter(task_type__pk=task_type_pk) for x in querysets]
-
-    # And filter by date
-    if start_date == end_date:
-        querysets = [
-            x.filter(datetime_created__date=start_date) for x in querysets
-        ]
-    else:
-        querysets = [
-            x.filter(datetime_created__date__gte=start_date).filter(
-                datetime_created__date__lte=end_date
-            )
-            for x in querysets
-        ]
+    for (state, _), count in counts.items():
+        state_counts[state] += count
 
     # Now build up the dataset based on state
     dataset = dict()
 
-    dataset["data"] = [
-        sum([x.filter(state=state).count() for x in querysets])
-        for state in INTERESTING_STATES
-    ]
+    dataset["data"] = [state_counts[state] for state in INTERESTING_STATES]
     dataset["backgroundColor"] = [
         STATE_COLOR_DICT[state] for state in INTERESTING_STATES
     ]
@@ -195,8 +280,8 @@ def get_job_state_data(
 def get_job_state_data_date_enumerated(
     task_class="both",
     task_type_pk=None,
-    start_date=date.today(),
-    end_date=date.today(),
+    start_date=None,
+    end_date=None,
     use_day_of_week=False,
     use_today_and_yesterday=True,
 ):
@@ -231,20 +316,18 @@ def get_job_state_data_date_enumerated(
         for Chart.js pie chargs. To use with Chart.js, make sure to
         encode the dictionaries to JSON strings first.
     """
-    # First build a list of the task instance models to use
-    if task_class == "both":
-        instance_models = [ContainerTaskInstance, ExecutableTaskInstance]
-    elif task_class == CONTAINER_TASK:
-        instance_models = [ContainerTaskInstance]
-    else:
-        instance_models = [ExecutableTaskInstance]
-
-    # Now build the corresponding querysets
-    querysets = [x.objects.all() for x in instance_models]
-
-    # Now filter by task type, possibly
-    if task_type_pk is not None:
-        querysets = [x.filter(task_type__pk=task_type_pk) for x in querysets]
+    # Use today for dates not provided
+    today = timezone.localdate()
+    start_date = start_date or today
+    end_date = end_date or today
+
+    # Get the state counts for each date
+    counts = count_job_states_by_date(
+        task_class=task_class,
+        task_type_pk=task_type_pk,
+        start_date=start_date,
+        end_date=end_date,
+    )
 
     # Now figure out what dates we care about
     delta = end_date - start_date
@@ -259,18 +342,7 @@ def get_job_state_data_date_enumerated(
         dataset = dict()
         dataset["backgroundColor"] = STATE_COLOR_DICT[state]
         dataset["label"] = state
-
-        dataset["data"] = [
-            sum(
-                [
-                    x.filter(state=state)
-                    .filter(datetime_created__date=d)
-                    .count()
-                    for x in querysets
-                ]
-            )
-            for d in my_dates
-        ]
+        dataset["data"] = [counts[(state, d)] for d in my_dates]
 
         datasets.append(dataset)
 
@@ -280,7 +352,7 @@ def get_job_state_data_date_enumerated(
             d,
             day_of_week=use_day_of_week,
             today_and_yesterday=use_today_and_yesterday,
-            today=date.today(),
+            today=today,
         )
         for d in my_dates
     ]
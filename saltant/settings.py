@@ -110,6 +110,7 @@ if not IM_A_CELERY_WORKER:
     ]
 
     MIDDLEWARE = [
+        "tasksapi.middleware.MetricsMiddleware",
         "django.middleware.security.SecurityMiddleware",
         "django.contrib.sessions.middleware.SessionMiddleware",
         "django.middleware.common.CommonMiddleware",
@@ -158,6 +159,29 @@ if not IM_A_CELERY_WORKER:
         }
     }
 
+    # Cache (used for task queue permissions, amongst other things)
+    # https://docs.djangoproject.com/en/2.1/topics/cache/
+    CACHES = {
+        "default": {
+            "BACKEND": os.environ["CACHE_BACKEND"],
+            "LOCATION": os.environ["CACHE_LOCATION"],
+        }
+    }
+
+    # Task instances are validated against cached task queue
+    # permissions, so every process must share the cache to see
+    # permission changes right away
+    if (
+        not DEBUG
+        and CACHES["default"]["BACKEND"]
+        == "django.core.cache.backends.locmem.LocMemCache"
+    ):
+        # Bad value in config file!
+        raise ValueError(
+            "CACHE_BACKEND must be shared between processes (e.g., "
+            "memcached, redis, or the database cache) unless DEBUG=True"
+        )
+
     # User model
     AUTH_USER_MODEL = "tasksapi.User"
 
@@ -261,6 +285,18 @@ if not IM_A_CELERY_WORKER:
     # AWS S3 logs bucket settings
     AWS_LOGS_BUCKET_NAME = os.environ["AWS_LOGS_BUCKET_NAME"]
 
+    # Where to cache logs of finished task instances too big for the
+    # Django's cache (nowhere if empty), and how much space they may use
+    LOG_CACHE_DIRECTORY = os.environ["LOG_CACHE_DIRECTORY"]
+    LOG_CACHE_MAX_MEGABYTES = int(os.environ["LOG_CACHE_MAX_MEGABYTES"])
+
+    # The IP addresses allowed to read the metrics at /metrics (e.g., a
+    # Prometheus server's), separated as for the hosts
+    METRICS_ALLOWED_IPS = (
+        os.environ["METRICS_ALLOWED_IPS"].replace("'", "").split(",")
+    )
+    METRICS_ALLOWED_IPS = list(filter(None, METRICS_ALLOWED_IPS))
+
     # Where to redirect to after login and logout
     LOGIN_URL = "login"
     LOGIN_REDIRECT_URL = "home"
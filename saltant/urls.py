@@ -23,6 +23,7 @@ from frontend.views import (
     PageNotFound404,
     ServerError500,
 )
+from tasksapi.metrics import metrics_view
 
 
 handler400 = BadRequest400.as_view()
@@ -34,6 +35,7 @@ urlpatterns = [
     path("", include("frontend.urls")),
     path("admin/", admin.site.urls, name="admin"),
     path("api/", include("tasksapi.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 # Serve static files properly during development (see
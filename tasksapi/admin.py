@@ -7,6 +7,7 @@ from tasksapi.models import (
     ContainerTaskType,
     ExecutableTaskInstance,
     ExecutableTaskType,
+    TaskInstanceStateCount,
     TaskQueue,
     TaskWhitelist,
     User,
@@ -73,6 +74,20 @@ class ExecutableTaskTypeAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(TaskInstanceStateCount)
+class TaskInstanceStateCountAdmin(admin.ModelAdmin):
+    """Interface modifiers for task instance state counts on the admin page."""
+
+    list_display = (
+        "datetime_created_bucket",
+        "task_class",
+        "task_type_pk",
+        "task_queue",
+        "state",
+        "count",
+    )
+
+
 @admin.register(TaskQueue)
 class TaskQueueAdmin(admin.ModelAdmin):
     """Interface modifiers for task queues on the admin page."""
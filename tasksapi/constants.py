@@ -22,6 +22,17 @@ STATE_CHOICES = (
 
 STATE_MAX_LENGTH = 10
 
+# The states a task instance can move to from each state. Task instances
+# never leave the finished states.
+STATE_TRANSITIONS = {
+    CREATED: (PUBLISHED, RUNNING, SUCCESSFUL, FAILED, TERMINATED),
+    PUBLISHED: (RUNNING, SUCCESSFUL, FAILED, TERMINATED),
+    RUNNING: (SUCCESSFUL, FAILED, TERMINATED),
+    SUCCESSFUL: (),
+    FAILED: (),
+    TERMINATED: (),
+}
+
 # Choices for container types.
 DOCKER = "docker"
 SINGULARITY = "singularity"
@@ -34,3 +45,11 @@ CONTAINER_TYPE_MAX_LENGTH = 11
 # Choices for class of task
 CONTAINER_TASK = "container"
 EXECUTABLE_TASK = "executable"
+
+# Tuple of (key, display_name)s
+TASK_CLASS_CHOICES = (
+    (CONTAINER_TASK, "container"),
+    (EXECUTABLE_TASK, "executable"),
+)
+
+TASK_CLASS_MAX_LENGTH = 10
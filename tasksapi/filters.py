@@ -32,6 +32,8 @@ ABSTRACT_TASK_INSTANCE_FIELDS = {
     "task_type": FOREIGN_KEY_FIELD_LOOKUPS,
     "task_queue": FOREIGN_KEY_FIELD_LOOKUPS,
     "datetime_created": DATE_FIELD_LOOKUPS,
+    "datetime_published": DATE_FIELD_LOOKUPS,
+    "datetime_started": DATE_FIELD_LOOKUPS,
     "datetime_finished": DATE_FIELD_LOOKUPS,
 }
 ABSTRACT_TASK_TYPE_FIELDS = {
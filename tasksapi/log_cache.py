@@ -0,0 +1,359 @@
+"""Cached logs of finished task instances.
+
+Logs of finished task instances don't change, so rather than going to
+S3 every time they're viewed, their listings and contents are cached.
+Contents are keyed by their S3 key (which begins with the task
+instance's UUID) and ETag, so a log uploaded again gets a new cache
+entry rather than a stale one.
+
+Contents are cached gzipped. Small logs are kept in Django's cache, and
+bigger ones in an on-disk cache (if LOG_CACHE_DIRECTORY is set), which
+removes the least recently used logs when they take up more than
+LOG_CACHE_MAX_MEGABYTES. Logs too big for either are marked as such
+and read from S3 by byte range as usual, as are logs bigger than
+LOG_CACHE_MAX_DOWNLOAD_BYTES (so pages showing them don't wait on their
+download).
+
+Reading the end of a cached log means decompressing all of it, whereas
+the end of a log S3 stores uncompressed can be read by byte range. So
+logs which workers didn't gzip are only cached if they're no bigger
+than LOG_CACHE_MAX_UNCOMPRESSED_BYTES; bigger ones are marked as too
+big.
+
+Workers upload logs when jobs finish, possibly a little after their
+task instances are marked as finished, so task instances are only
+treated as finished once LOG_CACHE_GRACE_PERIOD has passed.
+"""
+
+from datetime import timedelta
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from tasksapi.constants import FAILED, SUCCESSFUL, TERMINATED
+
+
+# How long to keep logs in Django's cache for, in seconds
+LOG_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# How long after task instances finish their logs can be cached
+LOG_CACHE_GRACE_PERIOD = timedelta(minutes=5)
+
+# The biggest gzipped log kept in Django's cache (memcached's default
+# limit on values is 1 MiB)
+LOG_CACHE_MAX_ENTRY_BYTES = 512 * 1024
+
+# The biggest log (as stored in S3) downloaded to be cached
+LOG_CACHE_MAX_DOWNLOAD_BYTES = 32 * 1024 * 1024
+
+# The biggest log which S3 doesn't store gzipped that's cached
+LOG_CACHE_MAX_UNCOMPRESSED_BYTES = 1024 * 1024
+
+# How many bytes of logs to download at a time
+LOG_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# Cache keys
+LOG_FILES_KEY = "tasksapi:log-files:%s"
+LOG_CONTENTS_KEY = "tasksapi:log-contents:%s"
+
+
+def is_log_cacheable(taskinstance):
+    """Determine whether a task instance's logs can be cached.
+
+    Args:
+        taskinstance: A task instance.
+
+    Returns:
+        A boolean specifying whether the task instance finished long
+        enough ago that its logs won't change.
+    """
+    return (
+        taskinstance.state in (SUCCESSFUL, FAILED, TERMINATED)
+        and taskinstance.datetime_finished is not None
+        and timezone.now() - taskinstance.datetime_finished
+        > LOG_CACHE_GRACE_PERIOD
+    )
+
+
+def get_cached_log_files(job_uuid):
+    """Get the cached listing of a task instance's log files.
+
+    Args:
+        job_uuid: A string containing the UUID of the task instance.
+
+    Returns:
+        A list of log files as returned by tasksapi.logs.list_log_files,
+        or None if the listing isn't cached.
+    """
+    return cache.get(LOG_FILES_KEY % job_uuid)
+
+
+def set_cached_log_files(job_uuid, log_files):
+    """Cache the listing of a task instance's log files.
+
+    Args:
+        job_uuid: A string containing the UUID of the task instance.
+        log_files: A list of log files as returned by
+            tasksapi.logs.list_log_files.
+    """
+    cache.set(LOG_FILES_KEY % job_uuid, log_files, LOG_CACHE_TIMEOUT)
+
+
+class DiskLogCache:
+    """A size-capped cache of gzipped logs in a directory.
+
+    Each log is a file named by its cache key. Files' modification
+    times are bumped when they're read, so the least recently used
+    files can be removed when the cache gets too big. Files are written
+    to temporary files and then renamed, so several processes can share
+    the directory.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """Initialize the cache.
+
+        Args:
+            directory: A string containing the path of the directory to
+                keep logs in.
+            max_bytes: An integer specifying how many bytes the logs
+                may take up.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def get_path(self, name):
+        """Get the path of a cached log.
+
+        Args:
+            name: A string containing the cache key of the log.
+
+        Returns:
+            A string containing the path.
+        """
+        return os.path.join(self.directory, name + ".gz")
+
+    def open(self, name):
+        """Open a cached log.
+
+        Args:
+            name: A string containing the cache key of the log.
+
+        Returns:
+            A binary file object containing the gzipped log, or None if
+            the log isn't cached.
+        """
+        path = self.get_path(name)
+
+        try:
+            cached_file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+        # Mark the log as recently used (it might have been evicted in
+        # the meantime, but the file is already open)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return cached_file
+
+    def put(self, name, gzipped_file):
+        """Add a log to the cache, evicting others if it gets too big.
+
+        Args:
+            name: A string containing the cache key of the log.
+            gzipped_file: A binary file object containing the gzipped
+                log, which is read from its current position.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix=".tmp", delete=False
+        ) as temp_file:
+            shutil.copyfileobj(gzipped_file, temp_file)
+
+        os.replace(temp_file.name, self.get_path(name))
+
+        self.evict(keep=name)
+
+    def evict(self, keep=None):
+        """Remove the least recently used logs until there's space.
+
+        Args:
+            keep: An optional string containing the cache key of a log
+                not to remove.
+        """
+        entries = []
+
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".gz"):
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+
+        total_bytes = sum(size for _, size, _ in entries)
+
+        for _, size, file_name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+
+            if keep is not None and file_name == keep + ".gz":
+                continue
+
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+
+            total_bytes -= size
+
+
+def get_disk_log_cache():
+    """Get the on-disk log cache.
+
+    Returns:
+        A DiskLogCache, or None if LOG_CACHE_DIRECTORY isn't set.
+    """
+    if not settings.LOG_CACHE_DIRECTORY:
+        return None
+
+    return DiskLogCache(
+        settings.LOG_CACHE_DIRECTORY,
+        settings.LOG_CACHE_MAX_MEGABYTES * 1024 * 1024,
+    )
+
+
+def download_gzipped_log(bucket, key, max_bytes):
+    """Download a log, gzipping it if it isn't already.
+
+    Args:
+        bucket: A tasksapi.logs.LogsBucket.
+        key: A string containing the key of the log file.
+        max_bytes: An integer specifying the most bytes the gzipped
+            log may take up. The download is abandoned past this.
+
+    Returns:
+        A binary file object containing the gzipped log, positioned at
+        its start, or None if the gzipped log is too big (or the log
+        isn't gzipped and is bigger than
+        LOG_CACHE_MAX_UNCOMPRESSED_BYTES).
+    """
+    response = bucket.get_object(key)
+    body = response["Body"]
+
+    if (
+        response.get("ContentEncoding") != "gzip"
+        and response["ContentLength"] > LOG_CACHE_MAX_UNCOMPRESSED_BYTES
+    ):
+        body.close()
+
+        return None
+
+    gzipped_file = tempfile.SpooledTemporaryFile(
+        max_size=LOG_CACHE_MAX_ENTRY_BYTES
+    )
+
+    # Logs already gzipped (by workers) are kept as they are
+    if response.get("ContentEncoding") == "gzip":
+        output_file = gzipped_file
+    else:
+        output_file = gzip.GzipFile(fileobj=gzipped_file, mode="wb")
+
+    try:
+        for chunk in iter(lambda: body.read(LOG_DOWNLOAD_CHUNK_BYTES), b""):
+            output_file.write(chunk)
+
+            if gzipped_file.tell() > max_bytes:
+                gzipped_file.close()
+
+                return None
+    finally:
+        body.close()
+
+    # This writes out the end of the gzipped data
+    if output_file is not gzipped_file:
+        output_file.close()
+
+    if gzipped_file.tell() > max_bytes:
+        gzipped_file.close()
+
+        return None
+
+    gzipped_file.seek(0)
+
+    return gzipped_file
+
+
+def open_cached_log(bucket, log_file):
+    """Open a finished log file, caching it first if need be.
+
+    Args:
+        bucket: A tasksapi.logs.LogsBucket.
+        log_file: A dictionary as returned by
+            tasksapi.logs.list_log_files.
+
+    Returns:
+        A binary file object containing the gzipped log, or None if the
+        log is too big to cache.
+    """
+    if log_file["size"] > LOG_CACHE_MAX_DOWNLOAD_BYTES:
+        return None
+
+    name = hashlib.sha1(
+        (log_file["key"] + log_file["etag"]).encode("utf-8")
+    ).hexdigest()
+    cache_key = LOG_CONTENTS_KEY % name
+
+    # False marks logs too big to cache
+    contents = cache.get(cache_key)
+
+    if contents is False:
+        return None
+
+    if contents is not None:
+        return io.BytesIO(contents)
+
+    disk_cache = get_disk_log_cache()
+
+    if disk_cache is not None:
+        cached_file = disk_cache.open(name)
+
+        if cached_file is not None:
+            return cached_file
+
+        max_bytes = disk_cache.max_bytes
+    else:
+        max_bytes = LOG_CACHE_MAX_ENTRY_BYTES
+
+    gzipped_file = download_gzipped_log(bucket, log_file["key"], max_bytes)
+
+    if gzipped_file is None:
+        cache.set(cache_key, False, LOG_CACHE_TIMEOUT)
+
+        return None
+
+    # Small logs go in Django's cache and big ones on disk
+    # Spooled temporary files' seek returns None before Python 3.7
+    gzipped_file.seek(0, io.SEEK_END)
+    size = gzipped_file.tell()
+    gzipped_file.seek(0)
+
+    if size <= LOG_CACHE_MAX_ENTRY_BYTES:
+        cache.set(cache_key, gzipped_file.read(), LOG_CACHE_TIMEOUT)
+    else:
+        disk_cache.put(name, gzipped_file)
+
+    gzipped_file.seek(0)
+
+    return gzipped_file
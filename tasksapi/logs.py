@@ -0,0 +1,676 @@
+"""Helpers for reading task instance logs from S3 a piece at a time.
+
+Workers upload each task instance's log files to the logs bucket under
+keys beginning with the task instance's UUID. Rather than downloading
+whole log files (which can be huge), these helpers read byte ranges of
+them: either from a given offset (e.g., to poll for what a running job
+has written since the last read) or the last so many bytes.
+
+Offsets are always in bytes of the (uncompressed) log file. Log files
+which workers gzipped can't be read by range, so they're streamed and
+decompressed a chunk at a time instead. Reads from an offset stop once
+they've decompressed the bytes asked for (taking the file's size from
+the gzip trailer), so their time grows with the offset rather than the
+file; reads of the end of a file still decompress all of it.
+
+Logs of finished task instances are cached (see the tasksapi.log_cache
+module), so viewing them again doesn't go to S3.
+
+Each process shares one S3 client (which, unlike boto3 resources, is
+thread-safe), and a task instance's log files are read concurrently by
+a bounded pool of threads.
+"""
+
+import os
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from tasksapi.log_cache import (
+    get_cached_log_files,
+    is_log_cacheable,
+    open_cached_log,
+    set_cached_log_files,
+)
+from tasksapi.metrics import log_fetch_duration_seconds
+
+
+# The most bytes of a log file returned by one read
+LOG_READ_MAX_BYTES = 256 * 1024
+
+# How many bytes at the end of log files to show by default
+LOG_TAIL_DEFAULT_BYTES = 64 * 1024
+
+# How many bytes of gzipped log files to download at a time
+GZIP_READ_CHUNK_BYTES = 64 * 1024
+
+# How many bytes at the end of gzipped files give the uncompressed size
+GZIP_SIZE_BYTES = 4
+
+# How many log files each process reads from S3 at once
+LOG_FETCH_THREADS = 8
+
+# The logs bucket and the pool of threads reading log files for each
+# process, keyed by process ID. Neither survives forks (e.g., of web
+# server workers), so each process needs its own.
+logs_buckets = {}
+log_fetch_executors = {}
+logs_lock = threading.Lock()
+
+
+class LogsBucket:
+    """The bucket containing task instance logs.
+
+    This pairs the bucket's name with an S3 client, which is shared
+    between threads.
+    """
+
+    def __init__(self, s3_client, name):
+        """Initialize the bucket.
+
+        Args:
+            s3_client: A boto3 S3 client.
+            name: A string containing the name of the bucket.
+        """
+        self.s3_client = s3_client
+        self.name = name
+
+    def list_objects(self, prefix):
+        """List the objects whose keys start with a prefix.
+
+        Args:
+            prefix: A string containing the prefix.
+
+        Returns:
+            A list of dictionaries describing the objects, as returned
+            by S3's ListObjectsV2 API.
+        """
+        objects = []
+        kwargs = {"Bucket": self.name, "Prefix": prefix}
+
+        while True:
+            response = self.s3_client.list_objects_v2(**kwargs)
+            objects += response.get("Contents", [])
+
+            if not response.get("IsTruncated"):
+                return objects
+
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+    def get_object(self, key, byte_range=None):
+        """Get (a byte range of) an object.
+
+        Args:
+            key: A string containing the key of the object.
+            byte_range: An optional string containing an HTTP Range
+                header value (e.g., "bytes=0-99").
+
+        Returns:
+            A dictionary as returned by S3's GetObject API.
+        """
+        if byte_range is None:
+            return self.s3_client.get_object(Bucket=self.name, Key=key)
+
+        return self.s3_client.get_object(
+            Bucket=self.name, Key=key, Range=byte_range
+        )
+
+    def head_object(self, key):
+        """Get an object's metadata.
+
+        Args:
+            key: A string containing the key of the object.
+
+        Returns:
+            A dictionary as returned by S3's HeadObject API.
+        """
+        return self.s3_client.head_object(Bucket=self.name, Key=key)
+
+
+def get_logs_bucket():
+    """Get the bucket containing task instance logs.
+
+    The bucket's client is created once per process.
+
+    Returns:
+        A LogsBucket, or None if the project doesn't have AWS stuff
+        defined.
+    """
+    if (
+        not os.environ["AWS_ACCESS_KEY_ID"]
+        or not os.environ["AWS_SECRET_ACCESS_KEY"]
+        or not settings.AWS_LOGS_BUCKET_NAME
+    ):
+        return None
+
+    pid = os.getpid()
+
+    with logs_lock:
+        if pid not in logs_buckets:
+            # This'll grab its settings from the environment (ultimately
+            # coming from .env file). A local stand-in for S3 can be
+            # used by giving its URL. Every thread reading log files
+            # gets its own connection.
+            s3_client = boto3.client(
+                "s3",
+                endpoint_url=os.environ.get("AWS_S3_ENDPOINT_URL") or None,
+                config=Config(max_pool_connections=LOG_FETCH_THREADS),
+            )
+
+            logs_buckets[pid] = LogsBucket(
+                s3_client, settings.AWS_LOGS_BUCKET_NAME
+            )
+
+        return logs_buckets[pid]
+
+
+def get_log_fetch_executor():
+    """Get the pool of threads reading log files for this process.
+
+    Returns:
+        A concurrent.futures.ThreadPoolExecutor.
+    """
+    pid = os.getpid()
+
+    with logs_lock:
+        if pid not in log_fetch_executors:
+            log_fetch_executors[pid] = ThreadPoolExecutor(
+                max_workers=LOG_FETCH_THREADS
+            )
+
+        return log_fetch_executors[pid]
+
+
+def list_log_files(bucket, job_uuid):
+    """List a task instance's log files without downloading them.
+
+    Args:
+        bucket: A LogsBucket.
+        job_uuid: A string containing the UUID of the task instance.
+
+    Returns:
+        A list of dictionaries, sorted by name, containing each file's
+        name (its key without the UUID), key, size in bytes (as stored,
+        so possibly compressed), date last modified, and ETag.
+    """
+    return sorted(
+        (
+            {
+                "name": log_file["Key"][len(job_uuid) + 1 :],
+                "key": log_file["Key"],
+                "size": log_file["Size"],
+                "last_modified": log_file["LastModified"],
+                "etag": log_file["ETag"],
+            }
+            for log_file in bucket.list_objects(job_uuid + "/")
+        ),
+        key=lambda log_file: log_file["name"],
+    )
+
+
+def decode_log_bytes(data, starts_mid_file, ends_mid_file):
+    """Decode bytes read from the middle of a UTF-8 log file.
+
+    Reads can start or end partway through a multi-byte character. Any
+    partial character at the start of the bytes is skipped, and any
+    partial character at the end is left for the next read.
+
+    Args:
+        data: A byte string.
+        starts_mid_file: A boolean specifying whether the bytes might
+            start partway through a character.
+        ends_mid_file: A boolean specifying whether the bytes might end
+            partway through a character.
+
+    Returns:
+        A three-tuple containing the decoded string and the number of
+        bytes skipped at the start and end of the data.
+    """
+    start = 0
+    end = len(data)
+
+    if starts_mid_file:
+        # Skip continuation bytes (of the form 10xxxxxx)
+        while start < min(3, end) and data[start] & 0xC0 == 0x80:
+            start += 1
+
+    if ends_mid_file:
+        # Find the lead byte of the last character, and see whether all
+        # of its continuation bytes are there
+        for num_bytes in range(1, min(4, end - start) + 1):
+            byte = data[end - num_bytes]
+
+            if byte & 0xC0 == 0x80:
+                continue
+
+            if byte >= 0xF0:
+                character_length = 4
+            elif byte >= 0xE0:
+                character_length = 3
+            elif byte >= 0xC0:
+                character_length = 2
+            else:
+                character_length = 1
+
+            if num_bytes < character_length:
+                end -= num_bytes
+
+            break
+
+    return (
+        data[start:end].decode("utf-8", "replace"),
+        start,
+        len(data) - end,
+    )
+
+
+def iter_gzipped_body(body):
+    """Decompress a gzipped S3 object's body a chunk at a time.
+
+    Args:
+        body: The streaming body of an S3 object.
+
+    Yields:
+        Byte strings of decompressed data.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    for chunk in iter(lambda: body.read(GZIP_READ_CHUNK_BYTES), b""):
+        data = decompressor.decompress(chunk)
+
+        if data:
+            yield data
+
+    data = decompressor.flush()
+
+    if data:
+        yield data
+
+
+def get_gzipped_size(size_bytes, min_size):
+    """Get the uncompressed size of a gzipped file from its trailer.
+
+    The last four bytes of a gzipped file contain its uncompressed size
+    modulo 2**32, so the size is the smallest one consistent with that
+    and with how many bytes are known to be in the file.
+
+    Args:
+        size_bytes: A byte string containing the last four bytes of the
+            gzipped file.
+        min_size: An integer containing the number of uncompressed
+            bytes known to be in the file.
+
+    Returns:
+        An integer containing the size of the uncompressed file.
+    """
+    (size,) = struct.unpack("<I", size_bytes)
+
+    while size < min_size:
+        size += 2 ** 32
+
+    return size
+
+
+def read_gzipped_range(body, offset, tail_bytes, max_bytes, read_size_bytes):
+    """Read a byte range of a gzipped log file.
+
+    Reads from an offset stop decompressing once they have the bytes
+    asked for. Reads of the end of the file have to decompress all of
+    it.
+
+    Args:
+        body: The streaming body of the gzipped S3 object.
+        offset: An integer containing the offset to read from, or None
+            to read the last tail_bytes bytes.
+        tail_bytes: An integer containing the number of bytes at the
+            end of the file to read if no offset is given.
+        max_bytes: An integer containing the maximum number of bytes to
+            read from the offset.
+        read_size_bytes: A function taking no arguments which returns
+            the last GZIP_SIZE_BYTES bytes of the gzipped file, used to
+            find the size of the uncompressed file when the read stops
+            before its end.
+
+    Returns:
+        A three-tuple containing the offset the bytes read start at, the
+        bytes, and the size of the uncompressed file.
+    """
+    position = 0
+    chunks = deque()
+    num_bytes = 0
+
+    for data in iter_gzipped_body(body):
+        data_start = position
+        position += len(data)
+
+        if offset is None:
+            # Keep only the chunks containing the last tail_bytes bytes
+            chunks.append(data)
+            num_bytes += len(data)
+
+            while num_bytes - len(chunks[0]) >= tail_bytes:
+                num_bytes -= len(chunks.popleft())
+
+            continue
+
+        # Keep the bytes between the offset and max_bytes past it
+        start = max(offset, data_start)
+        end = min(offset + max_bytes, position)
+
+        if start < end:
+            chunks.append(data[start - data_start : end - data_start])
+
+        if position >= offset + max_bytes:
+            data = b"".join(chunks)
+
+            return (
+                offset,
+                data,
+                get_gzipped_size(read_size_bytes(), position),
+            )
+
+    data = b"".join(chunks)
+
+    if offset is None:
+        data = data[len(data) - min(tail_bytes, len(data)) :]
+
+        return position - len(data), data, position
+
+    return min(offset, position), data, position
+
+
+def get_log_read(start, data, size):
+    """Decode bytes read from a log file.
+
+    Args:
+        start: An integer containing the offset the bytes start at.
+        data: A byte string containing the bytes read.
+        size: An integer containing the size of the file in bytes.
+
+    Returns:
+        A dictionary as returned by read_log_file.
+    """
+    text, num_skipped_bytes, num_trailing_bytes = decode_log_bytes(
+        data,
+        starts_mid_file=start > 0,
+        ends_mid_file=start + len(data) < size,
+    )
+
+    return {
+        "text": text,
+        "offset": start + num_skipped_bytes,
+        "next_offset": start + len(data) - num_trailing_bytes,
+        "size": size,
+    }
+
+
+def read_gzipped_log_file(
+    gzipped_file,
+    offset=None,
+    tail_bytes=None,
+    max_bytes=LOG_READ_MAX_BYTES,
+):
+    """Read part of a gzipped log file (e.g., from the log cache).
+
+    Args:
+        gzipped_file: A binary file object containing the gzipped log.
+        offset: An optional integer containing the byte offset to read
+            from. If not given, the end of the file is read.
+        tail_bytes: An optional integer containing the number of bytes
+            at the end of the file to read if no offset is given.
+            Defaults to LOG_TAIL_DEFAULT_BYTES.
+        max_bytes: An optional integer containing the maximum number of
+            bytes to read. Defaults to LOG_READ_MAX_BYTES.
+
+    Returns:
+        A dictionary as returned by read_log_file.
+    """
+    if tail_bytes is None:
+        tail_bytes = LOG_TAIL_DEFAULT_BYTES
+
+    def read_size_bytes():
+        """Read the end of the gzipped file, which gives its size."""
+        gzipped_file.seek(-GZIP_SIZE_BYTES, os.SEEK_END)
+
+        return gzipped_file.read(GZIP_SIZE_BYTES)
+
+    return get_log_read(
+        *read_gzipped_range(
+            gzipped_file,
+            offset,
+            min(tail_bytes, max_bytes),
+            max_bytes,
+            read_size_bytes,
+        )
+    )
+
+
+def read_log_file(
+    bucket, key, offset=None, tail_bytes=None, max_bytes=LOG_READ_MAX_BYTES
+):
+    """Read part of a log file.
+
+    Args:
+        bucket: A LogsBucket.
+        key: A string containing the key of the log file.
+        offset: An optional integer containing the byte offset to read
+            from. If not given, the end of the file is read.
+        tail_bytes: An optional integer containing the number of bytes
+            at the end of the file to read if no offset is given.
+            Defaults to LOG_TAIL_DEFAULT_BYTES.
+        max_bytes: An optional integer containing the maximum number of
+            bytes to read. Defaults to LOG_READ_MAX_BYTES.
+
+    Returns:
+        A dictionary containing the text read; the byte offset of the
+        start of the text ("offset") and of the end of the text
+        ("next_offset", which is where to read from next); and the size
+        of the file in bytes.
+    """
+    if tail_bytes is None:
+        tail_bytes = LOG_TAIL_DEFAULT_BYTES
+
+    tail_bytes = min(tail_bytes, max_bytes)
+
+    if offset is None:
+        byte_range = "bytes=-%d" % tail_bytes
+    else:
+        byte_range = "bytes=%d-%d" % (offset, offset + max_bytes - 1)
+
+    try:
+        response = bucket.get_object(key, byte_range)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "InvalidRange":
+            raise
+
+        # The range is past the end of the file as stored. Unless the
+        # file is gzipped (in which case the range might still be within
+        # the uncompressed file), there's nothing to read.
+        response = None
+        metadata = bucket.head_object(key)
+
+        if metadata.get("ContentEncoding") != "gzip":
+            size = metadata["ContentLength"]
+
+            return {
+                "text": "",
+                "offset": size if offset is None else offset,
+                "next_offset": size if offset is None else offset,
+                "size": size,
+            }
+
+    if response is None or response.get("ContentEncoding") == "gzip":
+        # Byte ranges of gzipped files are of the compressed bytes, so
+        # read the whole (decompressed) file instead
+        if response is not None:
+            response["Body"].close()
+
+        def read_size_bytes():
+            """Read the end of the gzipped file, which gives its size."""
+            return bucket.get_object(
+                key, "bytes=-%d" % GZIP_SIZE_BYTES
+            )["Body"].read()
+
+        body = bucket.get_object(key)["Body"]
+
+        try:
+            start, data, size = read_gzipped_range(
+                body, offset, tail_bytes, max_bytes, read_size_bytes
+            )
+        finally:
+            body.close()
+    elif response.get("ContentRange"):
+        data = response["Body"].read()
+
+        # The content range looks like "bytes 0-99/1234"
+        content_range = response["ContentRange"]
+        size = int(content_range.rsplit("/", 1)[1])
+        start = int(content_range.split(" ", 1)[1].split("-", 1)[0])
+    else:
+        # The whole file was sent (e.g., because it's smaller than the
+        # range asked for)
+        data = response["Body"].read()
+        size = len(data)
+
+        if offset is None:
+            start = max(0, size - tail_bytes)
+        else:
+            start = min(offset, size)
+
+        data = data[start : start + max_bytes]
+
+    return get_log_read(start, data, size)
+
+
+def get_task_instance_log_files(bucket, taskinstance):
+    """List a task instance's log files, from the cache if possible.
+
+    Args:
+        bucket: A LogsBucket.
+        taskinstance: A task instance.
+
+    Returns:
+        A list of dictionaries as returned by list_log_files.
+    """
+    job_uuid = str(taskinstance.uuid)
+
+    with log_fetch_duration_seconds.labels("list").time():
+        if not is_log_cacheable(taskinstance):
+            return list_log_files(bucket, job_uuid)
+
+        log_files = get_cached_log_files(job_uuid)
+
+        if log_files is None:
+            log_files = list_log_files(bucket, job_uuid)
+
+            # Don't hold on to the logs not being there yet
+            if log_files:
+                set_cached_log_files(job_uuid, log_files)
+
+    return log_files
+
+
+def read_task_instance_log_file(bucket, taskinstance, log_file, **kwargs):
+    """Read part of one of a task instance's log files.
+
+    Finished task instances' logs are read from the cache if possible.
+
+    Args:
+        bucket: A LogsBucket.
+        taskinstance: A task instance.
+        log_file: A dictionary as returned by list_log_files.
+        **kwargs: Keyword arguments to pass to read_log_file.
+
+    Returns:
+        A dictionary as returned by read_log_file.
+    """
+    with log_fetch_duration_seconds.labels("read").time():
+        if is_log_cacheable(taskinstance):
+            cached_file = open_cached_log(bucket, log_file)
+
+            if cached_file is not None:
+                with cached_file:
+                    return read_gzipped_log_file(cached_file, **kwargs)
+
+        return read_log_file(bucket, log_file["key"], **kwargs)
+
+
+def read_task_instance_log_files(bucket, taskinstance, log_files, **kwargs):
+    """Read part of each of a task instance's log files concurrently.
+
+    Args:
+        bucket: A LogsBucket.
+        taskinstance: A task instance.
+        log_files: A list of dictionaries as returned by list_log_files.
+        **kwargs: Keyword arguments to pass to read_log_file.
+
+    Returns:
+        A list of dictionaries as returned by read_log_file, in the same
+        order as the log files.
+    """
+    executor = get_log_fetch_executor()
+    futures = [
+        executor.submit(
+            read_task_instance_log_file,
+            bucket,
+            taskinstance,
+            log_file,
+            **kwargs
+        )
+        for log_file in log_files
+    ]
+
+    return [future.result() for future in futures]
+
+
+def read_task_instance_log(taskinstance, file_name, **kwargs):
+    """Read part of one of a task instance's log files by name.
+
+    Args:
+        taskinstance: A task instance.
+        file_name: A string containing the name of the log file (its
+            key without the UUID).
+        **kwargs: Keyword arguments to pass to read_log_file.
+
+    Returns:
+        A dictionary as returned by read_log_file, or None if the log
+        file doesn't exist (or the project doesn't have AWS stuff
+        defined).
+    """
+    bucket = get_logs_bucket()
+
+    if bucket is None:
+        return None
+
+    # Finished task instances' log files are listed (from the cache) to
+    # find their ETags. Otherwise there's no need to list them.
+    if is_log_cacheable(taskinstance):
+        log_files = get_task_instance_log_files(bucket, taskinstance)
+        log_file = next(
+            (
+                log_file
+                for log_file in log_files
+                if log_file["name"] == file_name
+            ),
+            None,
+        )
+
+        if log_file is None:
+            return None
+    else:
+        log_file = {"key": str(taskinstance.uuid) + "/" + file_name}
+
+    try:
+        return read_task_instance_log_file(
+            bucket, taskinstance, log_file, **kwargs
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+
+        raise
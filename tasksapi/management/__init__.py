@@ -0,0 +1 @@
+"""Contains management commands for the tasksapi."""
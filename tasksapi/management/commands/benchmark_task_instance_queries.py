@@ -0,0 +1,335 @@
+"""Contains a command to benchmark common task instance queries."""
+
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from tasksapi.constants import (
+    CREATED,
+    FAILED,
+    PUBLISHED,
+    RUNNING,
+    SUCCESSFUL,
+)
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskQueue,
+    User,
+)
+from tasksapi.paginators import TaskInstanceCursorPagination
+
+# The partial index for unfinished executable task instances, which is
+# made with SQL in migration 0008 rather than declared on the model
+UNFINISHED_INDEX_NAME = "eti_unfinished_idx"
+
+UNFINISHED_STATES = (CREATED, PUBLISHED, RUNNING)
+
+# The prefix of the names of the users, task types, and queues made for
+# the benchmark
+BENCHMARK_NAME_PREFIX = "benchmark"
+
+SEED_INSTANCES_SQL = """
+INSERT INTO {table} (
+    uuid, name, state, user_id, task_type_id, task_queue_id,
+    datetime_created, arguments
+)
+SELECT
+    md5(i::text || random()::text)::uuid,
+    '',
+    CASE
+        WHEN i %% %(unfinished_every)s = 0
+        THEN (%(unfinished_states)s)[1 + (i / %(unfinished_every)s) %% 3]
+        ELSE (%(finished_states)s)[1 + i %% 2]
+    END,
+    %(user_pk)s,
+    (%(task_type_pks)s)[1 + i %% %(num_task_types)s],
+    (%(task_queue_pks)s)[1 + (i / %(num_task_types)s) %% %(num_queues)s],
+    NOW() - i * INTERVAL '1 second',
+    '{{}}'
+FROM generate_series(1, %(num_instances)s) AS i;
+"""
+
+
+def summarize_plan(plan):
+    """Summarize how a query plan finds its rows.
+
+    Args:
+        plan: A dictionary containing a node of a query plan, as given
+            by EXPLAIN (FORMAT JSON).
+
+    Returns:
+        A string containing the first scan in the plan and, if it scans
+        an index, the name of the index.
+    """
+    if plan["Node Type"].endswith("Scan"):
+        if "Index Name" in plan:
+            return "%s using %s" % (plan["Node Type"], plan["Index Name"])
+
+        # Bitmap heap scans read the rows found by their index scans
+        for subplan in plan.get("Plans", []):
+            return "%s (%s)" % (plan["Node Type"], summarize_plan(subplan))
+
+        return plan["Node Type"]
+
+    for subplan in plan.get("Plans", []):
+        summary = summarize_plan(subplan)
+
+        if summary:
+            return summary
+
+    return ""
+
+
+def explain_analyze(queryset, count=False):
+    """Run a query with EXPLAIN ANALYZE.
+
+    Args:
+        queryset: The queryset whose query to run.
+        count: A boolean specifying whether to count the queryset's
+            rows (as QuerySet.count does) rather than select them.
+
+    Returns:
+        A tuple containing the query's execution time in milliseconds
+        and a summary of its plan.
+    """
+    sql, params = queryset.query.sql_with_params()
+
+    if count:
+        sql = "SELECT COUNT(*) FROM (%s) AS subquery" % sql
+
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+        result = cursor.fetchone()[0]
+
+    # psycopg2 decodes JSON columns itself; other drivers might not
+    if isinstance(result, str):
+        result = json.loads(result)
+
+    return (result[0]["Execution Time"], summarize_plan(result[0]["Plan"]))
+
+
+class Command(BaseCommand):
+    """Benchmark common executable task instance queries.
+
+    Synthetic task instances are added, after which the queries behind
+    the home page's running job count and the task instance lists are
+    timed with EXPLAIN ANALYZE, first with the task instance indexes
+    and then without them. Everything (including dropping the indexes)
+    happens in a transaction which is rolled back, so the database is
+    left as it was. Dropping the indexes locks the executable task
+    instance table until then, so don't run this against a database
+    that's in use.
+    """
+
+    help = (
+        "Time common task instance queries with and without their "
+        "indexes, using synthetic task instances which are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        """Add options for the size of the benchmark."""
+        parser.add_argument(
+            "--instances",
+            type=int,
+            default=1000000,
+            help="How many task instances to add (default 1000000).",
+        )
+        parser.add_argument(
+            "--task-types",
+            type=int,
+            default=20,
+            help="How many task types to spread them over (default 20).",
+        )
+        parser.add_argument(
+            "--queues",
+            type=int,
+            default=10,
+            help="How many queues to spread them over (default 10).",
+        )
+        parser.add_argument(
+            "--unfinished-every",
+            type=int,
+            default=500,
+            help=(
+                "Make one in this many task instances unfinished "
+                "(default 500, i.e., 0.2%%)."
+            ),
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="How many times to run each query (default 3).",
+        )
+
+    def handle(self, *args, **options):
+        """Seed task instances, then time the queries."""
+        with transaction.atomic():
+            queries = self.seed(options)
+
+            indexed_results = self.time_queries(queries, options["runs"])
+            self.drop_indexes()
+            unindexed_results = self.time_queries(queries, options["runs"])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            "%-18s %-58s %s" % ("query", "with indexes", "without indexes")
+        )
+
+        for name, _, _ in queries:
+            self.stdout.write(
+                "%-18s %9.2f ms  %-45s %9.2f ms  %s"
+                % (
+                    (name,)
+                    + indexed_results[name]
+                    + unindexed_results[name]
+                )
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Benchmarked %s task instances (best of %s runs)"
+                % (options["instances"], options["runs"])
+            )
+        )
+
+    def seed(self, options):
+        """Add synthetic task instances and get the queries to time.
+
+        Args:
+            options: A dictionary containing the command's options.
+
+        Returns:
+            A list of (name, queryset, count) tuples containing the
+            queries to time, in the order to report them, where count
+            specifies whether the queryset is counted.
+        """
+        user = User.objects.create(username=BENCHMARK_NAME_PREFIX)
+        task_types = [
+            ExecutableTaskType.objects.create(
+                name="%s-%s" % (BENCHMARK_NAME_PREFIX, i),
+                user=user,
+                command_to_run="true",
+            )
+            for i in range(options["task_types"])
+        ]
+        task_queues = [
+            TaskQueue.objects.create(
+                name="%s-%s" % (BENCHMARK_NAME_PREFIX, i), user=user
+            )
+            for i in range(options["queues"])
+        ]
+
+        # Adding this many rows through the ORM would take far longer
+        # than the benchmark itself, so add them in one statement. This
+        # skips the signals which keep state counts, but nothing here is
+        # kept anyway.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEED_INSTANCES_SQL.format(
+                    table=ExecutableTaskInstance._meta.db_table
+                ),
+                {
+                    "unfinished_every": options["unfinished_every"],
+                    "unfinished_states": list(UNFINISHED_STATES),
+                    "finished_states": [SUCCESSFUL, FAILED],
+                    "user_pk": user.pk,
+                    "task_type_pks": [
+                        task_type.pk for task_type in task_types
+                    ],
+                    "num_task_types": len(task_types),
+                    "task_queue_pks": [queue.pk for queue in task_queues],
+                    "num_queues": len(task_queues),
+                    "num_instances": options["instances"],
+                },
+            )
+            cursor.execute(
+                "ANALYZE %s;" % ExecutableTaskInstance._meta.db_table
+            )
+
+        instances = ExecutableTaskInstance.objects.all()
+        ordering = TaskInstanceCursorPagination.ordering
+        page_size = TaskInstanceCursorPagination.page_size
+
+        # Seek half way through, as a cursor for a deep page would
+        middle = instances.order_by(*ordering)[options["instances"] // 2]
+
+        return [
+            (
+                "running count",
+                instances.filter(state=RUNNING).order_by().values("pk"),
+                True,
+            ),
+            (
+                "newest page",
+                instances.order_by(*ordering)[:page_size],
+                False,
+            ),
+            (
+                "deep cursor page",
+                instances.filter(
+                    datetime_created__lt=middle.datetime_created
+                ).order_by(*ordering)[:page_size],
+                False,
+            ),
+            (
+                "task type page",
+                instances.filter(task_type=task_types[0]).order_by(
+                    "-datetime_created"
+                )[:page_size],
+                False,
+            ),
+            (
+                "queue page",
+                instances.filter(task_queue=task_queues[0]).order_by(
+                    "-datetime_created"
+                )[:page_size],
+                False,
+            ),
+            (
+                "queue unfinished",
+                instances.filter(
+                    task_queue=task_queues[0], state__in=UNFINISHED_STATES
+                )
+                .order_by()
+                .values("pk"),
+                True,
+            ),
+        ]
+
+    def time_queries(self, queries, runs):
+        """Time queries with EXPLAIN ANALYZE.
+
+        Args:
+            queries: A list of (name, queryset, count) tuples
+                containing the queries to time (see seed).
+            runs: An integer specifying how many times to run each
+                query.
+
+        Returns:
+            A dictionary where the keys are the names of the queries and
+            the values are tuples containing the fastest execution time
+            in milliseconds and a summary of the query's plan.
+        """
+        results = {}
+
+        for name, queryset, count in queries:
+            timings = [
+                explain_analyze(queryset, count) for _ in range(runs)
+            ]
+            results[name] = min(timings)
+
+        return results
+
+    def drop_indexes(self):
+        """Drop the executable task instance indexes."""
+        index_names = [
+            index.name for index in ExecutableTaskInstance._meta.indexes
+        ] + [UNFINISHED_INDEX_NAME]
+
+        with connection.cursor() as cursor:
+            for index_name in index_names:
+                cursor.execute(
+                    "DROP INDEX %s;" % connection.ops.quote_name(index_name)
+                )
@@ -0,0 +1,35 @@
+"""Contains a command to rebuild task instance state counts."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tasksapi.constants import CONTAINER_TASK, EXECUTABLE_TASK
+from tasksapi.models import ContainerTaskInstance, ExecutableTaskInstance
+from tasksapi.models.task_instance_stats import rebuild_state_counts
+
+
+class Command(BaseCommand):
+    """Rebuild task instance state counts from scratch.
+
+    The counts are normally kept up to date as task instances are saved
+    and deleted, but they can drift if task instances are modified
+    without sending signals (e.g., with queryset updates or directly in
+    the database).
+    """
+
+    help = "Rebuild task instance state counts from scratch."
+
+    def handle(self, *args, **options):
+        """Recount every task instance."""
+        with transaction.atomic():
+            num_counts = rebuild_state_counts(
+                {
+                    CONTAINER_TASK: ContainerTaskInstance,
+                    EXECUTABLE_TASK: ExecutableTaskInstance,
+                }
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt %s task instance state counts" % num_counts
+            )
+        )
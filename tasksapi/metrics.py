@@ -0,0 +1,75 @@
+"""Contains Prometheus metrics for the server.
+
+The server keeps metrics on how long requests take and how many
+database queries they make (by view), how many jobs are created (by
+task class and queue primary key, since queue names can be private),
+how many task instances move into each state, and how long fetching
+task instance logs takes. These are served at /metrics to the IP
+addresses in METRICS_ALLOWED_IPS, along with the metrics of any state
+updates the server sends itself (see tasksapi.tasks.metrics).
+
+When the server runs in several processes (e.g., under uWSGI), set
+prometheus_multiproc_dir so that the metrics of every process are
+served together; see tasksapi.tasks.metrics.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from tasksapi.tasks.metrics import get_metrics_registry
+
+
+# Buckets for how many database queries a request makes
+DB_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float("inf"))
+
+request_duration_seconds = Histogram(
+    "saltant_request_duration_seconds",
+    "How long requests took to respond to.",
+    ["view", "method"],
+)
+request_db_queries = Histogram(
+    "saltant_request_db_queries",
+    "How many database queries requests made.",
+    ["view"],
+    buckets=DB_QUERY_BUCKETS,
+)
+jobs_created = Counter(
+    "saltant_jobs_created",
+    "How many jobs were queued up.",
+    ["task_class", "task_queue_pk"],
+)
+state_transitions = Counter(
+    "saltant_state_transitions",
+    "How many task instances moved into each state.",
+    ["task_class", "state"],
+)
+log_fetch_duration_seconds = Histogram(
+    "saltant_log_fetch_duration_seconds",
+    "How long listing and reading task instance logs took.",
+    ["operation"],
+)
+
+
+def metrics_view(request):
+    """Serve the server's metrics in Prometheus' text format.
+
+    Args:
+        request: The request.
+
+    Returns:
+        An HttpResponse containing the metrics, or a 403 response if
+        the request didn't come from an IP address in
+        METRICS_ALLOWED_IPS.
+    """
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        generate_latest(get_metrics_registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
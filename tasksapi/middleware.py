@@ -1,7 +1,10 @@
 """Custom middleware for tasksapi."""
 
+import time
+from django.db import connection
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
+from tasksapi.metrics import request_db_queries, request_duration_seconds
 
 
 class TimezoneMiddleware(MiddlewareMixin):
@@ -16,3 +19,54 @@ class TimezoneMiddleware(MiddlewareMixin):
             timezone.activate(request.user.time_zone)
         except AttributeError:
             timezone.deactivate()
+
+
+class MetricsMiddleware:
+    """Record how long requests take and how many queries they make.
+
+    This should come first in the middleware list, so that the time
+    spent in other middleware is included.
+    """
+
+    def __init__(self, get_response):
+        """Keep the next middleware (or view) to call.
+
+        Args:
+            get_response: A callable which takes a request and returns a
+                response.
+        """
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Respond to a request, recording metrics about it.
+
+        Args:
+            request: The request.
+
+        Returns:
+            The response.
+        """
+        num_queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal num_queries
+            num_queries += 1
+
+            return execute(sql, params, many, context)
+
+        start_time = time.monotonic()
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+
+        # Label requests by the view they went to, rather than by their
+        # path, so that there aren't a label per task instance
+        resolver_match = getattr(request, "resolver_match", None)
+        view = resolver_match.view_name if resolver_match else "unmatched"
+
+        request_duration_seconds.labels(view, request.method).observe(
+            time.monotonic() - start_time
+        )
+        request_db_queries.labels(view).observe(num_queries)
+
+        return response
@@ -0,0 +1,69 @@
+# Generated by Django 2.1.11 on 2026-10-18 03:39
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def populate_task_instance_state_counts(apps, schema_editor):
+    """Count the task instances which already exist."""
+    TaskInstanceStateCount = apps.get_model('tasksapi', 'TaskInstanceStateCount')
+    instance_models = {
+        'container': apps.get_model('tasksapi', 'ContainerTaskInstance'),
+        'executable': apps.get_model('tasksapi', 'ExecutableTaskInstance'),
+    }
+
+    state_counts = []
+
+    for task_class, instance_model in instance_models.items():
+        rows = (
+            instance_model.objects.order_by()
+            .annotate(hour=TruncHour('datetime_created', tzinfo=timezone.utc))
+            .values('hour', 'task_type_id', 'task_queue_id', 'state')
+            .annotate(count=Count('uuid'))
+        )
+
+        state_counts += [
+            TaskInstanceStateCount(
+                datetime_created_hour=row['hour'],
+                task_class=task_class,
+                task_type_pk=row['task_type_id'],
+                task_queue_id=row['task_queue_id'],
+                state=row['state'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+
+    TaskInstanceStateCount.objects.bulk_create(state_counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0006_auto_20181217_1212'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskInstanceStateCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datetime_created_hour', models.DateTimeField(help_text='The hour (in UTC) the counted instances were created in.')),
+                ('task_class', models.CharField(choices=[('container', 'container'), ('executable', 'executable')], help_text='The class of the counted instances.', max_length=10)),
+                ('task_type_pk', models.PositiveIntegerField(help_text="The primary key of the counted instances' task type.", verbose_name='task type PK')),
+                ('state', models.CharField(choices=[('created', 'created'), ('published', 'published'), ('running', 'running'), ('successful', 'successful'), ('failed', 'failed'), ('terminated', 'terminated')], help_text='The state of the counted instances.', max_length=10)),
+                ('count', models.IntegerField(default=0, help_text='The number of instances counted.')),
+                ('task_queue', models.ForeignKey(help_text='The queue the counted instances run on.', on_delete=django.db.models.deletion.CASCADE, to='tasksapi.TaskQueue')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskinstancestatecount',
+            unique_together={('datetime_created_hour', 'task_class', 'task_type_pk', 'task_queue', 'state')},
+        ),
+        migrations.RunPython(
+            populate_task_instance_state_counts, migrations.RunPython.noop
+        ),
+    ]
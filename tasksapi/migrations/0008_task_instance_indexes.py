@@ -0,0 +1,59 @@
+# Generated by Django 2.1.11 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+# Partial indexes for task instances which haven't finished yet (e.g.,
+# for counting running jobs). Finished task instances vastly outnumber
+# unfinished ones, so these stay small. Django 2.1 can't declare
+# partial indexes on models, so they're made with SQL here.
+PARTIAL_INDEX_TABLES = (
+    ('cti_unfinished_idx', 'tasksapi_containertaskinstance'),
+    ('eti_unfinished_idx', 'tasksapi_executabletaskinstance'),
+)
+
+CREATE_PARTIAL_INDEX_SQL = (
+    "CREATE INDEX %s ON %s (state, task_queue_id) "
+    "WHERE state IN ('created', 'published', 'running');"
+)
+
+DROP_PARTIAL_INDEX_SQL = "DROP INDEX %s;"
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0007_taskinstancestatecount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='containertaskinstance',
+            index=models.Index(fields=['-datetime_created', '-uuid'], name='cti_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containertaskinstance',
+            index=models.Index(fields=['task_type', '-datetime_created'], name='cti_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containertaskinstance',
+            index=models.Index(fields=['task_queue', '-datetime_created'], name='cti_queue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executabletaskinstance',
+            index=models.Index(fields=['-datetime_created', '-uuid'], name='eti_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executabletaskinstance',
+            index=models.Index(fields=['task_type', '-datetime_created'], name='eti_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executabletaskinstance',
+            index=models.Index(fields=['task_queue', '-datetime_created'], name='eti_queue_created_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=CREATE_PARTIAL_INDEX_SQL % (index_name, table_name),
+            reverse_sql=DROP_PARTIAL_INDEX_SQL % index_name,
+        )
+        for index_name, table_name in PARTIAL_INDEX_TABLES
+    ]
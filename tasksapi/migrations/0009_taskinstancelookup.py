@@ -0,0 +1,52 @@
+# Generated by Django 2.1.11 on 2026-10-18 04:01
+
+from itertools import islice
+from django.db import migrations, models
+
+# How many lookups to insert at once, so that every task instance's
+# lookup never needs to be in memory at the same time
+BATCH_SIZE = 1000
+
+
+def populate_task_instance_lookups(apps, schema_editor):
+    """Record the classes of the task instances which already exist."""
+    TaskInstanceLookup = apps.get_model('tasksapi', 'TaskInstanceLookup')
+    instance_models = {
+        'container': apps.get_model('tasksapi', 'ContainerTaskInstance'),
+        'executable': apps.get_model('tasksapi', 'ExecutableTaskInstance'),
+    }
+
+    for task_class, instance_model in instance_models.items():
+        uuids = instance_model.objects.values_list(
+            'uuid', flat=True
+        ).iterator(chunk_size=BATCH_SIZE)
+
+        while True:
+            lookups = [
+                TaskInstanceLookup(uuid=uuid, task_class=task_class)
+                for uuid in islice(uuids, BATCH_SIZE)
+            ]
+
+            if not lookups:
+                break
+
+            TaskInstanceLookup.objects.bulk_create(lookups)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0008_task_instance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskInstanceLookup',
+            fields=[
+                ('uuid', models.UUIDField(help_text='The UUID of the task instance.', primary_key=True, serialize=False, verbose_name='UUID')),
+                ('task_class', models.CharField(choices=[('container', 'container'), ('executable', 'executable')], help_text='The class of the task instance.', max_length=10)),
+            ],
+        ),
+        migrations.RunPython(
+            populate_task_instance_lookups, migrations.RunPython.noop
+        ),
+    ]
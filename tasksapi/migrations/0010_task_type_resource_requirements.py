@@ -0,0 +1,34 @@
+# Generated by Django 2.1.11 on 2026-10-18 04:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0009_taskinstancelookup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='containertasktype',
+            name='required_cpus',
+            field=models.FloatField(default=0, help_text="How many CPUs the task's jobs need. Workers with a resource budget only start jobs once enough of their CPUs are free. Defaults to 0.", validators=[django.core.validators.MinValueValidator(0)], verbose_name='required CPUs'),
+        ),
+        migrations.AddField(
+            model_name='containertasktype',
+            name='required_memory_megabytes',
+            field=models.PositiveIntegerField(default=0, help_text="How many megabytes of memory the task's jobs need. Workers with a resource budget only start jobs once enough of their memory is free. Defaults to 0.", verbose_name='required memory (MB)'),
+        ),
+        migrations.AddField(
+            model_name='executabletasktype',
+            name='required_cpus',
+            field=models.FloatField(default=0, help_text="How many CPUs the task's jobs need. Workers with a resource budget only start jobs once enough of their CPUs are free. Defaults to 0.", validators=[django.core.validators.MinValueValidator(0)], verbose_name='required CPUs'),
+        ),
+        migrations.AddField(
+            model_name='executabletasktype',
+            name='required_memory_megabytes',
+            field=models.PositiveIntegerField(default=0, help_text="How many megabytes of memory the task's jobs need. Workers with a resource budget only start jobs once enough of their memory is free. Defaults to 0.", verbose_name='required memory (MB)'),
+        ),
+    ]
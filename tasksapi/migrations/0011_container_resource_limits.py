@@ -0,0 +1,43 @@
+# Generated by Django 2.1.11 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0010_task_type_resource_requirements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='cpu_limit',
+            field=models.FloatField(blank=True, default=None, help_text="The most CPUs the container can use, overriding the task type's limit. Specify null to use the task type's limit. Defaults to null.", null=True, verbose_name='CPU limit'),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='memory_limit_megabytes',
+            field=models.PositiveIntegerField(blank=True, default=None, help_text="The most megabytes of memory (including swap) the container can use, overriding the task type's limit. Specify null to use the task type's limit. Defaults to null.", null=True, verbose_name='memory limit (MB)'),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='pids_limit',
+            field=models.PositiveIntegerField(blank=True, default=None, help_text="The most processes the container can run at once, overriding the task type's limit. Specify null to use the task type's limit. Defaults to null.", null=True, verbose_name='process limit'),
+        ),
+        migrations.AddField(
+            model_name='containertasktype',
+            name='cpu_limit',
+            field=models.FloatField(blank=True, default=None, help_text='The most CPUs each container can use. Specify null for no limit. Defaults to null.', null=True, verbose_name='CPU limit'),
+        ),
+        migrations.AddField(
+            model_name='containertasktype',
+            name='memory_limit_megabytes',
+            field=models.PositiveIntegerField(blank=True, default=None, help_text='The most megabytes of memory (including swap) each container can use. Specify null for no limit. Defaults to null.', null=True, verbose_name='memory limit (MB)'),
+        ),
+        migrations.AddField(
+            model_name='containertasktype',
+            name='pids_limit',
+            field=models.PositiveIntegerField(blank=True, default=None, help_text='The most processes each container can run at once. Specify null for no limit. Defaults to null.', null=True, verbose_name='process limit'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.1.11 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0011_container_resource_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='bytes_read',
+            field=models.BigIntegerField(editable=False, help_text='How many bytes the job read from disk.', null=True),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='bytes_written',
+            field=models.BigIntegerField(editable=False, help_text='How many bytes the job wrote to disk.', null=True),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='cpu_system_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds of CPU time the job used in kernel mode.', null=True, verbose_name='CPU system seconds'),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='cpu_user_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds of CPU time the job used in user mode.', null=True, verbose_name='CPU user seconds'),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='peak_memory_megabytes',
+            field=models.FloatField(editable=False, help_text='The most megabytes of memory the job used at once.', null=True),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='wall_time_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds the job ran for.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='bytes_read',
+            field=models.BigIntegerField(editable=False, help_text='How many bytes the job read from disk.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='bytes_written',
+            field=models.BigIntegerField(editable=False, help_text='How many bytes the job wrote to disk.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='cpu_system_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds of CPU time the job used in kernel mode.', null=True, verbose_name='CPU system seconds'),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='cpu_user_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds of CPU time the job used in user mode.', null=True, verbose_name='CPU user seconds'),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='peak_memory_megabytes',
+            field=models.FloatField(editable=False, help_text='The most megabytes of memory the job used at once.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='wall_time_seconds',
+            field=models.FloatField(editable=False, help_text='How many seconds the job ran for.', null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.11 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0012_task_instance_resource_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='datetime_published',
+            field=models.DateTimeField(editable=False, help_text='When the job was published to its queue.', null=True),
+        ),
+        migrations.AddField(
+            model_name='containertaskinstance',
+            name='datetime_started',
+            field=models.DateTimeField(editable=False, help_text='When a worker started running the job.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='datetime_published',
+            field=models.DateTimeField(editable=False, help_text='When the job was published to its queue.', null=True),
+        ),
+        migrations.AddField(
+            model_name='executabletaskinstance',
+            name='datetime_started',
+            field=models.DateTimeField(editable=False, help_text='When a worker started running the job.', null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 2.1.11 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, DateTimeField, Func
+
+
+class TruncQuarterHour(Func):
+    """Truncate a datetime down to the start of its 15 minutes."""
+
+    template = (
+        'TO_TIMESTAMP(FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / 900) * 900)'
+    )
+    output_field = DateTimeField()
+
+
+def recount_task_instance_states(apps, schema_editor):
+    """Recount the task instances by the 15 minutes they were created in.
+
+    Counts by hour can't be split up, so count from scratch.
+    """
+    TaskInstanceStateCount = apps.get_model('tasksapi', 'TaskInstanceStateCount')
+    instance_models = {
+        'container': apps.get_model('tasksapi', 'ContainerTaskInstance'),
+        'executable': apps.get_model('tasksapi', 'ExecutableTaskInstance'),
+    }
+
+    state_counts = []
+
+    for task_class, instance_model in instance_models.items():
+        rows = (
+            instance_model.objects.order_by()
+            .annotate(bucket=TruncQuarterHour('datetime_created'))
+            .values('bucket', 'task_type_id', 'task_queue_id', 'state')
+            .annotate(count=Count('uuid'))
+        )
+
+        state_counts += [
+            TaskInstanceStateCount(
+                datetime_created_bucket=row['bucket'],
+                task_class=task_class,
+                task_type_pk=row['task_type_id'],
+                task_queue_id=row['task_queue_id'],
+                state=row['state'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+
+    TaskInstanceStateCount.objects.all().delete()
+    TaskInstanceStateCount.objects.bulk_create(state_counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasksapi', '0013_task_instance_state_datetimes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='taskinstancestatecount',
+            old_name='datetime_created_hour',
+            new_name='datetime_created_bucket',
+        ),
+        migrations.AlterField(
+            model_name='taskinstancestatecount',
+            name='datetime_created_bucket',
+            field=models.DateTimeField(help_text='The start of the 15 minutes (in UTC) the counted instances were created in.'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskinstancestatecount',
+            unique_together={('datetime_created_bucket', 'task_class', 'task_type_pk', 'task_queue', 'state')},
+        ),
+        migrations.RunPython(
+            recount_task_instance_states, migrations.RunPython.noop
+        ),
+    ]
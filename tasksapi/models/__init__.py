@@ -1,7 +1,26 @@
 """Collect all models to "export" from this directory."""
 
 from .abstract_tasks import AbstractTaskInstance, AbstractTaskType
+from .bulk_submissions import (
+    build_task_instances,
+    bulk_create_task_instances,
+)
 from .container_tasks import ContainerTaskInstance, ContainerTaskType
 from .executable_tasks import ExecutableTaskInstance, ExecutableTaskType
+from .queue_permissions import (
+    get_allowed_queue_pks,
+    invalidate_queue_permissions,
+)
+from .resource_usage import (
+    bulk_update_resource_usages,
+    summarize_resource_usage,
+)
+from .state_updates import (
+    bulk_update_task_instance_states,
+    get_task_instance_model,
+)
+from .task_instance_latencies import get_latency_percentiles
+from .task_instance_lookups import TaskInstanceLookup
+from .task_instance_stats import TaskInstanceStateCount
 from .task_queues import TaskQueue, TaskWhitelist
 from .users import User
@@ -7,19 +7,30 @@ import json
 from uuid import uuid4
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
 from tasksapi.constants import (
     CREATED,
+    PUBLISHED,
     STATE_CHOICES,
     STATE_MAX_LENGTH,
     EXECUTABLE_TASK,
     DOCKER,
-    SINGULARITY,
+)
+from tasksapi.metrics import jobs_created
+from tasksapi.tasks import run_task
+from .queue_permissions import (
+    get_task_queue_permissions,
+    queue_allows_task_type,
 )
 from .task_queues import TaskQueue
 from .users import User
 from .utils import determine_task_class
-from .validators import task_instance_args_are_valid, task_type_args_are_valid
+from .validators import (
+    state_transition_is_valid,
+    task_instance_args_are_valid,
+    task_type_args_are_valid,
+)
 
 
 class AbstractTaskType(models.Model):
@@ -87,6 +98,28 @@ class AbstractTaskType(models.Model):
         ),
     )
 
+    # Resources the task's jobs need, which workers with a resource
+    # budget admit jobs against
+    required_cpus = models.FloatField(
+        default=0,
+        validators=[MinValueValidator(0)],
+        verbose_name="required CPUs",
+        help_text=(
+            "How many CPUs the task's jobs need. Workers with a "
+            "resource budget only start jobs once enough of their "
+            "CPUs are free. Defaults to 0."
+        ),
+    )
+    required_memory_megabytes = models.PositiveIntegerField(
+        default=0,
+        verbose_name="required memory (MB)",
+        help_text=(
+            "How many megabytes of memory the task's jobs need. Workers "
+            "with a resource budget only start jobs once enough of "
+            "their memory is free. Defaults to 0."
+        ),
+    )
+
     class Meta:
         # Don't make an actual database table for this. Note that this
         # gets set to False when the model is inherited.
@@ -165,6 +198,18 @@ class AbstractTaskType(models.Model):
                 % self.required_arguments_default_values
             )
 
+        # Make sure resource requirements make sense
+        if self.required_cpus < 0:
+            raise ValidationError(
+                "'%s' is not a valid number of CPUs!" % self.required_cpus
+            )
+
+        if self.required_memory_megabytes < 0:
+            raise ValidationError(
+                "'%s' is not a valid number of megabytes!"
+                % self.required_memory_megabytes
+            )
+
         # Make sure arguments are valid
         is_valid, reason = task_type_args_are_valid(self)
 
@@ -209,6 +254,16 @@ class AbstractTaskInstance(models.Model):
     datetime_created = models.DateTimeField(
         auto_now_add=True, help_text="When the job was created."
     )
+    datetime_published = models.DateTimeField(
+        null=True,
+        editable=False,
+        help_text="When the job was published to its queue.",
+    )
+    datetime_started = models.DateTimeField(
+        null=True,
+        editable=False,
+        help_text="When a worker started running the job.",
+    )
     datetime_finished = models.DateTimeField(
         null=True, editable=False, help_text="When the job finished."
     )
@@ -228,6 +283,43 @@ class AbstractTaskInstance(models.Model):
         ),
     )
 
+    # The resources the job used, as measured by the worker which ran
+    # it. These are null until the job finishes.
+    wall_time_seconds = models.FloatField(
+        null=True,
+        editable=False,
+        help_text="How many seconds the job ran for.",
+    )
+    cpu_user_seconds = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="CPU user seconds",
+        help_text="How many seconds of CPU time the job used in user mode.",
+    )
+    cpu_system_seconds = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name="CPU system seconds",
+        help_text=(
+            "How many seconds of CPU time the job used in kernel mode."
+        ),
+    )
+    peak_memory_megabytes = models.FloatField(
+        null=True,
+        editable=False,
+        help_text="The most megabytes of memory the job used at once.",
+    )
+    bytes_read = models.BigIntegerField(
+        null=True,
+        editable=False,
+        help_text="How many bytes the job read from disk.",
+    )
+    bytes_written = models.BigIntegerField(
+        null=True,
+        editable=False,
+        help_text="How many bytes the job wrote to disk.",
+    )
+
     class Meta:
         """Model metadata."""
 
@@ -242,6 +334,74 @@ class AbstractTaskInstance(models.Model):
         """String representation of a task instance."""
         return str(self.uuid)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the values loaded from the database.
+
+        These let signal handlers tell what changed when an instance is
+        saved without having to query the database for the old values.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = dict(zip(field_names, values))
+
+        return instance
+
+    def get_run_task_kwargs(self):
+        """Get the keyword arguments to launch an instance's job with.
+
+        Make sure you override this when you subclass this!
+
+        Returns:
+            A dictionary containing keyword arguments for the run_task
+            Celery task.
+        """
+        raise NotImplementedError
+
+    def run_job(self):
+        """Queue up an instance's job and mark it as published."""
+        self.publish_job()
+        self.mark_published()
+
+    def publish_job(self, producer=None):
+        """Queue up an instance's job.
+
+        This doesn't mark the instance as published; see run_job.
+
+        Args:
+            producer: An optional Celery producer to publish the job
+                with. Passing in the same producer for many jobs lets
+                them share one broker connection.
+        """
+        run_task.apply_async(
+            kwargs=self.get_run_task_kwargs(),
+            queue=self.task_queue.name,
+            task_id=str(self.uuid),
+            producer=producer,
+        )
+
+        jobs_created.labels(
+            determine_task_class(self), self.task_queue_id
+        ).inc()
+
+    def mark_published(self):
+        """Mark an instance as published, unless its job has moved on.
+
+        By now a worker might have started the job and reported so, so
+        the instance is locked and only marked as published if it's
+        still in the created state.
+        """
+        with transaction.atomic():
+            state = (
+                type(self)
+                .objects.select_for_update()
+                .filter(uuid=self.uuid)
+                .values_list("state", flat=True)
+                .first()
+            )
+
+            if state == self.state == CREATED:
+                self.transition_state(PUBLISHED)
+
     def save(self, *args, **kwargs):  # pylint: disable=arguments-differ
         """Perform additonal validation."""
         # Call clean
@@ -250,10 +410,65 @@ class AbstractTaskInstance(models.Model):
         # Call the parent save method
         super().save(*args, **kwargs)
 
+    def transition_state(self, state):
+        """Move an instance to a new state.
+
+        Unlike save, this doesn't re-validate the instance (a state
+        change can't invalidate it), and only writes the fields a state
+        change affects. Signal handlers still run as they do for save.
+
+        Args:
+            state: A string which must be one of the state constants.
+
+        Returns:
+            A boolean signalling whether the state changed.
+
+        Raises:
+            ValidationError: The instance can't move to the state
+                given.
+        """
+        is_valid, reason = state_transition_is_valid(self.state, state)
+
+        if not is_valid:
+            raise ValidationError(reason)
+
+        if state == self.state:
+            return False
+
+        self.state = state
+
+        # Call Django's save method directly to skip our clean call.
+        # Note that the pre_save signal handlers set the datetimes
+        # published, started, and finished.
+        super().save(
+            update_fields=[
+                "state",
+                "datetime_published",
+                "datetime_started",
+                "datetime_finished",
+            ]
+        )
+
+        return True
+
     def clean(
         self, fill_in_missing_args=False
     ):  # pylint: disable=arguments-differ
-        """Validate an instance's arguments."""
+        """Validate an instance's arguments and task queue."""
+        self.clean_arguments(fill_in_missing_args=fill_in_missing_args)
+        self.clean_task_queue()
+
+    def clean_arguments(self, fill_in_missing_args=False):
+        """Validate an instance's arguments.
+
+        This doesn't query the database, as long as the instance's task
+        type is already loaded.
+
+        Args:
+            fill_in_missing_args: An optional boolean determining
+                whether to fill in any missing arguments with default
+                values. Defaults to False.
+        """
         # Set null JSON values to empty Python data structures
         if self.arguments is None:
             self.arguments = {}
@@ -271,15 +486,42 @@ class AbstractTaskInstance(models.Model):
                 "'%s' is not a valid JSON dictionary!" % self.arguments
             )
 
-        # Make sure the queue is active
-        if not self.task_queue.active:
+        # Make sure arguments are valid
+        is_valid, reason = task_instance_args_are_valid(
+            instance=self, fill_missing_args=fill_in_missing_args
+        )
+
+        # Arguments are not valid!
+        if not is_valid:
+            raise ValidationError(reason)
+
+    def clean_task_queue(self):
+        """Validate that an instance can run on its task queue.
+
+        This only depends on an instance's user, task type, and task
+        queue, so instances sharing these only need to be checked once.
+        The queue's permissions are cached, so this doesn't usually
+        query the database unless the instance isn't valid.
+        """
+        queue_permissions = get_task_queue_permissions(self.task_queue_id)
+
+        # Make sure the queue exists and is active
+        if queue_permissions is None:
+            raise ValidationError(
+                "Queue %s does not exist" % self.task_queue_id
+            )
+
+        if not queue_permissions["active"]:
             raise ValidationError(
                 "Queue %s is not active" % self.task_queue.name
             )
 
         # Make sure the user is authorized to use the queue they're
         # posting to
-        if self.task_queue.private and self.user != self.task_queue.user:
+        if (
+            queue_permissions["private"]
+            and self.user_id != queue_permissions["user_id"]
+        ):
             raise ValidationError(
                 "%s is not authorized to use the queue %s"
                 % (self.user, self.task_queue.name)
@@ -289,54 +531,31 @@ class AbstractTaskInstance(models.Model):
         this_task_class = determine_task_class(self)
 
         # Make sure this task type is on one of the queue's whitelists
-        if this_task_class == EXECUTABLE_TASK:
-            if not self.task_queue.whitelists.filter(
-                whitelisted_executable_task_types=self.task_type
-            ):
-                raise ValidationError(
-                    "Queue %s has not whitelisted task type %s"
-                    % (self.task_queue.name, self.task_type.name)
-                )
-        else:
-            if not self.task_queue.whitelists.filter(
-                whitelisted_container_task_types=self.task_type
-            ):
-                raise ValidationError(
-                    "Queue %s has not whitelisted task type %s"
-                    % (self.task_queue.name, self.task_type.name)
-                )
+        if self.task_type_id not in queue_permissions[
+            "whitelisted_task_type_pks"
+        ].get(this_task_class, ()):
+            raise ValidationError(
+                "Queue %s has not whitelisted task type %s"
+                % (self.task_queue.name, self.task_type.name)
+            )
 
         # Make sure the queue accepts the type of task they're posting
         # to
+        if queue_allows_task_type(queue_permissions, self.task_type):
+            return
+
         if this_task_class == EXECUTABLE_TASK:
-            if not self.task_queue.runs_executable_tasks:
-                raise ValidationError(
-                    "Queue %s does not accept executable tasks"
-                    % self.task_queue.name
-                )
+            raise ValidationError(
+                "Queue %s does not accept executable tasks"
+                % self.task_queue.name
+            )
+        elif self.task_type.container_type == DOCKER:
+            raise ValidationError(
+                "Queue %s does not accept Docker container tasks"
+                % self.task_queue.name
+            )
         else:
-            if (
-                self.task_type.container_type == DOCKER
-                and not self.task_queue.runs_docker_container_tasks
-            ):
-                raise ValidationError(
-                    "Queue %s does not accept Docker container tasks"
-                    % self.task_queue.name
-                )
-            elif (
-                self.task_type.container_type == SINGULARITY
-                and not self.task_queue.runs_singularity_container_tasks
-            ):
-                raise ValidationError(
-                    "Queue %s does not accept Singularity container tasks"
-                    % self.task_queue.name
-                )
-
-        # Make sure arguments are valid
-        is_valid, reason = task_instance_args_are_valid(
-            instance=self, fill_missing_args=fill_in_missing_args
-        )
-
-        # Arguments are not valid!
-        if not is_valid:
-            raise ValidationError(reason)
+            raise ValidationError(
+                "Queue %s does not accept Singularity container tasks"
+                % self.task_queue.name
+            )
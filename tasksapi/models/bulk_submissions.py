@@ -0,0 +1,125 @@
+"""Functions to create many task instances at once.
+
+Creating task instances one at a time validates each of them against
+their task queue, inserts them one row at a time, and publishes each
+of their jobs separately. For batches of task instances sharing a task
+type and task queue (e.g., parameter sweeps), these functions instead
+validate the task queue once, insert the task instances in bulk, and
+publish all of their jobs over one broker connection.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from tasksapi.constants import PUBLISHED
+from tasksapi.tasks import run_task
+from .state_updates import bulk_update_task_instance_states
+from .task_instance_lookups import bulk_register_task_instances
+from .task_instance_stats import (
+    bulk_update_state_counts,
+    get_current_state_count_key,
+)
+from .utils import determine_task_class
+
+
+# How many task instances to insert per query
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def build_task_instances(
+    instance_model, user, task_type, task_queue, arguments_list, name=""
+):
+    """Build and validate task instances sharing a task type and queue.
+
+    Args:
+        instance_model: The task instance model to build instances of.
+        user: The user creating the task instances.
+        task_type: The task type of the task instances.
+        task_queue: The task queue to run the task instances on.
+        arguments_list: A list of dictionaries containing the arguments
+            for each task instance.
+        name: An optional string containing the name for each of the
+            task instances. Defaults to an empty string.
+
+    Returns:
+        A list of unsaved task instances.
+
+    Raises:
+        ValidationError: One or more of the task instances isn't valid.
+    """
+    instances = [
+        instance_model(
+            name=name,
+            user=user,
+            task_type=task_type,
+            task_queue=task_queue,
+            arguments=arguments,
+        )
+        for arguments in arguments_list
+    ]
+
+    if not instances:
+        raise ValidationError("No task instance arguments provided!")
+
+    # The task queue validation is the same for every task instance
+    instances[0].clean_task_queue()
+
+    errors = []
+
+    for idx, instance in enumerate(instances):
+        try:
+            instance.clean_arguments(fill_in_missing_args=True)
+        except ValidationError as e:
+            errors += [
+                "Task instance %s: %s" % (idx, message)
+                for message in e.messages
+            ]
+
+    if errors:
+        raise ValidationError(errors)
+
+    return instances
+
+
+def bulk_create_task_instances(instances):
+    """Save task instances in bulk and queue up their jobs.
+
+    Note that no save signals are sent for the task instances; their
+    effects (i.e., updating state counts, recording task classes,
+    queuing up jobs, and marking the task instances as published) are
+    done here instead.
+
+    Args:
+        instances: A list of validated, unsaved task instances of the
+            same class, e.g., from build_task_instances.
+
+    Returns:
+        The list of saved task instances.
+    """
+    if not instances:
+        return instances
+
+    instance_model = type(instances[0])
+    task_class = determine_task_class(instances[0])
+
+    with transaction.atomic():
+        instances = instance_model.objects.bulk_create(
+            instances, batch_size=BULK_CREATE_BATCH_SIZE
+        )
+
+        bulk_update_state_counts(
+            (None, get_current_state_count_key(instance, task_class))
+            for instance in instances
+        )
+
+        bulk_register_task_instances(instances, task_class)
+
+    # Publish every job over the same broker connection
+    with run_task.app.producer_or_acquire() as producer:
+        for instance in instances:
+            instance.publish_job(producer=producer)
+
+    bulk_update_task_instance_states(
+        {str(instance.uuid): PUBLISHED for instance in instances}
+    )
+
+    return instances
@@ -1,18 +1,30 @@
 """Models to represent task types and instances which use containers."""
 
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from tasksapi.constants import (
+    PUBLISHED,
+    RUNNING,
     SUCCESSFUL,
     FAILED,
     CONTAINER_CHOICES,
     CONTAINER_TYPE_MAX_LENGTH,
     CONTAINER_TASK,
 )
-from tasksapi.tasks import run_task
 from .abstract_tasks import AbstractTaskInstance, AbstractTaskType
+from .task_instance_lookups import (
+    register_task_instance,
+    unregister_task_instance,
+)
+from .task_instance_stats import (
+    finish_state_counts_update,
+    prepare_state_counts_update,
+    remove_from_state_counts,
+)
+from .validators import resource_limits_are_valid
 
 
 class ContainerTaskType(AbstractTaskType):
@@ -56,6 +68,64 @@ class ContainerTaskType(AbstractTaskType):
         help_text="The type of container provided.",
     )
 
+    # Limits on the resources each container can use
+    cpu_limit = models.FloatField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="CPU limit",
+        help_text=(
+            "The most CPUs each container can use. Specify null for no "
+            "limit. Defaults to null."
+        ),
+    )
+    memory_limit_megabytes = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="memory limit (MB)",
+        help_text=(
+            "The most megabytes of memory (including swap) each "
+            "container can use. Specify null for no limit. Defaults to "
+            "null."
+        ),
+    )
+    pids_limit = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="process limit",
+        help_text=(
+            "The most processes each container can run at once. Specify "
+            "null for no limit. Defaults to null."
+        ),
+    )
+
+    def clean(self):
+        """Validate a task type's required arguments and limits."""
+        super().clean()
+
+        is_valid, reason = resource_limits_are_valid(
+            self.get_resource_limits(), self
+        )
+
+        if not is_valid:
+            raise ValidationError(reason)
+
+    def get_resource_limits(self):
+        """Get the limits on the resources the task's containers use.
+
+        Returns:
+            A dictionary containing the CPU limit, the memory limit in
+            megabytes, and the process limit, each of which is None if
+            there's no limit.
+        """
+        return {
+            "cpu_limit": self.cpu_limit,
+            "memory_limit_megabytes": self.memory_limit_megabytes,
+            "pids_limit": self.pids_limit,
+        }
+
 
 class ContainerTaskInstance(AbstractTaskInstance):
     """A running instance of a container task type."""
@@ -66,48 +136,170 @@ class ContainerTaskInstance(AbstractTaskInstance):
         help_text="The task type for which this is an instance.",
     )
 
+    # Overrides of the task type's resource limits
+    cpu_limit = models.FloatField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="CPU limit",
+        help_text=(
+            "The most CPUs the container can use, overriding the task "
+            "type's limit. Specify null to use the task type's limit. "
+            "Defaults to null."
+        ),
+    )
+    memory_limit_megabytes = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="memory limit (MB)",
+        help_text=(
+            "The most megabytes of memory (including swap) the "
+            "container can use, overriding the task type's limit. "
+            "Specify null to use the task type's limit. Defaults to "
+            "null."
+        ),
+    )
+    pids_limit = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name="process limit",
+        help_text=(
+            "The most processes the container can run at once, "
+            "overriding the task type's limit. Specify null to use the "
+            "task type's limit. Defaults to null."
+        ),
+    )
+
+    class Meta(AbstractTaskInstance.Meta):
+        """Model metadata.
+
+        The indexes support the default ordering (along with cursor
+        pagination) and listing the task instances of a task type or
+        task queue. Migration 0008 also adds a partial index for
+        unfinished task instances, which Django can't express here yet.
+        """
+
+        indexes = [
+            models.Index(
+                fields=["-datetime_created", "-uuid"],
+                name="cti_created_idx",
+            ),
+            models.Index(
+                fields=["task_type", "-datetime_created"],
+                name="cti_type_created_idx",
+            ),
+            models.Index(
+                fields=["task_queue", "-datetime_created"],
+                name="cti_queue_created_idx",
+            ),
+        ]
+
+    def clean(
+        self, fill_in_missing_args=False
+    ):  # pylint: disable=arguments-differ
+        """Validate an instance's arguments, task queue, and limits."""
+        super().clean(fill_in_missing_args=fill_in_missing_args)
+
+        is_valid, reason = resource_limits_are_valid(
+            self.get_resource_limits(), self.task_type
+        )
+
+        if not is_valid:
+            raise ValidationError(reason)
+
+    def get_resource_limits(self):
+        """Get the limits on the resources the instance's container uses.
+
+        Limits set on the instance override its task type's limits.
+
+        Returns:
+            A dictionary containing the CPU limit, the memory limit in
+            megabytes, and the process limit, each of which is None if
+            there's no limit.
+        """
+        limits = self.task_type.get_resource_limits()
+
+        for name in limits:
+            if getattr(self, name) is not None:
+                limits[name] = getattr(self, name)
+
+        return limits
+
+    def get_run_task_kwargs(self):
+        """Refer to parent class docstring :)"""
+        return {
+            "uuid": self.uuid,
+            "task_class": CONTAINER_TASK,
+            "command_to_run": self.task_type.command_to_run,
+            "env_vars_list": self.task_type.environment_variables,
+            "args_dict": self.arguments,
+            "logs_path": self.task_type.logs_path,
+            "results_path": self.task_type.results_path,
+            "container_image": self.task_type.container_image,
+            "container_type": self.task_type.container_type,
+            **self.get_resource_limits(),
+            "required_cpus": self.task_type.required_cpus,
+            "required_memory_megabytes": (
+                self.task_type.required_memory_megabytes
+            ),
+        }
+
 
 @receiver(pre_save, sender=ContainerTaskInstance)
-def container_task_instance_pre_save_handler(instance, **_):
+def container_task_instance_pre_save_handler(instance, raw, **_):
     """Adds additional behavior before saving a task instance.
 
-    If the state is about to be changed to a finished change, update the
-    datetime finished field.
+    If the state is about to be changed to published, running, or a
+    finished state, update the corresponding datetime field. Also
+    prepare to update the task instance state counts.
 
     Args:
         instance: The task instance about to be saved.
+        raw: A boolean telling us if the task instance is being saved
+            exactly as presented (e.g., when loading fixtures).
     """
-    if instance.state in (SUCCESSFUL, FAILED):
+    if instance.state == PUBLISHED and instance.datetime_published is None:
+        instance.datetime_published = timezone.now()
+    elif instance.state == RUNNING and instance.datetime_started is None:
+        instance.datetime_started = timezone.now()
+    elif instance.state in (SUCCESSFUL, FAILED):
         instance.datetime_finished = timezone.now()
 
+    prepare_state_counts_update(instance, CONTAINER_TASK, raw)
+
 
 @receiver(post_save, sender=ContainerTaskInstance)
 def container_task_instance_post_save_handler(instance, created, **_):
     """Adds additional behavior after saving a task instance.
 
-    Right now this just queues up the task instance upon creation.
+    This updates the task instance state counts, and records the task
+    instance's class and queues it up upon creation.
 
     Args:
         instance: The task instance just saved.
         created: A boolean telling us if the task instance was just
             created (cf. modified).
     """
+    # Keep the state counts up to date
+    finish_state_counts_update(instance, CONTAINER_TASK)
+
     # Only start the job if the instance was just created
     if created:
-        kwargs = {
-            "uuid": instance.uuid,
-            "task_class": CONTAINER_TASK,
-            "command_to_run": instance.task_type.command_to_run,
-            "env_vars_list": instance.task_type.environment_variables,
-            "args_dict": instance.arguments,
-            "logs_path": instance.task_type.logs_path,
-            "results_path": instance.task_type.results_path,
-            "container_image": instance.task_type.container_image,
-            "container_type": instance.task_type.container_type,
-        }
+        register_task_instance(instance, CONTAINER_TASK)
+        instance.run_job()
 
-        run_task.apply_async(
-            kwargs=kwargs,
-            queue=instance.task_queue.name,
-            task_id=str(instance.uuid),
-        )
+
+@receiver(post_delete, sender=ContainerTaskInstance)
+def container_task_instance_post_delete_handler(instance, **_):
+    """Adds additional behavior after deleting a task instance.
+
+    This keeps the task instance state counts up to date and forgets
+    the task instance's class.
+
+    Args:
+        instance: The task instance just deleted.
+    """
+    remove_from_state_counts(instance, CONTAINER_TASK)
+    unregister_task_instance(instance)
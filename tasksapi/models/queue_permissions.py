@@ -0,0 +1,252 @@
+"""Cached task queue permissions.
+
+Checking whether a task instance can run on a task queue needs the
+queue's attributes and the task types its whitelists allow, and
+finding the queues a user can submit to needs the same for every
+queue. Rather than joining through the whitelists each time, the
+permissions of every queue are read once and cached. Saving or deleting
+queues or whitelists (or changing whitelist memberships) invalidates
+the cache by moving it to a new version.
+
+Note that invalidation only reaches other processes if Django's cache
+is shared between them (e.g., memcached, redis, or the database cache);
+otherwise they see changes after at most QUEUE_PERMISSIONS_CACHE_TIMEOUT
+seconds. Since task instances are validated against the cache, the
+settings refuse per-process caches unless DEBUG is True.
+"""
+
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from tasksapi.constants import (
+    CONTAINER_TASK,
+    DOCKER,
+    EXECUTABLE_TASK,
+    SINGULARITY,
+)
+from .task_queues import TaskQueue, TaskWhitelist
+from .utils import determine_task_class
+
+
+# How long to keep queue permissions cached for, in seconds
+QUEUE_PERMISSIONS_CACHE_TIMEOUT = 300
+
+# Cache keys
+QUEUE_PERMISSIONS_VERSION_KEY = "tasksapi:queue-permissions-version"
+QUEUE_PERMISSIONS_KEY = "tasksapi:queue-permissions:%s"
+
+
+def get_queue_permissions_version():
+    """Get the current version of the cached queue permissions.
+
+    Returns:
+        A string identifying the version.
+    """
+    version = cache.get(QUEUE_PERMISSIONS_VERSION_KEY)
+
+    if version is None:
+        # Somebody else might be doing the same, so only set the version
+        # if it's still missing
+        cache.add(QUEUE_PERMISSIONS_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(QUEUE_PERMISSIONS_VERSION_KEY)
+
+    return version
+
+
+def invalidate_queue_permissions():
+    """Throw away the cached queue permissions.
+
+    Versions are random (cf. counters), so old permissions can't be
+    mistaken for new ones even if the version is evicted from the cache.
+    """
+    cache.set(QUEUE_PERMISSIONS_VERSION_KEY, uuid4().hex, None)
+
+
+def build_queue_permissions():
+    """Read the permissions of every queue from the database.
+
+    This takes three queries.
+
+    Returns:
+        A dictionary whose keys are queue primary keys and whose values
+        are dictionaries of the queue's attributes relevant to
+        permissions. The "whitelisted_task_type_pks" attribute is a
+        dictionary mapping task classes to frozensets of the primary
+        keys of the task types the queue's whitelists allow.
+    """
+    permissions = {
+        values["pk"]: dict(values, whitelisted_task_type_pks={})
+        for values in TaskQueue.objects.order_by().values(
+            "pk",
+            "user_id",
+            "active",
+            "private",
+            "runs_executable_tasks",
+            "runs_docker_container_tasks",
+            "runs_singularity_container_tasks",
+        )
+    }
+
+    for task_class, field_name in (
+        (CONTAINER_TASK, "whitelists__whitelisted_container_task_types"),
+        (EXECUTABLE_TASK, "whitelists__whitelisted_executable_task_types"),
+    ):
+        task_type_pks = {pk: set() for pk in permissions}
+
+        for queue_pk, task_type_pk in (
+            TaskQueue.objects.order_by()
+            .filter(**{field_name + "__isnull": False})
+            .values_list("pk", field_name)
+        ):
+            task_type_pks.setdefault(queue_pk, set()).add(task_type_pk)
+
+        for queue_pk, pks in task_type_pks.items():
+            if queue_pk in permissions:
+                permissions[queue_pk]["whitelisted_task_type_pks"][
+                    task_class
+                ] = frozenset(pks)
+
+    return permissions
+
+
+def get_queue_permissions(refresh=False):
+    """Get the permissions of every queue, from the cache if possible.
+
+    Args:
+        refresh: An optional boolean specifying whether to read the
+            permissions from the database regardless of what's cached.
+            Defaults to False.
+
+    Returns:
+        A dictionary as returned by build_queue_permissions.
+    """
+    key = QUEUE_PERMISSIONS_KEY % get_queue_permissions_version()
+    permissions = None if refresh else cache.get(key)
+
+    if permissions is None:
+        permissions = build_queue_permissions()
+        cache.set(key, permissions, QUEUE_PERMISSIONS_CACHE_TIMEOUT)
+
+    return permissions
+
+
+def get_task_queue_permissions(task_queue_pk):
+    """Get the permissions of a queue, from the cache if possible.
+
+    Args:
+        task_queue_pk: An integer containing the primary key of a
+            queue.
+
+    Returns:
+        A dictionary of the queue's permissions as in
+        build_queue_permissions, or None if the queue doesn't exist.
+    """
+    permissions = get_queue_permissions()
+
+    # The queue might have been made after the permissions were cached
+    # (e.g., by another process not sharing our cache)
+    if task_queue_pk not in permissions:
+        permissions = get_queue_permissions(refresh=True)
+
+    return permissions.get(task_queue_pk)
+
+
+def queue_allows_task_type(queue_permissions, task_type):
+    """Determine whether a queue can run instances of a task type.
+
+    This checks that the queue's whitelists include the task type and
+    that the queue runs tasks of its class (and container type).
+
+    Args:
+        queue_permissions: A dictionary of a queue's permissions as in
+            build_queue_permissions.
+        task_type: A task type.
+
+    Returns:
+        A boolean specifying whether the queue can run instances of the
+        task type.
+    """
+    task_class = determine_task_class(task_type)
+
+    if task_type.pk not in queue_permissions["whitelisted_task_type_pks"].get(
+        task_class, ()
+    ):
+        return False
+
+    if task_class == EXECUTABLE_TASK:
+        return queue_permissions["runs_executable_tasks"]
+
+    if task_type.container_type == DOCKER:
+        return queue_permissions["runs_docker_container_tasks"]
+
+    if task_type.container_type == SINGULARITY:
+        return queue_permissions["runs_singularity_container_tasks"]
+
+    return True
+
+
+def get_allowed_queue_pks(user, task_type=None):
+    """Get the primary keys of the queues a user can submit to.
+
+    Args:
+        user: A user.
+        task_type: An optional task type. If provided, only queues
+            which can run instances of the task type are included.
+
+    Returns:
+        A set of queue primary keys.
+    """
+    return {
+        queue_pk
+        for queue_pk, queue_permissions in get_queue_permissions().items()
+        if queue_permissions["active"]
+        and (
+            not queue_permissions["private"]
+            or queue_permissions["user_id"] == user.pk
+        )
+        and (
+            task_type is None
+            or queue_allows_task_type(queue_permissions, task_type)
+        )
+    }
+
+
+def invalidate_queue_permissions_on_commit():
+    """Throw away the cached queue permissions now and after commit.
+
+    Invalidating right away lets the current transaction see its own
+    changes. Other processes might cache the permissions they see before
+    the transaction commits, though, so invalidate again afterwards.
+    """
+    invalidate_queue_permissions()
+    transaction.on_commit(invalidate_queue_permissions)
+
+
+@receiver(post_save, sender=TaskQueue)
+@receiver(post_delete, sender=TaskQueue)
+@receiver(post_save, sender=TaskWhitelist)
+@receiver(post_delete, sender=TaskWhitelist)
+def queue_permissions_changed_handler(**_):
+    """Invalidate queue permissions when queues or whitelists change."""
+    invalidate_queue_permissions_on_commit()
+
+
+@receiver(m2m_changed)
+def queue_permissions_m2m_changed_handler(sender, action, **_):
+    """Invalidate queue permissions when whitelist memberships change.
+
+    Args:
+        sender: The intermediate model of the relation that changed.
+        action: A string describing the type of change.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if sender in (
+        TaskQueue.whitelists.through,
+        TaskWhitelist.whitelisted_container_task_types.through,
+        TaskWhitelist.whitelisted_executable_task_types.through,
+    ):
+        invalidate_queue_permissions_on_commit()
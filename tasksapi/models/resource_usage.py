@@ -0,0 +1,81 @@
+"""Functions to record and summarize the resources jobs use.
+
+Workers measure the wall time, CPU time, peak memory, and disk I/O of
+each job they run, and send these along with the job's final state
+update. They're stored on the job's task instance, so the task types
+whose jobs are expensive can be found.
+"""
+
+from django.db.models import Avg, Case, Count, F, Max, Value, When
+
+
+# The task instance fields containing the resources their jobs used
+RESOURCE_USAGE_FIELDS = (
+    "wall_time_seconds",
+    "cpu_user_seconds",
+    "cpu_system_seconds",
+    "peak_memory_megabytes",
+    "bytes_read",
+    "bytes_written",
+)
+
+
+def bulk_update_resource_usages(instance_model, resource_usages):
+    """Record the resources used by many task instances' jobs.
+
+    This takes one query, however many task instances there are.
+
+    Args:
+        instance_model: The task instance model of the task instances.
+        resource_usages: A dictionary whose keys are strings containing
+            the UUIDs of the task instances and whose values are
+            dictionaries containing (some of) the resource usage fields
+            and their values.
+    """
+    updated_fields = {}
+
+    for field in RESOURCE_USAGE_FIELDS:
+        whens = [
+            When(uuid=uuid, then=Value(usage[field]))
+            for uuid, usage in resource_usages.items()
+            if usage.get(field) is not None
+        ]
+
+        if whens:
+            updated_fields[field] = Case(
+                *whens,
+                default=F(field),
+                output_field=instance_model._meta.get_field(field)
+            )
+
+    if not updated_fields:
+        return
+
+    instance_model.objects.filter(uuid__in=list(resource_usages)).update(
+        **updated_fields
+    )
+
+
+def summarize_resource_usage(instances):
+    """Summarize the resources used by task instances' jobs.
+
+    Args:
+        instances: A queryset of task instances.
+
+    Returns:
+        A dictionary containing how many of the task instances have
+        their resource usage recorded, along with their average wall
+        time, CPU time (user and system), and bytes read and written,
+        and their average and maximum peak memory. The averages and
+        maximums are None if no task instances have their resource
+        usage recorded.
+    """
+    return instances.filter(wall_time_seconds__isnull=False).aggregate(
+        num_measured=Count("uuid"),
+        avg_wall_time_seconds=Avg("wall_time_seconds"),
+        avg_cpu_seconds=Avg(F("cpu_user_seconds") + F("cpu_system_seconds")),
+        avg_peak_memory_megabytes=Avg("peak_memory_megabytes"),
+        max_peak_memory_megabytes=Max("peak_memory_megabytes"),
+        avg_bytes_read=Avg("bytes_read"),
+        avg_bytes_written=Avg("bytes_written"),
+    )
@@ -0,0 +1,231 @@
+"""Functions to update the states of many task instances at once.
+
+Saving task instances one at a time re-validates each of them, which
+costs several queries per task instance. Instead, these functions
+resolve and update many task instances with a handful of queries, while
+keeping the datetimes task instances were published, started, and
+finished, and state counts, up to date just like the task instance
+signal handlers do.
+"""
+
+from django.db import transaction
+from django.db.models import Case, CharField, DateTimeField, F, Value, When
+from django.utils import timezone
+from tasksapi.constants import (
+    CONTAINER_TASK,
+    EXECUTABLE_TASK,
+    FAILED,
+    PUBLISHED,
+    RUNNING,
+    SUCCESSFUL,
+)
+from .container_tasks import ContainerTaskInstance
+from .executable_tasks import ExecutableTaskInstance
+from .resource_usage import bulk_update_resource_usages
+from .task_instance_lookups import get_task_classes
+from .task_instance_stats import (
+    STATE_COUNT_KEY_FIELDS,
+    bulk_update_state_counts,
+    get_state_count_key,
+)
+from .validators import state_transition_is_valid
+
+
+# The task instance models of each task class
+TASK_INSTANCE_MODELS = (
+    (CONTAINER_TASK, ContainerTaskInstance),
+    (EXECUTABLE_TASK, ExecutableTaskInstance),
+)
+
+# The fields recording when task instances first entered states. Unlike
+# the datetime finished, these are only ever set once.
+STATE_DATETIME_FIELDS = (
+    (PUBLISHED, "datetime_published"),
+    (RUNNING, "datetime_started"),
+)
+
+
+def get_task_instance_model(uuid):
+    """Find the model of a task instance given its UUID.
+
+    This takes one query, regardless of the task instance's class.
+
+    Args:
+        uuid: A string or UUID containing the task instance's UUID.
+
+    Returns:
+        The task instance model of the task instance, or None if there
+        is no task instance with that UUID.
+    """
+    task_class = get_task_classes([uuid]).get(str(uuid))
+
+    return dict(TASK_INSTANCE_MODELS).get(task_class)
+
+
+def bulk_update_task_instance_states(
+    states, timestamps=None, resource_usages=None
+):
+    """Update the states of many task instances of any class of task.
+
+    This takes one query to look up the classes of the task instances,
+    then for each class of task present, one query to find its task
+    instances and one query to update them, plus a query for each state
+    count that changes and a query to record resource usages. State
+    changes which aren't valid are skipped, but the first times task
+    instances were published and started running, and the resources
+    they used, are recorded regardless (e.g., an update saying a task
+    instance was published can arrive after one saying it's running).
+
+    Args:
+        states: A dictionary whose keys are strings containing the
+            UUIDs of the task instances to update and whose values are
+            strings containing the states to update them to.
+        timestamps: An optional dictionary whose keys are strings
+            containing the UUIDs of (some of) the task instances to
+            update and whose values are dictionaries mapping states to
+            the datetimes the task instances entered them. States
+            without a datetime are taken to have been entered now.
+        resource_usages: An optional dictionary whose keys are strings
+            containing the UUIDs of (some of) the task instances to
+            update and whose values are dictionaries containing the
+            resources their jobs used.
+
+    Returns:
+        A dictionary whose keys are the UUIDs (as strings) of the task
+        instances that were found and whose values are strings
+        explaining why a task instance's state wasn't changed, in the
+        case that its state change wasn't valid (otherwise they're
+        empty strings).
+    """
+    reasons = {}
+    now = timezone.now()
+
+    if timestamps is None:
+        timestamps = {}
+
+    if resource_usages is None:
+        resource_usages = {}
+
+    # Group the task instances by their classes
+    uuids_by_class = {}
+
+    for uuid, task_class in get_task_classes(states).items():
+        uuids_by_class.setdefault(task_class, []).append(uuid)
+
+    with transaction.atomic():
+        for task_class, instance_model in TASK_INSTANCE_MODELS:
+            if task_class not in uuids_by_class:
+                continue
+
+            # Lock the task instances so the state counts stay accurate.
+            # Lock them in order so concurrent batches can't deadlock.
+            saved_values = list(
+                instance_model.objects.select_for_update()
+                .filter(uuid__in=uuids_by_class[task_class])
+                .order_by("uuid")
+                .values(
+                    "uuid",
+                    *STATE_COUNT_KEY_FIELDS,
+                    *[field for _, field in STATE_DATETIME_FIELDS]
+                )
+            )
+
+            # Find the task instances whose states need to change, and
+            # group them by their new states. Also find the datetimes
+            # to record.
+            changed_values = []
+            uuids_by_state = {}
+            datetimes_by_field = {}
+
+            for values in saved_values:
+                uuid = str(values["uuid"])
+                state = states[uuid]
+                state_timestamps = {state: now, **timestamps.get(uuid, {})}
+
+                for timestamp_state, field in STATE_DATETIME_FIELDS:
+                    if (
+                        timestamp_state in state_timestamps
+                        and values[field] is None
+                    ):
+                        datetimes_by_field.setdefault(field, {})[uuid] = (
+                            state_timestamps[timestamp_state]
+                        )
+
+                _, reasons[uuid] = state_transition_is_valid(
+                    values["state"], state
+                )
+
+                if reasons[uuid] or state == values["state"]:
+                    continue
+
+                changed_values.append({**values, "new_state": state})
+                uuids_by_state.setdefault(state, []).append(uuid)
+
+                # Set the datetime finished for finished task instances
+                if state in (SUCCESSFUL, FAILED):
+                    datetimes_by_field.setdefault("datetime_finished", {})[
+                        uuid
+                    ] = state_timestamps[state]
+
+            # Record the resources the task instances' jobs used
+            found_resource_usages = {
+                str(values["uuid"]): resource_usages[str(values["uuid"])]
+                for values in saved_values
+                if str(values["uuid"]) in resource_usages
+            }
+
+            if found_resource_usages:
+                bulk_update_resource_usages(
+                    instance_model, found_resource_usages
+                )
+
+            if not changed_values and not datetimes_by_field:
+                continue
+
+            updated_fields = {
+                field: Case(
+                    *[
+                        When(uuid=uuid, then=Value(datetime))
+                        for uuid, datetime in datetimes.items()
+                    ],
+                    default=F(field),
+                    output_field=DateTimeField()
+                )
+                for field, datetimes in datetimes_by_field.items()
+            }
+
+            if uuids_by_state:
+                updated_fields["state"] = Case(
+                    *[
+                        When(uuid__in=uuids, then=Value(state))
+                        for state, uuids in uuids_by_state.items()
+                    ],
+                    default=F("state"),
+                    output_field=CharField()
+                )
+
+            updated_uuids = {
+                uuid
+                for datetimes in datetimes_by_field.values()
+                for uuid in datetimes
+            }
+            updated_uuids.update(
+                str(values["uuid"]) for values in changed_values
+            )
+
+            instance_model.objects.filter(uuid__in=updated_uuids).update(
+                **updated_fields
+            )
+
+            # Keep the state counts up to date
+            bulk_update_state_counts(
+                (
+                    get_state_count_key(task_class, values),
+                    get_state_count_key(
+                        task_class, {**values, "state": values["new_state"]}
+                    ),
+                )
+                for values in changed_values
+            )
+
+    return reasons
@@ -0,0 +1,138 @@
+"""Functions to break down how long task instances wait and run.
+
+A task instance's queue wait is the time between it being published to
+its queue and a worker starting to run it (which includes any time
+spent waiting for space in the worker's resource budget). Its run time
+is the time between it starting to run and finishing. Percentiles of
+these per task queue and task type show how busy queues' workers are
+and how long task types' jobs take, which is what's needed to size
+worker pools.
+
+The percentiles are computed by PostgreSQL's percentile_cont.
+"""
+
+from django.db.models import (
+    Aggregate,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Func,
+    Q,
+)
+
+
+# The percentiles to compute
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+class Seconds(Func):
+    """The number of seconds in an interval."""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = FloatField()
+
+
+class Percentile(Aggregate):
+    """A continuous percentile of the values of an expression.
+
+    Null values are ignored.
+    """
+
+    function = "PERCENTILE_CONT"
+    name = "Percentile"
+    template = (
+        "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    )
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        """Initialize the aggregate.
+
+        Args:
+            expression: An expression or string containing a field name.
+            percentile: A number between 0 and 100 specifying the
+                percentile.
+            **extra: Extra keyword arguments for the aggregate.
+        """
+        super().__init__(expression, fraction=percentile / 100, **extra)
+
+
+def get_duration_seconds(start_field, end_field):
+    """Get an expression for the seconds between two datetime fields.
+
+    Args:
+        start_field: A string containing the name of the field holding
+            when the duration started.
+        end_field: A string containing the name of the field holding
+            when the duration ended.
+
+    Returns:
+        An expression which is null if either datetime is null.
+    """
+    return Seconds(
+        ExpressionWrapper(
+            F(end_field) - F(start_field), output_field=DurationField()
+        )
+    )
+
+
+def get_latency_percentiles(instances):
+    """Get task instances' queue wait and run time percentiles.
+
+    This takes one query.
+
+    Args:
+        instances: A queryset of task instances.
+
+    Returns:
+        A list of dictionaries, one for each task queue and task type
+        the task instances belong to, containing the task queue's and
+        task type's primary keys, how many task instances have a queue
+        wait and a run time recorded, and the percentiles (in seconds)
+        of each, as "queue_wait_seconds_p<percentile>" and
+        "run_time_seconds_p<percentile>". Percentiles are None when no
+        task instances have a duration recorded.
+    """
+    durations = (
+        (
+            "queue_wait_seconds",
+            "datetime_published",
+            "datetime_started",
+            "num_queue_waits",
+        ),
+        (
+            "run_time_seconds",
+            "datetime_started",
+            "datetime_finished",
+            "num_run_times",
+        ),
+    )
+    aggregates = {}
+
+    for name, start_field, end_field, count_name in durations:
+        duration = get_duration_seconds(start_field, end_field)
+
+        aggregates[count_name] = Count(
+            "uuid",
+            filter=Q(
+                **{
+                    start_field + "__isnull": False,
+                    end_field + "__isnull": False,
+                }
+            ),
+        )
+
+        for percentile in LATENCY_PERCENTILES:
+            aggregates["%s_p%d" % (name, percentile)] = Percentile(
+                duration, percentile
+            )
+
+    # Ordering explicitly stops the default ordering from being grouped
+    # by as well
+    return list(
+        instances.values("task_queue", "task_type")
+        .annotate(**aggregates)
+        .order_by("task_queue_id", "task_type_id")
+    )
@@ -0,0 +1,99 @@
+"""Model to look up the class of a task instance by its UUID.
+
+Task instances of different classes live in different tables, so
+finding a task instance given only its UUID (e.g., when a worker
+updates its state) would otherwise mean probing each table in turn.
+Instead, the task instance signal handlers record the class of every
+task instance here when it's created.
+"""
+
+from django.db import models
+from tasksapi.constants import TASK_CLASS_CHOICES, TASK_CLASS_MAX_LENGTH
+
+
+# How many lookups to insert per query
+BULK_REGISTER_BATCH_SIZE = 1000
+
+
+class TaskInstanceLookup(models.Model):
+    """The class of the task instance with a given UUID."""
+
+    uuid = models.UUIDField(
+        primary_key=True,
+        verbose_name="UUID",
+        help_text="The UUID of the task instance.",
+    )
+    task_class = models.CharField(
+        max_length=TASK_CLASS_MAX_LENGTH,
+        choices=TASK_CLASS_CHOICES,
+        help_text="The class of the task instance.",
+    )
+
+    def __str__(self):
+        """String representation of a task instance lookup."""
+        return "%s: %s" % (self.uuid, self.task_class)
+
+
+def register_task_instance(instance, task_class):
+    """Record the class of a task instance that was just created.
+
+    Call this from a task instance's post_save signal handler.
+
+    Args:
+        instance: A task instance which was just created.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+    """
+    # Fixtures can be loaded more than once, so don't assume the lookup
+    # doesn't exist yet
+    TaskInstanceLookup.objects.get_or_create(
+        uuid=instance.uuid, defaults={"task_class": task_class}
+    )
+
+
+def bulk_register_task_instances(instances, task_class):
+    """Record the class of many task instances that were just created.
+
+    Args:
+        instances: A list of task instances which were just created.
+        task_class: A string defined in the constants module
+            representing the class of the task instances.
+    """
+    TaskInstanceLookup.objects.bulk_create(
+        [
+            TaskInstanceLookup(uuid=instance.uuid, task_class=task_class)
+            for instance in instances
+        ],
+        batch_size=BULK_REGISTER_BATCH_SIZE,
+    )
+
+
+def unregister_task_instance(instance):
+    """Forget the class of a task instance that was just deleted.
+
+    Call this from a task instance's post_delete signal handler.
+
+    Args:
+        instance: A task instance which was just deleted.
+    """
+    TaskInstanceLookup.objects.filter(uuid=instance.uuid).delete()
+
+
+def get_task_classes(uuids):
+    """Look up the classes of task instances in one query.
+
+    Args:
+        uuids: An iterable of the UUIDs of task instances (as strings
+            or UUIDs).
+
+    Returns:
+        A dictionary whose keys are the UUIDs (as strings) of the task
+        instances that exist and whose values are strings defined in
+        the constants module representing their task classes.
+    """
+    return {
+        str(uuid): task_class
+        for uuid, task_class in TaskInstanceLookup.objects.filter(
+            uuid__in=list(uuids)
+        ).values_list("uuid", "task_class")
+    }
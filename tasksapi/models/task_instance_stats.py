@@ -0,0 +1,409 @@
+"""Model to keep rolled up statistics about task instances.
+
+Computing statistics directly from the task instance tables means
+scanning every instance in the date range of interest. Instead, the
+task instance signal handlers keep running counts of instances here,
+which the frontend's charts read from.
+"""
+
+from collections import Counter
+from django.db import models
+from django.db.models import Count, DateTimeField, F, Func
+from django.utils import timezone
+from tasksapi.constants import (
+    STATE_CHOICES,
+    STATE_MAX_LENGTH,
+    TASK_CLASS_CHOICES,
+    TASK_CLASS_MAX_LENGTH,
+)
+from tasksapi.metrics import state_transitions
+from .task_queues import TaskQueue
+
+
+# How many minutes each count covers. Every UTC offset in use is a
+# multiple of 15 minutes, so counts never straddle a local midnight.
+STATE_COUNT_BUCKET_MINUTES = 15
+
+# The task instance fields (as attribute names) that determine which
+# count a task instance belongs to
+STATE_COUNT_KEY_FIELDS = (
+    "datetime_created",
+    "task_type_id",
+    "task_queue_id",
+    "state",
+)
+
+
+class TaskInstanceStateCount(models.Model):
+    """A count of task instances with a given state.
+
+    Instances are counted by the 15 minutes (in UTC) they were created
+    in, their task class, task type, task queue, and state. Counting by
+    15 minutes (cf. by day) lets consumers group counts by date in any
+    time zone, including those with half or quarter hour offsets from
+    UTC.
+
+    These counts are maintained incrementally as task instances are
+    saved and deleted, and can be rebuilt from scratch with the
+    rebuild_task_instance_state_counts management command.
+    """
+
+    datetime_created_bucket = models.DateTimeField(
+        help_text=(
+            "The start of the 15 minutes (in UTC) the counted instances "
+            "were created in."
+        )
+    )
+    task_class = models.CharField(
+        max_length=TASK_CLASS_MAX_LENGTH,
+        choices=TASK_CLASS_CHOICES,
+        help_text="The class of the counted instances.",
+    )
+    task_type_pk = models.PositiveIntegerField(
+        verbose_name="task type PK",
+        help_text="The primary key of the counted instances' task type.",
+    )
+    task_queue = models.ForeignKey(
+        TaskQueue,
+        on_delete=models.CASCADE,
+        help_text="The queue the counted instances run on.",
+    )
+    state = models.CharField(
+        max_length=STATE_MAX_LENGTH,
+        choices=STATE_CHOICES,
+        help_text="The state of the counted instances.",
+    )
+    count = models.IntegerField(
+        default=0, help_text="The number of instances counted."
+    )
+
+    class Meta:
+        unique_together = (
+            (
+                "datetime_created_bucket",
+                "task_class",
+                "task_type_pk",
+                "task_queue",
+                "state",
+            ),
+        )
+
+    def __str__(self):
+        """String representation of a task instance state count."""
+        return "%s %s instances created %s: %s" % (
+            self.count,
+            self.state,
+            self.datetime_created_bucket.isoformat(),
+            self.task_class,
+        )
+
+
+class TruncStateCountBucket(Func):
+    """Truncate a datetime down to the start of its state count bucket.
+
+    Buckets start on multiples of STATE_COUNT_BUCKET_MINUTES since the
+    epoch, which are the same in UTC and in every time zone in use.
+    """
+
+    template = (
+        "TO_TIMESTAMP(FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / "
+        "%(seconds)d) * %(seconds)d)"
+    )
+    output_field = DateTimeField()
+
+    def __init__(self, expression, **extra):
+        """Initialize the function.
+
+        Args:
+            expression: An expression or string containing the name of
+                a datetime field.
+            **extra: Extra keyword arguments for the function.
+        """
+        super().__init__(
+            expression, seconds=STATE_COUNT_BUCKET_MINUTES * 60, **extra
+        )
+
+
+def get_state_count_key(task_class, values):
+    """Get the key of the count that a task instance belongs to.
+
+    Args:
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+        values: A dictionary containing values for each of the
+            attributes in STATE_COUNT_KEY_FIELDS.
+
+    Returns:
+        A dictionary of TaskInstanceStateCount field values which
+        identify the count the task instance belongs to.
+    """
+    # Truncate the datetime created down to the start of its bucket
+    datetime_created = values["datetime_created"].astimezone(timezone.utc)
+    datetime_created_bucket = datetime_created.replace(
+        minute=datetime_created.minute
+        - datetime_created.minute % STATE_COUNT_BUCKET_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+
+    return {
+        "datetime_created_bucket": datetime_created_bucket,
+        "task_class": task_class,
+        "task_type_pk": values["task_type_id"],
+        "task_queue_id": values["task_queue_id"],
+        "state": values["state"],
+    }
+
+
+def get_saved_state_count_key(instance, task_class, raw=False):
+    """Get the count key of a task instance as it is in the database.
+
+    This should be called before a task instance is saved. The values
+    that were loaded from the database with the instance are used if
+    they're available; otherwise the database is queried.
+
+    Args:
+        instance: A task instance which is about to be saved.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+        raw: An optional boolean specifying whether the instance is
+            being saved exactly as presented (e.g., when loading
+            fixtures). Defaults to False.
+
+    Returns:
+        A dictionary identifying the count the task instance currently
+        belongs to, or None if the task instance isn't in the database.
+    """
+    loaded_values = getattr(instance, "loaded_values", {})
+
+    if all(field in loaded_values for field in STATE_COUNT_KEY_FIELDS):
+        return get_state_count_key(task_class, loaded_values)
+
+    # New instances aren't in the database yet. Note that raw saves can
+    # update existing rows with new instances, so don't trust those.
+    if instance._state.adding and not raw:
+        return None
+
+    saved_values = (
+        type(instance)
+        .objects.filter(pk=instance.pk)
+        .values(*STATE_COUNT_KEY_FIELDS)
+        .first()
+    )
+
+    if saved_values is None:
+        return None
+
+    return get_state_count_key(task_class, saved_values)
+
+
+def get_current_state_count_key(instance, task_class):
+    """Get the count key of a task instance as it is in memory.
+
+    Args:
+        instance: A task instance.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+
+    Returns:
+        A dictionary identifying the count the task instance belongs to.
+    """
+    return get_state_count_key(
+        task_class,
+        {field: getattr(instance, field) for field in STATE_COUNT_KEY_FIELDS},
+    )
+
+
+def add_to_state_count(key, amount):
+    """Add to the count of task instances for a given key.
+
+    Args:
+        key: A dictionary identifying the count to add to.
+        amount: An integer to add to the count (which may be negative).
+    """
+    # Try updating an existing count first, since this is by far the
+    # most common case
+    num_updated = TaskInstanceStateCount.objects.filter(**key).update(
+        count=F("count") + amount
+    )
+
+    # Create the count if necessary. Note that counts are never created
+    # for subtractions, since these can happen when task queues are
+    # being deleted (at which point creating counts referencing them
+    # would fail).
+    if not num_updated and amount > 0:
+        _, created = TaskInstanceStateCount.objects.get_or_create(
+            **key, defaults={"count": amount}
+        )
+
+        # Somebody else created the count in the meantime
+        if not created:
+            TaskInstanceStateCount.objects.filter(**key).update(
+                count=F("count") + amount
+            )
+
+
+def record_state_transition(previous_key, current_key):
+    """Count a task instance moving into a new state, if it did.
+
+    Args:
+        previous_key: A dictionary identifying the count the task
+            instance belonged to, or None if it wasn't counted.
+        current_key: A dictionary identifying the count the task
+            instance now belongs to, or None if it shouldn't be counted.
+    """
+    if current_key is None:
+        return
+
+    if previous_key is None or previous_key["state"] != current_key["state"]:
+        state_transitions.labels(
+            current_key["task_class"], current_key["state"]
+        ).inc()
+
+
+def update_state_counts(previous_key, current_key):
+    """Move a task instance from one count to another.
+
+    Args:
+        previous_key: A dictionary identifying the count the task
+            instance belonged to, or None if it wasn't counted.
+        current_key: A dictionary identifying the count the task
+            instance now belongs to, or None if it shouldn't be counted.
+    """
+    bulk_update_state_counts([(previous_key, current_key)])
+
+
+def bulk_update_state_counts(key_pairs):
+    """Move many task instances from one count to another.
+
+    The changes to each count are added up first, so this takes one
+    query per count that changes. Counts are always updated in the same
+    (sorted) order, so concurrent updates locking the same counts can't
+    deadlock.
+
+    Args:
+        key_pairs: An iterable of (previous_key, current_key) tuples,
+            where the keys are as for update_state_counts.
+    """
+    amounts = Counter()
+
+    for previous_key, current_key in key_pairs:
+        if previous_key == current_key:
+            continue
+
+        record_state_transition(previous_key, current_key)
+
+        if previous_key is not None:
+            amounts[tuple(sorted(previous_key.items()))] -= 1
+
+        if current_key is not None:
+            amounts[tuple(sorted(current_key.items()))] += 1
+
+    for key_items, amount in sorted(amounts.items()):
+        if amount:
+            add_to_state_count(dict(key_items), amount)
+
+
+def prepare_state_counts_update(instance, task_class, raw=False):
+    """Prepare to update state counts for a task instance being saved.
+
+    Call this from a task instance's pre_save signal handler.
+
+    Args:
+        instance: A task instance which is about to be saved.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+        raw: An optional boolean specifying whether the instance is
+            being saved exactly as presented. Defaults to False.
+    """
+    instance.saved_state_count_key = get_saved_state_count_key(
+        instance, task_class, raw
+    )
+
+
+def finish_state_counts_update(instance, task_class):
+    """Update state counts for a task instance that was just saved.
+
+    Call this from a task instance's post_save signal handler.
+
+    Args:
+        instance: A task instance which was just saved.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+    """
+    update_state_counts(
+        instance.saved_state_count_key,
+        get_current_state_count_key(instance, task_class),
+    )
+
+    # The instance now matches what's in the database, so remember this
+    # for any subsequent saves
+    instance.loaded_values = {
+        **getattr(instance, "loaded_values", {}),
+        **{
+            field: getattr(instance, field) for field in STATE_COUNT_KEY_FIELDS
+        },
+    }
+
+
+def remove_from_state_counts(instance, task_class):
+    """Update state counts for a task instance that was just deleted.
+
+    Call this from a task instance's post_delete signal handler.
+
+    Args:
+        instance: A task instance which was just deleted.
+        task_class: A string defined in the constants module
+            representing the class of the task instance.
+    """
+    update_state_counts(
+        get_current_state_count_key(instance, task_class), None
+    )
+
+
+def rebuild_state_counts(instance_models):
+    """Rebuild all task instance state counts from scratch.
+
+    Args:
+        instance_models: A dictionary whose keys are strings defined in
+            the constants module representing task classes and whose
+            values are the task instance models of those task classes.
+
+    Returns:
+        An integer specifying how many counts were created.
+    """
+    state_counts = []
+
+    for task_class, instance_model in instance_models.items():
+        rows = (
+            instance_model.objects.order_by()
+            .annotate(
+                datetime_created_bucket=TruncStateCountBucket(
+                    "datetime_created"
+                )
+            )
+            .values(
+                "datetime_created_bucket",
+                "task_type_id",
+                "task_queue_id",
+                "state",
+            )
+            .annotate(count=Count("uuid"))
+        )
+
+        state_counts += [
+            TaskInstanceStateCount(
+                datetime_created_bucket=row["datetime_created_bucket"],
+                task_class=task_class,
+                task_type_pk=row["task_type_id"],
+                task_queue_id=row["task_queue_id"],
+                state=row["state"],
+                count=row["count"],
+            )
+            for row in rows
+        ]
+
+    TaskInstanceStateCount.objects.all().delete()
+    TaskInstanceStateCount.objects.bulk_create(state_counts)
+
+    return len(state_counts)
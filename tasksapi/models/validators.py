@@ -1,5 +1,7 @@
 """Contains validators for task models."""
 
+from tasksapi.constants import STATE_TRANSITIONS
+
 
 def task_instance_args_are_valid(instance, fill_missing_args=False):
     """Determines whether a task instance's arguments are valid.
@@ -71,3 +73,66 @@ def task_type_args_are_valid(instance):
 
     # Valid
     return (True, "")
+
+
+def resource_limits_are_valid(limits, task_type):
+    """Determines whether container resource limits are valid.
+
+    The limits are valid if they're positive (or null, meaning there's
+    no limit) and leave room for the CPUs and memory the task type's
+    jobs require.
+
+    Arg:
+        limits: A dictionary containing the CPU, memory, and process
+            limits, as returned by a container task type's or task
+            instance's get_resource_limits method.
+        task_type: A container task type instance.
+    Returns:
+        A tuple containing a boolean and a string, where the boolean
+        signals whether the limits are valid and the string explains
+        why, in the case that the boolean is False (otherwise it's an
+        empty string).
+    """
+    for name, limit in sorted(limits.items()):
+        if limit is not None and limit <= 0:
+            return (False, "%s must be positive" % name)
+
+    if (
+        limits["cpu_limit"] is not None
+        and limits["cpu_limit"] < task_type.required_cpus
+    ):
+        return (False, "CPU limit is less than the required CPUs")
+
+    if (
+        limits["memory_limit_megabytes"] is not None
+        and limits["memory_limit_megabytes"]
+        < task_type.required_memory_megabytes
+    ):
+        return (False, "memory limit is less than the required memory")
+
+    # Valid
+    return (True, "")
+
+
+def state_transition_is_valid(previous_state, state):
+    """Determines whether a task instance can change states.
+
+    Staying in the same state is always valid.
+
+    Args:
+        previous_state: A string containing the task instance's current
+            state.
+        state: A string containing the state to change to.
+    Returns:
+        A tuple containing a boolean and a string, where the boolean
+        signals whether the state change is valid and the string
+        explains why, in the case that the boolean is False (otherwise
+        it's an empty string).
+    """
+    if state == previous_state or state in STATE_TRANSITIONS[previous_state]:
+        return (True, "")
+
+    return (
+        False,
+        "can't change state from %s to %s!" % (previous_state, state),
+    )
@@ -3,7 +3,9 @@
 See http://www.django-rest-framework.org/api-guide/pagination/
 """
 
-from rest_framework.pagination import PageNumberPagination
+import coreapi
+import coreschema
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class PageNumberVariableSizePagination(PageNumberPagination):
@@ -22,3 +24,93 @@ class SmallResultsSetPagination(PageNumberVariableSizePagination):
     """A paginator that shows _some_ results."""
 
     page_size = 10
+
+
+class TaskInstanceCursorPagination(CursorPagination):
+    """A cursor paginator for task instances.
+
+    Pages are found by seeking to where the previous page left off
+    (newest first), so deep pages cost as much as the first, and the
+    total count of task instances is never computed.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    ordering = ("-datetime_created", "-uuid")
+
+
+class TaskInstancePagination(SmallResultsSetPagination):
+    """A paginator for task instances.
+
+    Pages are numbered by default. Clients can request cursor
+    pagination instead (e.g., to poll or export task instances) by
+    passing "cursor" as the pagination query parameter.
+    """
+
+    pagination_query_param = "pagination"
+    cursor_pagination_class = TaskInstanceCursorPagination
+
+    def __init__(self):
+        """Start off paginating by page number."""
+        self.cursor_paginator = None
+
+    def use_cursor_pagination(self, request):
+        """Determine whether a request asks for cursor pagination.
+
+        Args:
+            request: The request being paginated.
+
+        Returns:
+            A boolean specifying whether to use cursor pagination.
+        """
+        return (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor_pagination(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.pagination_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.Enum(
+                    ("page", "cursor"),
+                    title="Pagination",
+                    description=(
+                        "How to paginate results. Cursor pagination "
+                        "doesn't count results, which makes deep pages "
+                        "much faster to get."
+                    ),
+                ),
+            ),
+            coreapi.Field(
+                name=self.cursor_pagination_class.cursor_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Cursor",
+                    description=(
+                        "The pagination cursor value (for cursor "
+                        "pagination)."
+                    ),
+                ),
+            ),
+        ]
@@ -1,14 +1,24 @@
 """Collect all serializers to "export" from this directory."""
 
 from .container_tasks import (
+    ContainerTaskInstanceBulkCreateSerializer,
     ContainerTaskTypeSerializer,
     ContainerTaskInstanceSerializer,
 )
 from .executable_tasks import (
+    ExecutableTaskInstanceBulkCreateSerializer,
     ExecutableTaskTypeSerializer,
     ExecutableTaskInstanceSerializer,
 )
+from .task_instance_latencies import TaskInstanceLatencySerializer
+from .task_instance_logs import (
+    TaskInstanceLogFileSerializer,
+    TaskInstanceLogRequestSerializer,
+    TaskInstanceLogResponseSerializer,
+)
 from .task_instance_update import (
+    TaskInstanceBulkStateUpdateRequestSerializer,
+    TaskInstanceBulkStateUpdateResponseSerializer,
     TaskInstanceStateUpdateRequestSerializer,
     TaskInstanceStateUpdateResponseSerializer,
 )
@@ -2,7 +2,13 @@
 
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
-from tasksapi.models import AbstractTaskInstance, AbstractTaskType
+from tasksapi.models import (
+    AbstractTaskInstance,
+    AbstractTaskType,
+    TaskQueue,
+    build_task_instances,
+    bulk_create_task_instances,
+)
 from tasksapi.utils import get_allowed_queues_sorted
 
 
@@ -70,6 +76,10 @@ class AbstractTaskTypeSerializer(serializers.ModelSerializer):
                 environment_variables=environment_vars,
                 required_arguments_default_values=default_vals,
                 required_arguments=required_args,
+                required_cpus=attrs.get("required_cpus", 0),
+                required_memory_megabytes=attrs.get(
+                    "required_memory_megabytes", 0
+                ),
             )
             test_type_instance.clean()
         except ValidationError as e:
@@ -83,16 +93,19 @@ class AbstractTaskInstanceSerializer(serializers.ModelSerializer):
 
     user = serializers.SlugRelatedField(slug_field="username", read_only=True)
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, instance=None, *args, **kwargs):
         """Initialize the queryset for task queues."""
         # Call parent constructor
-        super().__init__(*args, **kwargs)
+        super().__init__(instance, *args, **kwargs)
 
         # Customize the queryset of the task queues to only include
         # allowed queues. If a bad task type for a queue is chosen the
         # task instance model validation will deal with it; we can't do
         # anything more here without having a particular task in hand.
-        if "context" in kwargs:
+        #
+        # Serializers given instances only ever read them (task
+        # instances can't be updated), so don't bother in that case.
+        if instance is None and "context" in kwargs:
             self.fields["task_queue"].queryset = get_allowed_queues_sorted(
                 user=kwargs["context"]["request"].user
             )
@@ -137,3 +150,73 @@ class AbstractTaskInstanceSerializer(serializers.ModelSerializer):
         #     raise serializers.ValidationError(str(e))
 
         return attrs
+
+
+class AbstractTaskInstanceBulkCreateSerializer(serializers.Serializer):
+    """A serializer for creating many task instances at once.
+
+    The task instances share a task type and task queue, and differ in
+    their arguments (e.g., for parameter sweeps).
+    """
+
+    name = serializers.CharField(
+        max_length=200,
+        required=False,
+        allow_blank=True,
+        default="",
+        help_text="An optional non-unique name for each task instance.",
+    )
+    task_queue = serializers.PrimaryKeyRelatedField(
+        queryset=TaskQueue.objects.none(),
+        help_text="The queue the task instances run on.",
+    )
+    arguments_list = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        help_text=(
+            "A list of JSON dictionaries of arguments, one for each task "
+            "instance to create. See the arguments field of a task "
+            "instance."
+        ),
+    )
+
+    # Make sure you change this in the subclass serializer! Also make
+    # sure to add a task_type field.
+    instance_model = AbstractTaskInstance
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the queryset for task queues."""
+        # Call parent constructor
+        super().__init__(*args, **kwargs)
+
+        # Only allow allowed queues, like for single task instances
+        if "context" in kwargs:
+            self.fields["task_queue"].queryset = get_allowed_queues_sorted(
+                user=kwargs["context"]["request"].user
+            )
+
+    def validate(self, attrs):
+        """Validate the task instances.
+
+        The task queue is validated once for all the task instances.
+        """
+        # Call parent validate method
+        attrs = super().validate(attrs)
+
+        try:
+            attrs["instances"] = build_task_instances(
+                instance_model=self.instance_model,
+                user=self.context["request"].user,
+                task_type=attrs["task_type"],
+                task_queue=attrs["task_queue"],
+                arguments_list=attrs["arguments_list"],
+                name=attrs["name"],
+            )
+        except ValidationError as e:
+            raise serializers.ValidationError(e.messages)
+
+        return attrs
+
+    def create(self, validated_data):
+        """Create the task instances and queue up their jobs."""
+        return bulk_create_task_instances(validated_data["instances"])
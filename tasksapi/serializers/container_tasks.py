@@ -3,7 +3,9 @@
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from tasksapi.models import ContainerTaskInstance, ContainerTaskType
+from tasksapi.models.validators import resource_limits_are_valid
 from .abstract_tasks import (
+    AbstractTaskInstanceBulkCreateSerializer,
     AbstractTaskInstanceSerializer,
     AbstractTaskTypeSerializer,
 )
@@ -15,6 +17,34 @@ class ContainerTaskTypeSerializer(AbstractTaskTypeSerializer):
     class Meta(AbstractTaskTypeSerializer.Meta):
         model = ContainerTaskType
 
+    def validate(self, attrs):
+        """Refer to parent class docstring :)"""
+        # Call parent validator
+        attrs = super().validate(attrs)
+
+        # Test the resource limits
+        test_type_instance = ContainerTaskType(
+            **{
+                field: attrs[field]
+                for field in (
+                    "cpu_limit",
+                    "memory_limit_megabytes",
+                    "pids_limit",
+                    "required_cpus",
+                    "required_memory_megabytes",
+                )
+                if field in attrs
+            }
+        )
+        is_valid, reason = resource_limits_are_valid(
+            test_type_instance.get_resource_limits(), test_type_instance
+        )
+
+        if not is_valid:
+            raise serializers.ValidationError(reason)
+
+        return attrs
+
 
 class ContainerTaskInstanceSerializer(AbstractTaskInstanceSerializer):
     """A serializer for a container task instance."""
@@ -34,9 +64,25 @@ class ContainerTaskInstanceSerializer(AbstractTaskInstanceSerializer):
                 task_type=attrs["task_type"],
                 task_queue=attrs["task_queue"],
                 arguments=attrs["arguments"],
+                cpu_limit=attrs.get("cpu_limit"),
+                memory_limit_megabytes=attrs.get("memory_limit_megabytes"),
+                pids_limit=attrs.get("pids_limit"),
             )
             test_instance.clean()
         except ValidationError as e:
             raise serializers.ValidationError(str(e))
 
         return attrs
+
+
+class ContainerTaskInstanceBulkCreateSerializer(
+    AbstractTaskInstanceBulkCreateSerializer
+):
+    """A serializer for creating many container task instances at once."""
+
+    task_type = serializers.PrimaryKeyRelatedField(
+        queryset=ContainerTaskType.objects.all(),
+        help_text="The task type of the task instances.",
+    )
+
+    instance_model = ContainerTaskInstance
@@ -4,6 +4,7 @@ from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from tasksapi.models import ExecutableTaskInstance, ExecutableTaskType
 from .abstract_tasks import (
+    AbstractTaskInstanceBulkCreateSerializer,
     AbstractTaskInstanceSerializer,
     AbstractTaskTypeSerializer,
 )
@@ -40,3 +41,16 @@ class ExecutableTaskInstanceSerializer(AbstractTaskInstanceSerializer):
             raise serializers.ValidationError(str(e))
 
         return attrs
+
+
+class ExecutableTaskInstanceBulkCreateSerializer(
+    AbstractTaskInstanceBulkCreateSerializer
+):
+    """A serializer for creating many executable task instances at once."""
+
+    task_type = serializers.PrimaryKeyRelatedField(
+        queryset=ExecutableTaskType.objects.all(),
+        help_text="The task type of the task instances.",
+    )
+
+    instance_model = ExecutableTaskInstance
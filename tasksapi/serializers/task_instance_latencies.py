@@ -0,0 +1,29 @@
+"""Contains a serializer for task instance latency percentiles.
+
+These work for both container *and* executable tasks.
+"""
+
+from rest_framework import serializers
+
+
+class TaskInstanceLatencySerializer(serializers.Serializer):
+    """A serializer for the latencies of a task queue's task type."""
+
+    task_queue = serializers.IntegerField(
+        help_text="The primary key of the task queue."
+    )
+    task_type = serializers.IntegerField(
+        help_text="The primary key of the task type."
+    )
+    num_queue_waits = serializers.IntegerField(
+        help_text="How many task instances have a queue wait recorded."
+    )
+    queue_wait_seconds_p50 = serializers.FloatField(allow_null=True)
+    queue_wait_seconds_p95 = serializers.FloatField(allow_null=True)
+    queue_wait_seconds_p99 = serializers.FloatField(allow_null=True)
+    num_run_times = serializers.IntegerField(
+        help_text="How many task instances have a run time recorded."
+    )
+    run_time_seconds_p50 = serializers.FloatField(allow_null=True)
+    run_time_seconds_p95 = serializers.FloatField(allow_null=True)
+    run_time_seconds_p99 = serializers.FloatField(allow_null=True)
@@ -0,0 +1,77 @@
+"""Contains serializers for reading task instance logs.
+
+These work for both container *and* executable tasks.
+"""
+
+from rest_framework import serializers
+from tasksapi.constants import STATE_CHOICES
+from tasksapi.logs import LOG_READ_MAX_BYTES, LOG_TAIL_DEFAULT_BYTES
+
+
+class TaskInstanceLogRequestSerializer(serializers.Serializer):
+    """A serializer for the query parameters of a log request."""
+
+    file = serializers.CharField(
+        required=False,
+        help_text=(
+            "The name of the log file to read. If not given, the task "
+            "instance's log files are listed instead."
+        ),
+    )
+    offset = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text=(
+            "The byte offset to read from. If not given, the end of the "
+            "file is read."
+        ),
+    )
+    tail = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        default=LOG_TAIL_DEFAULT_BYTES,
+        help_text=(
+            "How many bytes at the end of the file to read if no offset "
+            "is given."
+        ),
+    )
+    max_bytes = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=LOG_READ_MAX_BYTES,
+        default=LOG_READ_MAX_BYTES,
+        help_text="The maximum number of bytes to read.",
+    )
+
+
+class TaskInstanceLogFileSerializer(serializers.Serializer):
+    """A serializer for a task instance's log file."""
+
+    name = serializers.CharField()
+    size = serializers.IntegerField(
+        help_text="The size of the file as stored (maybe compressed)."
+    )
+    last_modified = serializers.DateTimeField()
+
+
+class TaskInstanceLogResponseSerializer(serializers.Serializer):
+    """A serializer for part of a task instance's log file."""
+
+    text = serializers.CharField()
+    offset = serializers.IntegerField(
+        help_text="The byte offset of the start of the text."
+    )
+    next_offset = serializers.IntegerField(
+        help_text=(
+            "The byte offset of the end of the text, from which to read "
+            "any more of the file."
+        )
+    )
+    size = serializers.IntegerField(help_text="The size of the file in bytes.")
+    state = serializers.ChoiceField(
+        choices=STATE_CHOICES,
+        help_text=(
+            "The state of the task instance, to tell whether the file "
+            "might still grow."
+        ),
+    )
@@ -7,10 +7,25 @@ from rest_framework import serializers
 from tasksapi.constants import STATE_CHOICES
 
 
+class TaskInstanceResourceUsageSerializer(serializers.Serializer):
+    """A serializer for the resources a task instance's job used."""
+
+    wall_time_seconds = serializers.FloatField(required=False, min_value=0)
+    cpu_user_seconds = serializers.FloatField(required=False, min_value=0)
+    cpu_system_seconds = serializers.FloatField(required=False, min_value=0)
+    peak_memory_megabytes = serializers.FloatField(required=False, min_value=0)
+    bytes_read = serializers.IntegerField(required=False, min_value=0)
+    bytes_written = serializers.IntegerField(required=False, min_value=0)
+
+
 class TaskInstanceStateUpdateRequestSerializer(serializers.Serializer):
     """A serializer for a task instance update's request."""
 
     state = serializers.ChoiceField(choices=STATE_CHOICES)
+    resource_usage = TaskInstanceResourceUsageSerializer(
+        required=False,
+        help_text="The resources the task instance's job used.",
+    )
 
 
 class TaskInstanceStateUpdateResponseSerializer(serializers.Serializer):
@@ -18,3 +33,40 @@ class TaskInstanceStateUpdateResponseSerializer(serializers.Serializer):
 
     uuid = serializers.CharField(max_length=36)
     state = serializers.ChoiceField(choices=STATE_CHOICES)
+
+
+class TaskInstanceBulkStateUpdateRequestSerializer(serializers.Serializer):
+    """A serializer for an item of a bulk task instance update's request."""
+
+    uuid = serializers.UUIDField()
+    state = serializers.ChoiceField(choices=STATE_CHOICES)
+    timestamp = serializers.DateTimeField(
+        required=False,
+        help_text="When the task instance changed state.",
+    )
+    state_timestamps = serializers.DictField(
+        child=serializers.DateTimeField(),
+        required=False,
+        help_text=(
+            "When the task instance entered states of earlier updates "
+            "which this update replaced, keyed by state."
+        ),
+    )
+    resource_usage = TaskInstanceResourceUsageSerializer(
+        required=False,
+        help_text="The resources the task instance's job used.",
+    )
+
+
+class TaskInstanceBulkStateUpdateResponseSerializer(serializers.Serializer):
+    """A serializer for an item of a bulk task instance update's response."""
+
+    uuid = serializers.CharField(max_length=36)
+    state = serializers.ChoiceField(choices=STATE_CHOICES)
+    updated = serializers.BooleanField(
+        help_text="Whether the update was applied."
+    )
+    detail = serializers.CharField(
+        allow_blank=True,
+        help_text="Why the update wasn't applied, if it wasn't.",
+    )
@@ -0,0 +1,290 @@
+"""Contains resource budgets which workers admit jobs against.
+
+Task types declare how many CPUs and how many megabytes of memory their
+jobs need. If WORKER_CPUS or WORKER_MEMORY_MEGABYTES are set, the
+host gets a budget of that many CPUs and megabytes, shared by every
+queue its workers consume, and jobs only start running once the jobs
+already running on the host leave enough of the budget for them. Until
+then they wait (in the published state) in their worker process.
+
+Run workers with more processes (i.e., a higher --concurrency) than
+they have CPUs: processes are then cheap slots which jobs wait in, and
+the budget decides how many jobs actually run. Small jobs pack densely
+into whatever is left over by big ones, while big jobs never run
+alongside more than fits.
+
+Jobs requiring more than a whole budget are treated as requiring the
+whole budget, so they run alone rather than never. Small jobs can skip
+ahead of big jobs which are waiting for space, but only until a job has
+waited for longer than a given time; after that, jobs are admitted
+strictly in the order they started waiting, so big jobs aren't starved.
+
+The budget's state (which jobs are running and waiting) is kept in a
+JSON file shared by every worker process on the host. Jobs of worker
+processes which died without releasing their share of the budget are
+forgotten.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import logging
+import os
+import time
+from .utils import locked_json_file, process_is_alive
+
+logger = logging.getLogger(__name__)
+
+# How much room to leave for floating point error when adding up CPUs
+CPU_TOLERANCE = 1e-6
+
+
+class ResourceBudget(object):
+    """The CPUs and memory which jobs can use on a host."""
+
+    def __init__(
+        self,
+        state_path,
+        cpus=None,
+        memory_megabytes=None,
+        poll_interval=1,
+        max_bypass_time=300,
+    ):
+        """Initialize the budget.
+
+        Args:
+            state_path: A string containing the path of the JSON file
+                to keep the budget's state in.
+            cpus: An optional number specifying how many CPUs running
+                jobs can use in total. None means CPUs are unlimited.
+                Defaults to None.
+            memory_megabytes: An optional number specifying how many
+                megabytes of memory running jobs can use in total. None
+                means memory is unlimited. Defaults to None.
+            poll_interval: An optional number specifying how many
+                seconds waiting jobs wait between checks of the budget.
+                Defaults to 1.
+            max_bypass_time: An optional number specifying how many
+                seconds jobs can wait for while other jobs skip ahead of
+                them. Defaults to 300.
+        """
+        self.state_path = state_path
+        self.cpus = cpus
+        self.memory_megabytes = memory_megabytes
+        self.poll_interval = poll_interval
+        self.max_bypass_time = max_bypass_time
+
+    def get_requirements(self, cpus, memory_megabytes):
+        """Limit a job's requirements to the size of the budget.
+
+        Args:
+            cpus: A number specifying how many CPUs the job needs.
+            memory_megabytes: A number specifying how many megabytes of
+                memory the job needs.
+
+        Returns:
+            A dictionary containing the CPUs and megabytes of memory
+            the job is admitted with.
+        """
+        if self.cpus is not None:
+            cpus = min(cpus, self.cpus)
+
+        if self.memory_megabytes is not None:
+            memory_megabytes = min(memory_megabytes, self.memory_megabytes)
+
+        return {"cpus": cpus, "memory_megabytes": memory_megabytes}
+
+    def prune(self, state):
+        """Forget the jobs of worker processes which have died.
+
+        Args:
+            state: A dictionary containing the budget's state.
+        """
+        for jobs in (state["running"], state["waiting"]):
+            for job_uuid, job in list(jobs.items()):
+                if not process_is_alive(job["pid"]):
+                    del jobs[job_uuid]
+
+    def fits(self, running_jobs, requirements):
+        """Determine whether a job fits alongside the running jobs.
+
+        Args:
+            running_jobs: An iterable of dictionaries containing the
+                requirements of the running jobs.
+            requirements: A dictionary containing the requirements of
+                the job.
+
+        Returns:
+            A boolean specifying whether the job fits in the budget.
+        """
+        running_jobs = list(running_jobs)
+
+        if self.cpus is not None:
+            used_cpus = sum(job["cpus"] for job in running_jobs)
+
+            if used_cpus + requirements["cpus"] > self.cpus + CPU_TOLERANCE:
+                return False
+
+        if self.memory_megabytes is not None:
+            used_memory_megabytes = sum(
+                job["memory_megabytes"] for job in running_jobs
+            )
+
+            if (
+                used_memory_megabytes + requirements["memory_megabytes"]
+                > self.memory_megabytes
+            ):
+                return False
+
+        return True
+
+    def try_admit(self, job_uuid, cpus, memory_megabytes, now=None):
+        """Admit a job if there's space for it in the budget.
+
+        Jobs which aren't admitted are recorded as waiting, so that
+        they aren't skipped ahead of forever.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            cpus: A number specifying how many CPUs the job needs.
+            memory_megabytes: A number specifying how many megabytes of
+                memory the job needs.
+            now: An optional number containing the current time, as
+                returned by time.time(). Defaults to the current time.
+
+        Returns:
+            A boolean specifying whether the job was admitted.
+        """
+        if now is None:
+            now = time.time()
+
+        requirements = self.get_requirements(cpus, memory_megabytes)
+
+        with locked_json_file(
+            self.state_path, default={"running": {}, "waiting": {}}
+        ) as state:
+            self.prune(state)
+
+            waiting_jobs = state["waiting"]
+            job = waiting_jobs.get(job_uuid) or dict(
+                requirements, pid=os.getpid(), datetime_waiting=now
+            )
+
+            # Once a job has waited too long, only the job which has
+            # waited longest can start
+            longest_waiting = min(
+                list(waiting_jobs.items()) + [(job_uuid, job)],
+                key=lambda item: item[1]["datetime_waiting"],
+            )
+            is_blocked = (
+                longest_waiting[0] != job_uuid
+                and now - longest_waiting[1]["datetime_waiting"]
+                > self.max_bypass_time
+            )
+
+            if not is_blocked and self.fits(
+                state["running"].values(), requirements
+            ):
+                waiting_jobs.pop(job_uuid, None)
+                state["running"][job_uuid] = dict(
+                    requirements, pid=os.getpid()
+                )
+
+                return True
+
+            waiting_jobs[job_uuid] = job
+
+            return False
+
+    def admit(self, job_uuid, cpus, memory_megabytes):
+        """Wait until a job fits in the budget, then admit it.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            cpus: A number specifying how many CPUs the job needs.
+            memory_megabytes: A number specifying how many megabytes of
+                memory the job needs.
+        """
+        if self.try_admit(job_uuid, cpus, memory_megabytes):
+            return
+
+        logger.info(
+            "Job %s is waiting for %s CPUs and %s MB of memory",
+            job_uuid,
+            cpus,
+            memory_megabytes,
+        )
+
+        while not self.try_admit(job_uuid, cpus, memory_megabytes):
+            time.sleep(self.poll_interval)
+
+    def release(self, job_uuid):
+        """Give back a job's share of the budget.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+        """
+        with locked_json_file(
+            self.state_path, default={"running": {}, "waiting": {}}
+        ) as state:
+            state["running"].pop(job_uuid, None)
+            state["waiting"].pop(job_uuid, None)
+
+    def get_usage(self):
+        """Get how much of the budget is being used.
+
+        Returns:
+            A dictionary containing the CPUs and megabytes of memory
+            used by running jobs, and how many jobs are running and
+            waiting.
+        """
+        with locked_json_file(
+            self.state_path, default={"running": {}, "waiting": {}}
+        ) as state:
+            self.prune(state)
+
+            running_jobs = list(state["running"].values())
+            num_waiting = len(state["waiting"])
+
+        return {
+            "cpus": sum(job["cpus"] for job in running_jobs),
+            "memory_megabytes": sum(
+                job["memory_megabytes"] for job in running_jobs
+            ),
+            "running": len(running_jobs),
+            "waiting": num_waiting,
+        }
+
+
+def get_resource_budget():
+    """Make the host's resource budget configured from the environment.
+
+    Every worker process on the host shares the budget, whichever queues
+    it consumes, so that jobs from different queues can't together use
+    more than the host has.
+
+    Returns:
+        A ResourceBudget, or None if neither WORKER_CPUS nor
+        WORKER_MEMORY_MEGABYTES are set.
+    """
+    cpus = float(os.environ.get("WORKER_CPUS", 0)) or None
+    memory_megabytes = (
+        float(os.environ.get("WORKER_MEMORY_MEGABYTES", 0)) or None
+    )
+
+    if cpus is None and memory_megabytes is None:
+        return None
+
+    return ResourceBudget(
+        state_path=os.path.join(
+            os.environ["WORKER_TEMP_DIRECTORY"], "resource-budget.json"
+        ),
+        cpus=cpus,
+        memory_megabytes=memory_megabytes,
+        poll_interval=float(
+            os.environ.get("WORKER_ADMISSION_POLL_INTERVAL", 1)
+        ),
+        max_bypass_time=float(
+            os.environ.get("WORKER_ADMISSION_MAX_BYPASS_TIME", 300)
+        ),
+    )
@@ -3,18 +3,18 @@
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
-import os
 from celery import shared_task
 from celery.signals import (
-    after_task_publish,
+    task_postrun,
     task_prerun,
     task_success,
     task_failure,
     task_revoked,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
 )
-import requests
 from tasksapi.constants import (
-    PUBLISHED,
     RUNNING,
     SUCCESSFUL,
     FAILED,
@@ -24,11 +24,20 @@ from tasksapi.constants import (
     DOCKER,
     SINGULARITY,
 )
+from .admission import get_resource_budget
 from .container_tasks import (
     run_docker_container_command,
     run_singularity_container_command,
 )
+from .docker_clients import init_docker_client
 from .executable_tasks import run_executable_command
+from .log_shipping import flush_log_shipper, get_log_shipper
+from .metrics import run_task_duration_seconds, start_metrics_server
+from .state_updates import (
+    flush_state_update_client,
+    get_state_update_client,
+)
+from .utils import pop_resource_usage
 
 
 @shared_task
@@ -38,11 +47,71 @@ def run_task(
     command_to_run,
     env_vars_list,
     args_dict,
+    required_cpus=0,
+    required_memory_megabytes=0,
     **task_class_kwargs
 ):
-    """Launch an instance's job.
+    """Launch an instance's job once there are resources for it.
 
     This is the main function used to launch all tasks instance jobs.
+    If the worker's host has a resource budget, the job waits for its
+    share of the budget first, and it's only marked as running once it
+    has it.
+
+    Args:
+        uuid: A string containing the uuid of the job being run.
+        task_class: A string defined in the constants module resprenting
+            one of the task classes.
+        command_to_run: A string containing the command to run.
+        env_vars_list: A list of strings containing the environment
+            variable names for the worker to consume from its
+            environment.
+        args_dict: A dictionary containing arguments and corresponding
+            values.
+        required_cpus: An optional number specifying how many CPUs the
+            job needs. Defaults to 0.
+        required_memory_megabytes: An optional number specifying how
+            many megabytes of memory the job needs. Defaults to 0.
+        **task_class_kwargs: Arbitrary keywords arguments containing
+            variables specific to the class of the task (see
+            launch_job).
+
+    Raises:
+        NotImplementedError: An unsupported container type was passed
+            in.
+    """
+    # Wait for space in the host's budget
+    budget = get_resource_budget()
+
+    if budget is not None:
+        budget.admit(uuid, required_cpus, required_memory_megabytes)
+
+    try:
+        update_job(job_uuid=uuid, state=RUNNING)
+
+        with run_task_duration_seconds.labels(task_class).time():
+            return launch_job(
+                uuid=uuid,
+                task_class=task_class,
+                command_to_run=command_to_run,
+                env_vars_list=env_vars_list,
+                args_dict=args_dict,
+                **task_class_kwargs
+            )
+    finally:
+        if budget is not None:
+            budget.release(uuid)
+
+
+def launch_job(
+    uuid,
+    task_class,
+    command_to_run,
+    env_vars_list,
+    args_dict,
+    **task_class_kwargs
+):
+    """Run an instance's job.
 
     Args:
         uuid: A string containing the uuid of the job being run.
@@ -67,6 +136,12 @@ def run_task(
                 container to pull.
             container_type: A string defined in the constants module
                 representing the type of container.
+            cpu_limit: A number (or None) specifying the most CPUs the
+                container can use.
+            memory_limit_megabytes: An integer (or None) specifying the
+                most megabytes of memory the container can use.
+            pids_limit: An integer (or None) specifying the most
+                processes the container can run at once.
 
             For executable task types you should be passing in
 
@@ -86,6 +161,12 @@ def run_task(
         container_image = task_class_kwargs["container_image"]
         container_type = task_class_kwargs["container_type"]
 
+        # Jobs published before resource limits existed have none
+        resource_limits = {
+            name: task_class_kwargs.get(name)
+            for name in ("cpu_limit", "memory_limit_megabytes", "pids_limit")
+        }
+
         # Determine whether to run a Docker or Singularity container
         if container_type == DOCKER:
             return run_docker_container_command(
@@ -96,6 +177,7 @@ def run_task(
                 results_path=results_path,
                 env_vars_list=env_vars_list,
                 args_dict=args_dict,
+                **resource_limits
             )
 
         if container_type == SINGULARITY:
@@ -107,6 +189,7 @@ def run_task(
                 results_path=results_path,
                 env_vars_list=env_vars_list,
                 args_dict=args_dict,
+                **resource_limits
             )
 
         # Container type passed in is not supported!
@@ -131,68 +214,87 @@ def run_task(
         )
 
 
-def update_job(api_token, job_uuid, state):
-    """Update the status of the job.
+def update_job(job_uuid, state, resource_usage=None):
+    """Queue up an update of the status of the job.
+
+    The update is sent to the server in the background (batched with
+    any other updates from this process), so this returns immediately.
 
     Args:
-        api_token: A string containing a valid token for the API.
         job_uuid: A string containing the UUID for the task instance to
             update.
         state: A string which must be one of the state constants.
-    Returns:
-        A requests.Response object containing the server's response to
-            the HTTP request.
+        resource_usage: An optional dictionary containing the resources
+            the job used.
     """
-    # Form the API endpoint URL
-    base_url = os.environ["DJANGO_BASE_URL"]
-    endpoint_url_pieces = (
-        base_url,
-        r"/api/updatetaskinstancestatus/",
-        job_uuid,
+    get_state_update_client().put(
+        job_uuid, state, resource_usage=resource_usage
     )
-    endpoint_url = "/".join(s.strip("/") for s in endpoint_url_pieces) + "/"
 
-    # Make the HTTP request
-    return requests.patch(
-        endpoint_url,
-        data={"state": state},
-        headers={"Authorization": "Token {}".format(api_token)},
-    )
 
+@worker_init.connect
+def worker_init_handler(**kwargs):
+    """Start serving the worker's metrics, if configured to.
 
-@after_task_publish.connect
-def task_sent_handler(**kwargs):
-    """Update the state of the task instance.
+    Arg:
+        kwargs: A dictionary containing information about the worker.
+    """
+    start_metrics_server()
 
-    Note that this function is processed by the process sending the
-    task. Also note that the kwarg dictionaries given to the various
-    handlers in general do not contain the same information, and if they
-    do, then in general they will not share the same schema.
+
+@worker_process_init.connect
+def worker_process_init_handler(**kwargs):
+    """Connect to Docker once, before the process runs any jobs.
 
     Arg:
-        kwargs: A dictionary containing information about the task
-            instance.
+        kwargs: A dictionary containing information about the worker
+            process.
     """
-    update_job(
-        api_token=os.environ["API_AUTH_TOKEN"],
-        job_uuid=str(kwargs["headers"]["id"]),
-        state=PUBLISHED,
-    )
+    init_docker_client()
+
+
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(**kwargs):
+    """Send any queued up state updates before the process exits.
+
+    Arg:
+        kwargs: A dictionary containing information about the worker
+            process.
+    """
+    flush_state_update_client()
+    flush_log_shipper()
 
 
 @task_prerun.connect
 def task_prerun_handler(**kwargs):
-    """Update the state of the task instance.
+    """Start shipping the task instance's logs.
+
+    The task instance is marked as running by run_task, once it has
+    been admitted.
 
     Arg:
         kwargs: A dictionary containing information about the task
             instance.
     """
-    update_job(
-        api_token=os.environ["API_AUTH_TOKEN"],
-        job_uuid=str(kwargs["task_id"]),
-        state=RUNNING,
-    )
+    # Start shipping the job's logs while it runs, if configured to
+    log_shipper = get_log_shipper()
+
+    if log_shipper is not None:
+        log_shipper.start_job(str(kwargs["task_id"]))
+
+
+@task_postrun.connect
+def task_postrun_handler(**kwargs):
+    """Ship the task instance's logs, whether it succeeded or failed.
+
+    Arg:
+        kwargs: A dictionary containing information about the task
+            instance.
+    """
+    log_shipper = get_log_shipper()
+
+    if log_shipper is not None:
+        log_shipper.finish_job(str(kwargs["task_id"]))
 
 
 @task_success.connect
@@ -203,10 +305,12 @@ def task_success_handler(**kwargs):
         kwargs: A dictionary containing information about the task
             instance.
     """
+    job_uuid = kwargs["sender"].request.id
+
     update_job(
-        api_token=os.environ["API_AUTH_TOKEN"],
-        job_uuid=kwargs["sender"].request.id,
+        job_uuid=job_uuid,
         state=SUCCESSFUL,
+        resource_usage=pop_resource_usage(job_uuid),
     )
 
 
@@ -219,9 +323,9 @@ def task_failure_handler(**kwargs):
             instance.
     """
     update_job(
-        api_token=os.environ["API_AUTH_TOKEN"],
         job_uuid=kwargs["task_id"],
         state=FAILED,
+        resource_usage=pop_resource_usage(kwargs["task_id"]),
     )
 
 
@@ -234,7 +338,6 @@ def task_revoked_handler(**kwargs):
             instance.
     """
     update_job(
-        api_token=os.environ["API_AUTH_TOKEN"],
         job_uuid=kwargs["request"].task_id,
         state=TERMINATED,
     )
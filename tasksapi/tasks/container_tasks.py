@@ -9,10 +9,31 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import json
+import logging
 import os
 import shlex
+import subprocess
+import threading
+import time
+import requests
 import timeout_decorator
-from .utils import create_local_directory
+from .docker_clients import get_docker_client, reset_docker_client
+from .docker_images import JOB_CONTAINER_LABEL, get_docker_image_cache
+from .singularity_images import get_singularity_image_cache
+from .utils import (
+    call_with_usage,
+    create_local_directory,
+    get_job_log_paths,
+    read_file_tail,
+    record_resource_usage,
+    write_chunks_to_file,
+)
+
+logger = logging.getLogger(__name__)
+
+# How many seconds to wait for a container's stats to end after it
+# exits
+STATS_TIMEOUT = 5
 
 
 class SingularityPullFailure(Exception):
@@ -21,6 +42,145 @@ class SingularityPullFailure(Exception):
     pass
 
 
+def stream_container_logs(container, stdout_path, stderr_path):
+    """Write a Docker container's output to files until it exits.
+
+    The container's stderr is written from a separate thread, so that
+    neither of its streams has to wait for the other.
+
+    Args:
+        container: A docker.models.containers.Container which has been
+            started.
+        stdout_path: A string containing the path of the file to write
+            the container's stdout to.
+        stderr_path: A string containing the path of the file to write
+            the container's stderr to.
+
+    Returns:
+        An integer containing the container's exit code.
+    """
+    stderr_thread = threading.Thread(
+        target=write_chunks_to_file,
+        args=(
+            container.logs(
+                stdout=False, stderr=True, stream=True, follow=True
+            ),
+            stderr_path,
+        ),
+    )
+    stderr_thread.daemon = True
+    stderr_thread.start()
+
+    write_chunks_to_file(
+        container.logs(stdout=True, stderr=False, stream=True, follow=True),
+        stdout_path,
+    )
+
+    stderr_thread.join()
+
+    return container.wait()["StatusCode"]
+
+
+def get_docker_resource_limits(cpu_limit, memory_limit_megabytes, pids_limit):
+    """Get the options which limit a Docker container's resources.
+
+    Args:
+        cpu_limit: A number (or None) specifying the most CPUs the
+            container can use.
+        memory_limit_megabytes: An integer (or None) specifying the
+            most megabytes of memory the container can use.
+        pids_limit: An integer (or None) specifying the most processes
+            the container can run at once.
+
+    Returns:
+        A dictionary containing keyword arguments for running the
+        container with.
+    """
+    options = {}
+
+    if cpu_limit is not None:
+        options["nano_cpus"] = int(round(cpu_limit * 10 ** 9))
+
+    if memory_limit_megabytes is not None:
+        # Don't give the container any swap on top of its memory, so
+        # that it can't slow down the host by swapping
+        options["mem_limit"] = "%dm" % memory_limit_megabytes
+        options["memswap_limit"] = options["mem_limit"]
+
+    if pids_limit is not None:
+        options["pids_limit"] = pids_limit
+
+    return options
+
+
+def watch_container_stats(container, usage):
+    """Record a Docker container's resource usage until it exits.
+
+    Args:
+        container: A docker.models.containers.Container which has been
+            started.
+        usage: A dictionary to record the container's peak memory usage
+            (in megabytes), peak number of processes, user and system
+            CPU time (in seconds), and bytes read and written in, as its
+            stats come in.
+    """
+    for stats in container.stats(stream=True, decode=True):
+        memory_stats = stats.get("memory_stats") or {}
+        cpu_usage = (stats.get("cpu_stats") or {}).get("cpu_usage") or {}
+        pids_stats = stats.get("pids_stats") or {}
+        io_stats = (stats.get("blkio_stats") or {}).get(
+            "io_service_bytes_recursive"
+        ) or []
+
+        usage["peak_memory_megabytes"] = max(
+            usage["peak_memory_megabytes"],
+            memory_stats.get("max_usage", memory_stats.get("usage", 0))
+            / 1024
+            / 1024,
+        )
+        usage["peak_pids"] = max(
+            usage["peak_pids"], pids_stats.get("current", 0)
+        )
+
+        # I/O and CPU times are totals so far, and are missing once the
+        # container has exited
+        for usage_key, op in (
+            ("bytes_read", "read"),
+            ("bytes_written", "write"),
+        ):
+            bytes_so_far = sum(
+                entry.get("value", 0)
+                for entry in io_stats
+                if entry.get("op", "").lower() == op
+            )
+            usage[usage_key] = max(usage[usage_key], bytes_so_far)
+
+        if "usage_in_usermode" in cpu_usage:
+            usage["cpu_user_seconds"] = (
+                cpu_usage["usage_in_usermode"] / 10 ** 9
+            )
+            usage["cpu_system_seconds"] = (
+                cpu_usage["usage_in_kernelmode"] / 10 ** 9
+            )
+
+
+def remove_docker_container(container):
+    """Remove a job's Docker container, killing it if it's running.
+
+    Failing to remove the container is logged rather than raised, so as
+    not to fail (or hide the failure of) the job it ran.
+
+    Args:
+        container: A docker.models.containers.Container.
+    """
+    try:
+        container.remove(force=True)
+    except requests.exceptions.RequestException as e:
+        logger.warning(
+            "Could not remove Docker container %s: %s", container.id, e
+        )
+
+
 def run_docker_container_command(
     uuid,
     container_image,
@@ -29,6 +189,9 @@ def run_docker_container_command(
     results_path,
     env_vars_list,
     args_dict,
+    cpu_limit=None,
+    memory_limit_megabytes=None,
+    pids_limit=None,
 ):
     """Launch an executable within a Docker container.
 
@@ -46,22 +209,37 @@ def run_docker_container_command(
             environment.
         args_dict: A dictionary containing arguments and corresponding
             values.
+        cpu_limit: An optional number specifying the most CPUs the
+            container can use. Defaults to None, which means no limit.
+        memory_limit_megabytes: An optional integer specifying the most
+            megabytes of memory the container can use. Defaults to
+            None, which means no limit.
+        pids_limit: An optional integer specifying the most processes
+            the container can run at once. Defaults to None, which
+            means no limit.
+
+    Returns:
+        A dictionary containing the container's resource usage, which
+        is also written to the job's logs directory.
 
     Raises:
         KeyError: An environment variable specified was not available in
             the worker's environment.
+        docker.errors.ContainerError: The container exited with a
+            non-zero code.
     """
     # Import Docker. Useful to just import it here if we want to have
     # workers which *only* can support Singularity.
     import docker
 
-    # Get the Docker client on the host machine (see
-    # https://docker-py.readthedocs.io/en/stable/client.html#docker.client.from_env)
-    client = docker.from_env()
+    # Get this worker process's Docker client, which is made when the
+    # process starts and reused between jobs
+    client = get_docker_client()
 
-    # Pull the Docker container. This pull in the latest version of the
-    # container (with the specified tag if provided).
-    client.images.pull(container_image)
+    # Set up the host log directory for the job (before Docker makes it
+    # for any logs volume), and get the paths of the files to write the
+    # container's stdout and stderr to
+    host_stdout_log_path, host_stderr_log_path = get_job_log_paths(uuid)
 
     # Find out where to put the logs
     if logs_path is None:
@@ -99,13 +277,135 @@ def run_docker_container_command(
     else:
         command = command_to_run
 
-    # Run the executable
-    client.containers.run(
-        image=container_image,
-        command=command,
-        environment=environment,
-        volumes=volumes_dict,
-    )
+    try:
+        # Make sure the Docker image is on the host, pulling it if the
+        # pull policy calls for it. Run the image found by its ID so
+        # that it can't change underneath us.
+        image_id = get_docker_image_cache(client).get_image(container_image)
+
+        # Run the executable in the background, streaming its output
+        # to files as it comes in (cf. buffering it all in memory)
+        container = client.containers.run(
+            image=image_id,
+            command=command,
+            environment=environment,
+            volumes=volumes_dict,
+            detach=True,
+            labels={JOB_CONTAINER_LABEL: uuid},
+            **get_docker_resource_limits(
+                cpu_limit, memory_limit_megabytes, pids_limit
+            )
+        )
+
+        try:
+            start_time = time.time()
+
+            # Keep track of the container's resource usage while it runs
+            usage = {
+                "cpu_user_seconds": 0,
+                "cpu_system_seconds": 0,
+                "peak_memory_megabytes": 0,
+                "peak_pids": 0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+            }
+            stats_thread = threading.Thread(
+                target=watch_container_stats, args=(container, usage)
+            )
+            stats_thread.daemon = True
+            stats_thread.start()
+
+            exit_status = stream_container_logs(
+                container, host_stdout_log_path, host_stderr_log_path
+            )
+
+            usage["wall_time_seconds"] = time.time() - start_time
+
+            stats_thread.join(STATS_TIMEOUT)
+
+            # Find out whether the container ran out of memory
+            container.reload()
+            usage["oom_killed"] = container.attrs["State"].get(
+                "OOMKilled", False
+            )
+        finally:
+            # Stopped containers keep their images from being evicted
+            remove_docker_container(container)
+    except requests.exceptions.ConnectionError:
+        # The Docker daemon went away, so make sure the next job gets a
+        # new client rather than waiting for the next health check
+        reset_docker_client()
+        raise
+
+    record_resource_usage(uuid, usage)
+
+    # Fail the job if the executable failed, as containers.run does
+    if exit_status != 0:
+        stderr = read_file_tail(host_stderr_log_path)
+
+        if usage["oom_killed"]:
+            stderr += (
+                "\nThe container was killed for using more than %s MB of "
+                "memory" % memory_limit_megabytes
+            )
+
+        raise docker.errors.ContainerError(
+            container=container,
+            exit_status=exit_status,
+            command=command,
+            image=container_image,
+            stderr=stderr,
+        )
+
+    return usage
+
+
+def get_singularity_resource_limits(
+    cpu_limit, memory_limit_megabytes, pids_limit
+):
+    """Get the options which limit a Singularity container's resources.
+
+    Only recent versions of Singularity (3.10 and above, using cgroups
+    v2) support these options, so they're only used if
+    SINGULARITY_RESOURCE_LIMITS is True.
+
+    Args:
+        cpu_limit: A number (or None) specifying the most CPUs the
+            container can use.
+        memory_limit_megabytes: An integer (or None) specifying the
+            most megabytes of memory the container can use.
+        pids_limit: An integer (or None) specifying the most processes
+            the container can run at once.
+
+    Returns:
+        A list of strings containing the options to pass to
+        "singularity exec".
+    """
+    options = []
+
+    if cpu_limit is not None:
+        options += ["--cpus", str(cpu_limit)]
+
+    if memory_limit_megabytes is not None:
+        # Don't give the container any swap on top of its memory, as
+        # for Docker containers
+        options += ["--memory", "%dM" % memory_limit_megabytes]
+        options += ["--memory-swap", "%dM" % memory_limit_megabytes]
+
+    if pids_limit is not None:
+        options += ["--pids-limit", str(pids_limit)]
+
+    if options and (
+        os.environ.get("SINGULARITY_RESOURCE_LIMITS", "False") != "True"
+    ):
+        logger.warning(
+            "Not limiting the resources of a Singularity container "
+            "since SINGULARITY_RESOURCE_LIMITS isn't True"
+        )
+
+        return []
+
+    return options
 
 
 def run_singularity_container_command(
@@ -116,6 +416,9 @@ def run_singularity_container_command(
     results_path,
     env_vars_list,
     args_dict,
+    cpu_limit=None,
+    memory_limit_megabytes=None,
+    pids_limit=None,
 ):
     """Launch an executable within a Singularity container.
 
@@ -133,18 +436,33 @@ def run_singularity_container_command(
             environment.
         args_dict: A dictionary containing arguments and corresponding
             values.
+        cpu_limit: An optional number specifying the most CPUs the
+            container can use. Defaults to None, which means no limit.
+        memory_limit_megabytes: An optional integer specifying the most
+            megabytes of memory the container can use. Defaults to
+            None, which means no limit.
+        pids_limit: An optional integer specifying the most processes
+            the container can run at once. Defaults to None, which
+            means no limit.
+
+    Returns:
+        A dictionary containing the container's resource usage, which
+        is also written to the job's logs directory.
 
     Raises:
         KeyError: An environment variable specified was not available in
             the worker's environment.
         SingularityPullFailure: The Singularity pull could not complete
             with the specified timeout and number of retries.
+        subprocess.CalledProcessError: The container exited with a
+            non-zero code.
     """
     # Import Singularity library
     from spython.main import Client as client
 
-    # Pull the specified container. This pull in the latest version of
-    # the container (with the specified tag if provided).
+    # Pull the specified container if the cache doesn't have a fresh
+    # copy of it. This pulls in the latest version of the container
+    # (with the specified tag if provided).
     timeout = int(os.environ["SINGULARITY_PULL_TIMEOUT"])
     num_retries = int(os.environ["SINGULARITY_PULL_RETRIES"])
 
@@ -153,29 +471,47 @@ def run_singularity_container_command(
         timeout, timeout_exception=StopIteration
     )(client.pull)
 
-    for retry in range(num_retries):
-        try:
-            singularity_image = client.pull(
-                image=container_image,
-                pull_folder=os.environ["WORKER_SINGULARITY_IMAGES_DIRECTORY"],
-                name_by_commit=True,
-            )
-
-            break
-        except StopIteration:
-            # If this is the last retry, raise an exception to indicate
-            # a failed job
-            if retry == num_retries - 1:
-                raise SingularityPullFailure(
-                    (
-                        "Could not pull {image_url} within "
-                        "{timeout} seconds after {num_retries} retries."
-                    ).format(
-                        image_url=container_image,
-                        timeout=timeout,
-                        num_retries=num_retries,
-                    )
+    def pull_image(image_to_pull):
+        """Pull an image, retrying pulls which time out.
+
+        Args:
+            image_to_pull: A string containing the name of the
+                container to pull.
+
+        Returns:
+            A string containing the path of the pulled image.
+
+        Raises:
+            SingularityPullFailure: The Singularity pull could not
+                complete with the specified timeout and number of
+                retries.
+        """
+        for retry in range(num_retries):
+            try:
+                return client.pull(
+                    image=image_to_pull,
+                    pull_folder=os.environ[
+                        "WORKER_SINGULARITY_IMAGES_DIRECTORY"
+                    ],
+                    name_by_commit=True,
                 )
+            except StopIteration:
+                # If this is the last retry, raise an exception to
+                # indicate a failed job
+                if retry == num_retries - 1:
+                    raise SingularityPullFailure(
+                        (
+                            "Could not pull {image_url} within "
+                            "{timeout} seconds after {num_retries} "
+                            "retries."
+                        ).format(
+                            image_url=image_to_pull,
+                            timeout=timeout,
+                            num_retries=num_retries,
+                        )
+                    )
+
+    image_cache = get_singularity_image_cache(pull_image)
 
     # Find out where to put the logs
     if logs_path is None:
@@ -230,18 +566,37 @@ def run_singularity_container_command(
     if args_dict:
         command += [json.dumps(args_dict)]
 
-    # Run the executable
-    iter_ = client.execute(
-        image=singularity_image, command=command, bind=bind_option, stream=True
+    # Run the executable, writing its output to files as it comes in.
+    # This builds the same command that the Singularity library's
+    # execute method does, but lets us keep stderr as well as stdout.
+    singularity_command = [
+        "singularity",
+        "exec",
+    ] + get_singularity_resource_limits(
+        cpu_limit, memory_limit_megabytes, pids_limit
     )
 
-    # Okay, here's some magic. The issue is that without stream=True in
-    # the above call, there's no way of determining the return code of
-    # the above operation, and so no way of knowing whether it failed.
-    # However, with stream=True, it'll raise a
-    # subprocess.CalledProcessError exception for any non-zero return
-    # code. Great! But before we can get that exception triggered we
-    # need to iterate through all of the command's stdout, which is what
-    # the below (seemingly useless) loop does.
-    for _ in iter_:
-        pass
+    for bind in bind_option:
+        singularity_command += ["--bind", bind]
+
+    host_stdout_log_path, host_stderr_log_path = get_job_log_paths(uuid)
+
+    # The image's file is kept from being evicted until the container
+    # exits
+    with image_cache.use_image(container_image) as singularity_image:
+        singularity_command += [singularity_image] + command
+
+        with open(host_stdout_log_path, "w") as f_stdout:
+            with open(host_stderr_log_path, "w") as f_stderr:
+                exit_status, usage = call_with_usage(
+                    args=singularity_command,
+                    stdout=f_stdout,
+                    stderr=f_stderr,
+                )
+
+    record_resource_usage(uuid, usage)
+
+    if exit_status != 0:
+        raise subprocess.CalledProcessError(exit_status, singularity_command)
+
+    return usage
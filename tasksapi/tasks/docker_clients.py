@@ -0,0 +1,165 @@
+"""Contains the Docker client shared by jobs run in a worker process.
+
+Rather than making a new client (and connection pool) for every job,
+each worker process makes one client when it starts and reuses it.
+Before a job uses the client, the client is checked with a ping if it
+hasn't been checked for a while, and replaced with a new one if the
+Docker daemon can't be reached (e.g., because the daemon restarted).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Clients for each process, keyed by process ID. Connections don't
+# survive forks, so each (e.g., Celery worker) process needs its own
+# client.
+docker_clients = {}
+docker_clients_lock = threading.Lock()
+
+
+class DockerClientHolder(object):
+    """Holds a Docker client, reconnecting when it stops working."""
+
+    def __init__(self, health_check_interval=30.0):
+        """Initialize the holder.
+
+        Args:
+            health_check_interval: An optional number specifying how
+                many seconds a client is trusted for after it was last
+                known to work. Defaults to 30.
+        """
+        self.health_check_interval = health_check_interval
+        self.client = None
+        self.checked_at = None
+
+    def connect(self):
+        """Replace the client with a new one.
+
+        Returns:
+            A docker.DockerClient.
+        """
+        # Import Docker here so that workers which *only* support
+        # Singularity don't need it
+        import docker
+
+        self.close()
+
+        # Get the Docker client on the host machine (see
+        # https://docker-py.readthedocs.io/en/stable/client.html#docker.client.from_env)
+        self.client = docker.from_env()
+        self.checked_at = time.time()
+
+        return self.client
+
+    def close(self):
+        """Close the client's connections, if there is a client."""
+        if self.client is None:
+            return
+
+        try:
+            self.client.close()
+        except Exception as e:
+            logger.warning("Could not close Docker client: %s", e)
+
+        self.client = None
+
+    def is_healthy(self):
+        """Determine whether the client can reach the Docker daemon.
+
+        Returns:
+            A boolean specifying whether a ping succeeded.
+        """
+        try:
+            self.client.ping()
+        except Exception as e:
+            logger.warning("Docker client failed health check: %s", e)
+            return False
+
+        return True
+
+    def get_client(self):
+        """Get a working client, reconnecting if necessary.
+
+        Returns:
+            A docker.DockerClient.
+        """
+        if self.client is None:
+            return self.connect()
+
+        if time.time() - self.checked_at < self.health_check_interval:
+            return self.client
+
+        if not self.is_healthy():
+            logger.info("Reconnecting to the Docker daemon")
+            return self.connect()
+
+        self.checked_at = time.time()
+
+        return self.client
+
+    def reset(self):
+        """Throw away the client so the next job gets a new one.
+
+        Call this when using the client fails in a way that suggests
+        its connections are broken.
+        """
+        self.close()
+        self.checked_at = None
+
+
+def get_docker_client_holder():
+    """Get the Docker client holder for this process.
+
+    Returns:
+        A DockerClientHolder.
+    """
+    pid = os.getpid()
+
+    with docker_clients_lock:
+        if pid not in docker_clients:
+            docker_clients[pid] = DockerClientHolder(
+                health_check_interval=float(
+                    os.environ.get("DOCKER_CLIENT_HEALTH_CHECK_INTERVAL", 30)
+                )
+            )
+
+        return docker_clients[pid]
+
+
+def get_docker_client():
+    """Get a working Docker client for this process.
+
+    Returns:
+        A docker.DockerClient.
+    """
+    holder = get_docker_client_holder()
+
+    with docker_clients_lock:
+        return holder.get_client()
+
+
+def reset_docker_client():
+    """Throw away this process's Docker client."""
+    holder = get_docker_client_holder()
+
+    with docker_clients_lock:
+        holder.reset()
+
+
+def init_docker_client():
+    """Make this process's Docker client ahead of its first job.
+
+    Workers which can't run Docker containers (e.g., because Docker
+    isn't installed) are left without a client.
+    """
+    try:
+        get_docker_client()
+    except Exception as e:
+        logger.info("Not connecting to Docker: %s", e)
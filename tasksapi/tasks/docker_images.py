@@ -0,0 +1,322 @@
+"""Contains a cache for the Docker images that workers run.
+
+Pulling a job's image before every job costs a registry round trip even
+when the image ran seconds ago (and minutes for big images that
+changed). Instead, workers decide whether to pull an image according to
+a pull policy:
+
+- "always" pulls images before every job (the old behaviour).
+- "if-not-present" only pulls images which aren't on the host.
+- "if-older-than-ttl" also re-pulls images last pulled more than a
+  given number of seconds ago, so that moving tags (e.g., "latest") are
+  eventually picked up.
+
+Images referenced by digest (e.g., "image@sha256:...") can't change, so
+they're only pulled if they aren't on the host. Jobs are run using the
+ID of the image that was checked, so an image can't change between
+being checked and being run.
+
+Images that jobs have used can also be evicted (least recently used
+first) when they take up more than a given amount of disk space.
+The cache's state (when images were pulled and last used) along with
+hit and miss counts are kept in a JSON file shared by every worker
+process on the host.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import logging
+import os
+import time
+from tasksapi.constants import DOCKER
+from .metrics import image_pull_duration_seconds
+from .utils import locked_json_file
+
+logger = logging.getLogger(__name__)
+
+# Pull policies
+ALWAYS = "always"
+IF_NOT_PRESENT = "if-not-present"
+IF_OLDER_THAN_TTL = "if-older-than-ttl"
+
+PULL_POLICIES = (ALWAYS, IF_NOT_PRESENT, IF_OLDER_THAN_TTL)
+
+# What can happen to an image, which the cache keeps counts of. Misses
+# are pulls of images which weren't on the host, and refreshes are
+# pulls of images which were.
+HIT = "hit"
+MISS = "miss"
+REFRESH = "refresh"
+EVICTION = "eviction"
+
+OUTCOMES = (HIT, MISS, REFRESH, EVICTION)
+
+# The label given to the containers jobs run in, whose value is the
+# job's UUID
+JOB_CONTAINER_LABEL = "saltant.job_uuid"
+
+
+def is_pinned(container_image):
+    """Determine whether an image reference is pinned to a digest.
+
+    Args:
+        container_image: A string containing an image reference.
+
+    Returns:
+        A boolean specifying whether the reference includes a digest.
+    """
+    return "@" in container_image
+
+
+class DockerImageCache(object):
+    """Decides when to pull Docker images and evicts unused ones."""
+
+    def __init__(
+        self,
+        client,
+        state_path,
+        pull_policy=IF_OLDER_THAN_TTL,
+        ttl=3600,
+        max_bytes=0,
+    ):
+        """Initialize the cache.
+
+        Args:
+            client: A docker.DockerClient.
+            state_path: A string containing the path of the JSON file
+                to keep the cache's state in.
+            pull_policy: An optional string which must be one of the
+                pull policies. Defaults to IF_OLDER_THAN_TTL.
+            ttl: An optional number specifying how many seconds images
+                are considered fresh for with the IF_OLDER_THAN_TTL
+                pull policy. Defaults to 3600.
+            max_bytes: An optional integer specifying how much disk
+                space images pulled through the cache may use before
+                the least recently used ones are removed. Zero means
+                there's no limit. Defaults to 0.
+
+        Raises:
+            ValueError: The pull policy isn't valid.
+        """
+        if pull_policy not in PULL_POLICIES:
+            raise ValueError(
+                "%s is not one of the pull policies %s"
+                % (pull_policy, ", ".join(PULL_POLICIES))
+            )
+
+        self.client = client
+        self.state_path = state_path
+        self.pull_policy = pull_policy
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def get_local_image(self, container_image):
+        """Find an image on the host.
+
+        Args:
+            container_image: A string containing an image reference.
+
+        Returns:
+            A docker.models.images.Image, or None if the image isn't on
+            the host.
+        """
+        import docker
+
+        try:
+            return self.client.images.get(container_image)
+        except docker.errors.ImageNotFound:
+            return None
+
+    def needs_pull(self, container_image, image, entry, now):
+        """Determine whether an image needs to be pulled.
+
+        Args:
+            container_image: A string containing an image reference.
+            image: The image on the host, or None if there isn't one.
+            entry: A dictionary containing the cache's record of the
+                image, or None if there isn't one.
+            now: A number containing the current Unix time.
+
+        Returns:
+            A string containing the outcome: MISS or REFRESH if the
+            image needs to be pulled, or HIT otherwise.
+        """
+        if image is None:
+            return MISS
+
+        if is_pinned(container_image) or self.pull_policy == IF_NOT_PRESENT:
+            return HIT
+
+        if self.pull_policy == ALWAYS:
+            return REFRESH
+
+        # The image was pulled outside of the cache or too long ago
+        if entry is None or now - entry["pulled_at"] >= self.ttl:
+            return REFRESH
+
+        return HIT
+
+    def get_image(self, container_image):
+        """Make sure an image is on the host, pulling it if necessary.
+
+        Args:
+            container_image: A string containing an image reference.
+
+        Returns:
+            A string containing the ID of the image to run.
+        """
+        from docker.utils import parse_repository_tag
+
+        with locked_json_file(self.state_path) as state:
+            entry = state.get("images", {}).get(container_image)
+
+        image = self.get_local_image(container_image)
+        now = time.time()
+        outcome = self.needs_pull(container_image, image, entry, now)
+
+        if outcome == HIT:
+            pulled_at = entry["pulled_at"] if entry else now
+        else:
+            # Pulling a repository without a tag pulls every tag (and
+            # returns a list), so pull what the reference resolves to
+            repository, tag = parse_repository_tag(container_image)
+
+            with image_pull_duration_seconds.labels(DOCKER).time():
+                image = self.client.images.pull(
+                    repository, tag=tag or "latest"
+                )
+
+            pulled_at = now
+
+        logger.info(
+            "Docker image cache %s for %s (%s)",
+            outcome,
+            container_image,
+            image.id,
+        )
+
+        with locked_json_file(self.state_path) as state:
+            images = state.setdefault("images", {})
+            stats = state.setdefault("stats", {})
+
+            images[container_image] = {
+                "id": image.id,
+                "size": image.attrs.get("Size", 0),
+                "pulled_at": pulled_at,
+                "last_used": now,
+            }
+            stats[outcome] = stats.get(outcome, 0) + 1
+
+            if self.max_bytes:
+                self.evict(state, keep=container_image)
+
+        return image.id
+
+    def evict(self, state, keep):
+        """Remove least recently used images until within the budget.
+
+        Only images which jobs have used are removed. Stopped job
+        containers left behind (e.g., by a worker which was killed)
+        are removed along with their images. Images which can't be
+        removed (e.g., because a running container is using them) are
+        skipped.
+
+        Args:
+            state: The cache's state, which is updated in place.
+            keep: A string containing an image reference not to remove
+                (e.g., the image about to be run).
+        """
+        import docker
+
+        images = state["images"]
+        stats = state["stats"]
+
+        # Images can have several references, so count sizes by ID
+        sizes = {entry["id"]: entry["size"] for entry in images.values()}
+        total_bytes = sum(sizes.values())
+        keep_id = images[keep]["id"]
+
+        for container_image in sorted(
+            images, key=lambda reference: images[reference]["last_used"]
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+
+            # Already removed along with another reference to its image
+            if container_image not in images:
+                continue
+
+            image_id = images[container_image]["id"]
+
+            if image_id == keep_id:
+                continue
+
+            try:
+                for container in self.client.containers.list(
+                    all=True,
+                    filters={
+                        "ancestor": image_id,
+                        "label": JOB_CONTAINER_LABEL,
+                        "status": "exited",
+                    },
+                ):
+                    container.remove()
+
+                self.client.images.remove(image_id, force=False)
+            except docker.errors.ImageNotFound:
+                pass
+            except docker.errors.APIError as e:
+                logger.warning(
+                    "Could not evict Docker image %s: %s", container_image, e
+                )
+                continue
+
+            logger.info("Evicted Docker image %s", container_image)
+
+            # Forget every reference to the removed image
+            for reference in [
+                reference
+                for reference, entry in images.items()
+                if entry["id"] == image_id
+            ]:
+                del images[reference]
+
+            total_bytes -= sizes.pop(image_id, 0)
+            stats[EVICTION] = stats.get(EVICTION, 0) + 1
+
+    def get_stats(self):
+        """Get the cache's hit, miss, refresh, and eviction counts.
+
+        Returns:
+            A dictionary whose keys are the outcomes and whose values
+            are integers containing how many times they happened.
+        """
+        with locked_json_file(self.state_path) as state:
+            stats = state.get("stats", {})
+
+        return {outcome: stats.get(outcome, 0) for outcome in OUTCOMES}
+
+
+def get_docker_image_cache(client):
+    """Make a Docker image cache configured from the environment.
+
+    Args:
+        client: A docker.DockerClient.
+
+    Returns:
+        A DockerImageCache.
+    """
+    return DockerImageCache(
+        client=client,
+        state_path=os.path.join(
+            os.environ["WORKER_TEMP_DIRECTORY"], "docker-image-cache.json"
+        ),
+        pull_policy=os.environ.get("DOCKER_PULL_POLICY", IF_OLDER_THAN_TTL),
+        ttl=float(os.environ.get("DOCKER_PULL_TTL", 3600)),
+        max_bytes=int(
+            float(os.environ.get("DOCKER_IMAGE_CACHE_MAX_MEGABYTES", 0))
+            * 1024
+            * 1024
+        ),
+    )
@@ -12,7 +12,11 @@ import json
 import os
 import shlex
 import subprocess
-from .utils import create_local_directory
+from .utils import (
+    call_with_usage,
+    get_job_log_paths,
+    record_resource_usage,
+)
 
 
 def run_executable_command(
@@ -32,25 +36,19 @@ def run_executable_command(
             command line option to specify a JSON-encoded file to read
             from.
 
+    Returns:
+        A dictionary containing the process's resource usage, which is
+        also written to the job's logs directory.
+
     Raises:
         KeyError: An environment variable specified was not available in
             the worker's environment.
         subprocess.CalledProcessError: The process returned with a
             non-zero code.
     """
-    # Set up the host log directory for the job
-    host_logs_path = os.path.join(os.environ["WORKER_LOGS_DIRECTORY"], uuid)
-
-    create_local_directory(host_logs_path)
-
-    # Build paths to stdout and stdin files
-    host_stdout_log_path = os.path.join(
-        host_logs_path, uuid + "-" + "stdout.txt"
-    )
-
-    host_stderr_log_path = os.path.join(
-        host_logs_path, uuid + "-" + "stderr.txt"
-    )
+    # Set up the host log directory for the job, and get the paths of
+    # the stdout and stderr files
+    host_stdout_log_path, host_stderr_log_path = get_job_log_paths(uuid)
 
     # Consume necessary environment variables
     try:
@@ -109,8 +107,8 @@ def run_executable_command(
     try:
         with open(host_stdout_log_path, "w") as f_stdout:
             with open(host_stderr_log_path, "w") as f_stderr:
-                # Run command
-                subprocess.check_call(
+                # Run command, measuring what it uses
+                exit_status, usage = call_with_usage(
                     args=cmd_list,
                     stdout=f_stdout,
                     stderr=f_stderr,
@@ -120,3 +118,10 @@ def run_executable_command(
         # Clean up any temp files
         for temp_file in temp_files_to_clean_up:
             os.remove(temp_file)
+
+    record_resource_usage(uuid, usage)
+
+    if exit_status != 0:
+        raise subprocess.CalledProcessError(exit_status, cmd_list)
+
+    return usage
@@ -0,0 +1,446 @@
+"""Contains a shipper which uploads job logs to S3.
+
+The frontend reads a job's logs from the AWS_LOGS_BUCKET_NAME bucket,
+under keys beginning with the job's UUID. Workers upload the files in
+each job's directory in WORKER_LOGS_DIRECTORY there once the job
+finishes and, if LOG_SHIPPING_INTERVAL is set, every so often while the
+job runs (only uploading files which changed since they were last
+uploaded).
+
+Uploads are done by a fixed number of background threads, so jobs
+never wait on S3. Each file is only uploaded by one thread at a time
+and at most one further upload of it is kept waiting, so a file's last
+upload always has its final contents. Failed uploads are retried with
+exponential backoff, unless a newer version of the file is queued up in
+the meantime. Big files are uploaded in parts, and files can optionally
+be gzipped first (with their content encoding set accordingly).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import atexit
+import collections
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Shippers for each process, keyed by process ID. Background threads
+# don't survive forks, so each (e.g., Celery worker) process needs its
+# own shipper.
+log_shippers = {}
+log_shippers_lock = threading.Lock()
+
+
+class LogShipper(object):
+    """Uploads the files in job log directories to S3."""
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name,
+        logs_directory,
+        num_threads=4,
+        multipart_threshold=8 * 1024 * 1024,
+        gzip_logs=False,
+        interval=0,
+        max_retries=5,
+        backoff_factor=1.0,
+        max_backoff=60.0,
+    ):
+        """Initialize the shipper.
+
+        Args:
+            s3_client: A boto3 S3 client.
+            bucket_name: A string containing the name of the bucket to
+                upload logs to.
+            logs_directory: A string containing the path of the
+                directory containing the directories of each job's
+                logs.
+            num_threads: An optional integer specifying how many files
+                to upload at once. Defaults to 4.
+            multipart_threshold: An optional integer specifying the
+                size in bytes above which files are uploaded in parts.
+                Defaults to 8 MiB.
+            gzip_logs: An optional boolean specifying whether to gzip
+                files before uploading them. Defaults to False.
+            interval: An optional number specifying how many seconds to
+                wait between uploads of the logs of running jobs. Zero
+                means logs are only uploaded once jobs finish. Defaults
+                to 0.
+            max_retries: An optional integer specifying how many times
+                to retry uploading a file before giving up on it.
+                Defaults to 5.
+            backoff_factor: An optional number specifying the number of
+                seconds to wait before the first retry. This doubles
+                with each subsequent retry. Defaults to 1.
+            max_backoff: An optional number specifying the maximum
+                number of seconds to wait between retries. Defaults to
+                60.
+        """
+        from boto3.s3.transfer import TransferConfig
+
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.logs_directory = logs_directory
+        self.num_threads = num_threads
+        self.gzip_logs = gzip_logs
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        # The shipper's threads are the only concurrency we want
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=1,
+            use_threads=False,
+        )
+
+        # Files waiting to be uploaded (as paths mapped to their job
+        # UUIDs), files being uploaded, and the (size, modification
+        # time) of each file when it was last queued. These are all
+        # protected by the condition.
+        self.pending_files = collections.OrderedDict()
+        self.files_in_flight = set()
+        self.queued_versions = {}
+        self.condition = threading.Condition()
+
+        self.threads = []
+
+        # Threads uploading the logs of running jobs periodically, and
+        # events to stop them with, keyed by job UUID
+        self.job_threads = {}
+
+    def start(self):
+        """Start the background threads that upload files, if needed."""
+        with self.condition:
+            self.threads = [
+                thread for thread in self.threads if thread.is_alive()
+            ]
+
+            while len(self.threads) < self.num_threads:
+                thread = threading.Thread(
+                    target=self.run, name="saltant-log-shipping"
+                )
+                thread.daemon = True
+                thread.start()
+
+                self.threads.append(thread)
+
+    def run(self):
+        """Upload files forever."""
+        while True:
+            job_uuid, path = self.get_file()
+
+            try:
+                self.upload_file_with_retries(job_uuid, path)
+            finally:
+                with self.condition:
+                    self.files_in_flight.discard(path)
+                    self.condition.notify_all()
+
+    def get_file(self):
+        """Wait for a file to upload which isn't already being uploaded.
+
+        Returns:
+            A two-tuple containing the job's UUID and the file's path.
+        """
+        with self.condition:
+            while True:
+                for path, job_uuid in self.pending_files.items():
+                    if path not in self.files_in_flight:
+                        del self.pending_files[path]
+                        self.files_in_flight.add(path)
+
+                        return job_uuid, path
+
+                self.condition.wait()
+
+    def get_key(self, job_uuid, path):
+        """Get the key to upload a job's log file to.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            path: A string containing the path of the file.
+
+        Returns:
+            A string containing the key, which is the path of the file
+            relative to the job's log directory prefixed by the job's
+            UUID.
+        """
+        relative_path = os.path.relpath(
+            path, os.path.join(self.logs_directory, job_uuid)
+        )
+
+        return job_uuid + "/" + relative_path.replace(os.sep, "/")
+
+    def upload_file_with_retries(self, job_uuid, path):
+        """Upload a log file to S3, retrying if the upload fails.
+
+        The file stays in flight while waiting to retry, so it's never
+        uploaded twice at once. Retrying stops if a newer version of the
+        file is queued up, since uploading that supersedes this upload.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            path: A string containing the path of the file.
+        """
+        for retry in range(self.max_retries + 1):
+            if retry:
+                time.sleep(
+                    min(
+                        self.max_backoff,
+                        self.backoff_factor * 2 ** (retry - 1),
+                    )
+                )
+
+                with self.condition:
+                    if path in self.pending_files:
+                        return
+
+            try:
+                self.upload_file(job_uuid, path)
+            except Exception as e:
+                logger.warning("Could not upload log file %s: %s", path, e)
+                continue
+
+            return
+
+        logger.error(
+            "Giving up on uploading log file %s after %s retries",
+            path,
+            self.max_retries,
+        )
+
+    def upload_file(self, job_uuid, path):
+        """Upload a log file to S3.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            path: A string containing the path of the file.
+        """
+        key = self.get_key(job_uuid, path)
+
+        if not self.gzip_logs:
+            self.s3_client.upload_file(
+                Filename=path,
+                Bucket=self.bucket_name,
+                Key=key,
+                Config=self.transfer_config,
+            )
+
+            return
+
+        # Compress the file a bit at a time into a temporary file
+        with tempfile.NamedTemporaryFile(suffix=".gz") as gzipped_file:
+            with open(path, "rb") as log_file:
+                with gzip.GzipFile(
+                    fileobj=gzipped_file, mode="wb"
+                ) as gzip_file:
+                    shutil.copyfileobj(log_file, gzip_file)
+
+            gzipped_file.flush()
+
+            self.s3_client.upload_file(
+                Filename=gzipped_file.name,
+                Bucket=self.bucket_name,
+                Key=key,
+                ExtraArgs={
+                    "ContentEncoding": "gzip",
+                    "ContentType": "text/plain",
+                },
+                Config=self.transfer_config,
+            )
+
+    def ship_job(self, job_uuid):
+        """Queue up uploads of a job's log files which have changed.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+        """
+        job_logs_directory = os.path.join(self.logs_directory, job_uuid)
+
+        with self.condition:
+            for directory, _, file_names in os.walk(job_logs_directory):
+                for file_name in file_names:
+                    path = os.path.join(directory, file_name)
+
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+
+                    version = (stat.st_size, stat.st_mtime)
+
+                    if self.queued_versions.get(path) == version:
+                        continue
+
+                    self.queued_versions[path] = version
+                    self.pending_files[path] = job_uuid
+
+            self.condition.notify_all()
+
+        self.start()
+
+    def ship_job_periodically(self, job_uuid, stop_event):
+        """Upload a running job's logs every interval until stopped.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+            stop_event: A threading.Event which is set when the job
+                finishes.
+        """
+        while not stop_event.wait(self.interval):
+            self.ship_job(job_uuid)
+
+    def start_job(self, job_uuid):
+        """Start uploading a job's logs periodically, if enabled.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+        """
+        if not self.interval:
+            return
+
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self.ship_job_periodically,
+            args=(job_uuid, stop_event),
+            name="saltant-log-shipping-" + job_uuid,
+        )
+        thread.daemon = True
+        thread.start()
+
+        self.job_threads[job_uuid] = (thread, stop_event)
+
+    def finish_job(self, job_uuid):
+        """Upload a finished job's logs.
+
+        Args:
+            job_uuid: A string containing the UUID of the job.
+        """
+        if job_uuid in self.job_threads:
+            thread, stop_event = self.job_threads.pop(job_uuid)
+
+            stop_event.set()
+            thread.join()
+
+        self.ship_job(job_uuid)
+
+        # The job's files won't change any more, so stop keeping track
+        # of them
+        job_logs_directory = os.path.join(self.logs_directory, job_uuid)
+
+        with self.condition:
+            for path in list(self.queued_versions):
+                if path.startswith(job_logs_directory + os.sep):
+                    del self.queued_versions[path]
+
+    def flush(self, timeout=None):
+        """Wait for all queued up uploads to finish.
+
+        Args:
+            timeout: An optional number specifying the maximum number of
+                seconds to wait. Defaults to None, which means wait
+                forever.
+
+        Returns:
+            A boolean specifying whether all uploads finished.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self.condition:
+            while self.pending_files or self.files_in_flight:
+                if timeout is None:
+                    self.condition.wait()
+                    continue
+
+                remaining_time = deadline - time.time()
+
+                if remaining_time <= 0:
+                    return False
+
+                self.condition.wait(remaining_time)
+
+            return True
+
+
+def get_log_shipper():
+    """Get the log shipper for this process.
+
+    The shipper is configured from environment variables. It's created
+    on first use and flushed when the process exits.
+
+    Returns:
+        A LogShipper, or None if no logs bucket is configured.
+    """
+    if not os.environ.get("AWS_LOGS_BUCKET_NAME"):
+        return None
+
+    pid = os.getpid()
+
+    with log_shippers_lock:
+        if pid not in log_shippers:
+            import boto3
+
+            # This'll grab its credentials from the environment. A
+            # local stand-in for S3 can be used by giving its URL.
+            s3_client = boto3.client(
+                "s3",
+                endpoint_url=os.environ.get("AWS_S3_ENDPOINT_URL") or None,
+            )
+
+            shipper = LogShipper(
+                s3_client=s3_client,
+                bucket_name=os.environ["AWS_LOGS_BUCKET_NAME"],
+                logs_directory=os.environ["WORKER_LOGS_DIRECTORY"],
+                num_threads=int(os.environ.get("LOG_SHIPPING_THREADS", 4)),
+                multipart_threshold=int(
+                    float(
+                        os.environ.get(
+                            "LOG_SHIPPING_MULTIPART_THRESHOLD_MEGABYTES", 8
+                        )
+                    )
+                    * 1024
+                    * 1024
+                ),
+                gzip_logs=os.environ.get("LOG_SHIPPING_GZIP", "False")
+                == "True",
+                interval=float(os.environ.get("LOG_SHIPPING_INTERVAL", 0)),
+                max_retries=int(os.environ.get("LOG_SHIPPING_RETRIES", 5)),
+            )
+
+            atexit.register(flush_log_shipper)
+
+            log_shippers[pid] = shipper
+
+        return log_shippers[pid]
+
+
+def flush_log_shipper():
+    """Finish any queued up log uploads for this process.
+
+    This waits at most LOG_SHIPPING_SHUTDOWN_TIMEOUT seconds (60 by
+    default), since it's meant to be called when processes exit.
+    """
+    shipper = log_shippers.get(os.getpid())
+
+    if shipper is None:
+        return
+
+    timeout = float(os.environ.get("LOG_SHIPPING_SHUTDOWN_TIMEOUT", 60))
+
+    if not shipper.flush(timeout=timeout):
+        logger.error(
+            "Timed out uploading log files: %s",
+            list(shipper.pending_files) + list(shipper.files_in_flight),
+        )
@@ -0,0 +1,111 @@
+"""Contains Prometheus metrics for workers.
+
+Workers keep metrics on how long jobs take to run, how long container
+images take to pull, and how long state updates take to send (and how
+often sending them fails). If WORKER_METRICS_PORT is set, workers serve
+their metrics over HTTP on that port.
+
+Celery workers run jobs in child processes, each of which keeps its own
+metrics. For the metrics of every process to be served together, set
+prometheus_multiproc_dir to a directory which only this worker uses;
+each process then writes its metrics there, and the directory is
+emptied when the worker starts.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import glob
+import logging
+import os
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# Buckets (in seconds) for jobs and image pulls, which can take hours
+LONG_DURATION_BUCKETS = (
+    1,
+    5,
+    15,
+    30,
+    60,
+    120,
+    300,
+    600,
+    1800,
+    3600,
+    7200,
+    14400,
+    43200,
+    86400,
+    float("inf"),
+)
+
+run_task_duration_seconds = Histogram(
+    "saltant_worker_run_task_duration_seconds",
+    "How long jobs took to run (after being admitted).",
+    ["task_class"],
+    buckets=LONG_DURATION_BUCKETS,
+)
+image_pull_duration_seconds = Histogram(
+    "saltant_worker_image_pull_duration_seconds",
+    "How long container images took to pull.",
+    ["container_type"],
+    buckets=LONG_DURATION_BUCKETS,
+)
+state_update_request_duration_seconds = Histogram(
+    "saltant_worker_state_update_request_duration_seconds",
+    "How long requests sending state updates took.",
+)
+state_update_failures = Counter(
+    "saltant_worker_state_update_failures",
+    "How many requests sending state updates failed.",
+    ["reason"],
+)
+
+
+def get_metrics_registry():
+    """Get the registry of the metrics to expose.
+
+    Returns:
+        A CollectorRegistry which collects the metrics of every process
+        writing to prometheus_multiproc_dir if it's set, or otherwise
+        the metrics of this process.
+    """
+    if not os.environ.get("prometheus_multiproc_dir"):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return registry
+
+
+def start_metrics_server():
+    """Serve this worker's metrics over HTTP, if configured to.
+
+    This should be called from the worker's main process, before it
+    starts its child processes.
+    """
+    port = int(os.environ.get("WORKER_METRICS_PORT") or 0)
+
+    if not port:
+        return
+
+    # Forget the metrics of processes from previous runs
+    multiproc_dir = os.environ.get("prometheus_multiproc_dir")
+
+    if multiproc_dir:
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+    start_http_server(port, registry=get_metrics_registry())
+
+    logger.info("Serving metrics on port %s", port)
@@ -0,0 +1,350 @@
+"""Contains a cache for the Singularity images that workers run.
+
+Singularity images are pulled into files named by the commit (or
+digest) they resolve to. Rather than pulling an image before every job,
+workers reuse the file from the last pull according to the same pull
+policies as Docker images (see the docker_images module), so reusing an
+image doesn't touch the network at all.
+
+Pulls of the same image are also done one at a time: a job which needs
+an image waits on a lock held by whichever job is pulling it, and then
+uses the file that job pulled instead of pulling again.
+
+Image files that jobs have used can also be removed (least recently
+used first) when they take up more than a given amount of disk space.
+Jobs mark the files they're running as in use (by process ID) until
+their containers exit, and files in use by running processes are never
+removed. The cache's state (which file each image reference resolved
+to, when it was pulled and last used, and which processes are using
+it) along with hit and miss counts are kept in a JSON file shared by
+every worker process on the host.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import contextlib
+import errno
+import hashlib
+import logging
+import os
+import time
+from tasksapi.constants import SINGULARITY
+from .docker_images import (
+    ALWAYS,
+    EVICTION,
+    HIT,
+    IF_NOT_PRESENT,
+    IF_OLDER_THAN_TTL,
+    MISS,
+    OUTCOMES,
+    PULL_POLICIES,
+    REFRESH,
+    is_pinned,
+)
+from .metrics import image_pull_duration_seconds
+from .utils import file_lock, locked_json_file, process_is_alive
+
+logger = logging.getLogger(__name__)
+
+
+class SingularityImageCache(object):
+    """Decides when to pull Singularity images and evicts unused ones."""
+
+    def __init__(
+        self,
+        pull,
+        state_path,
+        pull_policy=IF_OLDER_THAN_TTL,
+        ttl=3600,
+        max_bytes=0,
+    ):
+        """Initialize the cache.
+
+        Args:
+            pull: A function which takes an image reference, pulls the
+                image, and returns a string containing the path of the
+                pulled image file.
+            state_path: A string containing the path of the JSON file
+                to keep the cache's state in. Pull locks are kept
+                alongside it.
+            pull_policy: An optional string which must be one of the
+                pull policies. Defaults to IF_OLDER_THAN_TTL.
+            ttl: An optional number specifying how many seconds images
+                are considered fresh for with the IF_OLDER_THAN_TTL
+                pull policy. Defaults to 3600.
+            max_bytes: An optional integer specifying how much disk
+                space images pulled through the cache may use before
+                the least recently used ones are removed. Zero means
+                there's no limit. Defaults to 0.
+
+        Raises:
+            ValueError: The pull policy isn't valid.
+        """
+        if pull_policy not in PULL_POLICIES:
+            raise ValueError(
+                "%s is not one of the pull policies %s"
+                % (pull_policy, ", ".join(PULL_POLICIES))
+            )
+
+        self.pull = pull
+        self.state_path = state_path
+        self.pull_policy = pull_policy
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def get_pull_lock_path(self, container_image):
+        """Get the path of the file locked while pulling an image.
+
+        Args:
+            container_image: A string containing an image reference.
+
+        Returns:
+            A string containing the path of the lock file.
+        """
+        return "%s.%s.lock" % (
+            self.state_path,
+            hashlib.sha1(container_image.encode("utf-8")).hexdigest(),
+        )
+
+    def needs_pull(self, container_image, entry, requested_at, now):
+        """Determine whether an image needs to be pulled.
+
+        Args:
+            container_image: A string containing an image reference.
+            entry: A dictionary containing the cache's record of the
+                image, or None if there isn't one.
+            requested_at: A number containing the Unix time the image
+                was asked for (before waiting for other pulls).
+            now: A number containing the current Unix time.
+
+        Returns:
+            A string containing the outcome: MISS or REFRESH if the
+            image needs to be pulled, or HIT otherwise.
+        """
+        if entry is None or not os.path.isfile(entry["path"]):
+            return MISS
+
+        # Somebody else pulled the image while we were waiting for them
+        if entry["pulled_at"] >= requested_at:
+            return HIT
+
+        if is_pinned(container_image) or self.pull_policy == IF_NOT_PRESENT:
+            return HIT
+
+        if self.pull_policy == ALWAYS:
+            return REFRESH
+
+        if now - entry["pulled_at"] >= self.ttl:
+            return REFRESH
+
+        return HIT
+
+    def get_image(self, container_image, mark_in_use=False):
+        """Make sure an image's file exists, pulling it if necessary.
+
+        Args:
+            container_image: A string containing an image reference.
+            mark_in_use: An optional boolean specifying whether to mark
+                the image file as in use by this process, so that it
+                isn't removed until release_image is called. Defaults
+                to False.
+
+        Returns:
+            A string containing the path of the image file to run.
+        """
+        requested_at = time.time()
+
+        with file_lock(self.get_pull_lock_path(container_image)):
+            with locked_json_file(self.state_path) as state:
+                entry = state.get("images", {}).get(container_image)
+
+            now = time.time()
+            outcome = self.needs_pull(
+                container_image, entry, requested_at, now
+            )
+
+            if outcome == HIT:
+                path = entry["path"]
+                pulled_at = entry["pulled_at"]
+            else:
+                with image_pull_duration_seconds.labels(SINGULARITY).time():
+                    path = self.pull(container_image)
+
+                pulled_at = time.time()
+
+            logger.info(
+                "Singularity image cache %s for %s (%s)",
+                outcome,
+                container_image,
+                path,
+            )
+
+            with locked_json_file(self.state_path) as state:
+                images = state.setdefault("images", {})
+                stats = state.setdefault("stats", {})
+
+                images[container_image] = {
+                    "path": path,
+                    "size": os.path.getsize(path),
+                    "pulled_at": pulled_at,
+                    "last_used": now,
+                }
+                stats[outcome] = stats.get(outcome, 0) + 1
+
+                if mark_in_use:
+                    state.setdefault("in_use", {}).setdefault(
+                        path, []
+                    ).append(os.getpid())
+
+                if self.max_bytes:
+                    self.evict(state, keep=container_image)
+
+        return path
+
+    def release_image(self, path):
+        """Unmark an image file as in use by this process.
+
+        Args:
+            path: A string containing the path of the image file, as
+                returned by get_image.
+        """
+        with locked_json_file(self.state_path) as state:
+            in_use = state.get("in_use", {})
+            pids = in_use.get(path, [])
+
+            if os.getpid() in pids:
+                pids.remove(os.getpid())
+
+            if not pids:
+                in_use.pop(path, None)
+
+    @contextlib.contextmanager
+    def use_image(self, container_image):
+        """Get an image's file and keep it from being removed while used.
+
+        Args:
+            container_image: A string containing an image reference.
+
+        Yields:
+            A string containing the path of the image file to run.
+        """
+        path = self.get_image(container_image, mark_in_use=True)
+
+        try:
+            yield path
+        finally:
+            self.release_image(path)
+
+    def evict(self, state, keep):
+        """Remove least recently used image files until within budget.
+
+        Only image files which jobs have used are removed, and never
+        files in use by running processes. Files which can't be removed
+        are skipped.
+
+        Args:
+            state: The cache's state, which is updated in place.
+            keep: A string containing an image reference not to remove
+                (e.g., the image about to be run).
+        """
+        images = state["images"]
+        stats = state["stats"]
+
+        # Forget processes which exited (e.g., were killed) without
+        # releasing their image files
+        in_use = state.setdefault("in_use", {})
+
+        for path in list(in_use):
+            in_use[path] = [
+                pid for pid in in_use[path] if process_is_alive(pid)
+            ]
+
+            if not in_use[path]:
+                del in_use[path]
+
+        # References resolving to the same commit share a file, so count
+        # sizes by path
+        sizes = {entry["path"]: entry["size"] for entry in images.values()}
+        total_bytes = sum(sizes.values())
+        keep_path = images[keep]["path"]
+
+        for container_image in sorted(
+            images, key=lambda reference: images[reference]["last_used"]
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+
+            # Already removed along with another reference to its file
+            if container_image not in images:
+                continue
+
+            path = images[container_image]["path"]
+
+            if path == keep_path or path in in_use:
+                continue
+
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    logger.warning(
+                        "Could not evict Singularity image %s: %s",
+                        container_image,
+                        e,
+                    )
+                    continue
+
+            logger.info("Evicted Singularity image %s", container_image)
+
+            # Forget every reference to the removed file
+            for reference in [
+                reference
+                for reference, entry in images.items()
+                if entry["path"] == path
+            ]:
+                del images[reference]
+
+            total_bytes -= sizes.pop(path, 0)
+            stats[EVICTION] = stats.get(EVICTION, 0) + 1
+
+    def get_stats(self):
+        """Get the cache's hit, miss, refresh, and eviction counts.
+
+        Returns:
+            A dictionary whose keys are the outcomes and whose values
+            are integers containing how many times they happened.
+        """
+        with locked_json_file(self.state_path) as state:
+            stats = state.get("stats", {})
+
+        return {outcome: stats.get(outcome, 0) for outcome in OUTCOMES}
+
+
+def get_singularity_image_cache(pull):
+    """Make a Singularity image cache configured from the environment.
+
+    Args:
+        pull: A function which takes an image reference, pulls the
+            image, and returns a string containing the path of the
+            pulled image file.
+
+    Returns:
+        A SingularityImageCache.
+    """
+    return SingularityImageCache(
+        pull=pull,
+        state_path=os.path.join(
+            os.environ["WORKER_SINGULARITY_IMAGES_DIRECTORY"],
+            "singularity-image-cache.json",
+        ),
+        pull_policy=os.environ.get(
+            "SINGULARITY_PULL_POLICY", IF_OLDER_THAN_TTL
+        ),
+        ttl=float(os.environ.get("SINGULARITY_PULL_TTL", 3600)),
+        max_bytes=int(
+            float(os.environ.get("SINGULARITY_IMAGE_CACHE_MAX_MEGABYTES", 0))
+            * 1024
+            * 1024
+        ),
+    )
@@ -0,0 +1,349 @@
+"""Contains a client for sending task instance state updates.
+
+State updates are sent to the server's bulk state update endpoint. The
+client keeps a pooled HTTP session (so connections are kept alive
+between requests), queues updates up (keeping only the latest update
+for each task instance), and sends them in batches from a background
+thread, so that whatever is reporting a state change (e.g.,
+a Celery signal handler) never has to wait on the server. Batches which
+can't be delivered are retried with exponential backoff, so a short API
+outage doesn't lose any state updates.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+import atexit
+import collections
+import datetime
+import logging
+import os
+import threading
+import time
+import requests
+from .metrics import (
+    state_update_failures,
+    state_update_request_duration_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying for, in addition to any server error
+RETRYABLE_STATUS_CODES = (408, 429)
+
+# Clients for each process, keyed by process ID. Background threads
+# don't survive forks, so each (e.g., Celery worker) process needs its
+# own client.
+state_update_clients = {}
+state_update_clients_lock = threading.Lock()
+
+
+class StateUpdateClient(object):
+    """A client which sends task instance state updates in batches."""
+
+    def __init__(
+        self,
+        base_url,
+        api_token,
+        batch_size=100,
+        flush_interval=1.0,
+        max_retries=10,
+        backoff_factor=0.5,
+        max_backoff=60.0,
+        request_timeout=30.0,
+    ):
+        """Initialize the client.
+
+        Args:
+            base_url: A string containing the base URL of the server;
+                e.g., "https://www.saltant.org".
+            api_token: A string containing a valid token for the API.
+            batch_size: An optional integer specifying the maximum
+                number of updates to send per request. Defaults to 100.
+            flush_interval: An optional number specifying the maximum
+                number of seconds to wait for a batch to fill up before
+                sending it. Defaults to 1.
+            max_retries: An optional integer specifying how many times
+                to retry sending a batch before giving up on it.
+                Defaults to 10.
+            backoff_factor: An optional number specifying the number of
+                seconds to wait before the first retry. This doubles
+                with each subsequent retry. Defaults to 0.5.
+            max_backoff: An optional number specifying the maximum
+                number of seconds to wait between retries. Defaults to
+                60.
+            request_timeout: An optional number specifying how many
+                seconds to wait for the server to respond to a request.
+                Defaults to 30.
+        """
+        self.endpoint_url = (
+            base_url.rstrip("/") + "/api/updatetaskinstancestatus/"
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.request_timeout = request_timeout
+
+        # A session keeps connections to the server alive
+        self.session = requests.Session()
+        self.session.headers.update(
+            {"Authorization": "Token {}".format(api_token)}
+        )
+
+        # Updates waiting to be sent (keyed by UUID), and the number of
+        # updates being sent right now. Both are protected by the
+        # condition.
+        self.pending_updates = collections.OrderedDict()
+        self.num_updates_in_flight = 0
+        self.flush_requested = False
+        self.condition = threading.Condition()
+
+        self.thread = None
+
+    def put(self, job_uuid, state, resource_usage=None):
+        """Queue up a state update for a task instance.
+
+        This replaces any update for the task instance that is still
+        waiting to be sent (keeping when the task instance entered the
+        replaced update's state, and its resource usage if this update
+        doesn't have any).
+
+        Args:
+            job_uuid: A string containing the UUID for the task instance
+                to update.
+            state: A string which must be one of the state constants.
+            resource_usage: An optional dictionary containing the
+                resources the task instance's job used.
+        """
+        update = {
+            "uuid": str(job_uuid),
+            "state": state,
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        }
+
+        with self.condition:
+            pending_update = self.pending_updates.get(update["uuid"])
+
+            if pending_update is not None:
+                update["state_timestamps"] = dict(
+                    pending_update.get("state_timestamps", {}),
+                    **{pending_update["state"]: pending_update["timestamp"]}
+                )
+
+                if resource_usage is None:
+                    resource_usage = pending_update.get("resource_usage")
+
+            if resource_usage is not None:
+                update["resource_usage"] = resource_usage
+
+            self.pending_updates[update["uuid"]] = update
+            self.condition.notify_all()
+
+        self.start()
+
+    def start(self):
+        """Start the background thread that sends updates, if needed."""
+        with self.condition:
+            if self.thread is not None and self.thread.is_alive():
+                return
+
+            self.thread = threading.Thread(
+                target=self.run, name="saltant-state-updates"
+            )
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        """Send batches of updates forever."""
+        while True:
+            self.send_batch(self.get_batch())
+
+    def get_batch(self):
+        """Wait for a batch of updates to send.
+
+        The batch is sent once it's full, once the flush interval has
+        passed since the first update came in, or once a flush has been
+        requested, whichever comes first.
+
+        Returns:
+            A non-empty list of update dictionaries.
+        """
+        with self.condition:
+            while not self.pending_updates:
+                self.condition.wait()
+
+            deadline = time.time() + self.flush_interval
+
+            while (
+                len(self.pending_updates) < self.batch_size
+                and not self.flush_requested
+            ):
+                remaining_time = deadline - time.time()
+
+                if remaining_time <= 0:
+                    break
+
+                self.condition.wait(remaining_time)
+
+            batch = [
+                self.pending_updates.popitem(last=False)[1]
+                for _ in range(min(self.batch_size, len(self.pending_updates)))
+            ]
+            self.num_updates_in_flight = len(batch)
+
+            return batch
+
+    def send_batch(self, batch):
+        """Send a batch of updates to the server.
+
+        Args:
+            batch: A list of update dictionaries.
+        """
+        try:
+            for retry in range(self.max_retries + 1):
+                if retry:
+                    time.sleep(
+                        min(
+                            self.max_backoff,
+                            self.backoff_factor * 2 ** (retry - 1),
+                        )
+                    )
+
+                try:
+                    with state_update_request_duration_seconds.time():
+                        response = self.session.patch(
+                            self.endpoint_url,
+                            json=batch,
+                            timeout=self.request_timeout,
+                        )
+                except requests.RequestException as e:
+                    logger.warning("Could not send state updates: %s", e)
+                    state_update_failures.labels("connection_error").inc()
+                    continue
+
+                if (
+                    response.status_code >= 500
+                    or response.status_code in RETRYABLE_STATUS_CODES
+                ):
+                    logger.warning(
+                        "Could not send state updates: HTTP %s",
+                        response.status_code,
+                    )
+                    state_update_failures.labels("server_error").inc()
+                    continue
+
+                # Retrying client errors won't help
+                if not response.ok:
+                    logger.error(
+                        "State updates rejected: HTTP %s: %s",
+                        response.status_code,
+                        response.text,
+                    )
+                    state_update_failures.labels("rejected").inc()
+
+                return
+
+            state_update_failures.labels("dropped").inc()
+            logger.error(
+                "Giving up on %s state updates after %s retries: %s",
+                len(batch),
+                self.max_retries,
+                batch,
+            )
+        finally:
+            with self.condition:
+                self.num_updates_in_flight = 0
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait for all queued up updates to be sent.
+
+        Args:
+            timeout: An optional number specifying the maximum number of
+                seconds to wait. Defaults to None, which means wait
+                forever.
+
+        Returns:
+            A boolean specifying whether all updates were sent.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self.condition:
+            if not self.pending_updates and not self.num_updates_in_flight:
+                return True
+
+            self.flush_requested = True
+            self.condition.notify_all()
+
+        self.start()
+
+        with self.condition:
+            try:
+                while self.pending_updates or self.num_updates_in_flight:
+                    if timeout is None:
+                        self.condition.wait()
+                        continue
+
+                    remaining_time = deadline - time.time()
+
+                    if remaining_time <= 0:
+                        return False
+
+                    self.condition.wait(remaining_time)
+
+                return True
+            finally:
+                self.flush_requested = False
+
+
+def get_state_update_client():
+    """Get the state update client for this process.
+
+    The client is configured from environment variables. It's created
+    on first use and flushed when the process exits.
+
+    Returns:
+        A StateUpdateClient.
+    """
+    pid = os.getpid()
+
+    with state_update_clients_lock:
+        if pid not in state_update_clients:
+            client = StateUpdateClient(
+                base_url=os.environ["DJANGO_BASE_URL"],
+                api_token=os.environ["API_AUTH_TOKEN"],
+                batch_size=int(os.environ.get("STATE_UPDATE_BATCH_SIZE", 100)),
+                flush_interval=float(
+                    os.environ.get("STATE_UPDATE_FLUSH_INTERVAL", 1)
+                ),
+                max_retries=int(os.environ.get("STATE_UPDATE_RETRIES", 10)),
+            )
+
+            atexit.register(flush_state_update_client)
+
+            state_update_clients[pid] = client
+
+        return state_update_clients[pid]
+
+
+def flush_state_update_client():
+    """Send any queued up state updates for this process.
+
+    This waits at most STATE_UPDATE_SHUTDOWN_TIMEOUT seconds (10 by
+    default), since it's meant to be called when processes exit.
+    """
+    client = state_update_clients.get(os.getpid())
+
+    if client is None:
+        return
+
+    timeout = float(os.environ.get("STATE_UPDATE_SHUTDOWN_TIMEOUT", 10))
+
+    if not client.flush(timeout=timeout):
+        logger.error(
+            "Timed out sending state updates: %s",
+            list(client.pending_updates.values()),
+        )
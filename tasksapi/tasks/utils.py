@@ -3,9 +3,19 @@
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
+import contextlib
 import errno
+import fcntl
+import json
 import os
+import subprocess
 import sys
+import time
+
+
+# The resources used by jobs which finished in this process, keyed by
+# job UUID, waiting to be sent with the jobs' final state updates
+job_resource_usages = {}
 
 
 def create_local_directory(path):
@@ -38,3 +48,226 @@ def mkdir_p(path):
             pass
         else:
             raise
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a file.
+
+    This lets processes on the same host (e.g., Celery worker
+    processes) take turns doing something. The file is created if
+    necessary, along with its directory.
+
+    Args:
+        path: A string containing the path of the file to lock.
+    """
+    create_local_directory(os.path.dirname(path) or ".")
+
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def locked_json_file(path, default=None):
+    """Read and write a JSON file while holding an exclusive lock on it.
+
+    This lets processes on the same host share state. The lock is held
+    on a separate ".lock" file so the JSON file itself can be replaced
+    atomically.
+
+    Args:
+        path: A string containing the path of the JSON file. Its
+            directory is created if necessary.
+        default: An optional object to use if the file doesn't exist or
+            can't be read. Defaults to an empty dictionary.
+
+    Yields:
+        The decoded contents of the file. Any changes made to it are
+        written back to the file afterwards.
+    """
+    with file_lock(path + ".lock"):
+        try:
+            with open(path) as json_file:
+                contents = json.load(json_file)
+        except (IOError, OSError, ValueError):
+            contents = {} if default is None else default
+
+        yield contents
+
+        # Write to a temporary file first so that the file is never left
+        # half written
+        temp_path = path + ".tmp"
+
+        with open(temp_path, "w") as json_file:
+            json.dump(contents, json_file)
+
+        os.rename(temp_path, path)
+
+
+def process_is_alive(pid):
+    """Determine whether a process on this host is still running.
+
+    Args:
+        pid: An integer containing the ID of the process.
+
+    Returns:
+        A boolean specifying whether the process is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # Processes we can't signal are still running
+        return e.errno == errno.EPERM
+
+    return True
+
+
+def get_job_log_paths(uuid):
+    """Get the paths of the files a job's output is written to.
+
+    These are in the job's directory in the worker's logs directory,
+    which is created if necessary.
+
+    Args:
+        uuid: A string containing the uuid of the job.
+
+    Returns:
+        A two-tuple of strings containing the paths of the files for the
+        job's stdout and stderr, respectively.
+    """
+    host_logs_path = os.path.join(os.environ["WORKER_LOGS_DIRECTORY"], uuid)
+
+    create_local_directory(host_logs_path)
+
+    return (
+        os.path.join(host_logs_path, uuid + "-" + "stdout.txt"),
+        os.path.join(host_logs_path, uuid + "-" + "stderr.txt"),
+    )
+
+
+def write_chunks_to_file(chunks, path):
+    """Write chunks of output to a file as they come in.
+
+    Only one chunk is held in memory at a time, and the file is flushed
+    after each chunk so that it can be read while it's being written.
+
+    Args:
+        chunks: An iterable of byte strings.
+        path: A string containing the path of the file to write to.
+    """
+    with open(path, "wb") as output_file:
+        for chunk in chunks:
+            output_file.write(chunk)
+            output_file.flush()
+
+
+def read_file_tail(path, num_bytes=4096):
+    """Read the end of a file.
+
+    Args:
+        path: A string containing the path of the file.
+        num_bytes: An optional integer specifying the maximum number of
+            bytes to read. Defaults to 4096.
+
+    Returns:
+        A string containing (at most) the last num_bytes bytes of the
+        file, decoded as UTF-8.
+    """
+    with open(path, "rb") as input_file:
+        input_file.seek(0, os.SEEK_END)
+        input_file.seek(max(0, input_file.tell() - num_bytes))
+
+        return input_file.read().decode("utf-8", "replace")
+
+
+def record_resource_usage(uuid, usage):
+    """Record the resources a job used.
+
+    The usage is written to the job's logs directory (so it's shipped
+    along with the job's logs) and kept until the job's final state
+    update picks it up (see pop_resource_usage).
+
+    Args:
+        uuid: A string containing the uuid of the job.
+        usage: A dictionary containing the job's resource usage.
+    """
+    host_logs_path = os.path.join(os.environ["WORKER_LOGS_DIRECTORY"], uuid)
+
+    create_local_directory(host_logs_path)
+
+    with open(
+        os.path.join(host_logs_path, uuid + "-resource-usage.json"), "w"
+    ) as usage_file:
+        json.dump(usage, usage_file, indent=2, sort_keys=True)
+
+    job_resource_usages[uuid] = usage
+
+
+def pop_resource_usage(uuid):
+    """Get and forget the resources a job used.
+
+    Args:
+        uuid: A string containing the uuid of the job.
+
+    Returns:
+        A dictionary containing the job's resource usage, or None if
+        none was recorded.
+    """
+    return job_resource_usages.pop(uuid, None)
+
+
+def call_with_usage(args, **kwargs):
+    """Run a command as in subprocess.call, measuring its usage.
+
+    The command is waited on with os.wait4, which gives the resources
+    used by the command and any of its children it waited on. Bytes
+    read and written only count what actually went to or from disk
+    (i.e., not what was served by the page cache).
+
+    Args:
+        args: A list of strings containing the command to run.
+        **kwargs: Keyword arguments for subprocess.Popen.
+
+    Returns:
+        A two-tuple containing the command's exit code and a dictionary
+        containing the command's wall time, user and system CPU time
+        (all in seconds), peak memory usage (in megabytes), and bytes
+        read and written.
+    """
+    start_time = time.time()
+    process = subprocess.Popen(args, **kwargs)
+
+    while True:
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            break
+        except OSError as e:
+            # Retry waits interrupted by signals (which Python 3.5+ does
+            # for us)
+            if e.errno != errno.EINTR:
+                raise
+
+    # Let the Popen object know the command is done
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+
+    return (
+        process.returncode,
+        {
+            "wall_time_seconds": time.time() - start_time,
+            "cpu_user_seconds": rusage.ru_utime,
+            "cpu_system_seconds": rusage.ru_stime,
+            # This is in kilobytes on Linux
+            "peak_memory_megabytes": rusage.ru_maxrss / 1024,
+            # These are in 512 byte blocks
+            "bytes_read": rusage.ru_inblock * 512,
+            "bytes_written": rusage.ru_oublock * 512,
+        },
+    )
@@ -8,11 +8,59 @@ from .execution_tests.executable_execution_tests import (
 from .models_tests.queue_permission_attrs_tests import (
     TaskQueuePermissionAttributesTests,
 )
+from .models_tests.queue_permissions_cache_tests import (
+    TaskQueuePermissionsCacheTests,
+)
 from .models_tests.queue_whitelist_tests import TaskQueueWhitelistTests
+from .models_tests.task_instance_indexes_tests import (
+    TaskInstanceIndexesTests,
+)
+from .models_tests.task_instance_lookups_tests import (
+    TaskInstanceLookupsTests,
+)
+from .models_tests.task_instance_state_counts_tests import (
+    TaskInstanceStateCountsTests,
+)
+from .models_tests.task_instance_state_transitions_tests import (
+    TaskInstanceStateTransitionsTests,
+)
 from .requests_tests.basic_requests_tests import BasicHTTPRequestsTests
+from .requests_tests.bulk_submission_requests_tests import (
+    BulkSubmissionRequestsTests,
+)
+from .requests_tests.latency_requests_tests import LatencyRequestsTests
+from .requests_tests.log_cache_requests_tests import (
+    LogCacheRequestsTests,
+)
+from .requests_tests.log_requests_tests import LogRequestsTests
+from .requests_tests.metrics_requests_tests import MetricsRequestsTests
+from .requests_tests.pagination_requests_tests import (
+    PaginationRequestsTests,
+)
+from .requests_tests.query_count_requests_tests import (
+    QueryCountRequestsTests,
+)
+from .requests_tests.resource_limits_requests_tests import (
+    ResourceLimitsRequestsTests,
+)
+from .requests_tests.state_update_requests_tests import (
+    StateUpdateRequestsTests,
+)
 from .requests_tests.user_editing_permissions_requests_tests import (
     UserEditPermissionsRequestsTests,
 )
 from .requests_tests.user_queue_permissions_requests_tests import (
     UserQueuePermissionsRequestsTests,
 )
+from .tasks_tests.container_log_tests import ContainerLogTests
+from .tasks_tests.container_resource_limits_tests import (
+    ContainerResourceLimitsTests,
+)
+from .tasks_tests.docker_client_tests import DockerClientTests
+from .tasks_tests.docker_image_cache_tests import DockerImageCacheTests
+from .tasks_tests.log_shipping_tests import LogShippingTests
+from .tasks_tests.resource_admission_tests import ResourceAdmissionTests
+from .tasks_tests.singularity_image_cache_tests import (
+    SingularityImageCacheTests,
+)
+from .tasks_tests.state_update_client_tests import StateUpdateClientTests
@@ -0,0 +1,137 @@
+"""Contains tests for the cached task queue permissions."""
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskQueue,
+    TaskWhitelist,
+    User,
+    get_allowed_queue_pks,
+    invalidate_queue_permissions,
+)
+from tasksapi.utils import get_allowed_queues
+
+# Put info about our fixtures data as constants here
+QUEUE_PK = 1
+INACTIVE_QUEUE_PK = 2
+PRIVATE_QUEUE_PK = 3
+EXECUTABLE_QUEUE_PK = 4
+DOCKER_QUEUE_PK = 5
+SINGULARITY_QUEUE_PK = 6
+ADMIN_USER_PK = 1
+NON_ADMIN_USER_PK = 2
+WHITELIST_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+NON_WHITELISTED_EXECUTABLE_TASK_TYPE_PK = 2
+
+
+class TaskQueuePermissionsCacheTests(TestCase):
+    """Test validating task instances with cached queue permissions."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Build a task instance to validate.
+
+        Note that rolling back earlier tests' changes to queues doesn't
+        invalidate the cache, so do that here.
+        """
+        invalidate_queue_permissions()
+
+        self.queue = TaskQueue.objects.get(pk=QUEUE_PK)
+        self.instance = ExecutableTaskInstance(
+            user=User.objects.get(pk=NON_ADMIN_USER_PK),
+            task_type=ExecutableTaskType.objects.get(
+                pk=EXECUTABLE_TASK_TYPE_PK
+            ),
+            task_queue=self.queue,
+        )
+
+    def test_cached_validation(self):
+        """Make sure validating a queue doesn't need queries when cached."""
+        self.instance.clean_task_queue()
+
+        with self.assertNumQueries(0):
+            self.instance.clean_task_queue()
+
+    def test_allowed_queues(self):
+        """Make sure the allowed queues respect queue attributes."""
+        admin_user = User.objects.get(pk=ADMIN_USER_PK)
+        non_admin_user = User.objects.get(pk=NON_ADMIN_USER_PK)
+        task_type = ExecutableTaskType.objects.get(pk=EXECUTABLE_TASK_TYPE_PK)
+
+        self.assertEqual(
+            get_allowed_queue_pks(admin_user),
+            {
+                QUEUE_PK,
+                PRIVATE_QUEUE_PK,
+                EXECUTABLE_QUEUE_PK,
+                DOCKER_QUEUE_PK,
+                SINGULARITY_QUEUE_PK,
+            },
+        )
+        self.assertEqual(
+            get_allowed_queue_pks(non_admin_user, task_type),
+            {QUEUE_PK, EXECUTABLE_QUEUE_PK},
+        )
+        self.assertEqual(
+            set(
+                get_allowed_queues(admin_user, task_type).values_list(
+                    "pk", flat=True
+                )
+            ),
+            {QUEUE_PK, PRIVATE_QUEUE_PK, EXECUTABLE_QUEUE_PK},
+        )
+        self.assertFalse(
+            get_allowed_queue_pks(
+                admin_user,
+                ExecutableTaskType.objects.get(
+                    pk=NON_WHITELISTED_EXECUTABLE_TASK_TYPE_PK
+                ),
+            )
+        )
+
+    def test_queue_changes_invalidate(self):
+        """Make sure changes to queues are seen right away."""
+        self.instance.clean_task_queue()
+
+        self.queue.private = True
+        self.queue.save()
+
+        with self.assertRaises(ValidationError):
+            self.instance.clean_task_queue()
+
+    def test_whitelist_changes_invalidate(self):
+        """Make sure changes to whitelists are seen right away."""
+        self.instance.clean_task_queue()
+
+        whitelist = TaskWhitelist.objects.get(pk=WHITELIST_PK)
+        whitelist.whitelisted_executable_task_types.remove(
+            self.instance.task_type
+        )
+
+        with self.assertRaises(ValidationError):
+            self.instance.clean_task_queue()
+
+        whitelist.whitelisted_executable_task_types.add(
+            self.instance.task_type
+        )
+        self.instance.clean_task_queue()
+
+        self.queue.whitelists.clear()
+
+        with self.assertRaises(ValidationError):
+            self.instance.clean_task_queue()
+
+    def test_new_queues(self):
+        """Make sure queues made after caching permissions are found."""
+        get_allowed_queue_pks(self.instance.user)
+
+        queue = TaskQueue.objects.create(
+            name="new-queue", user=self.instance.user
+        )
+        queue.whitelists.add(WHITELIST_PK)
+
+        self.assertIn(queue.pk, get_allowed_queue_pks(self.instance.user))
@@ -0,0 +1,47 @@
+"""Contains tests for the task instance indexes benchmark."""
+
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from tasksapi.models import ExecutableTaskInstance, ExecutableTaskType, User
+
+
+class TaskInstanceIndexesTests(TestCase):
+    """Test the command benchmarking task instance queries."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def test_benchmark(self):
+        """Make sure queries are timed and nothing is left behind."""
+        num_instances = ExecutableTaskInstance.objects.count()
+        num_task_types = ExecutableTaskType.objects.count()
+        num_users = User.objects.count()
+
+        stdout = StringIO()
+        call_command(
+            "benchmark_task_instance_queries",
+            instances=1000,
+            runs=1,
+            stdout=stdout,
+        )
+        output = stdout.getvalue()
+
+        # The indexes should be used while they exist
+        self.assertIn("Index Scan using eti_created_idx", output)
+        self.assertIn("eti_unfinished_idx", output)
+        self.assertIn("Benchmarked 1000 task instances", output)
+
+        # Everything should've been rolled back, indexes included
+        self.assertEqual(
+            ExecutableTaskInstance.objects.count(), num_instances
+        )
+        self.assertEqual(ExecutableTaskType.objects.count(), num_task_types)
+        self.assertEqual(User.objects.count(), num_users)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_indexes WHERE indexname LIKE %s;",
+                ["eti_%"],
+            )
+
+            self.assertEqual(cursor.fetchone()[0], 4)
@@ -0,0 +1,101 @@
+"""Contains tests for looking up task instances by UUID."""
+
+import uuid
+from django.test import TestCase
+from tasksapi.constants import EXECUTABLE_TASK
+from tasksapi.models import (
+    ContainerTaskInstance,
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskInstanceLookup,
+    TaskQueue,
+    User,
+    bulk_create_task_instances,
+    get_task_instance_model,
+)
+
+# Put info about our fixtures data as constants here
+QUEUE_PK = 1
+USER_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+CONTAINER_TASK_INSTANCE_UUID = "e7133970-ac3c-4026-adcf-55ee170d4eb3"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+
+
+class TaskInstanceLookupsTests(TestCase):
+    """Test recording and looking up the classes of task instances."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def build_executable_task_instance(self):
+        """Build an unsaved executable task instance.
+
+        Returns:
+            An executable task instance.
+        """
+        return ExecutableTaskInstance(
+            user=User.objects.get(pk=USER_PK),
+            task_type=ExecutableTaskType.objects.get(
+                pk=EXECUTABLE_TASK_TYPE_PK
+            ),
+            task_queue=TaskQueue.objects.get(pk=QUEUE_PK),
+        )
+
+    def test_fixture_lookups(self):
+        """Make sure task instances from fixtures can be looked up."""
+        self.assertEqual(
+            get_task_instance_model(CONTAINER_TASK_INSTANCE_UUID),
+            ContainerTaskInstance,
+        )
+        self.assertEqual(
+            get_task_instance_model(EXECUTABLE_TASK_INSTANCE_UUID),
+            ExecutableTaskInstance,
+        )
+        self.assertIsNone(get_task_instance_model(uuid.uuid4()))
+
+    def test_lookups_follow_task_instances(self):
+        """Make sure lookups are made and removed with task instances."""
+        instance = self.build_executable_task_instance()
+        instance.save()
+
+        self.assertEqual(
+            TaskInstanceLookup.objects.get(uuid=instance.uuid).task_class,
+            EXECUTABLE_TASK,
+        )
+
+        # Saving again shouldn't change anything
+        instance.name = "renamed"
+        instance.save()
+
+        # Looking up a task instance's model takes one query
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                get_task_instance_model(instance.uuid), ExecutableTaskInstance
+            )
+
+        instance.delete()
+
+        self.assertFalse(
+            TaskInstanceLookup.objects.filter(uuid=instance.uuid).exists()
+        )
+
+    def test_bulk_created_lookups(self):
+        """Make sure task instances created in bulk can be looked up."""
+        instances = bulk_create_task_instances(
+            [self.build_executable_task_instance() for _ in range(3)]
+        )
+
+        self.assertEqual(
+            TaskInstanceLookup.objects.filter(
+                uuid__in=[instance.uuid for instance in instances],
+                task_class=EXECUTABLE_TASK,
+            ).count(),
+            3,
+        )
+
+    def test_deleting_queues_removes_lookups(self):
+        """Make sure lookups go away with cascading deletes."""
+        # All of the fixtures' task instances run on this queue
+        TaskQueue.objects.get(pk=QUEUE_PK).delete()
+
+        self.assertFalse(TaskInstanceLookup.objects.exists())
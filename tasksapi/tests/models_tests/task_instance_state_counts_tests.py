@@ -0,0 +1,119 @@
+"""Contains tests for task instance state counts."""
+
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from tasksapi.constants import EXECUTABLE_TASK, PUBLISHED, RUNNING, SUCCESSFUL
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskInstanceStateCount,
+    TaskQueue,
+    User,
+)
+
+# Put info about our fixtures data as constants here
+QUEUE_PK = 1
+USER_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+
+
+class TaskInstanceStateCountsTests(TestCase):
+    """Test that task instance state counts are kept up to date."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Prep common test objects."""
+        self.user = User.objects.get(pk=USER_PK)
+        self.executable_task_type = ExecutableTaskType.objects.get(
+            pk=EXECUTABLE_TASK_TYPE_PK
+        )
+        self.queue = TaskQueue.objects.get(pk=QUEUE_PK)
+
+    def get_state_counts(self):
+        """Get the total count of executable task instances per state.
+
+        Returns:
+            A dictionary where the keys are states and the values are
+            the corresponding counts, omitting counts of zero.
+        """
+        state_counts = {}
+
+        for state_count in TaskInstanceStateCount.objects.filter(
+            task_class=EXECUTABLE_TASK
+        ):
+            state_counts[state_count.state] = (
+                state_counts.get(state_count.state, 0) + state_count.count
+            )
+
+        return {state: count for state, count in state_counts.items() if count}
+
+    def test_state_counts_follow_instance_lifecycle(self):
+        """Make sure counts follow creation, state changes, and deletion."""
+        # The fixture has one successful executable task instance
+        self.assertEqual(self.get_state_counts(), {SUCCESSFUL: 1})
+
+        # Create an instance, which is published once its job is queued
+        instance = ExecutableTaskInstance.objects.create(
+            user=self.user,
+            task_type=self.executable_task_type,
+            task_queue=self.queue,
+        )
+
+        self.assertEqual(
+            self.get_state_counts(), {SUCCESSFUL: 1, PUBLISHED: 1}
+        )
+
+        # Change its state, both from memory and from a fresh load
+        instance.state = RUNNING
+        instance.save()
+
+        self.assertEqual(self.get_state_counts(), {SUCCESSFUL: 1, RUNNING: 1})
+
+        instance = ExecutableTaskInstance.objects.get(uuid=instance.uuid)
+        instance.state = SUCCESSFUL
+        instance.save()
+
+        self.assertEqual(self.get_state_counts(), {SUCCESSFUL: 2})
+
+        # Saving without changing the state shouldn't change anything
+        instance.name = "renamed"
+        instance.save()
+
+        self.assertEqual(self.get_state_counts(), {SUCCESSFUL: 2})
+
+        # Delete the instance
+        instance.delete()
+
+        self.assertEqual(self.get_state_counts(), {SUCCESSFUL: 1})
+
+    def test_rebuild_state_counts(self):
+        """Make sure rebuilding the counts gives the same counts."""
+        ExecutableTaskInstance.objects.create(
+            user=self.user,
+            task_type=self.executable_task_type,
+            task_queue=self.queue,
+        )
+        state_counts = self.get_state_counts()
+        buckets = set(
+            TaskInstanceStateCount.objects.filter(count__gt=0).values_list(
+                "datetime_created_bucket", "state"
+            )
+        )
+
+        # Mess up the counts and rebuild them
+        TaskInstanceStateCount.objects.update(count=42)
+        call_command("rebuild_task_instance_state_counts", stdout=StringIO())
+
+        self.assertEqual(self.get_state_counts(), state_counts)
+
+        # Counts are rebuilt into the same buckets they're kept in
+        self.assertEqual(
+            set(
+                TaskInstanceStateCount.objects.values_list(
+                    "datetime_created_bucket", "state"
+                )
+            ),
+            buckets,
+        )
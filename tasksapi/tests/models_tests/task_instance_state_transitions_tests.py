@@ -0,0 +1,127 @@
+"""Contains tests for task instance state transitions."""
+
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from tasksapi.constants import (
+    CREATED,
+    FAILED,
+    PUBLISHED,
+    RUNNING,
+    SUCCESSFUL,
+    TERMINATED,
+)
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskInstanceStateCount,
+    TaskQueue,
+    User,
+    bulk_update_task_instance_states,
+)
+
+# Put info about our fixtures data as constants here
+QUEUE_PK = 1
+USER_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+
+
+class TaskInstanceStateTransitionsTests(TestCase):
+    """Test moving task instances between states."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Create a task instance to move between states."""
+        self.instance = ExecutableTaskInstance.objects.create(
+            user=User.objects.get(pk=USER_PK),
+            task_type=ExecutableTaskType.objects.get(
+                pk=EXECUTABLE_TASK_TYPE_PK
+            ),
+            task_queue=TaskQueue.objects.get(pk=QUEUE_PK),
+        )
+
+    def test_valid_transitions(self):
+        """Make sure task instances can move forward through states."""
+        # Instances are marked as published once their jobs are queued
+        self.assertEqual(self.instance.state, PUBLISHED)
+        self.assertIsNotNone(self.instance.datetime_published)
+
+        self.assertTrue(self.instance.transition_state(RUNNING))
+
+        # Staying in a state is fine, but doesn't do anything
+        self.assertFalse(self.instance.transition_state(RUNNING))
+
+        self.assertIsNone(self.instance.datetime_finished)
+        self.assertTrue(self.instance.transition_state(SUCCESSFUL))
+
+        instance = ExecutableTaskInstance.objects.get(uuid=self.instance.uuid)
+
+        self.assertEqual(instance.state, SUCCESSFUL)
+        self.assertIsNotNone(instance.datetime_finished)
+
+        # State counts are still kept up to date
+        self.assertFalse(
+            TaskInstanceStateCount.objects.filter(
+                state__in=(CREATED, PUBLISHED, RUNNING), count__gt=0
+            ).exists()
+        )
+
+    def test_started_jobs_not_marked_published(self):
+        """Make sure jobs which started right away stay running."""
+
+        def start_job(instance, producer=None):
+            bulk_update_task_instance_states({str(instance.uuid): RUNNING})
+
+        with mock.patch.object(
+            ExecutableTaskInstance,
+            "publish_job",
+            autospec=True,
+            side_effect=start_job,
+        ):
+            instance = ExecutableTaskInstance.objects.create(
+                user=self.instance.user,
+                task_type=self.instance.task_type,
+                task_queue=self.instance.task_queue,
+            )
+
+        instance.refresh_from_db()
+
+        self.assertEqual(instance.state, RUNNING)
+        self.assertIsNone(instance.datetime_published)
+
+    def test_invalid_transitions(self):
+        """Make sure task instances can't move back through states."""
+        self.instance.transition_state(RUNNING)
+
+        with self.assertRaises(ValidationError):
+            self.instance.transition_state(PUBLISHED)
+
+        self.instance.transition_state(TERMINATED)
+
+        for state in (RUNNING, SUCCESSFUL, FAILED):
+            with self.assertRaises(ValidationError):
+                self.instance.transition_state(state)
+
+        self.assertEqual(
+            ExecutableTaskInstance.objects.get(uuid=self.instance.uuid).state,
+            TERMINATED,
+        )
+
+    def test_transitions_skip_validation(self):
+        """Make sure state transitions don't re-validate task instances."""
+        # Make sure there's already a running count to add to
+        ExecutableTaskInstance.objects.get(
+            uuid=self.instance.uuid
+        ).transition_state(RUNNING)
+
+        instance = ExecutableTaskInstance.objects.create(
+            user=self.instance.user,
+            task_type=self.instance.task_type,
+            task_queue=self.instance.task_queue,
+        )
+
+        # One query to update the task instance, and one to update each
+        # of the two state counts involved
+        with self.assertNumQueries(3):
+            instance.transition_state(RUNNING)
@@ -0,0 +1,157 @@
+"""Contains requests tests for creating task instances in bulk."""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import CONTAINER_TASK, PUBLISHED
+from tasksapi.models import (
+    ContainerTaskInstance,
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskInstanceStateCount,
+)
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+QUEUE_PK = 1
+DOCKER_QUEUE_PK = 5
+CONTAINER_TASK_TYPE_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+NOT_WHITELISTED_EXECUTABLE_TASK_TYPE_PK = 2
+
+
+class BulkSubmissionRequestsTests(APITestCase):
+    """Test creating many task instances at once."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+    def post_executable_task_instances(self, arguments_list, **kwargs):
+        """Create executable task instances in bulk.
+
+        Args:
+            arguments_list: A list of argument dictionaries.
+            **kwargs: Fields to override in the request.
+
+        Returns:
+            The response to the request.
+        """
+        return self.client.post(
+            "/api/executabletaskinstances/bulk/",
+            dict(
+                dict(
+                    name="sweep",
+                    task_type=EXECUTABLE_TASK_TYPE_PK,
+                    task_queue=QUEUE_PK,
+                    arguments_list=arguments_list,
+                ),
+                **kwargs
+            ),
+            format="json",
+        )
+
+    def test_bulk_create(self):
+        """Make sure task instances are created with their arguments."""
+        response = self.client.post(
+            "/api/containertaskinstances/bulk/",
+            dict(
+                name="sweep",
+                task_type=CONTAINER_TASK_TYPE_PK,
+                task_queue=QUEUE_PK,
+                arguments_list=[{"name": "Alice"}, {"name": "Bob"}, {}],
+            ),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+
+        # Missing arguments are filled in with their defaults
+        self.assertEqual(
+            sorted(
+                instance.arguments["name"]
+                for instance in ContainerTaskInstance.objects.filter(
+                    name="sweep"
+                )
+            ),
+            ["Alice", "AzureDiamond", "Bob"],
+        )
+
+        # The task instances are marked as published, and state counts
+        # are kept up to date
+        self.assertFalse(
+            ContainerTaskInstance.objects.filter(name="sweep")
+            .exclude(state=PUBLISHED, datetime_published__isnull=False)
+            .exists()
+        )
+        self.assertEqual(
+            sum(
+                state_count.count
+                for state_count in TaskInstanceStateCount.objects.filter(
+                    task_class=CONTAINER_TASK, state=PUBLISHED
+                )
+            ),
+            3,
+        )
+
+    def test_bulk_create_validation(self):
+        """Make sure invalid batches are rejected entirely."""
+        ExecutableTaskType.objects.filter(pk=EXECUTABLE_TASK_TYPE_PK).update(
+            required_arguments=["seed"]
+        )
+
+        response_1 = self.post_executable_task_instances(
+            [{"seed": 1}, {}, {"seed": 3}]
+        )
+        response_2 = self.post_executable_task_instances(
+            [{"seed": 1}], task_type=NOT_WHITELISTED_EXECUTABLE_TASK_TYPE_PK
+        )
+        response_3 = self.post_executable_task_instances(
+            [{"seed": 1}], task_queue=DOCKER_QUEUE_PK
+        )
+        response_4 = self.post_executable_task_instances([])
+
+        for response in (response_1, response_2, response_3, response_4):
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertIn("Task instance 1", str(response_1.data))
+        self.assertFalse(
+            ExecutableTaskInstance.objects.filter(name="sweep").exists()
+        )
+
+    def test_bulk_create_queries(self):
+        """Make sure bigger batches don't need more queries."""
+
+        def count_queries(num_instances):
+            """Create task instances and count the queries needed.
+
+            Args:
+                num_instances: An integer specifying how many task
+                    instances to create.
+
+            Returns:
+                An integer specifying how many queries were run.
+            """
+            with CaptureQueriesContext(connection) as context:
+                response = self.post_executable_task_instances(
+                    [{"seed": seed} for seed in range(num_instances)]
+                )
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            return len(context.captured_queries)
+
+        # The first batch creates the state count, so compare the
+        # batches after that
+        count_queries(1)
+
+        self.assertEqual(count_queries(2), count_queries(50))
+        self.assertEqual(
+            ExecutableTaskInstance.objects.filter(name="sweep").count(), 53
+        )
@@ -0,0 +1,258 @@
+"""Contains requests tests for task instance queue waits and run times."""
+
+from datetime import datetime, timedelta
+from unittest import mock
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import PUBLISHED, RUNNING, SUCCESSFUL
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskQueue,
+    User,
+)
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+ADMIN_USER_PK = 1
+QUEUE_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+
+# When the test task instances were published
+PUBLISHED_DATETIME = datetime(2018, 12, 20, tzinfo=timezone.utc)
+
+
+def get_timestamp(seconds):
+    """Get a timestamp some seconds after the task instances were published.
+
+    Args:
+        seconds: A number specifying the seconds after publishing.
+
+    Returns:
+        A string containing the timestamp in ISO 8601 format.
+    """
+    return (PUBLISHED_DATETIME + timedelta(seconds=seconds)).isoformat()
+
+
+class LatencyRequestsTests(APITestCase):
+    """Test recording and summarizing when task instances change state."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client and create task instances."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+        self.instances = [self.create_instance() for _ in range(3)]
+
+    def create_instance(self):
+        """Create an executable task instance to update.
+
+        The task instance isn't marked as published, so the updates
+        sent in the tests decide when it was.
+
+        Returns:
+            An executable task instance.
+        """
+        with mock.patch.object(ExecutableTaskInstance, "mark_published"):
+            return ExecutableTaskInstance.objects.create(
+                user=User.objects.get(pk=ADMIN_USER_PK),
+                task_type=ExecutableTaskType.objects.get(
+                    pk=EXECUTABLE_TASK_TYPE_PK
+                ),
+                task_queue=TaskQueue.objects.get(pk=QUEUE_PK),
+            )
+
+    def update_states(self, updates):
+        """Send a bulk state update.
+
+        Args:
+            updates: A list of dictionaries containing the updates.
+        """
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/", updates, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_state_datetimes(self):
+        """Make sure when task instances change state is recorded."""
+        instance, coalesced_instance, late_instance = self.instances
+
+        self.update_states(
+            [
+                dict(
+                    uuid=instance.uuid,
+                    state=PUBLISHED,
+                    timestamp=get_timestamp(0),
+                ),
+                dict(
+                    uuid=instance.uuid,
+                    state=RUNNING,
+                    timestamp=get_timestamp(10),
+                ),
+                # Workers send one update for states which changed
+                # before they could send them
+                dict(
+                    uuid=coalesced_instance.uuid,
+                    state=SUCCESSFUL,
+                    timestamp=get_timestamp(30),
+                    state_timestamps={
+                        PUBLISHED: get_timestamp(0),
+                        RUNNING: get_timestamp(20),
+                    },
+                ),
+                dict(
+                    uuid=late_instance.uuid,
+                    state=RUNNING,
+                    timestamp=get_timestamp(5),
+                ),
+            ]
+        )
+
+        # Updates can arrive out of order
+        self.update_states(
+            [
+                dict(
+                    uuid=late_instance.uuid,
+                    state=PUBLISHED,
+                    timestamp=get_timestamp(0),
+                ),
+                dict(
+                    uuid=instance.uuid,
+                    state=SUCCESSFUL,
+                    timestamp=get_timestamp(70),
+                ),
+            ]
+        )
+
+        for instance in self.instances:
+            instance.refresh_from_db()
+
+        self.assertEqual(
+            [
+                (
+                    instance.state,
+                    instance.datetime_published,
+                    instance.datetime_started,
+                    instance.datetime_finished,
+                )
+                for instance in self.instances
+            ],
+            [
+                (
+                    SUCCESSFUL,
+                    PUBLISHED_DATETIME,
+                    PUBLISHED_DATETIME + timedelta(seconds=10),
+                    PUBLISHED_DATETIME + timedelta(seconds=70),
+                ),
+                (
+                    SUCCESSFUL,
+                    PUBLISHED_DATETIME,
+                    PUBLISHED_DATETIME + timedelta(seconds=20),
+                    PUBLISHED_DATETIME + timedelta(seconds=30),
+                ),
+                (
+                    RUNNING,
+                    PUBLISHED_DATETIME,
+                    PUBLISHED_DATETIME + timedelta(seconds=5),
+                    None,
+                ),
+            ],
+        )
+
+        # The datetimes task instances were published and started are
+        # only recorded once
+        self.update_states(
+            [
+                dict(
+                    uuid=late_instance.uuid,
+                    state=RUNNING,
+                    timestamp=get_timestamp(100),
+                )
+            ]
+        )
+
+        late_instance.refresh_from_db()
+
+        self.assertEqual(
+            late_instance.datetime_started,
+            PUBLISHED_DATETIME + timedelta(seconds=5),
+        )
+
+        # Single state updates record them too
+        single_instance = self.create_instance()
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/%s/" % single_instance.uuid,
+            dict(state=RUNNING),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        single_instance.refresh_from_db()
+
+        self.assertIsNotNone(single_instance.datetime_started)
+
+    def test_latency_percentiles(self):
+        """Make sure queue wait and run time percentiles are right."""
+        # The task instances wait 0, 10, and 20 seconds and run for 10,
+        # 20, and 30 seconds
+        self.update_states(
+            [
+                dict(
+                    uuid=instance.uuid,
+                    state=SUCCESSFUL,
+                    timestamp=get_timestamp(20 * idx + 10),
+                    state_timestamps={
+                        PUBLISHED: get_timestamp(0),
+                        RUNNING: get_timestamp(10 * idx),
+                    },
+                )
+                for idx, instance in enumerate(self.instances)
+            ]
+        )
+
+        response = self.client.get(
+            "/api/executabletaskinstances/latencies/",
+            {"datetime_published__gte": PUBLISHED_DATETIME.isoformat()},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+        latencies = response.data[0]
+
+        self.assertEqual(latencies["task_queue"], QUEUE_PK)
+        self.assertEqual(latencies["task_type"], EXECUTABLE_TASK_TYPE_PK)
+        self.assertEqual(latencies["num_queue_waits"], 3)
+        self.assertEqual(latencies["num_run_times"], 3)
+        self.assertAlmostEqual(latencies["queue_wait_seconds_p50"], 10)
+        self.assertAlmostEqual(latencies["queue_wait_seconds_p95"], 19)
+        self.assertAlmostEqual(latencies["run_time_seconds_p50"], 20)
+        self.assertAlmostEqual(latencies["run_time_seconds_p99"], 29.8)
+
+        # Filters narrow down the task instances covered
+        response = self.client.get(
+            "/api/executabletaskinstances/latencies/",
+            {"datetime_started__gt": get_timestamp(0)},
+        )
+
+        self.assertEqual(response.data[0]["num_run_times"], 2)
+        self.assertAlmostEqual(response.data[0]["run_time_seconds_p50"], 25)
+
+        # Task instances without recorded datetimes have no percentiles
+        response = self.client.get("/api/containertaskinstances/latencies/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data)
+        self.assertTrue(
+            all(
+                latencies["num_run_times"] == 0
+                and latencies["run_time_seconds_p50"] is None
+                for latencies in response.data
+            )
+        )
@@ -0,0 +1,258 @@
+"""Contains requests tests for caching finished task instances' logs."""
+
+from datetime import timedelta
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import RUNNING
+from tasksapi.log_cache import LOG_FILES_KEY, DiskLogCache
+from tasksapi.logs import LogsBucket
+from tasksapi.models import ExecutableTaskInstance
+from .utils import FakeS3Client
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+
+# A log which compresses to more than a few kilobytes, but is small
+# enough to cache uncompressed
+BIG_LOG = b"".join(b"line %d\n" % line for line in range(50000))
+
+
+class LogCacheRequestsTests(APITestCase):
+    """Test that finished task instances' logs are read from S3 once."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client and put some logs in S3."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+        cache.clear()
+
+        # Loading the fixture marks the task instance as just finished
+        self.instances = ExecutableTaskInstance.objects.filter(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        )
+        self.instances.update(
+            datetime_finished=timezone.now() - timedelta(days=1)
+        )
+
+        self.s3_client = FakeS3Client()
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt", BIG_LOG
+        )
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stderr.txt.gz",
+            b"oh no\n",
+            gzipped=True,
+        )
+
+        for target in ("tasksapi.logs", "tasksapi.views"):
+            patcher = mock.patch(
+                target + ".get_logs_bucket",
+                return_value=LogsBucket(self.s3_client, "logs"),
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.cache_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_directory)
+
+    def get_log(self, **params):
+        """Read part of the executable task instance's log.
+
+        Args:
+            **params: Request parameters.
+
+        Returns:
+            A dictionary containing the response.
+        """
+        response = self.client.get(
+            "/api/executabletaskinstances/%s/logs/"
+            % EXECUTABLE_TASK_INSTANCE_UUID,
+            params,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.json()
+
+    def test_finished_logs_cached(self):
+        """Make sure finished logs are only downloaded once."""
+        self.get_log()
+        log = self.get_log(file="stdout.txt", tail=1000)
+        num_requests = self.s3_client.num_requests
+
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+
+        # Any part of the log can now be read without going to S3
+        self.assertEqual(self.get_log(), self.get_log())
+        self.assertEqual(self.get_log(file="stdout.txt", tail=1000), log)
+
+        log = self.get_log(file="stdout.txt", offset=5, max_bytes=10)
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[5:15])
+        self.assertEqual(log["size"], len(BIG_LOG))
+
+        log = self.get_log(file="stderr.txt.gz", offset=0)
+        self.assertEqual(log["text"], "oh no\n")
+
+        self.assertEqual(self.s3_client.num_requests, num_requests + 1)
+
+        # Missing files are known to be missing
+        response = self.client.get(
+            "/api/executabletaskinstances/%s/logs/"
+            % EXECUTABLE_TASK_INSTANCE_UUID,
+            {"file": "nope.txt"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.s3_client.num_requests, num_requests + 1)
+
+    def test_unfinished_logs_not_cached(self):
+        """Make sure logs which might still change aren't cached."""
+        for update in (
+            {"state": RUNNING},
+            {"datetime_finished": timezone.now()},
+        ):
+            self.instances.update(**update)
+
+            self.get_log(file="stdout.txt")
+            num_requests = self.s3_client.num_requests
+            num_bytes_sent = self.s3_client.num_bytes_sent
+
+            self.get_log(file="stdout.txt")
+
+            self.assertEqual(self.s3_client.num_requests, num_requests + 1)
+            self.assertLess(
+                self.s3_client.num_bytes_sent - num_bytes_sent, len(BIG_LOG)
+            )
+
+    def test_reuploaded_logs(self):
+        """Make sure logs uploaded again aren't read from the cache."""
+        self.get_log(file="stdout.txt")
+
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt", b"hi"
+        )
+        cache.delete(LOG_FILES_KEY % EXECUTABLE_TASK_INSTANCE_UUID)
+
+        self.assertEqual(self.get_log(file="stdout.txt")["text"], "hi")
+
+    @mock.patch("tasksapi.log_cache.LOG_CACHE_MAX_ENTRY_BYTES", 1024)
+    def test_too_big_logs(self):
+        """Make sure logs too big to cache are read by byte range."""
+        log = self.get_log(file="stdout.txt", tail=1000)
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+
+        num_bytes_sent = self.s3_client.num_bytes_sent
+
+        log = self.get_log(file="stdout.txt", tail=1000)
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+        self.assertEqual(self.s3_client.num_bytes_sent, num_bytes_sent + 1000)
+
+    def test_spooled_files_without_seek_positions(self):
+        """Make sure logs are cached on Pythons whose spooled seek is None."""
+
+        class OldSpooledTemporaryFile(tempfile.SpooledTemporaryFile):
+            """A spooled temporary file as of Python 3.5 and 3.6."""
+
+            def seek(self, *args):
+                """Seek without returning the new position."""
+                super().seek(*args)
+
+        with mock.patch(
+            "tasksapi.log_cache.tempfile.SpooledTemporaryFile",
+            OldSpooledTemporaryFile,
+        ):
+            with override_settings(LOG_CACHE_DIRECTORY=self.cache_directory):
+                # Small logs go in Django's cache and big ones on disk
+                for max_entry_bytes in (1024 * 1024, 1024):
+                    cache.clear()
+
+                    with mock.patch(
+                        "tasksapi.log_cache.LOG_CACHE_MAX_ENTRY_BYTES",
+                        max_entry_bytes,
+                    ):
+                        log = self.get_log(file="stdout.txt", tail=1000)
+
+                    self.assertEqual(
+                        log["text"].encode("utf-8"), BIG_LOG[-1000:]
+                    )
+
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+    @mock.patch("tasksapi.log_cache.LOG_CACHE_MAX_UNCOMPRESSED_BYTES", 1024)
+    def test_big_uncompressed_logs(self):
+        """Make sure only big logs S3 stores gzipped are cached."""
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt.gz",
+            BIG_LOG,
+            gzipped=True,
+        )
+
+        for file_name in ("stdout.txt", "stdout.txt.gz"):
+            log = self.get_log(file=file_name, tail=1000)
+            self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+
+        num_requests = self.s3_client.num_requests
+        num_bytes_sent = self.s3_client.num_bytes_sent
+
+        # The uncompressed log's end is read by range
+        log = self.get_log(file="stdout.txt", tail=1000)
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+        self.assertEqual(self.s3_client.num_requests, num_requests + 1)
+        self.assertEqual(self.s3_client.num_bytes_sent, num_bytes_sent + 1000)
+
+        # The gzipped log is cached
+        log = self.get_log(file="stdout.txt.gz", tail=1000)
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+        self.assertEqual(self.s3_client.num_requests, num_requests + 1)
+
+    @mock.patch("tasksapi.log_cache.LOG_CACHE_MAX_DOWNLOAD_BYTES", 1024)
+    def test_too_big_downloads(self):
+        """Make sure big logs aren't downloaded to be cached."""
+        for _ in range(2):
+            log = self.get_log(file="stdout.txt", tail=1000)
+            self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+
+        self.assertEqual(self.s3_client.num_bytes_sent, 2000)
+
+    @mock.patch("tasksapi.log_cache.LOG_CACHE_MAX_ENTRY_BYTES", 1024)
+    def test_disk_cache(self):
+        """Make sure big logs are cached on disk."""
+        with override_settings(LOG_CACHE_DIRECTORY=self.cache_directory):
+            self.get_log(file="stdout.txt")
+            self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+            num_requests = self.s3_client.num_requests
+            log = self.get_log(file="stdout.txt", tail=1000)
+
+            self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+            self.assertEqual(self.s3_client.num_requests, num_requests)
+
+    def test_disk_cache_eviction(self):
+        """Make sure the least recently used logs are evicted."""
+        disk_cache = DiskLogCache(self.cache_directory, max_bytes=250)
+        now = time.time()
+
+        for age, name in ((30, "a"), (20, "b")):
+            disk_cache.put(name, io.BytesIO(b"x" * 100))
+            os.utime(disk_cache.get_path(name), (now - age, now - age))
+
+        # Using "a" makes "b" the least recently used
+        disk_cache.open("a").close()
+        disk_cache.put("c", io.BytesIO(b"x" * 100))
+
+        self.assertEqual(
+            sorted(os.listdir(self.cache_directory)), ["a.gz", "c.gz"]
+        )
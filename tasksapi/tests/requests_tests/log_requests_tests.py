@@ -0,0 +1,281 @@
+"""Contains requests tests for reading task instance logs."""
+
+import os
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import RUNNING
+from tasksapi.logs import (
+    LogsBucket,
+    get_logs_bucket,
+    list_log_files,
+    read_task_instance_log_files,
+)
+from tasksapi.models import ExecutableTaskInstance
+from .utils import FakeS3Client
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+CONTAINER_TASK_INSTANCE_UUID = "28717f82-7f17-463e-8d02-d974e9fde61e"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+
+# A log big enough to not be read all at once
+BIG_LOG = b"".join(b"line %d\n" % line for line in range(100000))
+
+
+class LogRequestsTests(APITestCase):
+    """Test reading task instance logs by byte range."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client and put some logs in S3."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+        # Finished task instances' logs are cached, so make sure the
+        # logs are read from S3
+        ExecutableTaskInstance.objects.filter(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        ).update(state=RUNNING)
+        cache.clear()
+
+        self.s3_client = FakeS3Client()
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt", BIG_LOG
+        )
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt.gz",
+            BIG_LOG,
+            gzipped=True,
+        )
+        self.s3_client.put(
+            EXECUTABLE_TASK_INSTANCE_UUID + "/unicode.txt",
+            "naïve café ☕ 🍰\n".encode("utf-8") * 10,
+        )
+
+        for target in ("tasksapi.logs", "tasksapi.views"):
+            patcher = mock.patch(
+                target + ".get_logs_bucket",
+                return_value=LogsBucket(self.s3_client, "logs"),
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_log(self, **params):
+        """Read part of the executable task instance's log.
+
+        Args:
+            **params: Request parameters.
+
+        Returns:
+            A dictionary containing the response.
+        """
+        response = self.client.get(
+            "/api/executabletaskinstances/%s/logs/"
+            % EXECUTABLE_TASK_INSTANCE_UUID,
+            params,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.json()
+
+    def test_list_files(self):
+        """Make sure log files are listed without being downloaded."""
+        response = self.client.get(
+            "/api/executabletaskinstances/%s/logs/"
+            % EXECUTABLE_TASK_INSTANCE_UUID
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [log_file["name"] for log_file in response.json()],
+            ["stdout.txt", "stdout.txt.gz", "unicode.txt"],
+        )
+        self.assertEqual(self.s3_client.num_bytes_sent, 0)
+
+        # Other task instances have no logs
+        response = self.client.get(
+            "/api/containertaskinstances/%s/logs/"
+            % CONTAINER_TASK_INSTANCE_UUID
+        )
+
+        self.assertEqual(response.json(), [])
+
+    def test_tail(self):
+        """Make sure only the end of logs is downloaded."""
+        log = self.get_log(file="stdout.txt", tail=1000)
+
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+        self.assertEqual(log["offset"], len(BIG_LOG) - 1000)
+        self.assertEqual(log["next_offset"], len(BIG_LOG))
+        self.assertEqual(log["size"], len(BIG_LOG))
+        self.assertEqual(log["state"], RUNNING)
+        self.assertEqual(self.s3_client.num_bytes_sent, 1000)
+
+    def test_follow(self):
+        """Make sure logs can be read from offsets until they're done."""
+        key = EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt"
+        self.s3_client.put(key, b"hello\n")
+
+        log = self.get_log(file="stdout.txt", offset=0)
+        self.assertEqual(log["text"], "hello\n")
+
+        # Nothing new yet
+        log = self.get_log(file="stdout.txt", offset=log["next_offset"])
+        self.assertEqual(log["text"], "")
+        self.assertEqual(log["next_offset"], 6)
+
+        self.s3_client.put(key, b"hello\nworld\n")
+
+        log = self.get_log(file="stdout.txt", offset=log["next_offset"])
+        self.assertEqual(log["text"], "world\n")
+        self.assertEqual(log["next_offset"], 12)
+
+    def test_max_bytes(self):
+        """Make sure big logs are read a piece at a time."""
+        text = ""
+        offset = 0
+
+        for _ in range(100):
+            log = self.get_log(
+                file="stdout.txt", offset=offset, max_bytes=200000
+            )
+            text += log["text"]
+            offset = log["next_offset"]
+
+            if offset == log["size"]:
+                break
+
+        self.assertEqual(text.encode("utf-8"), BIG_LOG)
+
+    def test_split_characters(self):
+        """Make sure characters split between reads aren't mangled."""
+        unicode_log = "naïve café ☕ 🍰\n" * 10
+
+        for max_bytes in range(1, 8):
+            text = ""
+            offset = 0
+
+            while True:
+                log = self.get_log(
+                    file="unicode.txt", offset=offset, max_bytes=max_bytes
+                )
+                text += log["text"]
+
+                # A read can only make no progress if it's too short to
+                # fit a whole character
+                if log["next_offset"] == offset:
+                    max_bytes += 1
+
+                offset = log["next_offset"]
+
+                if offset == log["size"]:
+                    break
+
+            self.assertEqual(text, unicode_log)
+
+        # Tails skip partial characters at their start
+        log = self.get_log(file="unicode.txt", tail=4)
+        self.assertEqual(log["text"], "\n")
+        self.assertEqual(log["offset"], log["size"] - 1)
+
+    def test_gzipped_logs(self):
+        """Make sure gzipped logs are read by uncompressed offset."""
+        log = self.get_log(file="stdout.txt.gz", tail=1000)
+
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[-1000:])
+        self.assertEqual(log["size"], len(BIG_LOG))
+
+        # This is past the end of the compressed file
+        offset = len(BIG_LOG) - 10
+        log = self.get_log(file="stdout.txt.gz", offset=offset)
+
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[offset:])
+        self.assertEqual(log["next_offset"], len(BIG_LOG))
+
+    def test_gzipped_logs_read_early(self):
+        """Make sure reads of gzipped logs stop once they have enough."""
+        gzipped_size = len(
+            self.s3_client.contents[
+                EXECUTABLE_TASK_INSTANCE_UUID + "/stdout.txt.gz"
+            ][0]
+        )
+
+        log = self.get_log(file="stdout.txt.gz", offset=100, max_bytes=1000)
+
+        self.assertEqual(log["text"].encode("utf-8"), BIG_LOG[100:1100])
+        self.assertEqual(log["next_offset"], 1100)
+        self.assertEqual(log["size"], len(BIG_LOG))
+        self.assertLess(
+            sum(body.num_bytes_read for body in self.s3_client.bodies),
+            gzipped_size // 2,
+        )
+
+    def test_bad_requests(self):
+        """Make sure missing files and bad parameters are rejected."""
+        url = (
+            "/api/executabletaskinstances/%s/logs/"
+            % EXECUTABLE_TASK_INSTANCE_UUID
+        )
+
+        response = self.client.get(url, {"file": "nope.txt"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {"file": "stdout.txt", "offset": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            url, {"file": "stdout.txt", "max_bytes": 10 ** 9}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_reads(self):
+        """Make sure a task instance's log files are read at once."""
+        instance = ExecutableTaskInstance.objects.get(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        )
+        bucket = LogsBucket(self.s3_client, "logs")
+        log_files = list_log_files(bucket, EXECUTABLE_TASK_INSTANCE_UUID)
+
+        # Each read's first (ranged) request waits for the others to
+        # start, which can only happen if they're concurrent
+        barrier = threading.Barrier(len(log_files), timeout=5)
+        get_object = self.s3_client.get_object
+
+        def get_object_concurrently(*args, **kwargs):
+            if "Range" in kwargs:
+                barrier.wait()
+
+            return get_object(*args, **kwargs)
+
+        with mock.patch.object(
+            self.s3_client, "get_object", get_object_concurrently
+        ):
+            logs = read_task_instance_log_files(
+                bucket, instance, log_files, tail_bytes=10
+            )
+
+        self.assertEqual(
+            [log["text"] for log in logs],
+            ["ine 99999\n", "ine 99999\n", " ☕ 🍰\n"],
+        )
+
+    @override_settings(AWS_LOGS_BUCKET_NAME="logs")
+    @mock.patch.dict(
+        os.environ,
+        {"AWS_ACCESS_KEY_ID": "key", "AWS_SECRET_ACCESS_KEY": "secret"},
+    )
+    @mock.patch.dict("tasksapi.logs.logs_buckets", clear=True)
+    def test_shared_client(self):
+        """Make sure each process creates one S3 client."""
+        # This is the real function, imported before setUp patched it
+        bucket = get_logs_bucket()
+
+        self.assertEqual(bucket.name, "logs")
+        self.assertIs(get_logs_bucket(), bucket)
@@ -0,0 +1,149 @@
+"""Contains requests tests for the metrics endpoint."""
+
+from prometheus_client import REGISTRY
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import CREATED, EXECUTABLE_TASK, RUNNING
+from tasksapi.models import (
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskQueue,
+    User,
+)
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+ADMIN_USER_PK = 1
+QUEUE_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+
+
+def get_sample_value(name, labels=None):
+    """Get the value of a metric's sample in this process.
+
+    Args:
+        name: A string containing the name of the sample.
+        labels: An optional dictionary containing the sample's labels.
+
+    Returns:
+        A number containing the sample's value, which is 0 if the
+        sample hasn't been recorded yet.
+    """
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+class MetricsRequestsTests(APITestCase):
+    """Test what's recorded in and served from the metrics."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+    def test_metrics_endpoint(self):
+        """Make sure metrics are served in Prometheus' text format."""
+        # Make a request to have something to record
+        self.client.get("/api/taskqueues/")
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+        for name in (
+            "saltant_request_duration_seconds",
+            "saltant_request_db_queries",
+            "saltant_jobs_created_total",
+            "saltant_state_transitions_total",
+            "saltant_log_fetch_duration_seconds",
+            "saltant_worker_state_update_failures_total",
+        ):
+            self.assertIn("# TYPE %s " % name, response.content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=["192.168.1.200"])
+    def test_metrics_allowed_ips(self):
+        """Make sure metrics are only served to allowed IP addresses."""
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get("/metrics", REMOTE_ADDR="192.168.1.200")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_requests_are_recorded(self):
+        """Make sure requests are recorded by view."""
+        labels = {"view": "tasksapi:taskqueue-list"}
+        num_requests = get_sample_value(
+            "saltant_request_duration_seconds_count",
+            dict(labels, method="GET"),
+        )
+        num_queries = get_sample_value(
+            "saltant_request_db_queries_sum", labels
+        )
+
+        response = self.client.get("/api/taskqueues/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            get_sample_value(
+                "saltant_request_duration_seconds_count",
+                dict(labels, method="GET"),
+            ),
+            num_requests + 1,
+        )
+        self.assertGreater(
+            get_sample_value("saltant_request_db_queries_sum", labels),
+            num_queries,
+        )
+
+    def test_jobs_and_state_transitions_are_counted(self):
+        """Make sure created jobs and state changes are counted."""
+        queue = TaskQueue.objects.get(pk=QUEUE_PK)
+        job_labels = {
+            "task_class": EXECUTABLE_TASK,
+            "task_queue_pk": str(QUEUE_PK),
+        }
+        created_labels = {"task_class": EXECUTABLE_TASK, "state": CREATED}
+        running_labels = {"task_class": EXECUTABLE_TASK, "state": RUNNING}
+
+        num_jobs = get_sample_value("saltant_jobs_created_total", job_labels)
+        num_created = get_sample_value(
+            "saltant_state_transitions_total", created_labels
+        )
+        num_running = get_sample_value(
+            "saltant_state_transitions_total", running_labels
+        )
+
+        instance = ExecutableTaskInstance.objects.create(
+            user=User.objects.get(pk=ADMIN_USER_PK),
+            task_type=ExecutableTaskType.objects.get(
+                pk=EXECUTABLE_TASK_TYPE_PK
+            ),
+            task_queue=queue,
+        )
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [dict(uuid=instance.uuid, state=RUNNING)],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            get_sample_value("saltant_jobs_created_total", job_labels),
+            num_jobs + 1,
+        )
+        self.assertEqual(
+            get_sample_value(
+                "saltant_state_transitions_total", created_labels
+            ),
+            num_created + 1,
+        )
+        self.assertEqual(
+            get_sample_value(
+                "saltant_state_transitions_total", running_labels
+            ),
+            num_running + 1,
+        )
@@ -0,0 +1,105 @@
+"""Contains requests tests for paginating task instances."""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.models import ExecutableTaskInstance
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+NUM_NEW_INSTANCES = 7
+
+
+class PaginationRequestsTests(APITestCase):
+    """Test paginating task instances by page number and by cursor."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client and some task instances."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+        instance = ExecutableTaskInstance.objects.get(
+            uuid=EXECUTABLE_TASK_INSTANCE_UUID
+        )
+
+        for _ in range(NUM_NEW_INSTANCES):
+            ExecutableTaskInstance.objects.create(
+                user=instance.user,
+                task_type=instance.task_type,
+                task_queue=instance.task_queue,
+            )
+
+    def test_page_number_pagination(self):
+        """Make sure pages are numbered and counted by default."""
+        response = self.client.get(
+            "/api/executabletaskinstances/", {"page_size": 3, "page": 2}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], NUM_NEW_INSTANCES + 1)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_cursor_pagination(self):
+        """Make sure cursor pages cover every instance exactly once."""
+        response = self.client.get(
+            "/api/executabletaskinstances/",
+            {"pagination": "cursor", "page_size": 3},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+        uuids = []
+
+        while True:
+            uuids += [result["uuid"] for result in response.data["results"]]
+
+            if response.data["next"] is None:
+                break
+
+            # Task instances shouldn't be counted
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(response.data["next"])
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(
+                any("COUNT(" in query["sql"] for query in context)
+            )
+
+        # Newest first
+        self.assertEqual(
+            uuids,
+            [
+                str(uuid)
+                for uuid in ExecutableTaskInstance.objects.order_by(
+                    "-datetime_created", "-uuid"
+                ).values_list("uuid", flat=True)
+            ],
+        )
+
+    def test_cursor_pagination_with_filters(self):
+        """Make sure cursor pagination works with filters."""
+        response = self.client.get(
+            "/api/executabletaskinstances/",
+            {"pagination": "cursor", "state": "successful"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["uuid"] for result in response.data["results"]],
+            [EXECUTABLE_TASK_INSTANCE_UUID],
+        )
+
+    def test_invalid_cursor(self):
+        """Make sure invalid cursors are rejected."""
+        response = self.client.get(
+            "/api/containertaskinstances/", {"cursor": "garbage"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
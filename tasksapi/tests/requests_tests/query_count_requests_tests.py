@@ -0,0 +1,96 @@
+"""Contains requests tests for the number of queries reads take."""
+
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.models import ContainerTaskInstance, ExecutableTaskInstance
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+CONTAINER_TASK_INSTANCE_UUID = "28717f82-7f17-463e-8d02-d974e9fde61e"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+LIST_URLS = (
+    "/api/containertaskinstances/",
+    "/api/executabletaskinstances/",
+    "/api/containertasktypes/",
+    "/api/executabletasktypes/",
+    "/api/taskqueues/",
+    "/api/taskwhitelists/",
+    "/api/users/",
+)
+
+
+class QueryCountRequestsTests(APITestCase):
+    """Test that reads take a fixed number of queries."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+    def count_queries(self, url, params=None):
+        """Count the queries a GET request takes.
+
+        Args:
+            url: A string containing the URL to GET.
+            params: An optional dictionary of query parameters.
+
+        Returns:
+            An integer specifying the number of queries taken.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return len(context)
+
+    def test_list_query_counts(self):
+        """Make sure list query counts don't depend on page size."""
+        for instance_model, uuid in (
+            (ContainerTaskInstance, CONTAINER_TASK_INSTANCE_UUID),
+            (ExecutableTaskInstance, EXECUTABLE_TASK_INSTANCE_UUID),
+        ):
+            instance = instance_model.objects.get(uuid=uuid)
+
+            for _ in range(5):
+                instance_model.objects.create(
+                    user=instance.user,
+                    task_type=instance.task_type,
+                    task_queue=instance.task_queue,
+                )
+
+        for url in LIST_URLS:
+            self.assertEqual(
+                self.count_queries(url, {"page_size": 1}),
+                self.count_queries(url, {"page_size": 100}),
+                msg=url,
+            )
+
+    def test_detail_query_counts(self):
+        """Make sure task instance details take a fixed number of queries."""
+        # Look up the token, then the instance along with its user
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                "/api/containertaskinstances/%s/"
+                % CONTAINER_TASK_INSTANCE_UUID
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @mock.patch(
+        "tasksapi.serializers.abstract_tasks.get_allowed_queues_sorted"
+    )
+    def test_reads_skip_allowed_queues(self, get_allowed_queues_sorted):
+        """Make sure the allowed queues are only found for writes."""
+        self.client.get("/api/executabletaskinstances/")
+        self.client.get(
+            "/api/executabletaskinstances/%s/" % EXECUTABLE_TASK_INSTANCE_UUID
+        )
+
+        get_allowed_queues_sorted.assert_not_called()
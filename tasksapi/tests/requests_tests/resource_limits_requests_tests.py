@@ -0,0 +1,102 @@
+"""Contains requests tests for container resource limits."""
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.models import ContainerTaskInstance, ContainerTaskType
+from .utils import TEST_CONTAINER_TASK_TYPE_DICT
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+QUEUE_PK = 1
+CONTAINER_TASK_TYPE_PK = 1
+
+
+class ResourceLimitsRequestsTests(APITestCase):
+    """Test setting and overriding container resource limits."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+    def test_task_type_limits(self):
+        """Make sure task types' limits are validated."""
+        response = self.client.post(
+            "/api/containertasktypes/",
+            dict(
+                TEST_CONTAINER_TASK_TYPE_DICT,
+                cpu_limit=1.5,
+                memory_limit_megabytes=512,
+                pids_limit=100,
+            ),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            ContainerTaskType.objects.get(
+                pk=response.data["id"]
+            ).get_resource_limits(),
+            {
+                "cpu_limit": 1.5,
+                "memory_limit_megabytes": 512,
+                "pids_limit": 100,
+            },
+        )
+
+        for limits in (
+            {"cpu_limit": 0},
+            {"memory_limit_megabytes": 0},
+            {"pids_limit": -1},
+            {"memory_limit_megabytes": 512, "required_memory_megabytes": 1024},
+            {"cpu_limit": 1, "required_cpus": 2},
+        ):
+            response = self.client.post(
+                "/api/containertasktypes/",
+                dict(TEST_CONTAINER_TASK_TYPE_DICT, name="bad", **limits),
+                format="json",
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_instance_overrides(self):
+        """Make sure task instances can override their limits."""
+        ContainerTaskType.objects.filter(pk=CONTAINER_TASK_TYPE_PK).update(
+            cpu_limit=2, memory_limit_megabytes=1024, required_cpus=1
+        )
+
+        response = self.client.post(
+            "/api/containertaskinstances/",
+            dict(
+                task_type=CONTAINER_TASK_TYPE_PK,
+                task_queue=QUEUE_PK,
+                memory_limit_megabytes=2048,
+            ),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        run_task_kwargs = ContainerTaskInstance.objects.get(
+            uuid=response.data["uuid"]
+        ).get_run_task_kwargs()
+
+        self.assertEqual(run_task_kwargs["cpu_limit"], 2)
+        self.assertEqual(run_task_kwargs["memory_limit_megabytes"], 2048)
+        self.assertIsNone(run_task_kwargs["pids_limit"])
+
+        # Overrides can't leave too little for the task type's jobs
+        response = self.client.post(
+            "/api/containertaskinstances/",
+            dict(
+                task_type=CONTAINER_TASK_TYPE_PK,
+                task_queue=QUEUE_PK,
+                cpu_limit=0.5,
+            ),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,299 @@
+"""Contains requests tests for task instance state updates."""
+
+import uuid
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tasksapi.constants import EXECUTABLE_TASK, FAILED, RUNNING, SUCCESSFUL
+from tasksapi.models import (
+    ContainerTaskInstance,
+    ContainerTaskType,
+    ExecutableTaskInstance,
+    ExecutableTaskType,
+    TaskInstanceStateCount,
+    TaskQueue,
+    User,
+)
+
+# Put info about our fixtures data as constants here
+ADMIN_USER_AUTH_TOKEN = "89afc52edb7ba88d127cde415e5e2e5b3c106001"
+ADMIN_USER_PK = 1
+QUEUE_PK = 1
+CONTAINER_TASK_TYPE_PK = 1
+EXECUTABLE_TASK_TYPE_PK = 1
+CONTAINER_TASK_INSTANCE_UUID = "e7133970-ac3c-4026-adcf-55ee170d4eb3"
+EXECUTABLE_TASK_INSTANCE_UUID = "aa07248f-fdf3-4d34-8215-0c7b21b892ad"
+
+
+class StateUpdateRequestsTests(APITestCase):
+    """Test updating task instance states."""
+
+    fixtures = ["test-fixture.yaml"]
+
+    def setUp(self):
+        """Add in admin's auth to client."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Token " + ADMIN_USER_AUTH_TOKEN
+        )
+
+    def create_executable_task_instances(self, num_instances):
+        """Create executable task instances to update.
+
+        Args:
+            num_instances: An integer specifying how many task instances
+                to create.
+
+        Returns:
+            A list of executable task instances.
+        """
+        return [
+            ExecutableTaskInstance.objects.create(
+                user=User.objects.get(pk=ADMIN_USER_PK),
+                task_type=ExecutableTaskType.objects.get(
+                    pk=EXECUTABLE_TASK_TYPE_PK
+                ),
+                task_queue=TaskQueue.objects.get(pk=QUEUE_PK),
+            )
+            for _ in range(num_instances)
+        ]
+
+    def get_state_count(self, state):
+        """Get the total count of executable task instances in a state.
+
+        Args:
+            state: A string containing the state to count.
+
+        Returns:
+            An integer specifying the count.
+        """
+        return sum(
+            state_count.count
+            for state_count in TaskInstanceStateCount.objects.filter(
+                task_class=EXECUTABLE_TASK, state=state
+            )
+        )
+
+    def test_bulk_state_update(self):
+        """Make sure many task instances can be updated at once."""
+        container_instance = ContainerTaskInstance.objects.create(
+            user=User.objects.get(pk=ADMIN_USER_PK),
+            task_type=ContainerTaskType.objects.get(pk=CONTAINER_TASK_TYPE_PK),
+            task_queue=TaskQueue.objects.get(pk=QUEUE_PK),
+        )
+        executable_instance = self.create_executable_task_instances(1)[0]
+        missing_uuid = str(uuid.uuid4())
+
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [
+                dict(uuid=container_instance.uuid, state=RUNNING),
+                dict(
+                    uuid=executable_instance.uuid,
+                    state=RUNNING,
+                    timestamp="2018-12-20T00:00:00Z",
+                ),
+                dict(uuid=missing_uuid, state=RUNNING),
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item["uuid"], item["updated"]) for item in response.data],
+            [
+                (str(container_instance.uuid), True),
+                (str(executable_instance.uuid), True),
+                (missing_uuid, False),
+            ],
+        )
+
+        for instance in (container_instance, executable_instance):
+            instance.refresh_from_db()
+
+            self.assertEqual(instance.state, RUNNING)
+
+    def test_bulk_state_update_details(self):
+        """Make sure bulk updates finish task instances and count them."""
+        instances = self.create_executable_task_instances(2)
+
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [
+                dict(uuid=instances[0].uuid, state=SUCCESSFUL),
+                dict(uuid=instances[1].uuid, state=SUCCESSFUL),
+                dict(uuid=instances[1].uuid, state=FAILED),
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Only the last update for a task instance is applied
+        self.assertEqual(
+            [item["updated"] for item in response.data], [True, False, True]
+        )
+
+        for instance, state in zip(instances, (SUCCESSFUL, FAILED)):
+            instance.refresh_from_db()
+
+            self.assertEqual(instance.state, state)
+            self.assertIsNotNone(instance.datetime_finished)
+
+        self.assertEqual(
+            {
+                state: self.get_state_count(state)
+                for state in (SUCCESSFUL, FAILED)
+            },
+            # The fixture has one successful executable task instance
+            {SUCCESSFUL: 2, FAILED: 1},
+        )
+
+    def test_resource_usage(self):
+        """Make sure the resources jobs used are recorded and shown."""
+        instances = self.create_executable_task_instances(2)
+        usage = dict(
+            wall_time_seconds=10,
+            cpu_user_seconds=4,
+            cpu_system_seconds=1,
+            peak_memory_megabytes=256,
+            bytes_read=4096,
+            bytes_written=1024,
+        )
+
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [
+                dict(
+                    uuid=instances[0].uuid,
+                    state=SUCCESSFUL,
+                    resource_usage=usage,
+                ),
+                dict(uuid=instances[1].uuid, state=RUNNING),
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/%s/" % instances[1].uuid,
+            dict(state=FAILED, resource_usage=dict(wall_time_seconds=2)),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            "/api/executabletaskinstances/%s/" % instances[0].uuid
+        )
+
+        self.assertEqual(
+            {field: response.data[field] for field in usage}, usage
+        )
+
+        instances[1].refresh_from_db()
+
+        self.assertEqual(instances[1].wall_time_seconds, 2)
+        self.assertIsNone(instances[1].bytes_read)
+
+        # Negative usages are rejected
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [
+                dict(
+                    uuid=instances[0].uuid,
+                    state=SUCCESSFUL,
+                    resource_usage=dict(bytes_read=-1),
+                )
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_state_update_queries(self):
+        """Make sure bulk updates don't need more queries for more updates."""
+        instances = self.create_executable_task_instances(12)
+
+        def update_states(instances_to_update, state):
+            """Update task instance states and count the queries needed.
+
+            Args:
+                instances_to_update: A list of task instances.
+                state: A string containing the state to update to.
+
+            Returns:
+                An integer specifying how many queries were run.
+            """
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(
+                    "/api/updatetaskinstancestatus/",
+                    [
+                        dict(uuid=instance.uuid, state=state)
+                        for instance in instances_to_update
+                    ],
+                    format="json",
+                )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            return len(context.captured_queries)
+
+        # The first update to each state creates its state count, so
+        # compare the updates after that
+        for state in (RUNNING, SUCCESSFUL):
+            update_states(instances[:1], state)
+
+            self.assertEqual(
+                update_states(instances[1:3], state),
+                update_states(instances[3:], state),
+            )
+
+    def test_invalid_state_transitions(self):
+        """Make sure invalid state changes aren't applied."""
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/"
+            + CONTAINER_TASK_INSTANCE_UUID
+            + "/",
+            dict(state=RUNNING),
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [
+                dict(uuid=CONTAINER_TASK_INSTANCE_UUID, state=RUNNING),
+                dict(uuid=EXECUTABLE_TASK_INSTANCE_UUID, state=SUCCESSFUL),
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["updated"] for item in response.data], [False, True]
+        )
+        self.assertEqual(
+            ContainerTaskInstance.objects.get(
+                uuid=CONTAINER_TASK_INSTANCE_UUID
+            ).state,
+            SUCCESSFUL,
+        )
+
+    def test_bulk_state_update_validation(self):
+        """Make sure malformed bulk state updates are rejected."""
+        response = self.client.patch(
+            "/api/updatetaskinstancestatus/",
+            [dict(uuid=CONTAINER_TASK_INSTANCE_UUID, state="sleeping")],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            ContainerTaskInstance.objects.get(
+                uuid=CONTAINER_TASK_INSTANCE_UUID
+            ).state,
+            SUCCESSFUL,
+        )
@@ -1,8 +1,13 @@
 """Contains helpers for requests tests."""
 
+import datetime
+import gzip
+import hashlib
+import io
+import threading
+from botocore.exceptions import ClientError
 from tasksapi.constants import DOCKER
 
-
 TEST_CONTAINER_TASK_TYPE_DICT = dict(
     name="my-task-type",
     description="Fantastic task type",
@@ -35,3 +40,144 @@ TEST_TASK_WHITELIST_DICT = dict(
     whitelisted_container_task_types=[1],
     whitelisted_executable_task_types=[1],
 )
+
+
+class FakeS3Body(io.BytesIO):
+    """A stand-in for an S3 object's streaming body.
+
+    This records how many bytes are read from it, which (unlike a real
+    body) can be checked after it's closed.
+    """
+
+    def __init__(self, data):
+        """Initialize the body.
+
+        Args:
+            data: A byte string containing the body's contents.
+        """
+        super().__init__(data)
+        self.num_bytes_read = 0
+
+    def read(self, size=-1):
+        """Read bytes from the body."""
+        data = super().read(size)
+        self.num_bytes_read += len(data)
+
+        return data
+
+
+class FakeS3Client:
+    """A stand-in for a boto3 S3 client, which records traffic.
+
+    Only one bucket's worth of objects is kept, whatever bucket is
+    asked for.
+    """
+
+    def __init__(self):
+        """Start off with an empty bucket."""
+        self.contents = {}
+        self.num_requests = 0
+        self.num_bytes_sent = 0
+        self.bodies = []
+        self.lock = threading.Lock()
+
+    def put(self, key, data, gzipped=False):
+        """Add an object to the bucket.
+
+        Args:
+            key: A string containing the key of the object.
+            data: A byte string containing the object's contents.
+            gzipped: An optional boolean specifying whether to store
+                the object gzipped. Defaults to False.
+        """
+        if gzipped:
+            self.contents[key] = (gzip.compress(data), "gzip")
+        else:
+            self.contents[key] = (data, None)
+
+    def get_stored(self, key, error_code="NoSuchKey"):
+        """Get the stored bytes and content encoding of an object.
+
+        Raises:
+            botocore.exceptions.ClientError: The object doesn't exist.
+        """
+        with self.lock:
+            self.num_requests += 1
+
+        if key not in self.contents:
+            raise ClientError(
+                {"Error": {"Code": error_code, "Message": key}}, "GetObject"
+            )
+
+        return self.contents[key]
+
+    def list_objects_v2(self, Bucket, Prefix):
+        """List the objects whose keys start with a prefix."""
+        with self.lock:
+            self.num_requests += 1
+
+        return {
+            "Contents": [
+                {
+                    "Key": key,
+                    "Size": len(data),
+                    "LastModified": datetime.datetime(
+                        2018, 1, 1, tzinfo=datetime.timezone.utc
+                    ),
+                    "ETag": '"%s"' % hashlib.md5(data).hexdigest(),
+                }
+                for key, (data, _) in sorted(self.contents.items())
+                if key.startswith(Prefix)
+            ],
+            "IsTruncated": False,
+        }
+
+    def head_object(self, Bucket, Key):
+        """Get an object's metadata."""
+        data, encoding = self.get_stored(Key, error_code="404")
+        response = {"ContentLength": len(data)}
+
+        if encoding:
+            response["ContentEncoding"] = encoding
+
+        return response
+
+    def get_object(self, Bucket, Key, Range=None):
+        """Get (a byte range of) an object."""
+        data, encoding = self.get_stored(Key)
+        response = {}
+
+        if encoding:
+            response["ContentEncoding"] = encoding
+
+        if Range is not None:
+            first, last = Range[len("bytes=") :].split("-")
+
+            if not first:
+                start = max(0, len(data) - int(last))
+            else:
+                start = int(first)
+
+            end = min(len(data), int(last) + 1 if first else len(data))
+
+            if start >= len(data):
+                raise ClientError(
+                    {"Error": {"Code": "InvalidRange", "Message": Range}},
+                    "GetObject",
+                )
+
+            response["ContentRange"] = "bytes %s-%s/%s" % (
+                start,
+                end - 1,
+                len(data),
+            )
+            data = data[start:end]
+
+        response["ContentLength"] = len(data)
+        response["Body"] = FakeS3Body(data)
+
+        with self.lock:
+            self.num_bytes_sent += len(data)
+            self.bodies.append(response["Body"])
+
+        return response
@@ -0,0 +1,68 @@
+"""Contains tests for writing container output to log files."""
+
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase
+from tasksapi.tasks.container_tasks import stream_container_logs
+from tasksapi.tasks.utils import read_file_tail
+
+
+class FakeContainer:
+    """A stand-in for a docker.models.containers.Container."""
+
+    def __init__(self, stdout_chunks, stderr_chunks, exit_status):
+        """Set the container's output and exit code."""
+        self.stdout_chunks = stdout_chunks
+        self.stderr_chunks = stderr_chunks
+        self.exit_status = exit_status
+
+    def logs(self, stdout, stderr, stream, follow):
+        """Stream one of the container's outputs."""
+        return iter(self.stdout_chunks if stdout else self.stderr_chunks)
+
+    def wait(self):
+        """Wait for the container to exit."""
+        return {"StatusCode": self.exit_status}
+
+
+class ContainerLogTests(SimpleTestCase):
+    """Test writing container output to log files."""
+
+    def setUp(self):
+        """Make a directory for the log files."""
+        self.directory = tempfile.mkdtemp()
+        self.stdout_path = os.path.join(self.directory, "stdout.txt")
+        self.stderr_path = os.path.join(self.directory, "stderr.txt")
+
+    def tearDown(self):
+        """Remove the log files."""
+        shutil.rmtree(self.directory)
+
+    def test_stream_container_logs(self):
+        """Make sure both outputs are written and the exit code kept."""
+        container = FakeContainer(
+            [b"hello ", b"world\n"] * 1000, [b"oh no\n"], 3
+        )
+
+        exit_status = stream_container_logs(
+            container, self.stdout_path, self.stderr_path
+        )
+
+        self.assertEqual(exit_status, 3)
+
+        with open(self.stdout_path, "rb") as stdout_file:
+            self.assertEqual(stdout_file.read(), b"hello world\n" * 1000)
+
+        with open(self.stderr_path, "rb") as stderr_file:
+            self.assertEqual(stderr_file.read(), b"oh no\n")
+
+    def test_read_file_tail(self):
+        """Make sure only the end of long files is read."""
+        with open(self.stderr_path, "w") as stderr_file:
+            stderr_file.write("a" * 10 + "b" * 5)
+
+        self.assertEqual(read_file_tail(self.stderr_path, 5), "bbbbb")
+        self.assertEqual(
+            read_file_tail(self.stderr_path, 100), "a" * 10 + "b" * 5
+        )
@@ -0,0 +1,160 @@
+"""Contains tests for limiting and measuring containers' resources."""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from tasksapi.tasks.container_tasks import (
+    get_docker_resource_limits,
+    get_singularity_resource_limits,
+    watch_container_stats,
+)
+from tasksapi.tasks.utils import (
+    call_with_usage,
+    pop_resource_usage,
+    record_resource_usage,
+)
+
+
+class FakeStatsContainer:
+    """A stand-in for a docker.models.containers.Container."""
+
+    def __init__(self, stats):
+        """Set the stats the container reports."""
+        self.stats_list = stats
+
+    def stats(self, stream, decode):
+        """Stream the container's stats."""
+        return iter(self.stats_list)
+
+
+class ContainerResourceLimitsTests(SimpleTestCase):
+    """Test limiting and measuring containers' resources."""
+
+    def test_docker_limits(self):
+        """Make sure Docker containers are limited as asked."""
+        self.assertEqual(get_docker_resource_limits(None, None, None), {})
+        self.assertEqual(
+            get_docker_resource_limits(1.5, 512, 100),
+            {
+                "nano_cpus": 1500000000,
+                "mem_limit": "512m",
+                "memswap_limit": "512m",
+                "pids_limit": 100,
+            },
+        )
+
+    def test_singularity_limits(self):
+        """Make sure Singularity containers are only limited if enabled."""
+        with mock.patch.dict(
+            os.environ, {"SINGULARITY_RESOURCE_LIMITS": "False"}
+        ), self.assertLogs("tasksapi.tasks.container_tasks", "WARNING"):
+            self.assertEqual(get_singularity_resource_limits(2, 512, 10), [])
+
+        with mock.patch.dict(
+            os.environ, {"SINGULARITY_RESOURCE_LIMITS": "True"}
+        ):
+            self.assertEqual(
+                get_singularity_resource_limits(2, 512, None),
+                ["--cpus", "2", "--memory", "512M", "--memory-swap", "512M"],
+            )
+
+    def test_watch_container_stats(self):
+        """Make sure containers' peak usage and CPU times are kept."""
+        container = FakeStatsContainer(
+            [
+                {
+                    "memory_stats": {"usage": 100 * 1024 * 1024},
+                    "cpu_stats": {
+                        "cpu_usage": {
+                            "usage_in_usermode": 10 ** 9,
+                            "usage_in_kernelmode": 0,
+                        }
+                    },
+                    "pids_stats": {"current": 5},
+                    "blkio_stats": {
+                        "io_service_bytes_recursive": [
+                            {"major": 8, "op": "Read", "value": 4096},
+                            {"major": 8, "op": "Write", "value": 100},
+                            {"major": 9, "op": "Read", "value": 1024},
+                        ]
+                    },
+                },
+                {
+                    "memory_stats": {"usage": 50 * 1024 * 1024},
+                    "cpu_stats": {
+                        "cpu_usage": {
+                            "usage_in_usermode": 3 * 10 ** 9,
+                            "usage_in_kernelmode": 10 ** 9,
+                        }
+                    },
+                    "pids_stats": {"current": 2},
+                },
+                # Stats once the container has exited are empty
+                {
+                    "memory_stats": {},
+                    "cpu_stats": {},
+                    "pids_stats": {},
+                    "blkio_stats": {},
+                },
+            ]
+        )
+        usage = {
+            "cpu_user_seconds": 0,
+            "cpu_system_seconds": 0,
+            "peak_memory_megabytes": 0,
+            "peak_pids": 0,
+            "bytes_read": 0,
+            "bytes_written": 0,
+        }
+
+        watch_container_stats(container, usage)
+
+        self.assertEqual(
+            usage,
+            {
+                "cpu_user_seconds": 3,
+                "cpu_system_seconds": 1,
+                "peak_memory_megabytes": 100,
+                "peak_pids": 5,
+                "bytes_read": 5120,
+                "bytes_written": 100,
+            },
+        )
+
+    def test_call_with_usage(self):
+        """Make sure commands' usage and exit codes are returned."""
+        exit_status, usage = call_with_usage(
+            [sys.executable, "-c", "bytearray(64 * 1024 * 1024)"]
+        )
+
+        self.assertEqual(exit_status, 0)
+        self.assertGreater(usage["peak_memory_megabytes"], 64)
+        self.assertGreater(usage["wall_time_seconds"], 0)
+        self.assertGreaterEqual(usage["bytes_read"], 0)
+        self.assertGreaterEqual(usage["bytes_written"], 0)
+
+        exit_status, _ = call_with_usage(["sh", "-c", "exit 3"])
+
+        self.assertEqual(exit_status, 3)
+
+    def test_record_resource_usage(self):
+        """Make sure usage is written and kept for the state update."""
+        logs_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, logs_directory)
+
+        with mock.patch.dict(
+            os.environ, {"WORKER_LOGS_DIRECTORY": logs_directory}
+        ):
+            record_resource_usage("job", {"peak_pids": 3})
+
+        with open(
+            os.path.join(logs_directory, "job", "job-resource-usage.json")
+        ) as usage_file:
+            self.assertEqual(json.load(usage_file), {"peak_pids": 3})
+
+        self.assertEqual(pop_resource_usage("job"), {"peak_pids": 3})
+        self.assertIsNone(pop_resource_usage("job"))
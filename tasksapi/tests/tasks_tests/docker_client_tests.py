@@ -0,0 +1,101 @@
+"""Contains tests for the worker's Docker client."""
+
+from unittest import mock
+import requests
+from django.test import SimpleTestCase
+from tasksapi.tasks.docker_clients import (
+    DockerClientHolder,
+    docker_clients,
+    get_docker_client,
+    get_docker_client_holder,
+    init_docker_client,
+    reset_docker_client,
+)
+
+
+class FakeClient:
+    """A stand-in for a docker.DockerClient."""
+
+    def __init__(self):
+        """Start off with a reachable daemon."""
+        self.healthy = True
+        self.pings = 0
+        self.closed = False
+
+    def ping(self):
+        """Check whether the daemon can be reached."""
+        self.pings += 1
+
+        if not self.healthy:
+            raise requests.exceptions.ConnectionError("daemon went away")
+
+        return True
+
+    def close(self):
+        """Close the client's connections."""
+        self.closed = True
+
+
+class DockerClientTests(SimpleTestCase):
+    """Test reusing and reconnecting Docker clients."""
+
+    def setUp(self):
+        """Make sure no process has a client yet."""
+        docker_clients.clear()
+        self.addCleanup(docker_clients.clear)
+
+        patcher = mock.patch("docker.from_env", side_effect=FakeClient)
+        self.from_env = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuse(self):
+        """Make sure each process makes one client."""
+        init_docker_client()
+
+        self.assertIs(get_docker_client(), get_docker_client())
+        self.assertEqual(self.from_env.call_count, 1)
+
+    def test_health_checks(self):
+        """Make sure clients are only pinged once they're due."""
+        holder = DockerClientHolder(health_check_interval=30)
+
+        with mock.patch("time.time", return_value=1000):
+            client = holder.get_client()
+
+        with mock.patch("time.time", return_value=1029):
+            holder.get_client()
+
+        self.assertEqual(client.pings, 0)
+
+        with mock.patch("time.time", return_value=1030):
+            self.assertIs(holder.get_client(), client)
+
+        self.assertEqual(client.pings, 1)
+
+    def test_reconnect(self):
+        """Make sure unhealthy clients are replaced."""
+        holder = DockerClientHolder(health_check_interval=0)
+        client = holder.get_client()
+        client.healthy = False
+
+        new_client = holder.get_client()
+
+        self.assertIsNot(new_client, client)
+        self.assertTrue(client.closed)
+        self.assertEqual(self.from_env.call_count, 2)
+
+    def test_reset(self):
+        """Make sure reset clients are replaced on next use."""
+        client = get_docker_client()
+        reset_docker_client()
+
+        self.assertTrue(client.closed)
+        self.assertIsNot(get_docker_client(), client)
+
+    def test_init_without_docker(self):
+        """Make sure workers without Docker can still start."""
+        self.from_env.side_effect = Exception("no Docker here")
+
+        init_docker_client()
+
+        self.assertIsNone(get_docker_client_holder().client)
@@ -0,0 +1,298 @@
+"""Contains tests for the worker's Docker image cache."""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+import docker
+from django.test import SimpleTestCase
+from tasksapi.tasks.docker_images import (
+    ALWAYS,
+    IF_NOT_PRESENT,
+    IF_OLDER_THAN_TTL,
+    JOB_CONTAINER_LABEL,
+    DockerImageCache,
+)
+
+
+class FakeImage:
+    """A stand-in for a docker.models.images.Image."""
+
+    def __init__(self, image_id, size):
+        """Set the image's ID and size."""
+        self.id = image_id
+        self.attrs = {"Size": size}
+
+
+class FakeContainer:
+    """A stand-in for a docker.models.containers.Container."""
+
+    def __init__(self, containers, image_id, status, labels):
+        """Set the container's image, status, and labels."""
+        self.containers = containers
+        self.image_id = image_id
+        self.status = status
+        self.labels = labels
+
+    def remove(self):
+        """Remove the container from the host."""
+        self.containers.remove(self)
+
+
+class FakeContainerCollection(list):
+    """A stand-in for a Docker client's containers."""
+
+    def list(self, all, filters):
+        """Find containers matching an image, label, and status."""
+        return [
+            container
+            for container in self
+            if container.image_id == filters["ancestor"]
+            and filters["label"] in container.labels
+            and container.status == filters["status"]
+        ]
+
+
+class FakeImageCollection:
+    """A stand-in for a Docker client's images, which records pulls.
+
+    Images named "busy", or which containers use, can't be removed.
+    """
+
+    def __init__(self, sizes, containers):
+        """Set up the registry.
+
+        Args:
+            sizes: A dictionary mapping image references to the sizes
+                of the images they refer to.
+            containers: A FakeContainerCollection containing the
+                containers on the host.
+        """
+        self.sizes = sizes
+        self.containers = containers
+        self.local_images = {}
+        self.pulls = []
+        self.removals = []
+
+    def get(self, name):
+        """Find an image on the host."""
+        if name not in self.local_images:
+            raise docker.errors.ImageNotFound(name)
+
+        return self.local_images[name]
+
+    def pull(self, repository, tag=None):
+        """Pull an image from the registry.
+
+        Like Docker's, pulling without a tag pulls every tag of the
+        repository and returns a list of images.
+        """
+        if tag in (None, "latest"):
+            name = repository
+        elif tag.startswith("sha256:"):
+            name = repository + "@" + tag
+        else:
+            name = repository + ":" + tag
+
+        self.pulls.append(name)
+        self.local_images[name] = FakeImage(
+            "sha256:%s-%s" % (name, len(self.pulls)), self.sizes[name]
+        )
+
+        if tag is None:
+            return [self.local_images[name]]
+
+        return self.local_images[name]
+
+    def remove(self, image_id, force):
+        """Remove an image from the host."""
+        if image_id.startswith("sha256:busy") or any(
+            container.image_id == image_id for container in self.containers
+        ):
+            raise docker.errors.APIError("image is being used")
+
+        self.removals.append(image_id)
+        self.local_images = {
+            name: image
+            for name, image in self.local_images.items()
+            if image.id != image_id
+        }
+
+
+class FakeClient:
+    """A stand-in for a docker.DockerClient."""
+
+    def __init__(self, sizes):
+        """Set up the client's containers and images."""
+        self.containers = FakeContainerCollection()
+        self.images = FakeImageCollection(sizes, self.containers)
+
+
+class DockerImageCacheTests(SimpleTestCase):
+    """Test pulling and evicting Docker images."""
+
+    def setUp(self):
+        """Make a directory for the cache's state."""
+        self.state_directory = tempfile.mkdtemp()
+        self.client = FakeClient(
+            {
+                "small": 100,
+                "medium": 200,
+                "large": 300,
+                "busy": 300,
+                "image@sha256:abc": 100,
+            }
+        )
+
+    def tearDown(self):
+        """Remove the cache's state."""
+        shutil.rmtree(self.state_directory)
+
+    def get_cache(self, **kwargs):
+        """Make a cache which uses the fake client.
+
+        Args:
+            **kwargs: Keyword arguments to pass to the cache.
+
+        Returns:
+            A DockerImageCache.
+        """
+        return DockerImageCache(
+            self.client,
+            os.path.join(self.state_directory, "state.json"),
+            **kwargs
+        )
+
+    def test_always(self):
+        """Make sure the always policy pulls every time."""
+        cache = self.get_cache(pull_policy=ALWAYS)
+
+        first_id = cache.get_image("small")
+        second_id = cache.get_image("small")
+
+        self.assertEqual(self.client.images.pulls, ["small", "small"])
+        self.assertNotEqual(first_id, second_id)
+        self.assertEqual(
+            cache.get_stats(),
+            {"hit": 0, "miss": 1, "refresh": 1, "eviction": 0},
+        )
+
+    def test_if_not_present(self):
+        """Make sure the if-not-present policy only pulls once."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT)
+
+        self.assertEqual(cache.get_image("small"), cache.get_image("small"))
+        self.assertEqual(self.client.images.pulls, ["small"])
+        self.assertEqual(cache.get_stats()["hit"], 1)
+
+    def test_if_older_than_ttl(self):
+        """Make sure images are re-pulled once they're stale."""
+        cache = self.get_cache(pull_policy=IF_OLDER_THAN_TTL, ttl=60)
+
+        with mock.patch("time.time", return_value=1000):
+            cache.get_image("small")
+
+        with mock.patch("time.time", return_value=1059):
+            cache.get_image("small")
+
+        self.assertEqual(self.client.images.pulls, ["small"])
+
+        with mock.patch("time.time", return_value=1060):
+            cache.get_image("small")
+
+        self.assertEqual(self.client.images.pulls, ["small", "small"])
+
+        # Images pulled outside of the cache are refreshed
+        self.client.images.local_images["medium"] = FakeImage(
+            "sha256:old-medium", 200
+        )
+        cache.get_image("medium")
+
+        self.assertEqual(
+            self.client.images.pulls, ["small", "small", "medium"]
+        )
+
+    def test_untagged_images(self):
+        """Make sure untagged references pull only the latest tag."""
+        cache = self.get_cache(pull_policy=ALWAYS)
+
+        image_id = cache.get_image("small")
+
+        self.assertEqual(
+            image_id, self.client.images.local_images["small"].id
+        )
+
+    def test_pinned_images(self):
+        """Make sure images pinned to digests are only pulled once."""
+        cache = self.get_cache(pull_policy=ALWAYS)
+
+        cache.get_image("image@sha256:abc")
+        cache.get_image("image@sha256:abc")
+
+        self.assertEqual(self.client.images.pulls, ["image@sha256:abc"])
+
+    def test_eviction(self):
+        """Make sure least recently used images are evicted."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        for timestamp, name in enumerate(["small", "medium", "small"]):
+            with mock.patch("time.time", return_value=timestamp):
+                cache.get_image(name)
+
+        # Medium was used least recently, and is enough to fit large
+        with mock.patch("time.time", return_value=10):
+            cache.get_image("large")
+
+        self.assertEqual(len(self.client.images.removals), 1)
+        self.assertIn("medium", self.client.images.removals[0])
+        self.assertEqual(
+            set(self.client.images.local_images), {"small", "large"}
+        )
+        self.assertEqual(cache.get_stats()["eviction"], 1)
+
+    def test_eviction_skips_images(self):
+        """Make sure images being run or in use aren't evicted."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        for timestamp, name in enumerate(["busy", "small", "large"]):
+            with mock.patch("time.time", return_value=timestamp):
+                cache.get_image(name)
+
+        # Evicting small isn't enough, but the other images can't go
+        self.assertEqual(len(self.client.images.removals), 1)
+        self.assertIn("small", self.client.images.removals[0])
+        self.assertEqual(
+            set(self.client.images.local_images), {"busy", "large"}
+        )
+
+    def test_eviction_removes_stopped_containers(self):
+        """Make sure stopped job containers don't keep images around."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        small_id = cache.get_image("small")
+        medium_id = cache.get_image("medium")
+
+        # Only stopped containers which jobs ran in are removed
+        other_container = FakeContainer(
+            self.client.containers, small_id, "exited", {}
+        )
+        job_container = FakeContainer(
+            self.client.containers,
+            medium_id,
+            "exited",
+            {JOB_CONTAINER_LABEL: "some-uuid"},
+        )
+        self.client.containers.extend([other_container, job_container])
+
+        cache.get_image("large")
+
+        self.assertEqual(self.client.containers, [other_container])
+        self.assertEqual(self.client.images.removals, [medium_id])
+        self.assertEqual(
+            set(self.client.images.local_images), {"small", "large"}
+        )
+
+    def test_bad_policy(self):
+        """Make sure unknown pull policies are rejected."""
+        with self.assertRaises(ValueError):
+            self.get_cache(pull_policy="sometimes")
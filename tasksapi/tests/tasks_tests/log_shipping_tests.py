@@ -0,0 +1,218 @@
+"""Contains tests for the worker's log shipper."""
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from tasksapi.tasks.log_shipping import LogShipper, get_log_shipper
+
+
+class FakeS3Client:
+    """A stand-in for a boto3 S3 client, which records uploads."""
+
+    def __init__(self):
+        """Start off with an empty bucket."""
+        self.objects = {}
+        self.num_uploads = 0
+        self.lock = threading.Lock()
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        """Upload a file."""
+        with open(Filename, "rb") as uploaded_file:
+            body = uploaded_file.read()
+
+        with self.lock:
+            self.objects[(Bucket, Key)] = {
+                "body": body,
+                "extra_args": ExtraArgs or {},
+                "config": Config,
+            }
+            self.num_uploads += 1
+
+
+class LogShippingTests(SimpleTestCase):
+    """Test uploading job logs."""
+
+    def setUp(self):
+        """Make a job with some logs."""
+        self.logs_directory = tempfile.mkdtemp()
+        self.job_uuid = "5a8c4c4c-96ec-4a43-a1c6-b2b2d1f7e0b1"
+        self.job_logs_directory = os.path.join(
+            self.logs_directory, self.job_uuid
+        )
+
+        os.makedirs(os.path.join(self.job_logs_directory, "nested"))
+
+        self.write_log("stdout.txt", "hello\n")
+        self.write_log(os.path.join("nested", "app.log"), "nested\n")
+
+        self.s3_client = FakeS3Client()
+
+    def tearDown(self):
+        """Remove the logs."""
+        shutil.rmtree(self.logs_directory)
+
+    def write_log(self, relative_path, text):
+        """Write a log file for the job.
+
+        Args:
+            relative_path: A string containing the path of the file
+                relative to the job's log directory.
+            text: A string to write to the file.
+        """
+        with open(
+            os.path.join(self.job_logs_directory, relative_path), "a"
+        ) as log_file:
+            log_file.write(text)
+
+    def get_shipper(self, **kwargs):
+        """Make a shipper which uses the fake client.
+
+        Args:
+            **kwargs: Keyword arguments to pass to the shipper.
+
+        Returns:
+            A LogShipper.
+        """
+        return LogShipper(
+            self.s3_client, "logs", self.logs_directory, **kwargs
+        )
+
+    def get_body(self, relative_key):
+        """Get the contents of one of the job's uploaded logs.
+
+        Args:
+            relative_key: A string containing the key of the log
+                without the job's UUID.
+
+        Returns:
+            A byte string.
+        """
+        return self.s3_client.objects[
+            ("logs", self.job_uuid + "/" + relative_key)
+        ]["body"]
+
+    def test_finish_job(self):
+        """Make sure every log file is uploaded once jobs finish."""
+        shipper = self.get_shipper(multipart_threshold=1024)
+        shipper.start_job(self.job_uuid)
+        shipper.finish_job(self.job_uuid)
+
+        self.assertTrue(shipper.flush(timeout=5))
+        self.assertEqual(
+            set(self.s3_client.objects),
+            {
+                ("logs", self.job_uuid + "/stdout.txt"),
+                ("logs", self.job_uuid + "/nested/app.log"),
+            },
+        )
+        self.assertEqual(self.get_body("stdout.txt"), b"hello\n")
+        self.assertEqual(self.get_body("nested/app.log"), b"nested\n")
+
+        config = self.s3_client.objects[
+            ("logs", self.job_uuid + "/stdout.txt")
+        ]["config"]
+        self.assertEqual(config.multipart_threshold, 1024)
+
+    def test_gzip(self):
+        """Make sure logs can be gzipped before they're uploaded."""
+        shipper = self.get_shipper(gzip_logs=True)
+        shipper.finish_job(self.job_uuid)
+
+        self.assertTrue(shipper.flush(timeout=5))
+        self.assertEqual(
+            gzip.decompress(self.get_body("stdout.txt")), b"hello\n"
+        )
+        self.assertEqual(
+            self.s3_client.objects[("logs", self.job_uuid + "/stdout.txt")][
+                "extra_args"
+            ]["ContentEncoding"],
+            "gzip",
+        )
+
+    def test_only_changed_files(self):
+        """Make sure unchanged files aren't uploaded again."""
+        shipper = self.get_shipper()
+        shipper.ship_job(self.job_uuid)
+        self.assertTrue(shipper.flush(timeout=5))
+
+        self.write_log("stdout.txt", "world\n")
+        shipper.ship_job(self.job_uuid)
+        self.assertTrue(shipper.flush(timeout=5))
+
+        self.assertEqual(self.s3_client.num_uploads, 3)
+        self.assertEqual(self.get_body("stdout.txt"), b"hello\nworld\n")
+
+    def test_periodic_shipping(self):
+        """Make sure running jobs' logs are uploaded periodically."""
+        shipper = self.get_shipper(interval=0.01)
+        shipper.start_job(self.job_uuid)
+
+        deadline = time.time() + 5
+
+        while not self.s3_client.num_uploads and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertTrue(self.s3_client.num_uploads)
+
+        self.write_log("stdout.txt", "world\n")
+        shipper.finish_job(self.job_uuid)
+
+        self.assertTrue(shipper.flush(timeout=5))
+        self.assertEqual(self.get_body("stdout.txt"), b"hello\nworld\n")
+        self.assertEqual(shipper.job_threads, {})
+        self.assertEqual(shipper.queued_versions, {})
+
+    def test_retries(self):
+        """Make sure failed uploads are retried."""
+        upload_file = self.s3_client.upload_file
+        attempts = []
+
+        def fail_first_upload(**kwargs):
+            attempts.append(kwargs["Key"])
+
+            if len(attempts) == 1:
+                raise IOError("S3 is down")
+
+            upload_file(**kwargs)
+
+        shipper = self.get_shipper(num_threads=1, backoff_factor=0.01)
+
+        with mock.patch.object(
+            self.s3_client, "upload_file", side_effect=fail_first_upload
+        ):
+            shipper.finish_job(self.job_uuid)
+
+            self.assertTrue(shipper.flush(timeout=5))
+
+        # The failed file was uploaded on its second attempt
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(attempts[0], attempts[1])
+        self.assertEqual(self.get_body("stdout.txt"), b"hello\n")
+        self.assertEqual(self.get_body("nested/app.log"), b"nested\n")
+
+    def test_bounded_retries(self):
+        """Make sure uploads which keep failing are given up on."""
+        shipper = self.get_shipper(
+            max_retries=2, backoff_factor=0.01, max_backoff=0.02
+        )
+
+        with mock.patch.object(
+            self.s3_client, "upload_file", side_effect=IOError("S3 is down")
+        ) as upload_file:
+            shipper.finish_job(self.job_uuid)
+
+            self.assertTrue(shipper.flush(timeout=5))
+
+        # Two files, each tried once and retried twice
+        self.assertEqual(upload_file.call_count, 6)
+        self.assertEqual(self.s3_client.objects, {})
+
+    def test_no_bucket(self):
+        """Make sure logs aren't shipped without a bucket."""
+        with mock.patch.dict(os.environ, {"AWS_LOGS_BUCKET_NAME": ""}):
+            self.assertIsNone(get_log_shipper())
@@ -0,0 +1,163 @@
+"""Contains tests for admitting jobs against workers' resource budgets."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+from tasksapi.constants import EXECUTABLE_TASK, RUNNING
+from tasksapi.models import ExecutableTaskType
+from tasksapi.tasks import run_task
+from tasksapi.tasks.admission import ResourceBudget, get_resource_budget
+
+
+class ResourceAdmissionTests(SimpleTestCase):
+    """Test admitting jobs only while they fit in the budget."""
+
+    def setUp(self):
+        """Make a directory to keep budgets' state in."""
+        self.temp_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_directory)
+
+    def get_budget(self, **kwargs):
+        """Make a budget which keeps its state in the temp directory.
+
+        Args:
+            **kwargs: Keyword arguments for the budget.
+
+        Returns:
+            A ResourceBudget.
+        """
+        return ResourceBudget(
+            state_path=os.path.join(self.temp_directory, "budget.json"),
+            **kwargs
+        )
+
+    def test_small_jobs_pack(self):
+        """Make sure jobs run together while they fit."""
+        budget = self.get_budget(cpus=4, memory_megabytes=1000)
+
+        for job in range(4):
+            self.assertTrue(budget.try_admit(str(job), 1, 200))
+
+        self.assertFalse(budget.try_admit("4", 1, 200))
+        self.assertEqual(
+            budget.get_usage(),
+            {"cpus": 4, "memory_megabytes": 800, "running": 4, "waiting": 1},
+        )
+
+        budget.release("0")
+
+        self.assertTrue(budget.try_admit("4", 1, 200))
+
+        # Memory can run out before CPUs do
+        budget.release("1")
+        budget.release("2")
+
+        self.assertFalse(budget.try_admit("5", 0.5, 700))
+
+    def test_big_jobs(self):
+        """Make sure jobs bigger than the budget run alone."""
+        budget = self.get_budget(cpus=4)
+
+        self.assertTrue(budget.try_admit("small", 1, 0))
+        self.assertFalse(budget.try_admit("big", 16, 0))
+
+        budget.release("small")
+
+        self.assertTrue(budget.try_admit("big", 16, 0))
+        self.assertFalse(budget.try_admit("small", 1, 0))
+
+    def test_no_starvation(self):
+        """Make sure small jobs stop skipping ahead of big ones."""
+        budget = self.get_budget(cpus=4, max_bypass_time=300)
+
+        self.assertTrue(budget.try_admit("a", 3, 0, now=0))
+        self.assertFalse(budget.try_admit("big", 2, 0, now=0))
+
+        # Small jobs can skip ahead for a while
+        self.assertTrue(budget.try_admit("b", 1, 0, now=10))
+        budget.release("b")
+
+        # But not once the big job has waited too long
+        self.assertFalse(budget.try_admit("c", 1, 0, now=400))
+
+        budget.release("a")
+
+        self.assertTrue(budget.try_admit("big", 2, 0, now=401))
+        self.assertTrue(budget.try_admit("c", 1, 0, now=402))
+
+    def test_dead_processes(self):
+        """Make sure jobs of dead worker processes are forgotten."""
+        budget = self.get_budget(cpus=1)
+
+        process = subprocess.Popen(["true"])
+        process.wait()
+
+        with mock.patch("os.getpid", return_value=process.pid):
+            self.assertTrue(budget.try_admit("orphan", 1, 0))
+
+        self.assertTrue(budget.try_admit("job", 1, 0))
+
+    def test_configuration(self):
+        """Make sure budgets are only used when configured."""
+        environment = {"WORKER_TEMP_DIRECTORY": self.temp_directory}
+
+        with mock.patch.dict(os.environ, environment):
+            os.environ.pop("WORKER_CPUS", None)
+            os.environ.pop("WORKER_MEMORY_MEGABYTES", None)
+
+            self.assertIsNone(get_resource_budget())
+
+            os.environ["WORKER_MEMORY_MEGABYTES"] = "2048"
+            budget = get_resource_budget()
+
+        self.assertIsNone(budget.cpus)
+        self.assertEqual(budget.memory_megabytes, 2048)
+        self.assertTrue(budget.state_path.endswith("resource-budget.json"))
+
+    def test_run_task(self):
+        """Make sure jobs hold their share of the budget while running."""
+        environment = {
+            "WORKER_TEMP_DIRECTORY": self.temp_directory,
+            "WORKER_CPUS": "4",
+        }
+        usages = []
+
+        def launch_job(**kwargs):
+            usages.append(get_resource_budget().get_usage())
+
+        with mock.patch.dict(os.environ, environment), mock.patch(
+            "tasksapi.tasks.base_task.launch_job", side_effect=launch_job
+        ), mock.patch("tasksapi.tasks.base_task.update_job") as update_job:
+            run_task(
+                uuid="job",
+                task_class=EXECUTABLE_TASK,
+                command_to_run="true",
+                env_vars_list=[],
+                args_dict={},
+                required_cpus=3,
+                required_memory_megabytes=100,
+                json_file_option=None,
+            )
+
+            usage = get_resource_budget().get_usage()
+
+        update_job.assert_called_once_with(job_uuid="job", state=RUNNING)
+        self.assertEqual(usages[0]["cpus"], 3)
+        self.assertEqual(usage["running"], 0)
+
+    def test_negative_requirements(self):
+        """Make sure task types can't require negative resources."""
+        for requirements in (
+            {"required_cpus": -1},
+            {"required_memory_megabytes": -1},
+        ):
+            task_type = ExecutableTaskType(
+                name="test", command_to_run="true", **requirements
+            )
+
+            with self.assertRaises(ValidationError):
+                task_type.clean()
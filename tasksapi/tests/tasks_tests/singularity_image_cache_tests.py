@@ -0,0 +1,262 @@
+"""Contains tests for the worker's Singularity image cache."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from tasksapi.tasks.docker_images import (
+    ALWAYS,
+    IF_NOT_PRESENT,
+    IF_OLDER_THAN_TTL,
+)
+from tasksapi.tasks.singularity_images import SingularityImageCache
+
+
+class FakePuller:
+    """A stand-in for Singularity pulls, which records pulls.
+
+    Images are written to files named by their commits, which are the
+    images' names up to any colon (so "image:a" and "image:b" resolve to
+    the same commit).
+    """
+
+    def __init__(self, directory, sizes, delay=0):
+        """Set up the registry.
+
+        Args:
+            directory: A string containing the directory to pull to.
+            sizes: A dictionary mapping image references to the sizes
+                of the images they refer to.
+            delay: An optional number of seconds each pull takes.
+                Defaults to 0.
+        """
+        self.directory = directory
+        self.sizes = sizes
+        self.delay = delay
+        self.pulls = []
+        self.pulling = threading.Event()
+
+    def __call__(self, container_image):
+        """Pull an image."""
+        self.pulls.append(container_image)
+        self.pulling.set()
+        time.sleep(self.delay)
+
+        path = os.path.join(
+            self.directory, container_image.split(":")[0] + ".sif"
+        )
+
+        with open(path, "wb") as image_file:
+            image_file.write(b"\0" * self.sizes[container_image])
+
+        return path
+
+
+class SingularityImageCacheTests(SimpleTestCase):
+    """Test pulling and evicting Singularity images."""
+
+    def setUp(self):
+        """Make a directory for the images and the cache's state."""
+        self.directory = tempfile.mkdtemp()
+        self.puller = FakePuller(
+            self.directory,
+            {
+                "small": 100,
+                "medium": 200,
+                "large": 300,
+                "image:a": 100,
+                "image:b": 100,
+                "image@sha256:abc": 100,
+            },
+        )
+
+    def tearDown(self):
+        """Remove the images and the cache's state."""
+        shutil.rmtree(self.directory)
+
+    def get_cache(self, **kwargs):
+        """Make a cache which uses the fake puller.
+
+        Args:
+            **kwargs: Keyword arguments to pass to the cache.
+
+        Returns:
+            A SingularityImageCache.
+        """
+        return SingularityImageCache(
+            self.puller, os.path.join(self.directory, "state.json"), **kwargs
+        )
+
+    def test_always(self):
+        """Make sure the always policy pulls every time."""
+        cache = self.get_cache(pull_policy=ALWAYS)
+
+        cache.get_image("small")
+        cache.get_image("small")
+
+        self.assertEqual(self.puller.pulls, ["small", "small"])
+        self.assertEqual(
+            cache.get_stats(),
+            {"hit": 0, "miss": 1, "refresh": 1, "eviction": 0},
+        )
+
+    def test_if_not_present(self):
+        """Make sure the if-not-present policy only pulls once."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT)
+
+        self.assertEqual(cache.get_image("small"), cache.get_image("small"))
+        self.assertEqual(self.puller.pulls, ["small"])
+
+        # Files removed outside of the cache are pulled again
+        os.remove(cache.get_image("small"))
+        cache.get_image("small")
+
+        self.assertEqual(self.puller.pulls, ["small", "small"])
+        self.assertEqual(
+            cache.get_stats(),
+            {"hit": 2, "miss": 2, "refresh": 0, "eviction": 0},
+        )
+
+    def test_if_older_than_ttl(self):
+        """Make sure images are re-pulled once they're stale."""
+        cache = self.get_cache(pull_policy=IF_OLDER_THAN_TTL, ttl=60)
+
+        with mock.patch("time.time", return_value=1000):
+            cache.get_image("small")
+
+        with mock.patch("time.time", return_value=1059):
+            cache.get_image("small")
+
+        self.assertEqual(self.puller.pulls, ["small"])
+
+        with mock.patch("time.time", return_value=1060):
+            cache.get_image("small")
+
+        self.assertEqual(self.puller.pulls, ["small", "small"])
+
+    def test_pinned_images(self):
+        """Make sure images pinned to digests are only pulled once."""
+        cache = self.get_cache(pull_policy=ALWAYS)
+
+        cache.get_image("image@sha256:abc")
+        cache.get_image("image@sha256:abc")
+
+        self.assertEqual(self.puller.pulls, ["image@sha256:abc"])
+
+    def test_concurrent_pulls(self):
+        """Make sure jobs wait for each other's pulls of an image."""
+        self.puller.delay = 0.2
+        cache = self.get_cache(pull_policy=ALWAYS)
+        paths = []
+
+        def get_image():
+            paths.append(cache.get_image("small"))
+
+        threads = [threading.Thread(target=get_image)]
+        threads[0].start()
+
+        # Only start the other jobs once the first one is pulling
+        self.puller.pulling.wait()
+
+        threads += [threading.Thread(target=get_image) for _ in range(3)]
+
+        for thread in threads[1:]:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.puller.pulls, ["small"])
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(cache.get_stats()["hit"], 3)
+
+    def test_eviction(self):
+        """Make sure least recently used image files are removed."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        for timestamp, name in enumerate(["small", "medium", "small"]):
+            with mock.patch("time.time", return_value=timestamp):
+                cache.get_image(name)
+
+        # Medium was used least recently, and is enough to fit large
+        with mock.patch("time.time", return_value=10):
+            cache.get_image("large")
+
+        self.assertEqual(
+            sorted(
+                name
+                for name in os.listdir(self.directory)
+                if name.endswith(".sif")
+            ),
+            ["large.sif", "small.sif"],
+        )
+        self.assertEqual(cache.get_stats()["eviction"], 1)
+
+    def test_eviction_of_shared_files(self):
+        """Make sure references sharing a file are forgotten together."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=300)
+
+        for timestamp, name in enumerate(["image:a", "image:b", "large"]):
+            with mock.patch("time.time", return_value=timestamp):
+                cache.get_image(name)
+
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory, "image.sif"))
+        )
+        self.assertEqual(cache.get_stats()["eviction"], 1)
+
+        # Both references need pulling again
+        cache.get_image("image:b")
+
+        self.assertEqual(
+            self.puller.pulls, ["image:a", "image:b", "large", "image:b"]
+        )
+
+    def test_images_in_use_not_evicted(self):
+        """Make sure image files being run aren't removed."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        with mock.patch("time.time", return_value=0):
+            with cache.use_image("medium") as medium_path:
+                with mock.patch("time.time", return_value=1):
+                    cache.get_image("small")
+
+                # Medium was used least recently, but is still running
+                with mock.patch("time.time", return_value=2):
+                    cache.get_image("large")
+
+                self.assertTrue(os.path.exists(medium_path))
+                self.assertFalse(
+                    os.path.exists(os.path.join(self.directory, "small.sif"))
+                )
+
+        # Once released, it can be removed
+        cache.get_image("small")
+
+        self.assertFalse(os.path.exists(medium_path))
+        self.assertEqual(cache.get_stats()["eviction"], 2)
+
+    def test_images_of_exited_processes_evicted(self):
+        """Make sure processes which didn't release images are ignored."""
+        cache = self.get_cache(pull_policy=IF_NOT_PRESENT, max_bytes=500)
+
+        # Start (and wait for) a process just to get a dead process ID
+        process = subprocess.Popen(["true"])
+        process.wait()
+
+        with mock.patch("os.getpid", return_value=process.pid):
+            medium_path = cache.get_image("medium", mark_in_use=True)
+
+        cache.get_image("small")
+        cache.get_image("large")
+
+        self.assertFalse(os.path.exists(medium_path))
+
+    def test_bad_policy(self):
+        """Make sure unknown pull policies are rejected."""
+        with self.assertRaises(ValueError):
+            self.get_cache(pull_policy="sometimes")
@@ -0,0 +1,215 @@
+"""Contains tests for the worker's state update client."""
+
+import threading
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+import requests
+from tasksapi.constants import FAILED, PUBLISHED, RUNNING, SUCCESSFUL
+from tasksapi.tasks.state_updates import StateUpdateClient
+
+
+class FakeResponse:
+    """A stand-in for a requests.Response."""
+
+    def __init__(self, status_code):
+        """Set the response's status code."""
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = ""
+
+
+class FakeSession:
+    """A stand-in for a requests.Session which records requests.
+
+    The first few requests can be made to fail.
+    """
+
+    def __init__(self, failures=()):
+        """Set up the session.
+
+        Args:
+            failures: An optional sequence of what to do for the first
+                requests. Integers are returned as response status
+                codes, and exceptions are raised.
+        """
+        self.failures = list(failures)
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def patch(self, url, json, timeout):
+        """Record a PATCH request."""
+        with self.lock:
+            if self.failures:
+                failure = self.failures.pop(0)
+
+                if isinstance(failure, Exception):
+                    raise failure
+
+                return FakeResponse(failure)
+
+            self.batches.append(json)
+
+            return FakeResponse(200)
+
+
+class StateUpdateClientTests(SimpleTestCase):
+    """Test batching and retrying state updates."""
+
+    def get_client(self, session, **kwargs):
+        """Make a client which uses a fake session.
+
+        Args:
+            session: A FakeSession.
+            **kwargs: Keyword arguments to pass to the client.
+
+        Returns:
+            A StateUpdateClient.
+        """
+        client = StateUpdateClient(
+            base_url="http://127.0.0.1:8000/",
+            api_token="token",
+            backoff_factor=0,
+            **kwargs
+        )
+        client.session = session
+
+        return client
+
+    def get_failure_counts(self):
+        """Get how many state update requests have failed so far.
+
+        Returns:
+            A list containing the counts of connection errors, server
+            errors, rejections, and dropped batches.
+        """
+        return [
+            REGISTRY.get_sample_value(
+                "saltant_worker_state_update_failures_total",
+                {"reason": reason},
+            )
+            or 0
+            for reason in (
+                "connection_error",
+                "server_error",
+                "rejected",
+                "dropped",
+            )
+        ]
+
+    def test_updates_are_batched(self):
+        """Make sure updates are coalesced and sent in batches."""
+        session = FakeSession()
+        client = self.get_client(session, batch_size=2, flush_interval=60)
+
+        self.assertEqual(
+            client.endpoint_url,
+            "http://127.0.0.1:8000/api/updatetaskinstancestatus/",
+        )
+
+        client.put("uuid-1", PUBLISHED)
+        client.put("uuid-1", RUNNING)
+        client.put("uuid-2", PUBLISHED)
+        client.put("uuid-3", PUBLISHED)
+
+        self.assertTrue(client.flush(timeout=10))
+        self.assertEqual(
+            [
+                [(update["uuid"], update["state"]) for update in batch]
+                for batch in session.batches
+            ],
+            [
+                [("uuid-1", RUNNING), ("uuid-2", PUBLISHED)],
+                [("uuid-3", PUBLISHED)],
+            ],
+        )
+
+    def test_resource_usage_is_kept(self):
+        """Make sure coalesced updates keep the jobs' resource usage."""
+        session = FakeSession()
+        client = self.get_client(session, flush_interval=60)
+
+        client.put("uuid-1", SUCCESSFUL, resource_usage={"bytes_read": 1})
+        client.put("uuid-1", SUCCESSFUL)
+        client.put("uuid-2", FAILED)
+
+        self.assertTrue(client.flush(timeout=10))
+        self.assertEqual(
+            [update.get("resource_usage") for update in session.batches[0]],
+            [{"bytes_read": 1}, None],
+        )
+
+    def test_state_timestamps_are_kept(self):
+        """Make sure coalesced updates keep when earlier states began."""
+        session = FakeSession()
+        client = self.get_client(session, flush_interval=60)
+
+        client.put("uuid-1", PUBLISHED)
+        client.put("uuid-1", RUNNING)
+        client.put("uuid-1", SUCCESSFUL)
+
+        self.assertTrue(client.flush(timeout=10))
+
+        update = session.batches[0][0]
+
+        self.assertEqual(update["state"], SUCCESSFUL)
+        self.assertEqual(
+            sorted(update["state_timestamps"]), [PUBLISHED, RUNNING]
+        )
+
+    def test_failed_batches_are_retried(self):
+        """Make sure batches are retried until the server accepts them."""
+        session = FakeSession(
+            failures=[requests.ConnectionError("API is down"), 503, 429]
+        )
+        client = self.get_client(session)
+
+        client.put("uuid-1", SUCCESSFUL)
+
+        self.assertTrue(client.flush(timeout=10))
+        self.assertEqual(len(session.batches), 1)
+
+    def test_failed_batches_are_dropped_eventually(self):
+        """Make sure failing batches don't hold up other updates."""
+        session = FakeSession(failures=[500] * 3 + [400])
+        client = self.get_client(session, max_retries=2)
+
+        with self.assertLogs("tasksapi.tasks.state_updates", "ERROR"):
+            client.put("uuid-1", SUCCESSFUL)
+            self.assertTrue(client.flush(timeout=10))
+
+            client.put("uuid-2", SUCCESSFUL)
+            self.assertTrue(client.flush(timeout=10))
+
+        client.put("uuid-3", SUCCESSFUL)
+
+        self.assertTrue(client.flush(timeout=10))
+        self.assertEqual(
+            [batch[0]["uuid"] for batch in session.batches], ["uuid-3"]
+        )
+
+    def test_failures_are_counted(self):
+        """Make sure failed requests are counted by why they failed."""
+        failures_before = self.get_failure_counts()
+
+        session = FakeSession(
+            failures=[requests.ConnectionError("API is down"), 503, 400]
+            + [500] * 3
+        )
+        client = self.get_client(session, max_retries=2)
+
+        with self.assertLogs("tasksapi.tasks.state_updates", "ERROR"):
+            client.put("uuid-1", SUCCESSFUL)
+            self.assertTrue(client.flush(timeout=10))
+
+            client.put("uuid-2", SUCCESSFUL)
+            self.assertTrue(client.flush(timeout=10))
+
+        self.assertEqual(
+            [
+                after - before
+                for before, after in zip(
+                    failures_before, self.get_failure_counts()
+                )
+            ],
+            [1, 4, 1, 1],
+        )
@@ -60,6 +60,11 @@ urlpatterns = [
         schema_view.without_ui(cache_timeout=None),
         name="schema-json",
     ),
+    path(
+        r"updatetaskinstancestatus/",
+        views.bulk_update_task_instance_status,
+        name="bulk_update_task_instance_status",
+    ),
     path(
         r"updatetaskinstancestatus/<slug:uuid>/",
         views.update_task_instance_status,
@@ -1,48 +1,20 @@
 """Helpful functions for the tasksapi."""
 
-from django.db.models import Case, IntegerField, Q, When
-from tasksapi.constants import DOCKER
-from tasksapi.models import ExecutableTaskType, TaskQueue
+from django.db.models import Case, IntegerField, When
+from tasksapi.models import TaskQueue, get_allowed_queue_pks
 
 
 def get_allowed_queues(user, task_type=None):
     """Return queryset of the allowed queues.
 
     This is with respect to the task type and user. If no task type is
-    provided we'll skip filtering based on task type.
+    provided we'll skip filtering based on task type. The queues are
+    found using the cached queue permissions, so the queryset only
+    needs to filter by primary key.
     """
-    # Filter down the queues by active attribute
-    queue_qs = TaskQueue.objects.filter(active=True)
-
-    # And by the private attribute
-    queue_qs = queue_qs.filter(Q(private=False) | Q(user=user.pk))
-
-    # And by the task type
-    if task_type is not None:
-        # Filter based on queue's "Allows x" attributes and whitelist
-        if isinstance(task_type, ExecutableTaskType):
-            # Whitelist
-            queue_qs = queue_qs.filter(
-                whitelists__whitelisted_executable_task_types=task_type
-            )
-
-            # Allows attr
-            queue_qs = queue_qs.filter(runs_executable_tasks=True)
-        else:
-            # Whitelist
-            queue_qs = queue_qs.filter(
-                whitelists__whitelisted_container_task_types=task_type
-            )
-
-            # Allows attrs
-            if task_type.container_type == DOCKER:
-                queue_qs = queue_qs.filter(runs_docker_container_tasks=True)
-            else:
-                queue_qs = queue_qs.filter(
-                    runs_singularity_container_tasks=True
-                )
-
-    return queue_qs
+    return TaskQueue.objects.filter(
+        pk__in=get_allowed_queue_pks(user, task_type)
+    )
 
 
 def get_allowed_queues_sorted(user, task_type=None):
@@ -1,7 +1,8 @@
 """Contains view(sets) related to tasks."""
 
 from celery.result import AsyncResult
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, serializers, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
@@ -11,6 +12,7 @@ from rest_framework.status import (
     HTTP_201_CREATED,
     HTTP_202_ACCEPTED,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -25,6 +27,11 @@ from tasksapi.filters import (
     TaskWhitelistFilter,
     UserFilter,
 )
+from tasksapi.logs import (
+    get_logs_bucket,
+    get_task_instance_log_files,
+    read_task_instance_log,
+)
 from tasksapi.models import (
     ContainerTaskInstance,
     ContainerTaskType,
@@ -33,14 +40,26 @@ from tasksapi.models import (
     TaskQueue,
     TaskWhitelist,
     User,
+    bulk_update_resource_usages,
+    bulk_update_task_instance_states,
+    get_latency_percentiles,
+    get_task_instance_model,
 )
-from tasksapi.paginators import SmallResultsSetPagination
+from tasksapi.paginators import TaskInstancePagination
 from tasksapi.permissions import IsAdminOrOwnerThenWriteElseReadOnly
 from tasksapi.serializers import (
+    ContainerTaskInstanceBulkCreateSerializer,
     ContainerTaskInstanceSerializer,
     ContainerTaskTypeSerializer,
+    ExecutableTaskInstanceBulkCreateSerializer,
     ExecutableTaskInstanceSerializer,
     ExecutableTaskTypeSerializer,
+    TaskInstanceBulkStateUpdateRequestSerializer,
+    TaskInstanceBulkStateUpdateResponseSerializer,
+    TaskInstanceLatencySerializer,
+    TaskInstanceLogFileSerializer,
+    TaskInstanceLogRequestSerializer,
+    TaskInstanceLogResponseSerializer,
     TaskInstanceStateUpdateRequestSerializer,
     TaskInstanceStateUpdateResponseSerializer,
     TaskQueueSerializer,
@@ -49,6 +68,60 @@ from tasksapi.serializers import (
 )
 
 
+def get_task_instance_logs_response(request, instance):
+    """Read part of one of a task instance's log files.
+
+    Or list the task instance's log files if no file is asked for.
+
+    Args:
+        request: The request, whose query parameters are as in
+            TaskInstanceLogRequestSerializer.
+        instance: The task instance whose logs to read.
+
+    Returns:
+        A Response.
+    """
+    request_serializer = TaskInstanceLogRequestSerializer(
+        data=request.query_params
+    )
+    request_serializer.is_valid(raise_exception=True)
+
+    params = request_serializer.validated_data
+
+    if "file" not in params:
+        bucket = get_logs_bucket()
+        log_files = (
+            []
+            if bucket is None
+            else get_task_instance_log_files(bucket, instance)
+        )
+
+        return Response(
+            TaskInstanceLogFileSerializer(log_files, many=True).data,
+            status=HTTP_200_OK,
+        )
+
+    log = read_task_instance_log(
+        instance,
+        params["file"],
+        offset=params.get("offset"),
+        tail_bytes=params["tail"],
+        max_bytes=params["max_bytes"],
+    )
+
+    if log is None:
+        return Response(
+            "No log file {} found".format(params["file"]),
+            status=HTTP_404_NOT_FOUND,
+        )
+
+    log["state"] = instance.state
+
+    return Response(
+        TaskInstanceLogResponseSerializer(log).data, status=HTTP_200_OK
+    )
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """A viewset for users."""
 
@@ -75,13 +148,37 @@ class UserInjectedModelViewSet(viewsets.ModelViewSet):
 class ContainerTaskInstanceViewSet(UserInjectedModelViewSet):
     """A viewset for container task instances."""
 
-    queryset = ContainerTaskInstance.objects.all()
+    queryset = ContainerTaskInstance.objects.select_related("user")
     serializer_class = ContainerTaskInstanceSerializer
-    pagination_class = SmallResultsSetPagination
+    pagination_class = TaskInstancePagination
     lookup_field = "uuid"
     http_method_names = ["get", "post"]
     filter_class = ContainerTaskInstanceFilter
 
+    @swagger_auto_schema(
+        method="post",
+        request_body=ContainerTaskInstanceBulkCreateSerializer,
+        responses={
+            HTTP_201_CREATED: ContainerTaskInstanceSerializer(many=True)
+        },
+    )
+    @action(methods=["post"], detail=False, url_path="bulk")
+    def bulk_create(self, request):
+        """Create many jobs of one task type with different arguments."""
+        # Validate and create the instances
+        serializer = ContainerTaskInstanceBulkCreateSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save()
+
+        # Serialize the new instances and return them in the response
+        serialized_instances = ContainerTaskInstanceSerializer(
+            instances, many=True
+        )
+
+        return Response(serialized_instances.data, status=HTTP_201_CREATED)
+
     @swagger_auto_schema(
         method="post",
         request_body=serializers.Serializer,
@@ -100,6 +197,9 @@ class ContainerTaskInstanceViewSet(UserInjectedModelViewSet):
             task_type=instance_to_clone.task_type,
             task_queue=instance_to_clone.task_queue,
             arguments=instance_to_clone.arguments,
+            cpu_limit=instance_to_clone.cpu_limit,
+            memory_limit_megabytes=instance_to_clone.memory_limit_megabytes,
+            pids_limit=instance_to_clone.pids_limit,
         )
 
         # Serialize the new instance and return it in the response
@@ -123,12 +223,49 @@ class ContainerTaskInstanceViewSet(UserInjectedModelViewSet):
         serialized_instance = ContainerTaskInstanceSerializer(this_instance)
         return Response(serialized_instance.data, status=HTTP_202_ACCEPTED)
 
+    @swagger_auto_schema(
+        method="get",
+        query_serializer=TaskInstanceLogRequestSerializer,
+        responses={HTTP_200_OK: TaskInstanceLogResponseSerializer},
+    )
+    @action(methods=["get"], detail=True)
+    def logs(self, request, uuid):
+        """Read part of one of a job's log files.
+
+        Either the end of the file or the bytes from an offset are read,
+        so a running job's logs can be followed by reading from the last
+        response's next_offset. If no file is given, the job's log files
+        are listed instead.
+        """
+        return get_task_instance_logs_response(request, self.get_object())
+
+    @swagger_auto_schema(
+        method="get",
+        responses={HTTP_200_OK: TaskInstanceLatencySerializer(many=True)},
+    )
+    @action(methods=["get"], detail=False)
+    def latencies(self, request):
+        """Get percentiles of how long jobs waited in queues and ran.
+
+        Percentiles are given for each task queue and task type, and
+        only cover the jobs matching the filters given (e.g., jobs
+        created in the last day).
+        """
+        latencies = get_latency_percentiles(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        return Response(
+            TaskInstanceLatencySerializer(latencies, many=True).data,
+            status=HTTP_200_OK,
+        )
+
 
 @permission_classes((IsAdminOrOwnerThenWriteElseReadOnly,))
 class ContainerTaskTypeViewSet(UserInjectedModelViewSet):
     """A viewset for container task types."""
 
-    queryset = ContainerTaskType.objects.all()
+    queryset = ContainerTaskType.objects.select_related("user")
     serializer_class = ContainerTaskTypeSerializer
     http_method_names = ["get", "post", "put"]
     filter_class = ContainerTaskTypeFilter
@@ -137,13 +274,37 @@ class ContainerTaskTypeViewSet(UserInjectedModelViewSet):
 class ExecutableTaskInstanceViewSet(UserInjectedModelViewSet):
     """A viewset for executable task instances."""
 
-    queryset = ExecutableTaskInstance.objects.all()
+    queryset = ExecutableTaskInstance.objects.select_related("user")
     serializer_class = ExecutableTaskInstanceSerializer
-    pagination_class = SmallResultsSetPagination
+    pagination_class = TaskInstancePagination
     lookup_field = "uuid"
     http_method_names = ["get", "post"]
     filter_class = ExecutableTaskInstanceFilter
 
+    @swagger_auto_schema(
+        method="post",
+        request_body=ExecutableTaskInstanceBulkCreateSerializer,
+        responses={
+            HTTP_201_CREATED: ExecutableTaskInstanceSerializer(many=True)
+        },
+    )
+    @action(methods=["post"], detail=False, url_path="bulk")
+    def bulk_create(self, request):
+        """Create many jobs of one task type with different arguments."""
+        # Validate and create the instances
+        serializer = ExecutableTaskInstanceBulkCreateSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save()
+
+        # Serialize the new instances and return them in the response
+        serialized_instances = ExecutableTaskInstanceSerializer(
+            instances, many=True
+        )
+
+        return Response(serialized_instances.data, status=HTTP_201_CREATED)
+
     @swagger_auto_schema(
         method="post",
         request_body=serializers.Serializer,
@@ -185,12 +346,49 @@ class ExecutableTaskInstanceViewSet(UserInjectedModelViewSet):
         serialized_instance = ExecutableTaskInstanceSerializer(this_instance)
         return Response(serialized_instance.data, status=HTTP_202_ACCEPTED)
 
+    @swagger_auto_schema(
+        method="get",
+        query_serializer=TaskInstanceLogRequestSerializer,
+        responses={HTTP_200_OK: TaskInstanceLogResponseSerializer},
+    )
+    @action(methods=["get"], detail=True)
+    def logs(self, request, uuid):
+        """Read part of one of a job's log files.
+
+        Either the end of the file or the bytes from an offset are read,
+        so a running job's logs can be followed by reading from the last
+        response's next_offset. If no file is given, the job's log files
+        are listed instead.
+        """
+        return get_task_instance_logs_response(request, self.get_object())
+
+    @swagger_auto_schema(
+        method="get",
+        responses={HTTP_200_OK: TaskInstanceLatencySerializer(many=True)},
+    )
+    @action(methods=["get"], detail=False)
+    def latencies(self, request):
+        """Get percentiles of how long jobs waited in queues and ran.
+
+        Percentiles are given for each task queue and task type, and
+        only cover the jobs matching the filters given (e.g., jobs
+        created in the last day).
+        """
+        latencies = get_latency_percentiles(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        return Response(
+            TaskInstanceLatencySerializer(latencies, many=True).data,
+            status=HTTP_200_OK,
+        )
+
 
 @permission_classes((IsAdminOrOwnerThenWriteElseReadOnly,))
 class ExecutableTaskTypeViewSet(UserInjectedModelViewSet):
     """A viewset for executable task types."""
 
-    queryset = ExecutableTaskType.objects.all()
+    queryset = ExecutableTaskType.objects.select_related("user")
     serializer_class = ExecutableTaskTypeSerializer
     http_method_names = ["get", "post", "put"]
     filter_class = ExecutableTaskTypeFilter
@@ -200,7 +398,9 @@ class ExecutableTaskTypeViewSet(UserInjectedModelViewSet):
 class TaskQueueViewSet(UserInjectedModelViewSet):
     """A viewset for task queues."""
 
-    queryset = TaskQueue.objects.all()
+    queryset = TaskQueue.objects.select_related("user").prefetch_related(
+        "whitelists"
+    )
     serializer_class = TaskQueueSerializer
     http_method_names = ["get", "post", "patch", "put"]
     filter_class = TaskQueueFilter
@@ -210,7 +410,10 @@ class TaskQueueViewSet(UserInjectedModelViewSet):
 class TaskWhitelistViewSet(UserInjectedModelViewSet):
     """A viewset for task queues."""
 
-    queryset = TaskWhitelist.objects.all()
+    queryset = TaskWhitelist.objects.select_related("user").prefetch_related(
+        "whitelisted_container_task_types",
+        "whitelisted_executable_task_types",
+    )
     serializer_class = TaskWhitelistSerializer
     http_method_names = ["get", "post", "patch", "put"]
     filter_class = TaskWhitelistFilter
@@ -254,41 +457,113 @@ class TokenRefreshPermissiveView(TokenRefreshView):
 @api_view(["PATCH"])
 def update_task_instance_status(request, uuid):
     """Updates the status for task instances of any class of task."""
-    # Find the instance we need to update
-    state = request.data["state"]
+    request_serializer = TaskInstanceStateUpdateRequestSerializer(
+        data=request.data
+    )
+    request_serializer.is_valid(raise_exception=True)
 
-    try:
-        # Try finding a container task instance first
-        instance = ContainerTaskInstance.objects.get(uuid=uuid)
-        instance.state = state
-        instance.save()
+    state = request_serializer.validated_data["state"]
+    resource_usage = request_serializer.validated_data.get("resource_usage")
 
-        serialized_instance = TaskInstanceStateUpdateResponseSerializer(
-            instance
-        )
+    # Find which table the instance we need to update is in
+    instance_model = get_task_instance_model(uuid)
+
+    with transaction.atomic():
+        if instance_model is None:
+            instance = None
+        else:
+            instance = (
+                instance_model.objects.select_for_update()
+                .filter(uuid=uuid)
+                .first()
+            )
 
-        return Response(serialized_instance.data, status=HTTP_200_OK)
-    except ObjectDoesNotExist:
-        # Not a container task instance
-        pass
+        if instance is None:
+            # Bad request :(
+            return Response(
+                "No task instance with UUID {} found".format(uuid),
+                status=HTTP_400_BAD_REQUEST,
+            )
 
-    # Now try finding an executable task instance
-    try:
-        instance = ExecutableTaskInstance.objects.get(uuid=uuid)
-        instance.state = state
-        instance.save()
+        try:
+            instance.transition_state(state)
+        except ValidationError as e:
+            return Response(e.message, status=HTTP_400_BAD_REQUEST)
 
-        serialized_instance = TaskInstanceStateUpdateResponseSerializer(
-            instance
+        if resource_usage:
+            bulk_update_resource_usages(
+                instance_model, {str(instance.uuid): resource_usage}
+            )
+
+    serialized_instance = TaskInstanceStateUpdateResponseSerializer(instance)
+
+    return Response(serialized_instance.data, status=HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method="patch",
+    request_body=TaskInstanceBulkStateUpdateRequestSerializer(many=True),
+    responses={
+        HTTP_200_OK: TaskInstanceBulkStateUpdateResponseSerializer(many=True)
+    },
+)
+@api_view(["PATCH"])
+def bulk_update_task_instance_status(request):
+    """Updates the statuses for many task instances at once.
+
+    Task instances can be of any class of task. A result is returned
+    for each update, in the order the updates were given. If a task
+    instance is given more than once, only its last update is applied.
+    Updates which would make an invalid state change (e.g., from
+    successful to running) aren't applied. Updates can also record when
+    task instances changed state and the resources their jobs used.
+    """
+    request_serializer = TaskInstanceBulkStateUpdateRequestSerializer(
+        data=request.data, many=True
+    )
+    request_serializer.is_valid(raise_exception=True)
+
+    updates = [
+        (str(update["uuid"]), update["state"])
+        for update in request_serializer.validated_data
+    ]
+
+    timestamps = {}
+    resource_usages = {}
+
+    for update in request_serializer.validated_data:
+        uuid = str(update["uuid"])
+        timestamps.setdefault(uuid, {}).update(
+            update.get("state_timestamps", {})
         )
 
-        return Response(serialized_instance.data, status=HTTP_200_OK)
-    except ObjectDoesNotExist:
-        # Not a container task instance
-        pass
+        if "timestamp" in update:
+            timestamps[uuid][update["state"]] = update["timestamp"]
+
+        if update.get("resource_usage"):
+            resource_usages[uuid] = update["resource_usage"]
+
+    # Later updates for a task instance override earlier ones
+    last_update_indices = {uuid: idx for idx, (uuid, _) in enumerate(updates)}
+    reasons = bulk_update_task_instance_states(
+        dict(updates), timestamps=timestamps, resource_usages=resource_usages
+    )
+
+    results = []
+
+    for idx, (uuid, state) in enumerate(updates):
+        if uuid not in reasons:
+            detail = "No task instance with UUID {} found".format(uuid)
+        elif idx != last_update_indices[uuid]:
+            detail = "Overridden by a later update"
+        else:
+            detail = reasons[uuid]
+
+        results.append(
+            dict(uuid=uuid, state=state, updated=not detail, detail=detail)
+        )
 
-    # Bad request :(
     return Response(
-        "No task instance with UUID {} found".format(uuid),
-        status=HTTP_400_BAD_REQUEST,
+        TaskInstanceBulkStateUpdateResponseSerializer(results, many=True).data,
+        status=HTTP_200_OK,
     )